@@ -0,0 +1,6 @@
+"""Command line entry point of the ETL package: python -m ETL run | status (see ETL/pipeline.py)."""
+
+from ETL.pipeline import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,956 @@
+"""
+Shared Database Access Layer for the ETL Scripts
+
+One place for the connection settings, pooling, per-statement timeouts,
+retries of transient errors and transactions, so every script pays
+connection setup once per process and concurrent workers share a pool.
+
+Backends (DB_BACKEND):
+- 'mysql' (default): mysql.connector connections to DB_CONFIG
+- 'sqlite': a local SQLite file (SQLITE_PATH) as a stand-in for tests and
+  benchmarks. The schema (deployment/sqlite_schema.sql) is created on first
+  use and the MySQL statements of the ETL scripts are translated on the fly:
+  %s placeholders, ON DUPLICATE KEY UPDATE, INSERT IGNORE, TRUNCATE,
+  DATE_SUB/DATE_ADD ... INTERVAL, GREATEST/LEAST, NOW/CURDATE and
+  INFORMATION_SCHEMA.COLUMNS/TABLES. ISO date strings come back as
+  date/datetime like they do from MySQL.
+Other backends can be added with register_backend().
+
+Connections come from a per-process pool (DB_POOL_SIZE); close() returns
+them to the pool, so scripts keep their connect / close structure. After a
+fork the child process starts a fresh pool.
+
+Heavy read-only queries can use get_read_connection() instead: it returns a
+connection to the read replica (DB_REPLICA_HOST / SQLITE_REPLICA_PATH) while
+the replica is fresh, and to the primary otherwise, so nightly scans of
+plc_sensor_readings stay off the primary. Writes always go to get_connection().
+
+With ETL_SAMPLE=1 the connections go to the scratch sample database
+(DB_SAMPLE_NAME / SQLITE_SAMPLE_PATH) built by ETL/sampling.py instead, so
+the unchanged scripts run on a small sample and never touch production.
+
+Tables that are rebuilt from scratch on every run are replaced with
+refresh_table(): the rows are bulk-loaded into a shadow table and swapped in
+atomically, so readers never see an empty or partially loaded table.
+
+Usage:
+    from ETL.db import Error, get_connection, transaction
+
+    connection = get_connection()
+    try:
+        with transaction(connection) as cursor:
+            cursor.execute("UPDATE ...")
+    finally:
+        connection.close()
+"""
+
+import mysql.connector
+from mysql.connector import errors as mysql_errors
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
+import calendar
+import os
+import re
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+import numpy as np
+
+# Load environment variables
+load_dotenv()
+
+# Database configuration
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'database': os.getenv('DB_NAME', 'palantir_maintenance'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'port': int(os.getenv('DB_PORT', 3306))
+}
+
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql')
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'palantir_maintenance.sqlite')
+
+# Read replica for the read-only analytical queries (no host / path = read from the primary)
+DB_REPLICA_CONFIG = {
+    'host': os.getenv('DB_REPLICA_HOST'),
+    'database': os.getenv('DB_REPLICA_NAME', DB_CONFIG['database']),
+    'user': os.getenv('DB_REPLICA_USER', DB_CONFIG['user']),
+    'password': os.getenv('DB_REPLICA_PASSWORD', DB_CONFIG['password']),
+    'port': int(os.getenv('DB_REPLICA_PORT', DB_CONFIG['port']))
+}
+SQLITE_REPLICA_PATH = os.getenv('SQLITE_REPLICA_PATH')
+# Replication lag (MySQL Seconds_Behind_Source) above which reads go to the primary
+DB_REPLICA_MAX_LAG_SECONDS = int(os.getenv('DB_REPLICA_MAX_LAG_SECONDS', 300))
+# How long a replica freshness check is trusted
+DB_REPLICA_CHECK_SECONDS = float(os.getenv('DB_REPLICA_CHECK_SECONDS', 60))
+SQLITE_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  'deployment', 'sqlite_schema.sql')
+
+# Sampling/dev mode (ETL/sampling.py): with ETL_SAMPLE=1 every script reads and
+# writes the scratch sample database instead of the production one
+ETL_SAMPLE = os.getenv('ETL_SAMPLE', '0') == '1'
+DB_SAMPLE_NAME = os.getenv('DB_SAMPLE_NAME', f"{DB_CONFIG['database']}_sample")
+SQLITE_SAMPLE_PATH = os.getenv('SQLITE_SAMPLE_PATH', f"{os.path.splitext(SQLITE_PATH)[0]}_sample.sqlite")
+SAMPLE_CONFIG = dict(DB_CONFIG, database=DB_SAMPLE_NAME)
+if ETL_SAMPLE:
+    DB_CONFIG['database'], SQLITE_PATH = DB_SAMPLE_NAME, SQLITE_SAMPLE_PATH
+
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+# Seconds to wait for a free pooled connection
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+# Idle pooled connections older than this are checked before reuse
+DB_POOL_RECHECK_SECONDS = float(os.getenv('DB_POOL_RECHECK_SECONDS', 30))
+DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', 10))
+# Per-statement limit in milliseconds (0 = none); MySQL applies it to SELECTs
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))
+# Seconds a statement waits for a row lock (MySQL) or the database lock (SQLite)
+DB_LOCK_WAIT_TIMEOUT = int(os.getenv('DB_LOCK_WAIT_TIMEOUT', 50))
+DB_RETRIES = int(os.getenv('DB_RETRIES', 3))
+DB_RETRY_BACKOFF = float(os.getenv('DB_RETRY_BACKOFF', 0.5))
+# Rows per committed batch when refresh_table() loads a shadow table
+DB_REFRESH_BATCH_SIZE = int(os.getenv('DB_REFRESH_BATCH_SIZE', 5000))
+
+# Catch-all for database errors of any backend (usable in `except Error`)
+Error = (mysql.connector.Error, sqlite3.Error)
+
+# Lock wait timeout, deadlock, too many connections, can't connect, server gone, lost connection
+TRANSIENT_MYSQL_ERRORS = {1205, 1213, 1040, 2003, 2006, 2013}
+
+
+def is_transient(error):
+    """True if the error is worth retrying (lock contention, lost connection)."""
+    if isinstance(error, mysql.connector.Error):
+        return error.errno in TRANSIENT_MYSQL_ERRORS
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error)
+        return 'locked' in message or 'busy' in message
+    return False
+
+
+def with_retries(func, *args, retries=None, **kwargs):
+    """
+    Call func(*args, **kwargs), retrying transient database errors with
+    exponential backoff. func must be safe to run again.
+    """
+    retries = DB_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except Error as e:
+            if attempt == retries or not is_transient(e):
+                raise
+            delay = DB_RETRY_BACKOFF * 2 ** attempt
+            print(f"Transient database error ({e}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+def _connect_mysql(config=DB_CONFIG):
+    connection = mysql.connector.connect(connection_timeout=DB_CONNECT_TIMEOUT, **config)
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SET SESSION innodb_lock_wait_timeout = %s", (DB_LOCK_WAIT_TIMEOUT,))
+    finally:
+        cursor.close()
+    return connection
+
+
+def _set_mysql_timeout(connection, timeout_ms):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SET SESSION MAX_EXECUTION_TIME = %s", (int(timeout_ms),))
+    finally:
+        cursor.close()
+
+
+def _connect_sqlite():
+    return SQLiteConnection(SQLITE_PATH)
+
+
+def _set_sqlite_timeout(connection, timeout_ms):
+    connection.statement_timeout_ms = int(timeout_ms)
+
+
+def _connect_mysql_replica():
+    connection = _connect_mysql(DB_REPLICA_CONFIG)
+    cursor = connection.cursor()
+    try:
+        # A write routed to the replica by mistake fails instead of diverging from the primary
+        cursor.execute("SET SESSION TRANSACTION READ ONLY")
+    finally:
+        cursor.close()
+    return connection
+
+
+def _connect_sqlite_replica():
+    connection = SQLiteConnection(SQLITE_REPLICA_PATH)
+    connection.sqlite.execute("PRAGMA query_only = ON")
+    return connection
+
+
+def _connect_mysql_sample():
+    return _connect_mysql(SAMPLE_CONFIG)
+
+
+def _connect_sqlite_sample():
+    return SQLiteConnection(SQLITE_SAMPLE_PATH)
+
+
+# name -> (connect(), set_statement_timeout(connection, ms))
+BACKENDS = {
+    'mysql': (_connect_mysql, _set_mysql_timeout),
+    'sqlite': (_connect_sqlite, _set_sqlite_timeout),
+    # Read replicas of the backends above (see read_backend())
+    'mysql_replica': (_connect_mysql_replica, _set_mysql_timeout),
+    'sqlite_replica': (_connect_sqlite_replica, _set_sqlite_timeout),
+    # Scratch sample databases, for building them from production (ETL/sampling.py)
+    'mysql_sample': (_connect_mysql_sample, _set_mysql_timeout),
+    'sqlite_sample': (_connect_sqlite_sample, _set_sqlite_timeout),
+}
+
+
+def register_backend(name, connect, set_statement_timeout):
+    """Make another backend selectable through DB_BACKEND / get_connection(backend=...)."""
+    BACKENDS[name] = (connect, set_statement_timeout)
+
+
+# ---------------------------------------------------------------------------
+# Pooling
+# ---------------------------------------------------------------------------
+
+class PooledConnection:
+    """
+    A checked-out connection. Behaves like the backend connection; close()
+    rolls back anything uncommitted and hands it back to the pool.
+    """
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise AttributeError(f"{name}: connection already returned to the pool")
+        return getattr(self._connection, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._connection.cursor(*args, **kwargs)
+        return _cursor_wrapper(cursor) if _cursor_wrapper is not None else cursor
+
+    @property
+    def raw(self):
+        """The underlying backend connection."""
+        return self._connection
+
+    def is_connected(self):
+        return self._connection is not None and self._connection.is_connected()
+
+    def set_statement_timeout(self, timeout_ms):
+        """Change the per-statement timeout (milliseconds, 0 = none) of this connection."""
+        self._pool.set_timeout(self._connection, timeout_ms)
+
+    def close(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Lazily filled pool of at most `size` connections of one backend. Callers
+    block up to `timeout` seconds when every connection is checked out.
+    """
+
+    def __init__(self, backend=None, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.backend = backend or DB_BACKEND
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown DB_BACKEND '{self.backend}' (expected one of {sorted(BACKENDS)})")
+        self._connect, self._set_timeout = BACKENDS[self.backend]
+        self.size = size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []  # (connection, returned_at)
+        self._timeouts = {}  # id(connection) -> statement timeout in effect
+
+    def get(self, statement_timeout_ms=None):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise mysql_errors.PoolError(f"No free connection in the '{self.backend}' pool "
+                                         f"after {self.timeout:g}s (DB_POOL_SIZE={self.size})")
+        try:
+            connection = self._checkout()
+            self.set_timeout(connection, DB_STATEMENT_TIMEOUT_MS if statement_timeout_ms is None
+                             else statement_timeout_ms)
+            return PooledConnection(self, connection)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def set_timeout(self, connection, timeout_ms):
+        if self._timeouts.get(id(connection), 0) != timeout_ms:
+            self._set_timeout(connection, timeout_ms)
+            self._timeouts[id(connection)] = timeout_ms
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                connection, returned_at = self._idle.pop()
+            if time.monotonic() - returned_at < DB_POOL_RECHECK_SECONDS or connection.is_connected():
+                return connection
+            self._discard(connection)
+        return with_retries(self._connect)
+
+    def release(self, connection):
+        try:
+            if connection.is_connected():
+                connection.rollback()
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+            else:
+                self._discard(connection)
+        except Error:
+            self._discard(connection)
+        finally:
+            self._slots.release()
+
+    def _discard(self, connection):
+        self._timeouts.pop(id(connection), None)
+        try:
+            connection.close()
+        except Error:
+            pass
+
+    def close(self):
+        """Close the idle connections (checked-out ones close when returned)."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._discard(connection)
+
+
+_pools = {}
+_pools_pid = None
+# Optional callable wrapping every cursor of a pooled connection (ETL/instrumentation.py)
+_cursor_wrapper = None
+
+
+def set_cursor_wrapper(wrapper):
+    """Wrap every cursor created from now on with wrapper(cursor) (None = no wrapping)."""
+    global _cursor_wrapper
+    _cursor_wrapper = wrapper
+
+_pools_lock = threading.Lock()
+
+
+def get_pool(backend=None):
+    """The process-wide pool of a backend (recreated after a fork)."""
+    global _pools, _pools_pid
+    backend = backend or DB_BACKEND
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Connections inherited from the parent process must not be reused
+            _pools, _pools_pid = {}, os.getpid()
+        pool = _pools.get(backend)
+        if pool is None:
+            pool = _pools[backend] = ConnectionPool(backend)
+        return pool
+
+
+def get_connection(statement_timeout_ms=None, backend=None):
+    """
+    Check out a pooled connection (DB_BACKEND unless `backend` is given),
+    with the per-statement timeout set (default DB_STATEMENT_TIMEOUT_MS).
+    Connecting retries transient errors. close() returns it to the pool.
+    """
+    return get_pool(backend).get(statement_timeout_ms)
+
+
+# ---------------------------------------------------------------------------
+# Read replica routing
+# ---------------------------------------------------------------------------
+
+_replica_checks = {}  # backend -> (checked_at, reason the replica is not used or None)
+_replica_lock = threading.Lock()
+
+
+def replica_backend(backend=None):
+    """Name of the read replica backend of `backend`, or None if none is configured."""
+    if ETL_SAMPLE:
+        # The replica holds production data, not the sample
+        return None
+    backend = backend or DB_BACKEND
+    configured = {'mysql': DB_REPLICA_CONFIG['host'], 'sqlite': SQLITE_REPLICA_PATH}.get(backend)
+    return f"{backend}_replica" if configured else None
+
+
+def _watermarks(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT watermark_name, watermark_value FROM etl_watermarks")
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def _mysql_replication_lag(connection):
+    """Seconds_Behind_Source of a MySQL replica; None if replication is not running."""
+    cursor = connection.cursor(dictionary=True)
+    try:
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+        except mysql.connector.Error:
+            cursor.execute("SHOW SLAVE STATUS")  # MySQL < 8.0.22
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if row is None:
+        return None
+    return row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+
+
+def replica_staleness(backend=None):
+    """
+    None if the replica of `backend` is fresh enough to read from, else the
+    reason it is not: replication lag above DB_REPLICA_MAX_LAG_SECONDS (MySQL),
+    or an ETL watermark (etl_watermarks) that the replica has not caught up with.
+    """
+    replica = get_connection(backend=replica_backend(backend))
+    try:
+        if not _is_sqlite(replica):
+            lag = _mysql_replication_lag(replica)
+            if lag is None:
+                return "replication is not running"
+            if lag > DB_REPLICA_MAX_LAG_SECONDS:
+                return f"replication lag {lag}s > {DB_REPLICA_MAX_LAG_SECONDS}s"
+        replica_watermarks = _watermarks(replica)
+    finally:
+        replica.close()
+    primary = get_connection(backend=backend)
+    try:
+        primary_watermarks = _watermarks(primary)
+    finally:
+        primary.close()
+    behind = sorted(name for name, value in primary_watermarks.items() if replica_watermarks.get(name) != value)
+    if behind:
+        return f"replica behind the ETL watermarks {', '.join(behind)}"
+    return None
+
+
+def read_backend(backend=None):
+    """
+    Backend for read-only analytical queries: the replica of `backend` when one
+    is configured and fresh, else `backend` itself (the primary). The freshness
+    check is reused for DB_REPLICA_CHECK_SECONDS.
+    """
+    backend = backend or DB_BACKEND
+    replica = replica_backend(backend)
+    if replica is None:
+        return backend
+    with _replica_lock:
+        checked = _replica_checks.get(backend)
+        if checked is None or time.monotonic() - checked[0] > DB_REPLICA_CHECK_SECONDS:
+            try:
+                reason = replica_staleness(backend)
+            except Error as e:
+                reason = f"replica unavailable ({e})"
+            if checked is None or reason != checked[1]:
+                print(f"Reading from the primary: {reason}" if reason else f"Reading from the replica ({replica})")
+            checked = _replica_checks[backend] = (time.monotonic(), reason)
+    return backend if checked[1] else replica
+
+
+def get_read_connection(statement_timeout_ms=None, backend=None):
+    """
+    Pooled connection for read-only analytical queries: the replica when it is
+    fresh (read_backend()), else the primary. Never write through it.
+    """
+    return get_connection(statement_timeout_ms, read_backend(backend))
+
+
+def close_pools():
+    """Close every idle pooled connection of this process."""
+    with _pools_lock:
+        pools = list(_pools.values()) if _pools_pid == os.getpid() else []
+    for pool in pools:
+        pool.close()
+
+
+@contextmanager
+def transaction(connection, dictionary=False):
+    """
+    Run a block in a transaction: yields a cursor, commits on success and
+    rolls back on any exception.
+    """
+    cursor = connection.cursor(dictionary=dictionary)
+    try:
+        yield cursor
+        connection.commit()
+    except BaseException:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def run_transaction(func, *args, retries=None, dictionary=False, **kwargs):
+    """
+    Run func(cursor, *args, **kwargs) in a transaction on a fresh pooled
+    connection and return its result. Deadlocks, lock wait timeouts and
+    lost connections roll back and re-run the whole transaction.
+    """
+    def attempt():
+        connection = get_connection()
+        try:
+            with transaction(connection, dictionary) as cursor:
+                return func(cursor, *args, **kwargs)
+        finally:
+            connection.close()
+    return with_retries(attempt, retries=retries)
+
+
+# ---------------------------------------------------------------------------
+# Table refresh (shadow table + atomic swap)
+# ---------------------------------------------------------------------------
+
+def _is_sqlite(connection):
+    return isinstance(getattr(connection, 'raw', connection), SQLiteConnection)
+
+
+def _mysql_secondary_indexes(cursor, table):
+    """ADD INDEX clauses recreating the non-primary indexes of `table`."""
+    cursor.execute("""
+        SELECT INDEX_NAME, NON_UNIQUE, COLUMN_NAME, SUB_PART
+        FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND INDEX_NAME <> 'PRIMARY'
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """, (DB_CONFIG['database'], table))
+    indexes = {}
+    for name, non_unique, column, sub_part in cursor.fetchall():
+        unique, parts = indexes.setdefault(name, (not int(non_unique), []))
+        parts.append(f"`{column}`({sub_part})" if sub_part else f"`{column}`")
+    return {name: f"ADD {'UNIQUE ' if unique else ''}INDEX `{name}` ({', '.join(parts)})"
+            for name, (unique, parts) in indexes.items()}
+
+
+def _foreign_keys(cursor, table, sqlite):
+    """[(columns, referenced table, referenced columns, on update, on delete)] of `table`."""
+    keys = {}
+    if sqlite:
+        cursor.execute(f"PRAGMA foreign_key_list({table})")
+        for key_id, _, ref_table, column, ref_column, on_update, on_delete, _ in cursor.fetchall():
+            keys.setdefault(key_id, ([], ref_table, [], on_update, on_delete))
+            keys[key_id][0].append(column)
+            keys[key_id][2].append(ref_column)
+        return list(keys.values())
+    cursor.execute("""
+        SELECT k.CONSTRAINT_NAME, k.COLUMN_NAME, k.REFERENCED_TABLE_NAME, k.REFERENCED_COLUMN_NAME,
+               r.UPDATE_RULE, r.DELETE_RULE
+        FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE k
+        JOIN INFORMATION_SCHEMA.REFERENTIAL_CONSTRAINTS r
+          ON r.CONSTRAINT_SCHEMA = k.CONSTRAINT_SCHEMA AND r.CONSTRAINT_NAME = k.CONSTRAINT_NAME
+        WHERE k.TABLE_SCHEMA = %s AND k.TABLE_NAME = %s AND k.REFERENCED_TABLE_NAME IS NOT NULL
+        ORDER BY k.CONSTRAINT_NAME, k.ORDINAL_POSITION
+    """, (DB_CONFIG['database'], table))
+    for name, column, ref_table, ref_column, on_update, on_delete in cursor.fetchall():
+        keys.setdefault(name, ([], ref_table, [], on_update, on_delete))
+        keys[name][0].append(column)
+        keys[name][2].append(ref_column)
+    return list(keys.values())
+
+
+def _validate_shadow(cursor, shadow, expected, foreign_keys):
+    """Row count of the loaded shadow table and rows without a parent (none allowed)."""
+    cursor.execute(f"SELECT COUNT(*) FROM {shadow}")
+    count = cursor.fetchone()[0]
+    if count != expected:
+        raise RuntimeError(f"Refresh of {shadow} incomplete: {count} of {expected} rows")
+    for columns, ref_table, ref_columns, _, _ in foreign_keys:
+        join = ' AND '.join(f"p.{ref} = s.{col}" for col, ref in zip(columns, ref_columns))
+        present = ' AND '.join(f"s.{col} IS NOT NULL" for col in columns)
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM {shadow} s LEFT JOIN {ref_table} p ON {join}
+            WHERE {present} AND p.{ref_columns[0]} IS NULL
+        """)
+        orphans = cursor.fetchone()[0]
+        if orphans:
+            raise RuntimeError(f"Refresh of {shadow}: {orphans} rows reference missing {ref_table} rows")
+
+
+def _load_batches(connection, cursor, shadow, columns, rows, batch_size):
+    insert_sql = f"INSERT INTO {shadow} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    loaded, batch = 0, []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            cursor.executemany(insert_sql, batch)
+            connection.commit()
+            loaded += len(batch)
+            batch = []
+    if batch:
+        cursor.executemany(insert_sql, batch)
+        connection.commit()
+        loaded += len(batch)
+    return loaded
+
+
+def refresh_table(connection, table, columns, rows, batch_size=None):
+    """
+    Replace the contents of `table` with `rows` (tuples in `columns` order)
+    so readers always see either the old or the new complete table:
+    1. load a shadow copy (<table>_shadow) without secondary indexes, in
+       committed batches, so no long transaction holds locks on `table`
+    2. build the indexes once, after the load
+    3. check the row count and that every foreign key has its parent row
+    4. swap it in atomically (MySQL: RENAME TABLE; SQLite: DROP + RENAME in
+       one transaction)
+    A failed load or validation drops the shadow and leaves `table` as it
+    was. Returns the number of rows loaded.
+    """
+    batch_size = batch_size or DB_REFRESH_BATCH_SIZE
+    shadow, old = f"{table}_shadow", f"{table}_old"
+    sqlite = _is_sqlite(connection)
+    cursor = connection.cursor()
+    try:
+        connection.commit()
+        cursor.execute(f"DROP TABLE IF EXISTS {shadow}")
+        foreign_keys = _foreign_keys(cursor, table, sqlite)
+        if sqlite:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", (table,))
+            create_sql = re.sub(r'^CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?["`]?\w+["`]?',
+                                f'CREATE TABLE {shadow}', cursor.fetchone()[0], flags=re.I)
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL",
+                           (table,))
+            index_sqls = [row[0] for row in cursor.fetchall()]
+            cursor.execute(create_sql)
+        else:
+            indexes = _mysql_secondary_indexes(cursor, table)
+            cursor.execute(f"CREATE TABLE {shadow} LIKE {table}")
+            if indexes:
+                cursor.execute(f"ALTER TABLE {shadow} {', '.join(f'DROP INDEX `{name}`' for name in indexes)}")
+
+        try:
+            loaded = _load_batches(connection, cursor, shadow, columns, rows, batch_size)
+            if not sqlite and indexes:
+                cursor.execute(f"ALTER TABLE {shadow} {', '.join(indexes.values())}")
+            _validate_shadow(cursor, shadow, loaded, foreign_keys)
+        except BaseException:
+            connection.rollback()
+            cursor.execute(f"DROP TABLE IF EXISTS {shadow}")
+            raise
+
+        if sqlite:
+            # DDL is transactional in SQLite: readers see the old table until COMMIT
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                cursor.execute(f"DROP TABLE {table}")
+                cursor.execute(f"ALTER TABLE {shadow} RENAME TO {table}")
+                for index_sql in index_sqls:
+                    cursor.execute(index_sql)
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+        else:
+            # CREATE TABLE ... LIKE does not copy foreign keys. Rows were checked
+            # above, so they are added without a second validation scan. Named
+            # <shadow>_ibfk_N, RENAME TABLE turns them into <table>_ibfk_N.
+            if foreign_keys:
+                clauses = [
+                    f"ADD CONSTRAINT `{shadow}_ibfk_{i}` FOREIGN KEY ({', '.join(columns_)}) "
+                    f"REFERENCES {ref_table} ({', '.join(ref_columns)}) ON UPDATE {on_update} ON DELETE {on_delete}"
+                    for i, (columns_, ref_table, ref_columns, on_update, on_delete) in enumerate(foreign_keys, 1)
+                ]
+                cursor.execute("SET SESSION foreign_key_checks = 0")
+                try:
+                    cursor.execute(f"ALTER TABLE {shadow} {', '.join(clauses)}")
+                finally:
+                    cursor.execute("SET SESSION foreign_key_checks = 1")
+            cursor.execute(f"DROP TABLE IF EXISTS {old}")
+            cursor.execute(f"RENAME TABLE {table} TO {old}, {shadow} TO {table}")
+            cursor.execute(f"DROP TABLE {old}")
+        return loaded
+    finally:
+        cursor.close()
+
+
+# ---------------------------------------------------------------------------
+# SQLite stand-in
+# ---------------------------------------------------------------------------
+
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+_ISO_DATETIME = re.compile(r'^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(\.\d{1,6})?$')
+
+
+def _sqlite_param(value):
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+# Bound parameters are adapted by sqlite3 itself, which only calls back into
+# Python for these types, not for every int / float / str of a bulk insert
+for _type in (datetime, date, Decimal):
+    sqlite3.register_adapter(_type, _sqlite_param)
+for _type in (np.bool_, np.int8, np.int16, np.int32, np.int64, np.uint8, np.uint16,
+              np.uint32, np.uint64, np.float16, np.float32, np.datetime64):
+    sqlite3.register_adapter(_type, lambda value: _sqlite_param(value.item()))
+
+
+def _mysql_value(value):
+    if isinstance(value, str):
+        if _ISO_DATE.match(value):
+            return date.fromisoformat(value)
+        if _ISO_DATETIME.match(value):
+            return datetime.fromisoformat(value)
+    return value
+
+
+def _parse_temporal(value):
+    if value is None or isinstance(value, (date, datetime)):
+        return value
+    return _mysql_value(str(value))
+
+
+def _shift(value, amount, unit):
+    value = _parse_temporal(value)
+    if value is None or amount is None:
+        return None
+    unit = unit.upper()
+    amount = int(amount)
+    if unit in ('MONTH', 'YEAR', 'QUARTER'):
+        months = value.month - 1 + amount * {'MONTH': 1, 'QUARTER': 3, 'YEAR': 12}[unit]
+        year, month = value.year + months // 12, months % 12 + 1
+        shifted = value.replace(year=year, month=month, day=min(value.day, calendar.monthrange(year, month)[1]))
+    else:
+        shifted = value + timedelta(**{{'WEEK': 'weeks', 'DAY': 'days', 'HOUR': 'hours',
+                                        'MINUTE': 'minutes', 'SECOND': 'seconds'}[unit]: amount})
+    return _sqlite_param(shifted)
+
+
+def _nullable(func):
+    def wrapper(*args):
+        return None if any(arg is None for arg in args) else func(*args)
+    return wrapper
+
+
+_SQLITE_FUNCTIONS = {
+    'NOW': (0, lambda: datetime.now().replace(microsecond=0).isoformat(' ')),
+    'CURDATE': (0, lambda: date.today().isoformat()),
+    'DATE_SUB': (3, lambda value, amount, unit: _shift(value, -int(amount) if amount is not None else None, unit)),
+    'DATE_ADD': (3, _shift),
+    'DATEDIFF': (2, _nullable(lambda a, b: (_parse_temporal(a).toordinal() - _parse_temporal(b).toordinal()))),
+    'GREATEST': (-1, _nullable(max)),
+    'LEAST': (-1, _nullable(min)),
+    'HOUR': (1, _nullable(lambda value: _parse_temporal(value).hour if isinstance(_parse_temporal(value), datetime) else 0)),
+    'MAKETIME': (3, _nullable(lambda h, m, s: f"{int(h):02d}:{int(m):02d}:{int(s):02d}")),
+    'TIMESTAMP': (2, _nullable(lambda d, t: f"{str(d)[:10]} {t}")),
+    'SQRT': (1, _nullable(lambda x: x ** 0.5 if x >= 0 else None)),
+}
+
+
+class _StddevPop:
+    """STDDEV_POP aggregate (Welford's algorithm)."""
+
+    def __init__(self):
+        self.n, self.mean, self.m2 = 0, 0.0, 0.0
+
+    def step(self, value):
+        if value is not None:
+            self.n += 1
+            delta = value - self.mean
+            self.mean += delta / self.n
+            self.m2 += delta * (value - self.mean)
+
+    def finalize(self):
+        return (self.m2 / self.n) ** 0.5 if self.n else None
+
+
+_UPSERT = re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', re.I)
+
+
+@lru_cache(maxsize=512)
+def translate_sql(sql):
+    """
+    Rewrite a MySQL statement of the ETL scripts into SQLite syntax.
+
+    Semantic differences are not rewritten: `/` between integers is integer
+    division in SQLite (multiply one side by 1.0), and multi-table
+    UPDATE ... JOIN / DELETE ... JOIN have no SQLite form (use a correlated
+    subquery or per-row statements).
+    """
+    sql = sql.replace('%s', '?').replace('%%', '%')
+    sql = re.sub(r'\bINSERT\s+IGNORE\b', 'INSERT OR IGNORE', sql, flags=re.I)
+    sql = re.sub(r'\bTRUNCATE\s+TABLE\b', 'DELETE FROM', sql, flags=re.I)
+    sql = re.sub(r'\b(DROP|CREATE)\s+TEMPORARY\s+TABLE\b', r'\1 TEMP TABLE', sql, flags=re.I)
+    sql = re.sub(r'\bINTERVAL\s+(\?|-?\d+)\s+(\w+?)S?\b', r"\1, '\2'", sql, flags=re.I)
+    sql = re.sub(r'\bFOR\s+UPDATE(\s+(SKIP\s+LOCKED|NOWAIT))?|\bLOCK\s+IN\s+SHARE\s+MODE\b', '', sql, flags=re.I)
+    match = _UPSERT.search(sql)
+    if match:
+        head, tail = sql[:match.start()], sql[match.end():]
+        top_level = head
+        while re.search(r'\([^()]*\)', top_level):
+            top_level = re.sub(r'\([^()]*\)', '', top_level)
+        last_from = top_level.upper().rfind('FROM')
+        if last_from >= 0 and not re.search(r'\b(WHERE|GROUP\s+BY)\b', top_level[last_from:], re.I):
+            # INSERT ... SELECT ... FROM x ON CONFLICT would parse as a join constraint
+            head = f"{head.rstrip()} WHERE true\n"
+        tail = re.sub(r'\bVALUES\s*\(\s*(\w+)\s*\)', r'excluded.\1', tail, flags=re.I)
+        sql = f"{head}ON CONFLICT DO UPDATE SET{tail}"
+    return sql
+
+
+class SQLiteCursor:
+    """DB-API cursor with the mysql.connector surface the ETL scripts use."""
+
+    def __init__(self, connection, dictionary=False):
+        self._connection = connection
+        self._cursor = connection.sqlite.cursor()
+        self._dictionary = dictionary
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def column_names(self):
+        return tuple(column[0] for column in self._cursor.description or ())
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def execute(self, sql, params=()):
+        sql = translate_sql(sql)
+        if 'information_schema' in sql.lower():
+            self._connection.refresh_information_schema()
+        with self._connection.deadline():
+            self._cursor.execute(sql, params or ())
+
+    def executemany(self, sql, seq_of_params):
+        sql = translate_sql(sql)
+        with self._connection.deadline():
+            self._cursor.executemany(sql, seq_of_params)
+
+    def _convert(self, row):
+        values = tuple(_mysql_value(value) for value in row)
+        if self._dictionary:
+            return dict(zip(self.column_names, values))
+        return values
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return None if row is None else self._convert(row)
+
+    def fetchmany(self, size=1):
+        return [self._convert(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._convert(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """sqlite3 connection with the mysql.connector surface the ETL scripts use."""
+
+    def __init__(self, path=SQLITE_PATH):
+        self.database = path
+        self.statement_timeout_ms = 0
+        self.sqlite = sqlite3.connect(path, timeout=DB_LOCK_WAIT_TIMEOUT, check_same_thread=False)
+        self.sqlite.execute("PRAGMA foreign_keys = ON")
+        if path != ':memory:':
+            self.sqlite.execute("PRAGMA journal_mode = WAL")
+            self.sqlite.execute("PRAGMA synchronous = NORMAL")
+        for name, (n_args, func) in _SQLITE_FUNCTIONS.items():
+            self.sqlite.create_function(name, n_args, func, deterministic=name not in ('NOW', 'CURDATE'))
+        self.sqlite.create_aggregate('STDDEV_POP', 1, _StddevPop)
+        self.sqlite.execute("ATTACH DATABASE ':memory:' AS information_schema")
+        self.sqlite.execute("""
+            CREATE TABLE information_schema.COLUMNS (
+                TABLE_SCHEMA TEXT, TABLE_NAME TEXT, COLUMN_NAME TEXT, ORDINAL_POSITION INTEGER,
+                COLUMN_DEFAULT TEXT, IS_NULLABLE TEXT, DATA_TYPE TEXT, COLUMN_KEY TEXT
+            )
+        """)
+        self.sqlite.execute("""
+            CREATE TABLE information_schema.TABLES (TABLE_SCHEMA TEXT, TABLE_NAME TEXT, TABLE_TYPE TEXT)
+        """)
+        if self.sqlite.execute("SELECT 1 FROM sqlite_master WHERE name = 'assets'").fetchone() is None:
+            with open(SQLITE_SCHEMA_PATH, encoding='utf-8') as schema:
+                self.sqlite.executescript(schema.read())
+        self._closed = False
+
+    def cursor(self, dictionary=False, buffered=None):
+        return SQLiteCursor(self, dictionary)
+
+    def commit(self):
+        self.sqlite.commit()
+
+    def rollback(self):
+        self.sqlite.rollback()
+
+    def is_connected(self):
+        return not self._closed
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.sqlite.close()
+
+    @contextmanager
+    def deadline(self):
+        """Interrupt the statement after statement_timeout_ms (if set)."""
+        if not self.statement_timeout_ms:
+            yield
+            return
+        limit = time.monotonic() + self.statement_timeout_ms / 1000.0
+        self.sqlite.set_progress_handler(lambda: int(time.monotonic() > limit), 10000)
+        try:
+            yield
+        finally:
+            self.sqlite.set_progress_handler(None, 0)
+
+    def refresh_information_schema(self):
+        """Mirror the current schema into information_schema.COLUMNS / TABLES."""
+        tables = [(name, 'VIEW' if kind == 'view' else 'BASE TABLE') for name, kind in self.sqlite.execute(
+            "SELECT name, type FROM main.sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'"
+        )]
+        columns = []
+        for table, _ in tables:
+            for cid, name, data_type, not_null, default, pk in self.sqlite.execute(f"PRAGMA main.table_info({table})"):
+                columns.append((DB_CONFIG['database'], table, name, cid + 1, default,
+                                'NO' if not_null or pk else 'YES', data_type.split('(')[0].lower(),
+                                'PRI' if pk else ''))
+        self.sqlite.execute("DELETE FROM information_schema.COLUMNS")
+        self.sqlite.execute("DELETE FROM information_schema.TABLES")
+        self.sqlite.executemany("INSERT INTO information_schema.COLUMNS VALUES (?, ?, ?, ?, ?, ?, ?, ?)", columns)
+        self.sqlite.executemany("INSERT INTO information_schema.TABLES VALUES (?, ?, ?)",
+                                [(DB_CONFIG['database'], table, table_type) for table, table_type in tables])
@@ -8,26 +8,21 @@ This script calculates failure probability for each asset based on:
 - Recent maintenance activity
 
 Output: Updates the faliure_probability table in MySQL
+
+Set ETL_ASYNC=1 to calculate the assets concurrently (ETL/async_exec.py).
 """
 
-import mysql.connector
-from mysql.connector import Error
 from datetime import datetime, timedelta
 import os
-from dotenv import load_dotenv
 import sys
 
-# Load environment variables
-load_dotenv()
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/faliure_probability_calculation.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Database configuration
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'database': os.getenv('DB_NAME', 'palantir_maintenance'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', ''),
-    'port': int(os.getenv('DB_PORT', 3306))
-}
+from ETL.async_exec import ETL_ASYNC, AsyncRunner
+from ETL.db import Error, get_connection, get_read_connection, read_backend
+from ETL.instrumentation import instrumented_main, stage
 
 
 def calculate_failure_probability(asset_id, connection):
@@ -173,6 +168,7 @@ def calculate_failure_probability(asset_id, connection):
 def update_failure_probability_table(connection):
     """Update the failure_probability table with calculated values for all assets."""
     cursor = connection.cursor()
+    read_connection = None
     
     try:
         # Get all assets
@@ -181,9 +177,17 @@ def update_failure_probability_table(connection):
         
         updated_count = 0
         
-        for (asset_id,) in assets:
-            result = calculate_failure_probability(asset_id, connection)
-            
+        asset_ids = [asset_id for (asset_id,) in assets]
+        if ETL_ASYNC:
+            # Per-asset queries of many assets in flight at once; writes stay sequential and in order
+            with AsyncRunner(backend=read_backend()) as runner:
+                results = runner.map(calculate_failure_probability, asset_ids)
+        else:
+            # The per-asset scans go to the read replica while it is fresh
+            read_connection = get_read_connection()
+            results = (calculate_failure_probability(asset_id, read_connection) for asset_id in asset_ids)
+        
+        for asset_id, result in zip(asset_ids, results):
             if result:
                 # Insert or update the failure probability record
                 cursor.execute("""
@@ -229,21 +233,25 @@ def update_failure_probability_table(connection):
         raise
     finally:
         cursor.close()
+        if read_connection is not None:
+            read_connection.close()
 
 
+@instrumented_main('faliure_probability_calculation')
 def main():
     """Main ETL execution function."""
     connection = None
     
     try:
-        print("Connecting to MySQL database...")
-        connection = mysql.connector.connect(**DB_CONFIG)
+        print("Connecting to database...")
+        connection = get_connection()
         
         if connection.is_connected():
-            print(f"Connected to MySQL database: {DB_CONFIG['database']}")
+            print(f"Connected to database: {connection.database}")
             print("Starting failure probability calculation ETL...")
             
-            update_failure_probability_table(connection)
+            with stage('update_failure_probability'):
+                update_failure_probability_table(connection)
             
             print("\nETL process completed successfully!")
             
@@ -256,7 +264,7 @@ def main():
     finally:
         if connection and connection.is_connected():
             connection.close()
-            print("MySQL connection closed")
+            print("Database connection closed")
 
 
 if __name__ == "__main__":
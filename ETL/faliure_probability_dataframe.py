@@ -5,30 +5,53 @@ Features extracted (industrial predictive maintenance - pumps and motors):
 - Mechanical vibration, RPM, power, electrical current, pressure, flow (from plc_sensor_readings, last 30d avg)
 - Asset service days, asset service hours
 - Days since last failure, days since last (visual) inspection
+- Sensor anomaly score and CUSUM alarm count of the day (from sensor_anomaly_daily,
+  filled by ETL/sensor_anomaly_detection.py)
+- Sensor coverage ratio of the day and of the 30-day window (from sensor_data_quality,
+  filled by ETL/sensor_data_quality.py), so gaps are visible next to the averages
 
 Output: faliure_probability_base table with one row per asset per day and 'faliure' = failure in next 7 days.
+
+Set SENSOR_STORE_DIR to read the sensor windows from the columnar sensor store
+(ETL/sensor_columnar_store.py) instead of querying plc_sensor_readings, or
+SENSOR_ROLLUPS=1 to answer them from the daily rollup tier
+(ETL/sensor_downsampling.py) wherever it is built.
+
+Set ETL_ASYNC=1 to extract the assets of each day concurrently
+(ETL/async_exec.py).
+
+Set FEATURE_ENGINE=duckdb to compute the whole table in DuckDB instead
+(ETL/faliure_probability_duckdb.py).
 """
 
-import mysql.connector
-from mysql.connector import Error
 from datetime import datetime, timedelta
 import os
-from dotenv import load_dotenv
 import sys
-import pandas as pd
 import numpy as np
 
-# Load environment variables
-load_dotenv()
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/faliure_probability_dataframe.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.async_exec import ETL_ASYNC, AsyncRunner
+from ETL.db import DB_CONFIG, ETL_SAMPLE, Error, get_connection, get_read_connection, read_backend, refresh_table
+from ETL.feature_store import FEATURE_NAMES
+from ETL.instrumentation import instrumented_main, stage
+from ETL.sensor_columnar_store import SENSOR_STORE_DIR, SensorColumnarStore, sensor_window_averages
+from ETL.sensor_downsampling import window_averages
 
-# Database configuration
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'database': os.getenv('DB_NAME', 'palantir_maintenance'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', 'admin'),
-    'port': int(os.getenv('DB_PORT', 3306))
-}
+# Optional columnar store for sensor history (None = read from MySQL)
+SENSOR_STORE = SensorColumnarStore(SENSOR_STORE_DIR) if SENSOR_STORE_DIR else None
+
+# Read sensor windows from the hourly/daily rollup tiers when they cover them
+SENSOR_ROLLUPS = os.getenv('SENSOR_ROLLUPS', '0') == '1'
+
+# 'mysql' (per asset-day queries) or 'duckdb' (export + one set-based query)
+FEATURE_ENGINE = os.getenv('FEATURE_ENGINE', 'mysql')
+
+# Feature columns stored as whole numbers (NaN in the arrays marks NULL)
+INTEGER_FEATURES = ('asset_service_days', 'days_since_last_failure', 'days_since_last_inspection',
+                    'sensor_anomaly_alarms')
 
 
 def get_date_range(connection):
@@ -46,6 +69,12 @@ def get_date_range(connection):
     """)
     result = cursor.fetchone()
     cursor.close()
+    if ETL_SAMPLE:
+        # Only the days the sample database was built for (ETL/sampling.py)
+        from ETL.sampling import sample_window
+        window = sample_window(connection)
+        if window:
+            return window
     return result['min_date'], result['max_date']
 
 
@@ -96,6 +125,52 @@ def _float_or_none(val):
         return None
 
 
+def _query_sensor_averages(cursor, asset_id, date_from, date_to):
+    """
+    Average of each sensor type for readings on days date_from..date_to.
+    The range is expressed on the raw column (not DATE(reading_timestamp)) so
+    that indexes and monthly partition pruning apply.
+    """
+    cursor.execute("""
+        SELECT
+            AVG(CASE WHEN sensor_type = 'vibration' THEN reading_value END) as mechanical_vibration,
+            AVG(CASE WHEN sensor_type = 'rpm' THEN reading_value END) as rpm,
+            AVG(CASE WHEN sensor_type = 'power' THEN reading_value END) as power,
+            AVG(CASE WHEN sensor_type = 'current' THEN reading_value END) as electrical_current,
+            AVG(CASE WHEN sensor_type = 'pressure' THEN reading_value END) as pressure,
+            AVG(CASE WHEN sensor_type = 'flow' THEN reading_value END) as flow
+        FROM plc_sensor_readings
+        WHERE asset_id = %s
+        AND reading_timestamp >= %s AND reading_timestamp < %s
+    """, (asset_id, date_from, date_to + timedelta(days=1)))
+    return cursor.fetchone()
+
+
+def _query_anomaly_features(cursor, asset_id, reading_date):
+    """Daily anomaly features: max |z| over all sensors and total CUSUM alarms."""
+    cursor.execute("""
+        SELECT MAX(max_abs_z) as sensor_anomaly_score, SUM(alarm_count) as sensor_anomaly_alarms
+        FROM sensor_anomaly_daily
+        WHERE asset_id = %s AND reading_date = %s
+    """, (asset_id, reading_date))
+    return cursor.fetchone()
+
+
+def _query_coverage_features(cursor, asset_id, date_from, reading_date):
+    """Valid / expected readings over all applicable sensors, for the day and the window."""
+    cursor.execute("""
+        SELECT
+            SUM(CASE WHEN reading_date = %s THEN LEAST(reading_count - duplicate_count - out_of_range_count,
+                                                       expected_count) END) * 1.0
+              / SUM(CASE WHEN reading_date = %s THEN expected_count END) as sensor_coverage_1d,
+            SUM(LEAST(reading_count - duplicate_count - out_of_range_count, expected_count)) * 1.0
+              / SUM(expected_count) as sensor_coverage_30d
+        FROM sensor_data_quality
+        WHERE asset_id = %s AND reading_date >= %s AND reading_date <= %s
+    """, (reading_date, reading_date, asset_id, date_from, reading_date))
+    return cursor.fetchone()
+
+
 def extract_features_for_asset_date(asset_id, reading_date, connection, failure_dict):
     """
     Extract only the required features for faliure_probability_base:
@@ -121,19 +196,15 @@ def extract_features_for_asset_date(asset_id, reading_date, connection, failure_
     date_30_days_ago = reading_date - timedelta(days=30)
     
     # Sensor features: avg in last 30 days by type (vibration, rpm, power, current, pressure, flow)
-    cursor.execute("""
-        SELECT
-            AVG(CASE WHEN sensor_type = 'vibration' THEN reading_value END) as mechanical_vibration,
-            AVG(CASE WHEN sensor_type = 'rpm' THEN reading_value END) as rpm,
-            AVG(CASE WHEN sensor_type = 'power' THEN reading_value END) as power,
-            AVG(CASE WHEN sensor_type = 'current' THEN reading_value END) as electrical_current,
-            AVG(CASE WHEN sensor_type = 'pressure' THEN reading_value END) as pressure,
-            AVG(CASE WHEN sensor_type = 'flow' THEN reading_value END) as flow
-        FROM plc_sensor_readings
-        WHERE asset_id = %s
-        AND DATE(reading_timestamp) BETWEEN %s AND %s
-    """, (asset_id, date_30_days_ago, reading_date))
-    sensor_row = cursor.fetchone()
+    sensor_row = None
+    if SENSOR_STORE is not None:
+        sensor_row = sensor_window_averages(
+            SENSOR_STORE, asset_id, date_30_days_ago, reading_date + timedelta(days=1)
+        )
+    elif SENSOR_ROLLUPS:
+        sensor_row = window_averages(connection, asset_id, date_30_days_ago, reading_date + timedelta(days=1))
+    if sensor_row is None:
+        sensor_row = _query_sensor_averages(cursor, asset_id, date_30_days_ago, reading_date)
     
     # Days since last failure
     cursor.execute("""
@@ -158,6 +229,9 @@ def extract_features_for_asset_date(asset_id, reading_date, connection, failure_
     if insp_row and insp_row['last_inspection']:
         days_since_last_inspection = (reading_date - insp_row['last_inspection']).days
     
+    anomaly_row = _query_anomaly_features(cursor, asset_id, reading_date)
+    coverage_row = _query_coverage_features(cursor, asset_id, date_30_days_ago, reading_date)
+
     has_failure_next_week = check_failure_in_next_week(asset_id, reading_date, failure_dict)
     cursor.close()
     
@@ -175,94 +249,144 @@ def extract_features_for_asset_date(asset_id, reading_date, connection, failure_
         'asset_service_hours': asset_service_hours,
         'days_since_last_failure': days_since_last_failure,
         'days_since_last_inspection': days_since_last_inspection,
+        'sensor_anomaly_score': _float_or_none(anomaly_row['sensor_anomaly_score']) if anomaly_row else None,
+        'sensor_anomaly_alarms': (int(anomaly_row['sensor_anomaly_alarms'])
+                                  if anomaly_row and anomaly_row['sensor_anomaly_alarms'] is not None else None),
+        'sensor_coverage_1d': _float_or_none(coverage_row['sensor_coverage_1d']) if coverage_row else None,
+        'sensor_coverage_30d': _float_or_none(coverage_row['sensor_coverage_30d']) if coverage_row else None,
     }
 
 
+class FeatureColumns:
+    """
+    Feature rows of assets x days in preallocated column arrays: float64 per
+    feature with NaN for NULL, converted to Python values / None only when the
+    rows are written to the database (db_rows).
+    """
+
+    def __init__(self, capacity, feature_names=FEATURE_NAMES):
+        self.asset_id = np.zeros(capacity, dtype=np.int64)
+        self.reading_date = np.zeros(capacity, dtype='datetime64[D]')
+        self.faliure = np.zeros(capacity, dtype=bool)
+        self.features = {name: np.full(capacity, np.nan) for name in feature_names}
+        self.size = 0
+
+    def append(self, features):
+        """Store one extract_features_for_asset_date() result."""
+        i = self.size
+        self.asset_id[i] = features['asset_id']
+        self.reading_date[i] = features['reading_date']
+        self.faliure[i] = features['faliure']
+        for name, column in self.features.items():
+            value = features[name]
+            if value is not None:
+                column[i] = value
+        self.size += 1
+
+    def column(self, name):
+        if name in self.features:
+            return self.features[name][:self.size]
+        return getattr(self, name)[:self.size]
+
+    def db_rows(self, columns, batch_size=5000):
+        """Row tuples of `columns` for the database, NaN as None, built one batch at a time."""
+        for start in range(0, self.size, batch_size):
+            stop = min(start + batch_size, self.size)
+            values = []
+            for name in columns:
+                data = self.column(name)[start:stop]
+                if name == 'reading_date':
+                    values.append(data.astype(object))
+                elif name in self.features:
+                    cast = int if name in INTEGER_FEATURES else float
+                    values.append([None if value != value else cast(value) for value in data.tolist()])
+                else:
+                    values.append(data.tolist())
+            yield from zip(*values)
+
+
 def create_feature_dataframe(connection):
     """
     Create a dataframe with features for all assets for each day and save to faliure_probability_base table.
     """
     cursor = connection.cursor()
+    read_connection = None
     
     try:
-        # Get all assets
-        cursor.execute("SELECT asset_id FROM assets")
-        assets = cursor.fetchall()
+        with stage('load_inputs'):
+            # Get all assets
+            cursor.execute("SELECT asset_id FROM assets")
+            assets = cursor.fetchall()
         
-        # Get date range from sensor readings
-        min_date, max_date = get_date_range(connection)
-        print(f"Processing date range: {min_date} to {max_date}")
+            # Get date range from sensor readings
+            min_date, max_date = get_date_range(connection)
+            print(f"Processing date range: {min_date} to {max_date}")
         
-        # Get all failure dates for checking future failures
-        failure_dict = get_failure_dates(connection)
-        print(f"Loaded failure data for {len(failure_dict)} assets")
+            # Get all failure dates for checking future failures
+            failure_dict = get_failure_dates(connection)
+            print(f"Loaded failure data for {len(failure_dict)} assets")
         
-        all_features = []
+        # One preallocated row per asset-day
+        n_days = (max_date - min_date).days + 1
+        features = FeatureColumns(len(assets) * n_days)
         
-        # Iterate through each day in the date range
-        current_date = min_date
-        while current_date <= max_date:
-            for (asset_id,) in assets:
-                features = extract_features_for_asset_date(asset_id, current_date, connection, failure_dict)
-                if features:
-                    all_features.append(features)
-            
-            print(f"Processed date: {current_date}")
-            current_date += timedelta(days=1)
+        asset_ids = [asset_id for (asset_id,) in assets]
+        # The sensor scans go to the read replica while it is fresh; only the table refresh writes
+        if ETL_ASYNC:
+            # The assets of a day are extracted concurrently, appended in order
+            runner = AsyncRunner(backend=read_backend())
+        else:
+            runner = None
+            read_connection = get_read_connection()
         
-        if not all_features:
+        with stage('extract_features'):
+            # Iterate through each day in the date range
+            current_date = min_date
+            try:
+                while current_date <= max_date:
+                    extract = lambda asset_id, conn: extract_features_for_asset_date(
+                        asset_id, current_date, conn, failure_dict)
+                    if runner is not None:
+                        rows = runner.map(extract, asset_ids)
+                    else:
+                        rows = (extract(asset_id, read_connection) for asset_id in asset_ids)
+                    for row in rows:
+                        if row:
+                            features.append(row)
+                
+                    print(f"Processed date: {current_date}")
+                    current_date += timedelta(days=1)
+            finally:
+                if runner is not None:
+                    runner.close()
+        
+        if not features.size:
             print("No features extracted. Exiting.")
             return
         
-        # Create DataFrame
-        df = pd.DataFrame(all_features)
-        
-        # Replace NaN with None for SQL compatibility
-        df = df.replace({np.nan: None})
-        
-        print(f"\nTotal records generated: {len(df)}")
-        print(f"Failure rate: {df['faliure'].sum()} / {len(df)} ({100*df['faliure'].sum()/len(df):.2f}%)")
-        
-        # Clear existing data
-        print("\nTruncating faliure_probability_base table...")
-        cursor.execute("TRUNCATE TABLE faliure_probability_base")
+        failures = int(features.column('faliure').sum())
+        print(f"\nTotal records generated: {features.size}")
+        print(f"Failure rate: {failures} / {features.size} ({100*failures/features.size:.2f}%)")
         
-        # Get valid columns from database table schema
-        cursor.execute("""
-            SELECT COLUMN_NAME 
-            FROM INFORMATION_SCHEMA.COLUMNS 
-            WHERE TABLE_SCHEMA = %s 
-            AND TABLE_NAME = 'faliure_probability_base'
-            AND COLUMN_NAME NOT IN ('base_id', 'created_at', 'updated_at')
-        """, (DB_CONFIG['database'],))
-        valid_columns = [row[0] for row in cursor.fetchall()]
+        with stage('write_table'):
+            # Get valid columns from database table schema
+            cursor.execute("""
+                SELECT COLUMN_NAME 
+                FROM INFORMATION_SCHEMA.COLUMNS 
+                WHERE TABLE_SCHEMA = %s 
+                AND TABLE_NAME = 'faliure_probability_base'
+                AND COLUMN_NAME NOT IN ('base_id', 'created_at', 'updated_at')
+            """, (DB_CONFIG['database'],))
+            valid_columns = [row[0] for row in cursor.fetchall()]
         
-        # Filter feature columns to only include those that exist in the table
-        feature_columns = [col for col in df.columns 
-                          if col in valid_columns and col not in ['asset_id', 'reading_date', 'faliure']]
-
-        print("\nInserting data into faliure_probability_base...")
-        
-        # Insert data into database
-        for idx, row in df.iterrows():
-            # Build column list and values
+            # Filter feature columns to only include those that exist in the table
+            feature_columns = [col for col in FEATURE_NAMES if col in valid_columns]
             columns = ['asset_id', 'reading_date', 'faliure'] + feature_columns
-            placeholders = ['%s'] * len(columns)
-            values = [row['asset_id'], row['reading_date'], row['faliure']] + [row.get(col) for col in feature_columns]
-            
-            insert_sql = f"""
-                INSERT INTO faliure_probability_base 
-                ({', '.join(columns)})
-                VALUES ({', '.join(placeholders)})
-            """
-            
-            cursor.execute(insert_sql, values)
-            
-            if (idx + 1) % 100 == 0:
-                print(f"  Inserted {idx + 1} / {len(df)} records...")
-        
-        connection.commit()
-        print(f"\nSuccessfully saved {len(df)} asset-day feature vectors to faliure_probability_base table")
+
+            # Load a shadow table and swap it in, so readers never see a partial table
+            print("\nLoading faliure_probability_base shadow table...")
+            refresh_table(connection, 'faliure_probability_base', columns, features.db_rows(columns))
+        print(f"\nSuccessfully saved {features.size} asset-day feature vectors to faliure_probability_base table")
         print(f"Total features: {len(feature_columns)}")
         
     except Error as e:
@@ -271,21 +395,28 @@ def create_feature_dataframe(connection):
         raise
     finally:
         cursor.close()
+        if read_connection is not None:
+            read_connection.close()
 
 
+@instrumented_main('faliure_probability_dataframe')
 def main():
     """Main ETL execution function."""
     connection = None
     
     try:
-        print("Connecting to MySQL database...")
-        connection = mysql.connector.connect(**DB_CONFIG)
+        print("Connecting to database...")
+        connection = get_connection()
         
         if connection.is_connected():
-            print(f"Connected to MySQL database: {DB_CONFIG['database']}")
+            print(f"Connected to database: {connection.database}")
             print("Starting failure probability feature extraction ETL (daily granularity)...")
             
-            create_feature_dataframe(connection)
+            if FEATURE_ENGINE == 'duckdb':
+                from ETL.faliure_probability_duckdb import create_feature_dataframe_duckdb
+                create_feature_dataframe_duckdb(connection)
+            else:
+                create_feature_dataframe(connection)
             
             print("\nETL process completed successfully!")
             
@@ -300,7 +431,7 @@ def main():
     finally:
         if connection and connection.is_connected():
             connection.close()
-            print("MySQL connection closed")
+            print("Database connection closed")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,335 @@
+"""
+ETL Script for Failure Probability Feature Extraction on DuckDB (Daily Granularity)
+
+Optional execution mode of faliure_probability_dataframe.py: instead of
+several MySQL queries per asset-day, the source tables are exported once to
+local Parquet files and the whole faliure_probability_base computation runs
+as a single set-based query in the embedded DuckDB engine:
+- 30-day sensor averages: per-day sums/counts over a dense asset x day
+  calendar, then a RANGE window of 30 days preceding + the current day
+- days since last failure / inspection and the next-week failure label:
+  ASOF joins against the event dates
+- anomaly and coverage features from sensor_anomaly_daily and
+  sensor_data_quality (when those tables exist)
+Only the final rows are loaded back into faliure_probability_base.
+
+Requires the optional duckdb package (pip install duckdb).
+
+Usage:
+    python ETL/faliure_probability_duckdb.py
+    python ETL/faliure_probability_duckdb.py --reuse-export     # skip the MySQL export
+    FEATURE_ENGINE=duckdb python ETL/faliure_probability_dataframe.py
+"""
+
+import argparse
+import os
+import sys
+import time
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:  # optional dependency, only needed for this mode
+    duckdb = None
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/faliure_probability_duckdb.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import DB_CONFIG, ETL_SAMPLE, Error, get_connection, get_read_connection, refresh_table
+from ETL.instrumentation import instrumented_main
+from ETL.sensor_columnar_store import SENSOR_FEATURES
+
+DUCKDB_EXPORT_DIR = os.getenv('DUCKDB_EXPORT_DIR', 'duckdb_export_sample' if ETL_SAMPLE else 'duckdb_export')
+EXPORT_FETCH_SIZE = 100000
+INSERT_BATCH_SIZE = 5000
+
+# table -> (MySQL extraction query, DuckDB schema). Optional tables may not exist yet.
+EXPORT_TABLES = {
+    'assets': (
+        "SELECT asset_id, installation_date FROM assets",
+        "asset_id INTEGER, installation_date DATE",
+    ),
+    'plc_sensor_readings': (
+        "SELECT asset_id, sensor_type, reading_timestamp, CAST(reading_value AS DOUBLE) FROM plc_sensor_readings",
+        "asset_id INTEGER, sensor_type VARCHAR, reading_timestamp TIMESTAMP, reading_value DOUBLE",
+    ),
+    'assets_faliures': (
+        "SELECT asset_id, failure_date FROM assets_faliures",
+        "asset_id INTEGER, failure_date TIMESTAMP",
+    ),
+    'mantainance_orders': (
+        "SELECT asset_id, order_type, status, completion_date FROM mantainance_orders",
+        "asset_id INTEGER, order_type VARCHAR, status VARCHAR, completion_date TIMESTAMP",
+    ),
+}
+OPTIONAL_EXPORT_TABLES = {
+    'sensor_anomaly_daily': (
+        "SELECT asset_id, reading_date, CAST(max_abs_z AS DOUBLE), alarm_count FROM sensor_anomaly_daily",
+        "asset_id INTEGER, reading_date DATE, max_abs_z DOUBLE, alarm_count INTEGER",
+    ),
+    'sensor_data_quality': (
+        "SELECT asset_id, reading_date, reading_count - duplicate_count - out_of_range_count, expected_count "
+        "FROM sensor_data_quality",
+        "asset_id INTEGER, reading_date DATE, valid_count INTEGER, expected_count INTEGER",
+    ),
+}
+
+
+def _require_duckdb():
+    if duckdb is None:
+        raise RuntimeError("DuckDB mode requires the duckdb package: pip install duckdb")
+
+
+def _table_exists(cursor, table):
+    cursor.execute("""
+        SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s
+    """, (DB_CONFIG['database'], table))
+    return cursor.fetchone()[0] > 0
+
+
+def export_tables(connection, export_dir=DUCKDB_EXPORT_DIR):
+    """
+    Stream the source tables from MySQL into <export_dir>/<table>.parquet
+    (fetchmany chunks, so memory stays bounded). Returns {table: rows}.
+    """
+    _require_duckdb()
+    os.makedirs(export_dir, exist_ok=True)
+    local = duckdb.connect()
+    cursor = connection.cursor()
+    exported = {}
+    try:
+        tables = dict(EXPORT_TABLES)
+        for table, spec in OPTIONAL_EXPORT_TABLES.items():
+            if _table_exists(cursor, table):
+                tables[table] = spec
+        for table, (query, schema) in tables.items():
+            local.execute(f"CREATE OR REPLACE TABLE {table} ({schema})")
+            names = [column.split()[0] for column in schema.split(',')]
+            cursor.execute(query)
+            rows = 0
+            while True:
+                chunk = cursor.fetchmany(EXPORT_FETCH_SIZE)
+                if not chunk:
+                    break
+                # Bulk-append through a DataFrame; row-wise executemany is far slower in DuckDB
+                local.register('export_chunk', pd.DataFrame(chunk, columns=names))
+                local.execute(f"INSERT INTO {table} SELECT * FROM export_chunk")
+                local.unregister('export_chunk')
+                rows += len(chunk)
+            path = os.path.join(export_dir, f"{table}.parquet")
+            local.execute(f"COPY {table} TO '{path}' (FORMAT PARQUET)")
+            exported[table] = rows
+            print(f"  Exported {table}: {rows} rows")
+        return exported
+    finally:
+        cursor.close()
+        local.close()
+
+
+def _source(local, export_dir, table, schema):
+    """Expose <table>.parquet as a view, or an empty table when it was not exported."""
+    path = os.path.join(export_dir, f"{table}.parquet")
+    if os.path.exists(path):
+        local.execute(f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM read_parquet('{path}')")
+    else:
+        local.execute(f"CREATE OR REPLACE TABLE {table} ({schema})")
+
+
+def feature_query(min_date, max_date):
+    """DuckDB SQL producing faliure_probability_base rows for min_date..max_date."""
+    sums = ',\n            '.join(
+        f"SUM(CASE WHEN sensor_type = '{s}' THEN reading_value END) AS {f}_sum, "
+        f"COUNT(CASE WHEN sensor_type = '{s}' THEN 1 END) AS {f}_n"
+        for s, f in SENSOR_FEATURES.items()
+    )
+    averages = ',\n            '.join(
+        f"SUM(s.{f}_sum) OVER w / NULLIF(SUM(s.{f}_n) OVER w, 0) AS {f}"
+        for f in SENSOR_FEATURES.values()
+    )
+    feature_columns = ', '.join(f"ws.{f}" for f in SENSOR_FEATURES.values())
+    return f"""
+        WITH calendar AS (
+            -- 30 extra days in front so the first window is complete
+            SELECT a.asset_id, a.installation_date, CAST(d.day AS DATE) AS reading_date
+            FROM assets a,
+                 generate_series(DATE '{min_date}' - INTERVAL 30 DAY, DATE '{max_date}', INTERVAL 1 DAY) AS d(day)
+        ),
+        sensor_days AS (
+            SELECT asset_id, CAST(reading_timestamp AS DATE) AS reading_date,
+            {sums}
+            FROM plc_sensor_readings
+            WHERE reading_timestamp >= DATE '{min_date}' - INTERVAL 30 DAY
+              AND reading_timestamp < DATE '{max_date}' + INTERVAL 1 DAY
+            GROUP BY ALL
+        ),
+        coverage_days AS (
+            SELECT asset_id, reading_date,
+                   SUM(LEAST(valid_count, expected_count)) AS valid_count,
+                   SUM(expected_count) AS expected_count
+            FROM sensor_data_quality
+            GROUP BY ALL
+        ),
+        windows AS (
+            SELECT c.asset_id, c.installation_date, c.reading_date,
+            {averages},
+            cd.valid_count / NULLIF(cd.expected_count, 0) AS sensor_coverage_1d,
+            SUM(cd.valid_count) OVER w / NULLIF(SUM(cd.expected_count) OVER w, 0) AS sensor_coverage_30d
+            FROM calendar c
+            LEFT JOIN sensor_days s ON s.asset_id = c.asset_id AND s.reading_date = c.reading_date
+            LEFT JOIN coverage_days cd ON cd.asset_id = c.asset_id AND cd.reading_date = c.reading_date
+            WINDOW w AS (PARTITION BY c.asset_id ORDER BY c.reading_date
+                         RANGE BETWEEN INTERVAL 30 DAY PRECEDING AND CURRENT ROW)
+        ),
+        failure_days AS (
+            SELECT DISTINCT asset_id, CAST(failure_date AS DATE) AS failure_date FROM assets_faliures
+        ),
+        inspection_days AS (
+            SELECT DISTINCT asset_id, CAST(completion_date AS DATE) AS inspection_date
+            FROM mantainance_orders
+            WHERE order_type = 'preventive' AND status = 'completed' AND completion_date IS NOT NULL
+        ),
+        anomaly_days AS (
+            SELECT asset_id, reading_date, MAX(max_abs_z) AS sensor_anomaly_score,
+                   SUM(alarm_count) AS sensor_anomaly_alarms
+            FROM sensor_anomaly_daily
+            GROUP BY ALL
+        )
+        SELECT
+            ws.asset_id,
+            ws.reading_date,
+            COALESCE(date_diff('day', ws.reading_date, nf.failure_date) <= 7, FALSE) AS faliure,
+            {feature_columns},
+            date_diff('day', ws.installation_date, ws.reading_date) AS asset_service_days,
+            date_diff('day', ws.installation_date, ws.reading_date) * 24.0 AS asset_service_hours,
+            date_diff('day', lf.failure_date, ws.reading_date) AS days_since_last_failure,
+            date_diff('day', li.inspection_date, ws.reading_date) AS days_since_last_inspection,
+            ad.sensor_anomaly_score,
+            ad.sensor_anomaly_alarms,
+            ws.sensor_coverage_1d,
+            ws.sensor_coverage_30d
+        FROM windows ws
+        ASOF LEFT JOIN failure_days lf
+            ON lf.asset_id = ws.asset_id AND ws.reading_date >= lf.failure_date
+        ASOF LEFT JOIN failure_days nf
+            ON nf.asset_id = ws.asset_id AND ws.reading_date < nf.failure_date
+        ASOF LEFT JOIN inspection_days li
+            ON li.asset_id = ws.asset_id AND ws.reading_date >= li.inspection_date
+        LEFT JOIN anomaly_days ad ON ad.asset_id = ws.asset_id AND ad.reading_date = ws.reading_date
+        WHERE ws.reading_date >= DATE '{min_date}'
+        ORDER BY ws.reading_date, ws.asset_id
+    """
+
+
+def compute_features(min_date, max_date, export_dir=DUCKDB_EXPORT_DIR):
+    """Run the feature query on the exported files. Returns (column names, rows)."""
+    _require_duckdb()
+    local = duckdb.connect()
+    try:
+        for table, (_, schema) in {**EXPORT_TABLES, **OPTIONAL_EXPORT_TABLES}.items():
+            _source(local, export_dir, table, schema)
+        result = local.execute(feature_query(min_date, max_date))
+        columns = [description[0] for description in result.description]
+        return columns, result.fetchall()
+    finally:
+        local.close()
+
+
+def load_features(connection, columns, rows):
+    """Replace faliure_probability_base with the computed rows (existing columns only)."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT COLUMN_NAME
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = %s
+            AND TABLE_NAME = 'faliure_probability_base'
+        """, (DB_CONFIG['database'],))
+        valid_columns = {row[0] for row in cursor.fetchall()}
+        keep = [i for i, column in enumerate(columns) if column in valid_columns]
+        insert_columns = [columns[i] for i in keep]
+
+        print("\nLoading faliure_probability_base shadow table...")
+        refresh_table(connection, 'faliure_probability_base', insert_columns,
+                      (tuple(row[i] for i in keep) for row in rows), batch_size=INSERT_BATCH_SIZE)
+        print(f"Successfully saved {len(rows)} asset-day feature vectors to faliure_probability_base table")
+    except Error as e:
+        print(f"Error loading DuckDB features: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def create_feature_dataframe_duckdb(connection, export_dir=DUCKDB_EXPORT_DIR, reuse_export=False):
+    """DuckDB counterpart of create_feature_dataframe. Returns stage timings in seconds."""
+    from ETL.faliure_probability_dataframe import get_date_range
+
+    timings = {}
+    min_date, max_date = get_date_range(connection)
+    print(f"Processing date range: {min_date} to {max_date}")
+
+    started = time.perf_counter()
+    if reuse_export and os.path.exists(os.path.join(export_dir, 'plc_sensor_readings.parquet')):
+        print(f"Reusing export in {export_dir}")
+    else:
+        print(f"Exporting source tables to {export_dir}...")
+        # The export scans whole tables: read them from the replica while it is fresh
+        read_connection = get_read_connection()
+        try:
+            export_tables(read_connection, export_dir)
+        finally:
+            read_connection.close()
+    timings['export'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    columns, rows = compute_features(min_date, max_date, export_dir)
+    timings['compute'] = time.perf_counter() - started
+    print(f"Computed {len(rows)} feature rows in DuckDB ({timings['compute']:.2f}s)")
+
+    started = time.perf_counter()
+    load_features(connection, columns, rows)
+    timings['load'] = time.perf_counter() - started
+    return timings
+
+
+@instrumented_main('faliure_probability_duckdb')
+def main(argv=None):
+    """Main ETL execution function."""
+    parser = argparse.ArgumentParser(description='Build faliure_probability_base with DuckDB.')
+    parser.add_argument('--export-dir', default=DUCKDB_EXPORT_DIR)
+    parser.add_argument('--reuse-export', action='store_true', help='Use existing Parquet files if present')
+    args = parser.parse_args(argv)
+    connection = None
+
+    try:
+        _require_duckdb()
+        print("Connecting to database...")
+        connection = get_connection()
+
+        if connection.is_connected():
+            print(f"Connected to database: {connection.database}")
+            print("Starting failure probability feature extraction ETL (DuckDB, daily granularity)...")
+
+            timings = create_feature_dataframe_duckdb(connection, args.export_dir, args.reuse_export)
+
+            print("\nETL process completed successfully! "
+                  + ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()))
+
+    except Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+            print("Database connection closed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+ETL Script for Failure Probability Feature Extraction (Configurable Interval)
+
+A subset of the faliure_probability_dataframe.py features, per asset per
+time bucket (default 60 minutes, i.e. risk per hour / shift) instead of per day:
+- Mechanical vibration, RPM, power, electrical current, pressure, flow: average
+  over the 30 days before the bucket plus the bucket itself
+- Asset service days, asset service hours
+- Days since last failure, days since last (visual) inspection
+- 'faliure' = a failure in the 7 days after the bucket ends
+The sensor_anomaly_* and sensor_coverage_* features are not included: their
+sources (sensor_anomaly_daily, sensor_data_quality) are daily, and a day's
+value is only known once the day is over, so it cannot describe an hour of it
+without looking ahead. Models trained on faliure_probability_base cannot be
+scored on this table as is.
+
+Instead of a handful of queries per output row, each asset's readings are
+loaded once and aggregated onto a time-bucketed grid with np.bincount; the
+rolling 30-day windows are differences of cumulative sums, and the
+failure/inspection features are binary searches over sorted event times. Run
+time therefore grows linearly with the number of readings plus buckets.
+
+Output: faliure_probability_base_hourly (one row per asset per bucket, keyed
+by interval_minutes so several granularities can coexist).
+
+Usage:
+    python ETL/faliure_probability_interval.py                     # hourly
+    python ETL/faliure_probability_interval.py --interval-minutes 480
+"""
+
+from datetime import datetime, timedelta
+import argparse
+import os
+import sys
+import numpy as np
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/faliure_probability_interval.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import Error, get_connection
+from ETL.instrumentation import instrumented_main
+from ETL.faliure_probability_dataframe import get_date_range
+from ETL.sensor_columnar_store import SENSOR_FEATURES
+
+FEATURE_INTERVAL_MINUTES = int(os.getenv('FEATURE_INTERVAL_MINUTES', 60))
+FEATURE_WINDOW_DAYS = 30
+FAILURE_HORIZON_DAYS = 7
+INSERT_BATCH_SIZE = 5000
+
+OUTPUT_COLUMNS = (
+    ['faliure'] + list(SENSOR_FEATURES.values())
+    + ['asset_service_days', 'asset_service_hours', 'days_since_last_failure', 'days_since_last_inspection']
+)
+
+DAY = np.timedelta64(1, 'D').astype('timedelta64[s]')
+
+
+def bucket_grid(min_date, max_date, interval_minutes):
+    """Bucket start times covering the days min_date..max_date."""
+    start = np.datetime64(min_date, 's')
+    end = np.datetime64(max_date, 's') + DAY
+    return np.arange(start, end, np.timedelta64(interval_minutes * 60, 's'))
+
+
+def _days_since(bucket_starts, bucket_ends, event_times):
+    """Whole days from the last event before each bucket's end (NaN if none)."""
+    result = np.full(len(bucket_starts), np.nan)
+    if len(event_times) == 0:
+        return result
+    last = np.searchsorted(event_times, bucket_ends, side='left') - 1
+    has_event = last >= 0
+    elapsed = (bucket_starts[has_event] - event_times[last[has_event]]) // DAY
+    result[has_event] = np.maximum(elapsed, 0)
+    return result
+
+
+def build_asset_features(buckets, interval_minutes, sensor_series, installation_date,
+                         failure_times, inspection_times):
+    """
+    Feature columns for one asset on the bucket grid.
+
+    buckets: datetime64[s] bucket start times (evenly spaced)
+    sensor_series: sensor_type -> (datetime64[s] timestamps, float values)
+    failure_times / inspection_times: sorted datetime64[s] event times
+    Returns a dict of column name -> array (NaN = missing).
+    """
+    interval = np.timedelta64(interval_minutes * 60, 's')
+    n = len(buckets)
+    bucket_ends = buckets + interval
+    # 30 days before the bucket plus the bucket itself
+    window = int(np.ceil(FEATURE_WINDOW_DAYS * 1440 / interval_minutes)) + 1
+    columns = {}
+
+    for sensor_type, feature in SENSOR_FEATURES.items():
+        timestamps, values = sensor_series.get(sensor_type, (np.empty(0, 'datetime64[s]'), np.empty(0)))
+        # Readings before the grid land in negative buckets; shift so the
+        # window of the first bucket still sees them
+        index = (timestamps - buckets[0]) // interval + (window - 1)
+        keep = (index >= 0) & (index < n + window - 1)
+        sums = np.bincount(index[keep], weights=values[keep], minlength=n + window - 1)
+        counts = np.bincount(index[keep], minlength=n + window - 1)
+        sum_cs = np.concatenate(([0.0], np.cumsum(sums)))
+        count_cs = np.concatenate(([0], np.cumsum(counts)))
+        # Bucket i of the grid is position i + window - 1; its window ends there
+        hi = np.arange(window, n + window)
+        window_sums = sum_cs[hi] - sum_cs[hi - window]
+        window_counts = count_cs[hi] - count_cs[hi - window]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            columns[feature] = np.where(window_counts > 0, window_sums / window_counts, np.nan)
+
+    installed = np.datetime64(installation_date, 's')
+    columns['asset_service_days'] = (buckets.astype('datetime64[D]') - installed.astype('datetime64[D]')).astype(np.int64)
+    columns['asset_service_hours'] = np.round((buckets - installed).astype(np.int64) / 3600.0, 2)
+    columns['days_since_last_failure'] = _days_since(buckets, bucket_ends, failure_times)
+    columns['days_since_last_inspection'] = _days_since(buckets, bucket_ends, inspection_times)
+
+    # Label: a failure in [bucket_end, bucket_end + 7 days)
+    next_failure = np.searchsorted(failure_times, bucket_ends, side='left')
+    upcoming = np.append(failure_times, np.datetime64('NaT'))[next_failure]
+    columns['faliure'] = (next_failure < len(failure_times)) & (
+        upcoming < bucket_ends + FAILURE_HORIZON_DAYS * DAY
+    )
+    return columns
+
+
+def _event_times(cursor, query, asset_id):
+    cursor.execute(query, (asset_id,))
+    return np.array(sorted(row[0] for row in cursor.fetchall() if row[0] is not None), dtype='datetime64[s]')
+
+
+def load_asset_inputs(cursor, asset_id, window_start, window_end):
+    """Readings of one asset grouped by sensor, plus its failure and inspection times."""
+    cursor.execute("""
+        SELECT sensor_type, reading_timestamp, reading_value
+        FROM plc_sensor_readings
+        WHERE asset_id = %s AND reading_timestamp >= %s AND reading_timestamp < %s
+        ORDER BY sensor_type, reading_timestamp
+    """, (asset_id, window_start, window_end))
+    rows = cursor.fetchall()
+    sensor_series = {}
+    if rows:
+        sensor_types = np.array([row[0] for row in rows])
+        timestamps = np.array([row[1] for row in rows], dtype='datetime64[s]')
+        values = np.array([float(row[2]) for row in rows])
+        for sensor_type in np.unique(sensor_types):
+            mask = sensor_types == sensor_type
+            sensor_series[str(sensor_type)] = (timestamps[mask], values[mask])
+
+    failure_times = _event_times(cursor, """
+        SELECT failure_date FROM assets_faliures WHERE asset_id = %s
+    """, asset_id)
+    inspection_times = _event_times(cursor, """
+        SELECT completion_date FROM mantainance_orders
+        WHERE asset_id = %s AND order_type = 'preventive' AND status = 'completed'
+    """, asset_id)
+    return sensor_series, failure_times, inspection_times, len(rows)
+
+
+def _to_rows(asset_id, interval_minutes, buckets, columns):
+    starts = buckets.astype(datetime)
+    data = [columns[name] for name in OUTPUT_COLUMNS]
+    rows = []
+    for i, bucket_start in enumerate(starts):
+        values = []
+        for name, column in zip(OUTPUT_COLUMNS, data):
+            value = column[i]
+            if name == 'faliure':
+                values.append(bool(value))
+            elif value != value:  # NaN
+                values.append(None)
+            elif name in ('asset_service_days', 'days_since_last_failure', 'days_since_last_inspection'):
+                values.append(int(value))
+            else:
+                values.append(round(float(value), 4))
+        rows.append((asset_id, interval_minutes, bucket_start, *values))
+    return rows
+
+
+def create_interval_features(connection, interval_minutes=FEATURE_INTERVAL_MINUTES):
+    """Build and store the interval feature rows of every asset."""
+    cursor = connection.cursor()
+    try:
+        min_date, max_date = get_date_range(connection)
+        buckets = bucket_grid(min_date, max_date, interval_minutes)
+        window_start = datetime.combine(min_date, datetime.min.time()) - timedelta(days=FEATURE_WINDOW_DAYS)
+        window_end = datetime.combine(max_date, datetime.min.time()) + timedelta(days=1)
+        print(f"Processing {min_date} to {max_date}: {len(buckets)} buckets of {interval_minutes} minutes per asset")
+
+        cursor.execute("SELECT asset_id, installation_date FROM assets ORDER BY asset_id")
+        assets = cursor.fetchall()
+
+        cursor.execute("DELETE FROM faliure_probability_base_hourly WHERE interval_minutes = %s",
+                       (interval_minutes,))
+        insert_sql = f"""
+            INSERT INTO faliure_probability_base_hourly
+            (asset_id, interval_minutes, bucket_start, {', '.join(OUTPUT_COLUMNS)})
+            VALUES ({', '.join(['%s'] * (len(OUTPUT_COLUMNS) + 3))})
+        """
+
+        total = failures = 0
+        for asset_id, installation_date in assets:
+            sensor_series, failure_times, inspection_times, n_readings = load_asset_inputs(
+                cursor, asset_id, window_start, window_end
+            )
+            columns = build_asset_features(buckets, interval_minutes, sensor_series, installation_date,
+                                           failure_times, inspection_times)
+            rows = _to_rows(asset_id, interval_minutes, buckets, columns)
+            for offset in range(0, len(rows), INSERT_BATCH_SIZE):
+                cursor.executemany(insert_sql, rows[offset:offset + INSERT_BATCH_SIZE])
+            total += len(rows)
+            failures += int(columns['faliure'].sum())
+            print(f"  asset_id {asset_id}: {n_readings} readings -> {len(rows)} rows")
+
+        connection.commit()
+        if total:
+            print(f"\nSuccessfully saved {total} asset-bucket feature vectors to faliure_probability_base_hourly")
+            print(f"Failure rate: {failures} / {total} ({100 * failures / total:.2f}%)")
+        return total
+
+    except Error as e:
+        print(f"Error creating interval features: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+@instrumented_main('faliure_probability_interval')
+def main(argv=None):
+    """Main ETL execution function."""
+    parser = argparse.ArgumentParser(description='Build interval-granularity failure probability features.')
+    parser.add_argument('--interval-minutes', type=int, default=FEATURE_INTERVAL_MINUTES,
+                        help='Bucket length in minutes (must divide a day)')
+    args = parser.parse_args(argv)
+    if args.interval_minutes <= 0 or 1440 % args.interval_minutes:
+        print("--interval-minutes must be a positive divisor of 1440")
+        sys.exit(2)
+    connection = None
+
+    try:
+        print("Connecting to database...")
+        connection = get_connection()
+
+        if connection.is_connected():
+            print(f"Connected to database: {connection.database}")
+            print(f"Starting failure probability feature extraction ETL ({args.interval_minutes}-minute granularity)...")
+
+            create_interval_features(connection, args.interval_minutes)
+
+            print("\nETL process completed successfully!")
+
+    except Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+            print("Database connection closed")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,19 +2,21 @@
 ETL Script for Failure Probability Prediction using Decision Tree and LightGBM
 
 This script:
-1. Loads feature data from faliure_probability_base table (daily granularity)
+1. Loads the labelled asset-days from faliure_probability_base (daily granularity)
+   and their point-in-time feature vectors from the feature store (ETL/feature_store.py)
 2. Trains Decision Tree Classifier and LightGBM models
 3. Predicts failure probability for each asset-day
 4. Saves predictions to faliure_prediction table
+5. Registers the models and the feature drift reference in the model registry
+
+With RETRAIN_POLICY=on_drift, training is skipped while the feature drift
+monitor reports no drift, and the registered model is reused for predictions.
 
 The models are used to predict if an asset will have a failure in the next week.
 """
 
-import mysql.connector
-from mysql.connector import Error
 from datetime import datetime
 import os
-from dotenv import load_dotenv
 import sys
 import pandas as pd
 import numpy as np
@@ -26,32 +28,35 @@ from sklearn.metrics import (
     f1_score, accuracy_score, confusion_matrix, roc_auc_score
 )
 from lightgbm import LGBMClassifier
-import joblib
 import warnings
 warnings.filterwarnings('ignore')
 
-# Load environment variables
-load_dotenv()
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/faliure_probability_lightgbm_prediction.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import Error, get_connection, refresh_table
+from ETL.instrumentation import instrumented_main, stage
+from ETL.model_registry import save_artifact, load_artifact, get_artifact_metadata
+from ETL.feature_drift_monitor import register_reference, run_drift_monitor, should_retrain
+from ETL.feature_store import FEATURE_NAMES, FeatureStore
 
-# Database configuration
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'database': os.getenv('DB_NAME', 'palantir_maintenance'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', 'admin'),
-    'port': int(os.getenv('DB_PORT', 3306))
-}
+# 'always' retrains on every run; 'on_drift' retrains only when the feature
+# drift monitor flags drift (or no model is registered yet)
+RETRAIN_POLICY = os.getenv('RETRAIN_POLICY', 'always')
 
 
 def load_training_data(connection):
     """
-    Load training data from faliure_probability_base table.
+    Load training data: labels from faliure_probability_base and the
+    point-in-time feature vectors of each asset-day from the feature store
+    (the same path online scoring uses).
     The 'faliure' column indicates if there's a failure in the next 7 days.
     """
     try:
-        # Load feature data with the faliure target column
+        # Load the asset-days with the faliure target column
         query = """
-            SELECT * FROM faliure_probability_base 
+            SELECT asset_id, reading_date, faliure FROM faliure_probability_base 
             ORDER BY asset_id, reading_date
         """
         df = pd.read_sql(query, connection)
@@ -60,14 +65,11 @@ def load_training_data(connection):
             print("No data found in faliure_probability_base table")
             return None, None, None
         
-        # Separate features and target
-        # Exclude non-feature columns
-        exclude_cols = ['base_id', 'asset_id', 'reading_date', 'faliure', 
-                       'asset_status', 'created_at', 'updated_at']
-        
-        feature_cols = [col for col in df.columns if col not in exclude_cols]
-        
-        X = df[feature_cols].select_dtypes(include=[np.number]).fillna(0)
+        # Features of reading_date are available from the end of that day
+        features = FeatureStore(connection).get_features(
+            df['asset_id'], pd.to_datetime(df['reading_date']) + pd.Timedelta(days=1)
+        )
+        X = features[FEATURE_NAMES].fillna(0)
         y = df['faliure'].astype(int).values
         
         print(f"Loaded {len(df)} samples")
@@ -202,63 +204,88 @@ def calculate_risk_level(probability):
 
 
 def save_predictions(connection, metadata, probabilities, predictions, model_version):
-    """Save predictions to faliure_prediction table."""
-    cursor = connection.cursor()
-    
+    """Save predictions to faliure_prediction table (shadow table swapped in when complete)."""
+    rows = []
+    for i in range(len(metadata)):
+        prob = float(probabilities[i]) if i < len(probabilities) else 0.0
+        pred = bool(predictions[i]) if i < len(predictions) else False
+        rows.append((
+            int(metadata['asset_id'].iloc[i]),
+            metadata['reading_date'].iloc[i],
+            prob,
+            pred,
+            calculate_risk_level(prob),
+            model_version
+        ))
+
     try:
-        # Clear existing predictions
-        cursor.execute("TRUNCATE TABLE faliure_prediction")
-        
-        for i in range(len(metadata)):
-            asset_id = metadata['asset_id'].iloc[i]
-            reading_date = metadata['reading_date'].iloc[i]
-            prob = float(probabilities[i]) if i < len(probabilities) else 0.0
-            pred = bool(predictions[i]) if i < len(predictions) else False
-            risk_level = calculate_risk_level(prob)
-            
-            cursor.execute("""
-                INSERT INTO faliure_prediction
-                (asset_id, prediction_date, probability_score, predicted_failure, risk_level, model_version)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                int(asset_id),
-                reading_date,
-                prob,
-                pred,
-                risk_level,
-                model_version
-            ))
-        
-        connection.commit()
+        refresh_table(connection, 'faliure_prediction',
+                      ['asset_id', 'prediction_date', 'probability_score', 'predicted_failure', 'risk_level',
+                       'model_version'],
+                      rows)
         print(f"\nSuccessfully saved {len(metadata)} predictions to faliure_prediction table")
         
     except Error as e:
         print(f"Error saving predictions: {e}")
         connection.rollback()
         raise
-    finally:
-        cursor.close()
 
 
+def predict_with_registered_model(connection, X, metadata):
+    """
+    Predict with the latest registered model instead of retraining.
+    Returns False if no usable model is registered.
+    """
+    model_info = get_artifact_metadata('failure_model')
+    model = load_artifact('failure_model')
+    scaler = load_artifact('feature_scaler')
+    if model is None or scaler is None:
+        return False
+
+    feature_names = model_info['metadata'].get('features', list(X.columns))
+    if any(name not in X.columns for name in feature_names):
+        # Feature set changed since the model was trained
+        return False
+    X_all_scaled = scaler.transform(X[feature_names])
+    if model_info['metadata'].get('model_version', '').startswith('LightGBM'):
+        X_all_scaled = pd.DataFrame(X_all_scaled, columns=feature_names)
+    probabilities = model.predict_proba(X_all_scaled)[:, 1]
+    predictions = model.predict(X_all_scaled)
+
+    save_predictions(connection, metadata, probabilities, predictions,
+                     model_info['metadata'].get('model_version', 'registered'))
+    return True
+
+
+@instrumented_main('faliure_probability_lightgbm_prediction')
 def main():
     """Main execution function."""
     connection = None
     
     try:
-        print("Connecting to MySQL database...")
-        connection = mysql.connector.connect(**DB_CONFIG)
+        print("Connecting to database...")
+        connection = get_connection()
         
         if connection.is_connected():
-            print(f"Connected to MySQL database: {DB_CONFIG['database']}")
+            print(f"Connected to database: {connection.database}")
             print("Loading training data from faliure_probability_base...")
             
             # Load data
-            X, y, metadata = load_training_data(connection)
+            with stage('load_training_data'):
+                X, y, metadata = load_training_data(connection)
             
             if X is None or len(X) == 0:
                 print("No data available for training. Please run faliure_probability_dataframe.py first.")
                 return
             
+            if RETRAIN_POLICY == 'on_drift':
+                run_drift_monitor(connection)
+                retrain, reason = should_retrain(connection)
+                print(f"Retraining decision: {'retrain' if retrain else 'keep model'} ({reason})")
+                if not retrain and predict_with_registered_model(connection, X, metadata):
+                    print("\nETL process completed successfully (registered model reused)!")
+                    return
+            
             # Handle case with insufficient data
             if len(X) < 20:
                 print(f"Warning: Only {len(X)} samples available. Using simple prediction.")
@@ -293,8 +320,9 @@ def main():
             X_test_scaled_df = pd.DataFrame(X_test_scaled, columns=X_test.columns)
             
             # Train models
-            dt_model = train_decision_tree(X_train_scaled, y_train, X_test_scaled, y_test)
-            lgbm_model = train_lightgbm(X_train_scaled_df, y_train, X_test_scaled_df, y_test)
+            with stage('train'):
+                dt_model = train_decision_tree(X_train_scaled, y_train, X_test_scaled, y_test)
+                lgbm_model = train_lightgbm(X_train_scaled_df, y_train, X_test_scaled_df, y_test)
             
             # Compare models and choose the best one based on F1-score
             dt_pred = dt_model.predict(X_test_scaled)
@@ -327,13 +355,25 @@ def main():
                 predictions = best_model.predict(X_all_scaled)
             
             # Save predictions
-            save_predictions(connection, metadata, probabilities, predictions, model_version)
+            with stage('save_predictions'):
+                save_predictions(connection, metadata, probabilities, predictions, model_version)
             
-            # Save models
-            joblib.dump(dt_model, 'decision_tree_failure_model.pkl')
-            joblib.dump(lgbm_model, 'lightgbm_failure_model.pkl')
-            joblib.dump(scaler, 'feature_scaler.pkl')
-            print("\nModels saved: decision_tree_failure_model.pkl, lightgbm_failure_model.pkl")
+            # Register models, scaler and the drift reference of the training data
+            feature_names = list(X.columns)
+            save_artifact('decision_tree_failure_model', dt_model, metadata={'features': feature_names})
+            save_artifact('lightgbm_failure_model', lgbm_model, metadata={'features': feature_names})
+            save_artifact('feature_scaler', scaler, metadata={'features': feature_names})
+            save_artifact('failure_model', best_model, metadata={
+                'model_version': model_version,
+                'features': feature_names,
+                'decision_tree_f1': round(dt_f1, 4),
+                'lightgbm_f1': round(lgbm_f1, 4),
+            })
+            reference_version = register_reference(
+                connection, training_keys=meta_train[['asset_id', 'reading_date']].itertuples(index=False),
+                metadata={'model_version': model_version}
+            )
+            print(f"\nModels registered in model registry (drift reference {reference_version})")
             
             print("\nETL process completed successfully!")
             
@@ -350,7 +390,7 @@ def main():
     finally:
         if connection and connection.is_connected():
             connection.close()
-            print("MySQL connection closed")
+            print("Database connection closed")
 
 
 if __name__ == "__main__":
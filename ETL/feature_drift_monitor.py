@@ -0,0 +1,374 @@
+"""
+ETL Script for Streaming Feature-Drift Monitoring
+
+Compares the sensor features in faliure_probability_base with the data the
+failure model was trained on:
+- The training reference is a fixed-bin histogram per feature (quantile edges
+  computed once at training time from the training rows), stored in the model
+  registry.
+- Every new day of features updates incremental histograms (a rolling window
+  of daily counts), so scoring never reloads history. When
+  faliure_probability_base has been rebuilt since the last run, the window is
+  restarted from the latest DRIFT_WINDOW_DAYS days of the new extraction.
+- PSI and KS scores are computed from bin counts in O(bins) per feature.
+
+Output: feature_drift table (one row per reading date and feature). The latest
+scores drive the retraining decision of faliure_probability_lightgbm_prediction.py.
+"""
+
+from datetime import timedelta
+import os
+import sys
+import numpy as np
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/feature_drift_monitor.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import Error, get_connection
+from ETL.instrumentation import instrumented_main
+from ETL.model_registry import save_artifact, load_artifact, get_artifact_metadata
+
+# Sensor features monitored for drift (columns of faliure_probability_base)
+DRIFT_FEATURES = [
+    'mechanical_vibration', 'rpm', 'power', 'electrical_current', 'pressure', 'flow'
+]
+
+REFERENCE_ARTIFACT = 'feature_drift_reference'
+STATE_ARTIFACT = 'feature_drift_state'
+
+DRIFT_BINS = int(os.getenv('DRIFT_BINS', 20))
+DRIFT_WINDOW_DAYS = int(os.getenv('DRIFT_WINDOW_DAYS', 30))
+PSI_WARNING = float(os.getenv('DRIFT_PSI_WARNING', 0.1))
+PSI_DRIFT = float(os.getenv('DRIFT_PSI_DRIFT', 0.25))
+KS_DRIFT = float(os.getenv('DRIFT_KS_DRIFT', 0.2))
+
+# Smoothing for empty bins so PSI stays finite
+_EPSILON = 1e-6
+
+
+def _bin_counts(values, edges):
+    """
+    Count values into len(edges) + 1 bins: (-inf, e0], (e0, e1], ..., (e_last, inf).
+    NaN values are ignored.
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    idx = np.searchsorted(edges, values, side='left')
+    return np.bincount(idx, minlength=len(edges) + 1).astype(np.int64)
+
+
+def build_reference_histograms(feature_frame, n_bins=DRIFT_BINS):
+    """
+    Build the training reference: quantile bin edges and counts per feature.
+
+    feature_frame is any mapping/DataFrame with the DRIFT_FEATURES columns
+    (raw, unscaled values as stored in faliure_probability_base; NaN = NULL).
+    """
+    reference = {'n_bins': n_bins, 'features': {}}
+    quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+    for feature in DRIFT_FEATURES:
+        if feature not in feature_frame:
+            continue
+        values = np.asarray(feature_frame[feature], dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            continue
+        edges = np.unique(np.quantile(values, quantiles))
+        reference['features'][feature] = {
+            'edges': edges,
+            'counts': _bin_counts(values, edges),
+        }
+    return reference
+
+
+def register_reference(connection, training_keys=None, metadata=None):
+    """
+    Build the training reference from the faliure_probability_base rows the
+    model was trained on (training_keys: (asset_id, reading_date) pairs;
+    default: every row), store it in the model registry and reset the drift
+    state. Returns the reference version.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT asset_id, reading_date, {', '.join(DRIFT_FEATURES)}
+            FROM faliure_probability_base
+        """)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    if training_keys is not None:
+        keys = {(int(asset_id), str(reading_date)[:10]) for asset_id, reading_date in training_keys}
+        rows = [row for row in rows if (int(row[0]), str(row[1])[:10]) in keys]
+    values = np.array(
+        [[np.nan if v is None else float(v) for v in row[2:]] for row in rows]
+    ).reshape(len(rows), len(DRIFT_FEATURES))
+    reference = build_reference_histograms(
+        {feature: values[:, col] for col, feature in enumerate(DRIFT_FEATURES)}
+    )
+    version = save_artifact(REFERENCE_ARTIFACT, reference, metadata=metadata)
+    save_artifact(STATE_ARTIFACT, _empty_state(reference, version), version='current')
+    return version
+
+
+def _empty_state(reference, reference_version, extraction=None):
+    return {
+        'reference_version': reference_version,
+        # faliure_probability_base extraction the window was built from
+        'extraction': extraction,
+        'last_date': None,
+        # Rolling window: list of (reading_date, {feature: counts})
+        'daily_counts': [],
+        'window_counts': {
+            feature: np.zeros(len(hist['counts']), dtype=np.int64)
+            for feature, hist in reference['features'].items()
+        },
+    }
+
+
+def population_stability_index(reference_counts, current_counts):
+    """PSI between two histograms over the same bins."""
+    ref = np.asarray(reference_counts, dtype=float)
+    cur = np.asarray(current_counts, dtype=float)
+    ref = np.maximum(ref / max(ref.sum(), 1.0), _EPSILON)
+    cur = np.maximum(cur / max(cur.sum(), 1.0), _EPSILON)
+    return float(np.sum((cur - ref) * np.log(cur / ref)))
+
+
+def ks_statistic(reference_counts, current_counts):
+    """Kolmogorov-Smirnov distance between the binned CDFs."""
+    ref = np.cumsum(reference_counts, dtype=float)
+    cur = np.cumsum(current_counts, dtype=float)
+    if ref[-1] == 0 or cur[-1] == 0:
+        return 0.0
+    return float(np.max(np.abs(ref / ref[-1] - cur / cur[-1])))
+
+
+def classify_drift(psi, ks):
+    """Drift status from PSI / KS thresholds."""
+    if psi >= PSI_DRIFT or ks >= KS_DRIFT:
+        return 'drift'
+    if psi >= PSI_WARNING:
+        return 'warning'
+    return 'stable'
+
+
+def update_state(state, reference, reading_date, day_values):
+    """
+    Add one day of feature values to the rolling window and drop days that
+    fell out of it. Cost is O(bins) per feature plus binning the new batch.
+    """
+    day_counts = {}
+    for feature, hist in reference['features'].items():
+        if feature not in day_values:
+            continue
+        counts = _bin_counts(day_values[feature], hist['edges'])
+        day_counts[feature] = counts
+        state['window_counts'][feature] += counts
+    state['daily_counts'].append((reading_date, day_counts))
+
+    window_start = reading_date - timedelta(days=DRIFT_WINDOW_DAYS - 1)
+    while state['daily_counts'] and state['daily_counts'][0][0] < window_start:
+        _, expired = state['daily_counts'].pop(0)
+        for feature, counts in expired.items():
+            state['window_counts'][feature] -= counts
+    state['last_date'] = reading_date
+
+
+def score_state(state, reference):
+    """Return {feature: (psi, ks, window_count)} for the current window."""
+    scores = {}
+    for feature, hist in reference['features'].items():
+        current = state['window_counts'][feature]
+        scores[feature] = (
+            population_stability_index(hist['counts'], current),
+            ks_statistic(hist['counts'], current),
+            int(current.sum()),
+        )
+    return scores
+
+
+def fetch_extraction(connection):
+    """
+    (extraction key, latest reading_date) of faliure_probability_base. The key
+    changes whenever the table is rebuilt or extended.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*), MAX(extraction_date), MAX(reading_date) FROM faliure_probability_base")
+        count, extraction_date, latest_date = cursor.fetchone()
+    finally:
+        cursor.close()
+    return f"{count}/{extraction_date}", latest_date
+
+
+def fetch_new_feature_days(connection, last_date):
+    """
+    Yield (reading_date, {feature: values}) for each day in
+    faliure_probability_base newer than last_date.
+    """
+    cursor = connection.cursor()
+    try:
+        query = f"""
+            SELECT reading_date, {', '.join(DRIFT_FEATURES)}
+            FROM faliure_probability_base
+            WHERE reading_date IS NOT NULL
+        """
+        params = ()
+        if last_date is not None:
+            query += " AND reading_date > %s"
+            params = (last_date,)
+        query += " ORDER BY reading_date"
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    if not rows:
+        return
+    dates = [row[0] for row in rows]
+    values = np.array([[np.nan if v is None else float(v) for v in row[1:]] for row in rows])
+    start = 0
+    for i in range(1, len(rows) + 1):
+        if i == len(rows) or dates[i] != dates[start]:
+            yield dates[start], {
+                feature: values[start:i, col] for col, feature in enumerate(DRIFT_FEATURES)
+            }
+            start = i
+
+
+def save_drift_scores(connection, reading_date, scores, reference_version):
+    """Insert or update the drift scores of one reading date."""
+    cursor = connection.cursor()
+    try:
+        cursor.executemany("""
+            INSERT INTO feature_drift
+            (reading_date, feature_name, psi, ks_statistic, window_count,
+             drift_status, reference_version)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                psi = VALUES(psi),
+                ks_statistic = VALUES(ks_statistic),
+                window_count = VALUES(window_count),
+                drift_status = VALUES(drift_status),
+                updated_at = CURRENT_TIMESTAMP
+        """, [
+            (reading_date, feature, round(psi, 6), round(ks, 6), count,
+             classify_drift(psi, ks), reference_version)
+            for feature, (psi, ks, count) in scores.items()
+        ])
+    finally:
+        cursor.close()
+
+
+def run_drift_monitor(connection):
+    """
+    Process every new day of features since the last run and store drift scores.
+    After a rebuild of faliure_probability_base, the latest DRIFT_WINDOW_DAYS
+    days of the new extraction are scored. Returns the number of days processed.
+    """
+    reference = load_artifact(REFERENCE_ARTIFACT)
+    reference_info = get_artifact_metadata(REFERENCE_ARTIFACT)
+    if reference is None:
+        print("No training reference registered yet. Train the model first.")
+        return 0
+    reference_version = reference_info['version']
+
+    extraction, latest_date = fetch_extraction(connection)
+    state = load_artifact(STATE_ARTIFACT, version='current')
+    if (state is None or state['reference_version'] != reference_version
+            or state.get('extraction') != extraction):
+        state = _empty_state(reference, reference_version, extraction)
+        if latest_date is not None:
+            state['last_date'] = latest_date - timedelta(days=DRIFT_WINDOW_DAYS)
+
+    days = 0
+    try:
+        for reading_date, day_values in fetch_new_feature_days(connection, state['last_date']):
+            update_state(state, reference, reading_date, day_values)
+            scores = score_state(state, reference)
+            save_drift_scores(connection, reading_date, scores, reference_version)
+            days += 1
+        connection.commit()
+    except Error as e:
+        print(f"Error saving drift scores: {e}")
+        connection.rollback()
+        raise
+
+    # State is saved only after the scores are committed
+    save_artifact(STATE_ARTIFACT, state, version='current')
+    print(f"Processed {days} new day(s) against reference {reference_version}")
+    return days
+
+
+def should_retrain(connection):
+    """
+    Retraining decision for the LightGBM pipeline.
+
+    Returns (retrain, reason): retrain when no reference is registered, when
+    no day has been scored against it yet, or when any feature of the latest
+    drift scores is in 'drift' status.
+    """
+    reference_info = get_artifact_metadata(REFERENCE_ARTIFACT)
+    if reference_info is None:
+        return True, 'no training reference registered'
+
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT feature_name, psi, ks_statistic, drift_status
+            FROM feature_drift
+            WHERE reference_version = %s
+            AND reading_date = (
+                SELECT MAX(reading_date) FROM feature_drift WHERE reference_version = %s
+            )
+        """, (reference_info['version'], reference_info['version']))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    if not rows:
+        return True, f"no feature days scored against reference {reference_info['version']}"
+    drifted = [row['feature_name'] for row in rows if row['drift_status'] == 'drift']
+    if drifted:
+        return True, f"drift detected in: {', '.join(drifted)}"
+    return False, 'no feature drift detected'
+
+
+@instrumented_main('feature_drift_monitor')
+def main():
+    """Main ETL execution function."""
+    connection = None
+
+    try:
+        print("Connecting to database...")
+        connection = get_connection()
+
+        if connection.is_connected():
+            print(f"Connected to database: {connection.database}")
+            print("Starting feature drift monitoring...")
+
+            run_drift_monitor(connection)
+            retrain, reason = should_retrain(connection)
+            print(f"Retraining decision: {'retrain' if retrain else 'keep model'} ({reason})")
+
+            print("\nETL process completed successfully!")
+
+    except Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+            print("Database connection closed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,514 @@
+"""
+Point-in-Time Feature Store for the Failure Probability Features
+
+One read path for the daily feature vectors of faliure_probability_base, shared
+by model training (faliure_probability_lightgbm_prediction.load_training_data),
+online scoring and the notebooks:
+
+    get_features(asset_ids, as_of_timestamps, feature_names=None) -> DataFrame
+
+A vector as of timestamp t describes the last day that was complete at t
+(features of reading_date d are available from d + 1 day, 00:00), so no value
+depends on data from after t.
+
+Vectors are served from an in-memory cache per asset and day:
+- filled from the materialized faliure_probability_base rows of the asset
+- days that are not materialized (e.g. today, or outside the extraction range)
+  are computed on demand, for all missing assets in one batch: daily sums of
+  the rollup tier (ETL/sensor_downsampling.py) up to its watermark and raw
+  readings after it, rolled into the 30-day windows with cumulative sums, and
+  the failure / inspection / anomaly / coverage features with binary searches
+  and per-day aggregates, the same definitions as
+  ETL/faliure_probability_dataframe.py
+The cache is dropped when the materialized inputs change (the
+faliure_probability_base extraction, the daily rollup watermark, failures and
+maintenance orders), checked at most every FEATURE_STORE_CHECK_SECONDS. Cached
+lookups are pure numpy: thousands of asset-timestamps take milliseconds.
+
+Usage:
+    from ETL.feature_store import get_features
+    X = get_features([1, 2, 3], '2022-06-10 12:00')
+
+    python ETL/feature_store.py --assets 1 2 --as-of 2022-06-10T12:00
+    python ETL/feature_store.py --benchmark 5000
+    python ETL/feature_store.py --validate      # computed vs materialized vectors
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/feature_store.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import Error, get_connection
+from ETL.instrumentation import instrumented_main, stage
+from ETL.sensor_columnar_store import SENSOR_FEATURES
+from ETL.sensor_downsampling import DAILY_WATERMARK, get_watermark
+
+FEATURE_STORE_CHECK_SECONDS = float(os.getenv('FEATURE_STORE_CHECK_SECONDS', 60))
+# Assets per batch of on-demand queries (size of the IN lists)
+FEATURE_STORE_BATCH_ASSETS = int(os.getenv('FEATURE_STORE_BATCH_ASSETS', 500))
+FEATURE_WINDOW_DAYS = 30
+
+# faliure_probability_base feature columns, in table order
+FEATURE_NAMES = (
+    list(SENSOR_FEATURES.values())
+    + ['asset_service_days', 'asset_service_hours', 'days_since_last_failure', 'days_since_last_inspection',
+       'sensor_anomaly_score', 'sensor_anomaly_alarms', 'sensor_coverage_1d', 'sensor_coverage_30d']
+)
+
+# Scale of the DECIMAL columns, so computed vectors equal materialized ones
+FEATURE_DECIMALS = {
+    'mechanical_vibration': 4, 'rpm': 2, 'power': 4, 'electrical_current': 4, 'pressure': 4, 'flow': 4,
+    'asset_service_hours': 2, 'sensor_anomaly_score': 4, 'sensor_coverage_1d': 4, 'sensor_coverage_30d': 4,
+}
+
+_COLUMN = {name: i for i, name in enumerate(FEATURE_NAMES)}
+_EPOCH_DAY = np.datetime64('1970-01-01', 'D')
+
+
+def _day_numbers(values):
+    """Dates / datetimes -> int64 days since 1970-01-01."""
+    return np.asarray(values, dtype='datetime64[D]').astype(np.int64)
+
+
+def _in_list(ids):
+    return ', '.join(['%s'] * len(ids))
+
+
+class _AssetDays:
+    """Feature vectors of one asset on a contiguous day range (NaN = missing value)."""
+
+    def __init__(self):
+        self.first = 0
+        self.values = np.empty((0, len(FEATURE_NAMES)))
+        self.known = np.empty(0, dtype=bool)
+
+    def _cover(self, lo, hi):
+        if len(self.known) == 0:
+            self.first = lo
+            self.values = np.full((hi - lo + 1, len(FEATURE_NAMES)), np.nan)
+            self.known = np.zeros(hi - lo + 1, dtype=bool)
+            return
+        first, last = min(lo, self.first), max(hi, self.first + len(self.known) - 1)
+        if first == self.first and last == self.first + len(self.known) - 1:
+            return
+        values = np.full((last - first + 1, len(FEATURE_NAMES)), np.nan)
+        known = np.zeros(last - first + 1, dtype=bool)
+        offset = self.first - first
+        values[offset:offset + len(self.known)] = self.values
+        known[offset:offset + len(self.known)] = self.known
+        self.first, self.values, self.known = first, values, known
+
+    def put(self, days, values):
+        self._cover(int(days.min()), int(days.max()))
+        self.values[days - self.first] = values
+        self.known[days - self.first] = True
+
+    def missing(self, days):
+        """The requested days that are not cached yet."""
+        index = days - self.first
+        inside = (index >= 0) & (index < len(self.known))
+        result = ~inside
+        result[inside] = ~self.known[index[inside]]
+        return days[result]
+
+    def get(self, days):
+        return self.values[days - self.first]
+
+
+def _window_sums(daily, window):
+    """Sum over the last `window` entries (inclusive) of every position of a per-day array."""
+    cs = np.concatenate((np.zeros((1,) + daily.shape[1:]), np.cumsum(daily, axis=0)))
+    hi = np.arange(window, len(daily) + 1)
+    return cs[hi] - cs[hi - window]
+
+
+def _days_since(days, event_days):
+    """Days from the last event on or before each day (NaN if none)."""
+    result = np.full(len(days), np.nan)
+    if len(event_days) == 0:
+        return result
+    last = np.searchsorted(event_days, days, side='right') - 1
+    has_event = last >= 0
+    result[has_event] = days[has_event] - event_days[last[has_event]]
+    return result
+
+
+class FeatureStore:
+    """
+    Point-in-time feature vectors with a per asset-day cache. Uses
+    `connection` if given, otherwise a pooled connection per refresh.
+    """
+
+    def __init__(self, connection=None, use_materialized=True):
+        self.connection = connection
+        # False computes every vector from the source tables (for validation)
+        self.use_materialized = use_materialized
+        self._assets = {}
+        self._version = None
+        self._checked = 0.0
+
+    def clear(self):
+        self._assets = {}
+        self._version = None
+
+    def _sources_version(self, cursor):
+        cursor.execute("SELECT COUNT(*), MAX(extraction_date) FROM faliure_probability_base")
+        base = cursor.fetchone()
+        cursor.execute("SELECT COUNT(*), MAX(failure_id) FROM assets_faliures")
+        failures = cursor.fetchone()
+        cursor.execute("SELECT COUNT(*), MAX(order_id), MAX(updated_at) FROM mantainance_orders")
+        orders = cursor.fetchone()
+        return tuple(str(value) for value in (*base, *failures, *orders, get_watermark(cursor, DAILY_WATERMARK)))
+
+    def _with_cursor(self, func, *args):
+        connection = self.connection or get_connection()
+        cursor = connection.cursor()
+        try:
+            result = func(cursor, *args)
+            # Do not keep a read snapshot open between lookups
+            connection.commit()
+            return result
+        finally:
+            cursor.close()
+            if connection is not self.connection:
+                connection.close()
+
+    def _check_version(self):
+        if time.monotonic() - self._checked < FEATURE_STORE_CHECK_SECONDS and self._version is not None:
+            return
+        version = self._with_cursor(self._sources_version)
+        if version != self._version:
+            self._assets = {}
+            self._version = version
+        self._checked = time.monotonic()
+
+    def _load_materialized(self, cursor, asset_ids):
+        cursor.execute(f"""
+            SELECT asset_id, reading_date, {', '.join(FEATURE_NAMES)}
+            FROM faliure_probability_base
+            WHERE asset_id IN ({_in_list(asset_ids)}) AND reading_date IS NOT NULL
+            ORDER BY extraction_date
+        """, tuple(asset_ids))
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        assets = np.array([row[0] for row in rows], dtype=np.int64)
+        days = _day_numbers([row[1] for row in rows])
+        values = np.array([row[2:] for row in rows], dtype=float)
+        for asset_id in np.unique(assets):
+            mask = assets == asset_id
+            # Later extractions overwrite earlier ones of the same day
+            self._assets[int(asset_id)].put(days[mask], values[mask])
+
+    def _compute(self, cursor, ranges):
+        """Compute and cache the vectors of {asset_id: (first day, last day)}."""
+        asset_ids = sorted(ranges)
+        lo = min(first for first, _ in ranges.values())
+        hi = max(last for _, last in ranges.values())
+        window_lo = lo - FEATURE_WINDOW_DAYS
+        ids = tuple(asset_ids)
+        date_lo = (_EPOCH_DAY + window_lo).astype(object)
+        date_end = (_EPOCH_DAY + hi + 1).astype(object)
+
+        cursor.execute(f"SELECT asset_id, installation_date FROM assets WHERE asset_id IN ({_in_list(ids)})", ids)
+        installed = {row[0]: int(_day_numbers(row[1])) for row in cursor.fetchall() if row[1] is not None}
+
+        # Daily sums / counts per sensor: rollup tier up to its watermark, raw readings after it
+        watermark = get_watermark(cursor, DAILY_WATERMARK)
+        rollup_end = min(int(_day_numbers(watermark)), hi + 1) if watermark is not None else window_lo
+        sensor_rows = []
+        if rollup_end > window_lo:
+            cursor.execute(f"""
+                SELECT asset_id, sensor_type, bucket_date, SUM(mean_value * reading_count), SUM(reading_count)
+                FROM plc_sensor_readings_daily
+                WHERE asset_id IN ({_in_list(ids)}) AND bucket_date >= %s AND bucket_date < %s
+                GROUP BY asset_id, sensor_type, bucket_date
+            """, ids + (date_lo, (_EPOCH_DAY + rollup_end).astype(object)))
+            sensor_rows += cursor.fetchall()
+        if rollup_end <= hi:
+            cursor.execute(f"""
+                SELECT asset_id, sensor_type, DATE(reading_timestamp), SUM(reading_value), COUNT(reading_value)
+                FROM plc_sensor_readings
+                WHERE asset_id IN ({_in_list(ids)}) AND reading_timestamp >= %s AND reading_timestamp < %s
+                GROUP BY asset_id, sensor_type, DATE(reading_timestamp)
+            """, ids + ((_EPOCH_DAY + max(rollup_end, window_lo)).astype(object), date_end))
+            sensor_rows += cursor.fetchall()
+
+        cursor.execute(f"""
+            SELECT asset_id, DATE(failure_date) FROM assets_faliures WHERE asset_id IN ({_in_list(ids)})
+        """, ids)
+        failure_rows = cursor.fetchall()
+        cursor.execute(f"""
+            SELECT asset_id, DATE(completion_date) FROM mantainance_orders
+            WHERE asset_id IN ({_in_list(ids)}) AND order_type = 'preventive' AND status = 'completed'
+            AND completion_date IS NOT NULL
+        """, ids)
+        inspection_rows = cursor.fetchall()
+        cursor.execute(f"""
+            SELECT asset_id, reading_date, MAX(max_abs_z), SUM(alarm_count)
+            FROM sensor_anomaly_daily
+            WHERE asset_id IN ({_in_list(ids)}) AND reading_date >= %s AND reading_date < %s
+            GROUP BY asset_id, reading_date
+        """, ids + ((_EPOCH_DAY + lo).astype(object), date_end))
+        anomaly_rows = cursor.fetchall()
+        cursor.execute(f"""
+            SELECT asset_id, reading_date,
+                   SUM(LEAST(reading_count - duplicate_count - out_of_range_count, expected_count)),
+                   SUM(expected_count)
+            FROM sensor_data_quality
+            WHERE asset_id IN ({_in_list(ids)}) AND reading_date >= %s AND reading_date < %s
+            GROUP BY asset_id, reading_date
+        """, ids + (date_lo, date_end))
+        quality_rows = cursor.fetchall()
+
+        # Per-day inputs of all assets on the window_lo..hi grid
+        position = {asset_id: i for i, asset_id in enumerate(asset_ids)}
+        n_days = hi - window_lo + 1
+        shape = (len(asset_ids), n_days)
+
+        sensor_index = {sensor_type: j for j, sensor_type in enumerate(SENSOR_FEATURES)}
+        sensor_rows = [row for row in sensor_rows if row[1] in sensor_index and row[3] is not None]
+        sums = np.zeros(shape + (len(SENSOR_FEATURES),))
+        counts = np.zeros(shape + (len(SENSOR_FEATURES),))
+        if sensor_rows:
+            at = (np.array([position[row[0]] for row in sensor_rows]),
+                  _day_numbers([row[2] for row in sensor_rows]) - window_lo,
+                  np.array([sensor_index[row[1]] for row in sensor_rows]))
+            np.add.at(sums, at, np.array([row[3] for row in sensor_rows], dtype=float))
+            np.add.at(counts, at, np.array([row[4] for row in sensor_rows], dtype=float))
+
+        anomaly_score = np.full(shape, np.nan)
+        anomaly_alarms = np.full(shape, np.nan)
+        if anomaly_rows:
+            at = (np.array([position[row[0]] for row in anomaly_rows]),
+                  _day_numbers([row[1] for row in anomaly_rows]) - window_lo)
+            anomaly_score[at] = np.array([row[2] for row in anomaly_rows], dtype=float)
+            anomaly_alarms[at] = np.array([row[3] for row in anomaly_rows], dtype=float)
+
+        valid = np.zeros(shape)
+        expected = np.zeros(shape)
+        has_quality = np.zeros(shape, dtype=bool)
+        if quality_rows:
+            at = (np.array([position[row[0]] for row in quality_rows]),
+                  _day_numbers([row[1] for row in quality_rows]) - window_lo)
+            valid[at] = np.array([row[2] or 0 for row in quality_rows], dtype=float)
+            expected[at] = np.array([row[3] or 0 for row in quality_rows], dtype=float)
+            has_quality[at] = True
+
+        failures, inspections = {}, {}
+        for events, rows in ((failures, failure_rows), (inspections, inspection_rows)):
+            for row_asset, day in rows:
+                if day is not None:
+                    events.setdefault(row_asset, []).append(day)
+
+        window = FEATURE_WINDOW_DAYS + 1
+        # _window_sums position p covers grid days p..p + window - 1
+        sensor_sums = _window_sums(np.moveaxis(sums, 1, 0), window)
+        sensor_counts = _window_sums(np.moveaxis(counts, 1, 0), window)
+        valid_sums = _window_sums(valid.T, window)
+        expected_sums = _window_sums(expected.T, window)
+
+        for asset_id in asset_ids:
+            i = position[asset_id]
+            first, last = ranges[asset_id]
+            days = np.arange(first, last + 1)
+            at = days - window_lo
+            columns = np.full((len(days), len(FEATURE_NAMES)), np.nan)
+
+            with np.errstate(invalid='ignore', divide='ignore'):
+                window_counts = sensor_counts[at - window + 1, i]
+                columns[:, :len(SENSOR_FEATURES)] = np.where(
+                    window_counts > 0, sensor_sums[at - window + 1, i] / window_counts, np.nan)
+                columns[:, _COLUMN['sensor_coverage_1d']] = np.where(
+                    has_quality[i, at] & (expected[i, at] > 0), valid[i, at] / expected[i, at], np.nan)
+                window_expected = expected_sums[at - window + 1, i]
+                columns[:, _COLUMN['sensor_coverage_30d']] = np.where(
+                    window_expected > 0, valid_sums[at - window + 1, i] / window_expected, np.nan)
+
+            if asset_id in installed:
+                service_days = days - installed[asset_id]
+                columns[:, _COLUMN['asset_service_days']] = service_days
+                columns[:, _COLUMN['asset_service_hours']] = service_days * 24.0
+            columns[:, _COLUMN['days_since_last_failure']] = _days_since(
+                days, np.unique(_day_numbers(failures.get(asset_id, []))))
+            columns[:, _COLUMN['days_since_last_inspection']] = _days_since(
+                days, np.unique(_day_numbers(inspections.get(asset_id, []))))
+            columns[:, _COLUMN['sensor_anomaly_score']] = anomaly_score[i, at]
+            columns[:, _COLUMN['sensor_anomaly_alarms']] = anomaly_alarms[i, at]
+
+            for name, decimals in FEATURE_DECIMALS.items():
+                columns[:, _COLUMN[name]] = np.round(columns[:, _COLUMN[name]], decimals)
+            self._assets[asset_id].put(days, columns)
+
+    def _fill(self, cursor, asset_days):
+        """Make sure every {asset_id: requested day numbers} is cached."""
+        new = [asset_id for asset_id in asset_days if asset_id not in self._assets]
+        for asset_id in new:
+            self._assets[asset_id] = _AssetDays()
+        if self.use_materialized:
+            for offset in range(0, len(new), FEATURE_STORE_BATCH_ASSETS):
+                self._load_materialized(cursor, new[offset:offset + FEATURE_STORE_BATCH_ASSETS])
+
+        ranges = {}
+        for asset_id, days in asset_days.items():
+            missing = self._assets[asset_id].missing(days)
+            if len(missing):
+                ranges[asset_id] = (int(missing.min()), int(missing.max()))
+        batch = list(ranges)
+        for offset in range(0, len(batch), FEATURE_STORE_BATCH_ASSETS):
+            self._compute(cursor, {asset_id: ranges[asset_id]
+                                   for asset_id in batch[offset:offset + FEATURE_STORE_BATCH_ASSETS]})
+
+    def get_features(self, asset_ids, as_of_timestamps, feature_names=None):
+        """
+        Feature vectors of each (asset_id, as_of) pair, in input order. A single
+        timestamp applies to all assets. Returns a DataFrame with asset_id,
+        as_of, feature_date (the day the vector describes) and the features
+        (NaN = missing).
+        """
+        feature_names = list(feature_names or FEATURE_NAMES)
+        unknown = set(feature_names) - set(FEATURE_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown features {sorted(unknown)} (expected some of {FEATURE_NAMES})")
+        asset_ids = np.asarray(asset_ids, dtype=np.int64).ravel()
+        as_of = np.asarray(pd.to_datetime(as_of_timestamps), dtype='datetime64[ns]').ravel()
+        if len(as_of) == 1:
+            as_of = np.repeat(as_of, len(asset_ids))
+        if len(as_of) != len(asset_ids):
+            raise ValueError(f"{len(asset_ids)} asset ids but {len(as_of)} timestamps")
+        # Last day complete at as_of
+        days = as_of.astype('datetime64[D]').astype(np.int64) - 1
+
+        self._check_version()
+        order = np.argsort(asset_ids, kind='stable')
+        unique_ids, starts = np.unique(asset_ids[order], return_index=True)
+        groups = np.split(order, starts[1:])
+        asset_days = {int(asset_id): np.unique(days[group]) for asset_id, group in zip(unique_ids, groups)}
+        if any(asset_id not in self._assets or len(self._assets[asset_id].missing(requested))
+               for asset_id, requested in asset_days.items()):
+            self._with_cursor(self._fill, asset_days)
+
+        values = np.empty((len(asset_ids), len(FEATURE_NAMES)))
+        for asset_id, group in zip(unique_ids, groups):
+            values[group] = self._assets[int(asset_id)].get(days[group])
+        result = pd.DataFrame(values[:, [_COLUMN[name] for name in feature_names]], columns=feature_names)
+        result.insert(0, 'feature_date', (_EPOCH_DAY + days).astype('datetime64[s]'))
+        result.insert(0, 'as_of', as_of)
+        result.insert(0, 'asset_id', asset_ids)
+        return result
+
+
+# Process-wide store behind get_features()
+_STORE = None
+
+
+def get_features(asset_ids, as_of_timestamps, feature_names=None):
+    """Point-in-time feature vectors from the process-wide FeatureStore (see FeatureStore.get_features)."""
+    global _STORE
+    if _STORE is None:
+        _STORE = FeatureStore()
+    return _STORE.get_features(asset_ids, as_of_timestamps, feature_names)
+
+
+def validate_materialized(connection, tolerance=1e-3):
+    """
+    Compute the vector of every materialized faliure_probability_base row from
+    the source tables and compare it with the stored one. Returns
+    {feature: number of rows that differ by more than `tolerance`}.
+    """
+    rows = pd.read_sql("SELECT asset_id, reading_date FROM faliure_probability_base", connection)
+    as_of = pd.to_datetime(rows['reading_date']) + pd.Timedelta(days=1)
+    materialized = FeatureStore(connection).get_features(rows['asset_id'], as_of)
+    computed = FeatureStore(connection, use_materialized=False).get_features(rows['asset_id'], as_of)
+    differences = {}
+    for name in FEATURE_NAMES:
+        same = np.isclose(materialized[name], computed[name], rtol=tolerance, atol=tolerance, equal_nan=True)
+        if not same.all():
+            differences[name] = int((~same).sum())
+    return differences
+
+
+@instrumented_main('feature_store')
+def main(argv=None):
+    """Print feature vectors, time cached lookups or validate the materialized vectors."""
+    parser = argparse.ArgumentParser(description='Point-in-time feature vectors.')
+    parser.add_argument('--assets', type=int, nargs='+', help='Asset ids (default: all)')
+    parser.add_argument('--as-of', default=None, help='Timestamp (default: now)')
+    parser.add_argument('--features', nargs='+', choices=FEATURE_NAMES)
+    parser.add_argument('--benchmark', type=int, metavar='N', help='Time lookups of N random asset-timestamps')
+    parser.add_argument('--validate', action='store_true',
+                        help='Compare computed vectors with faliure_probability_base (exit code 1 on differences)')
+    args = parser.parse_args(argv)
+    connection = None
+
+    try:
+        print("Connecting to database...")
+        connection = get_connection()
+
+        if connection.is_connected():
+            print(f"Connected to database: {connection.database}")
+            cursor = connection.cursor()
+            cursor.execute("SELECT asset_id FROM assets ORDER BY asset_id")
+            asset_ids = args.assets or [row[0] for row in cursor.fetchall()]
+            cursor.execute("SELECT MIN(reading_date), MAX(reading_date) FROM faliure_probability_base")
+            min_date, max_date = cursor.fetchone()
+            cursor.close()
+            store = FeatureStore(connection)
+
+            if args.validate:
+                differences = validate_materialized(connection)
+                for name, count in differences.items():
+                    print(f"  {name}: {count} rows differ")
+                if differences:
+                    print("Computed vectors differ from faliure_probability_base")
+                    sys.exit(1)
+                print("Computed vectors match faliure_probability_base")
+                return
+
+            if not args.benchmark:
+                features = store.get_features(asset_ids, args.as_of or pd.Timestamp.now(), args.features)
+                with pd.option_context('display.max_columns', None, 'display.width', 200):
+                    print(features.to_string(index=False))
+                return
+
+            if min_date is None:
+                print("faliure_probability_base is empty: run faliure_probability_dataframe.py first.")
+                return
+            rng = np.random.default_rng(0)
+            lo, hi = pd.Timestamp(min_date), pd.Timestamp(max_date) + pd.Timedelta(days=2)
+            sample_ids = rng.choice(asset_ids, args.benchmark)
+            sample_times = lo + pd.to_timedelta(rng.uniform(0, (hi - lo).total_seconds(), args.benchmark), unit='s')
+            with stage('cold'):
+                started = time.perf_counter()
+                store.get_features(sample_ids, sample_times, args.features)
+                cold = time.perf_counter() - started
+            with stage('cached'):
+                started = time.perf_counter()
+                for _ in range(10):
+                    store.get_features(sample_ids, sample_times, args.features)
+                cached = (time.perf_counter() - started) / 10
+            print(f"{args.benchmark} lookups: {cold * 1000:.1f} ms cold, {cached * 1000:.2f} ms cached")
+
+    except Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+            print("Database connection closed")
+
+
+if __name__ == "__main__":
+    main()
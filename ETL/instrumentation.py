@@ -0,0 +1,486 @@
+"""
+Query Instrumentation and Run Reports for the ETL Scripts
+
+When ETL_METRICS_DIR is set, every cursor handed out by ETL.db is wrapped and
+each statement is recorded under its normalized text (literals and
+placeholders replaced by ?, IN lists and multi-row VALUES collapsed):
+- number of executions, total time (execute + fetch) and latency percentiles
+- rows fetched (SELECT) or affected (DML)
+Scripts also mark their pipeline stages with `stage(name)`, which records wall
+time and the queries issued inside the stage. At the end of the run a report
+<script>_<run_id>.json (and/or .prom in Prometheus text format) is written to
+ETL_METRICS_DIR, and the most expensive statements are printed, so N+1 query
+patterns stand out as statements with thousands of executions.
+
+With ETL_METRICS_DIR unset no cursor is wrapped and stage() only reads the
+clock.
+
+Usage:
+    ETL_METRICS_DIR=metrics python ETL/faliure_probability_dataframe.py
+    ETL_METRICS_FORMAT=both ETL_METRICS_DIR=metrics python ETL/mantainance_cost_calculation.py
+    python ETL/instrumentation.py compare metrics/old.json metrics/new.json --threshold 0.2
+"""
+
+from array import array
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache, wraps
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import numpy as np
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/instrumentation.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL import db
+
+# Directory for run reports (None = instrumentation off)
+ETL_METRICS_DIR = os.getenv('ETL_METRICS_DIR')
+# 'json', 'prometheus' or 'both'
+ETL_METRICS_FORMAT = os.getenv('ETL_METRICS_FORMAT', 'json')
+# Statements printed at the end of an instrumented run
+ETL_METRICS_TOP = int(os.getenv('ETL_METRICS_TOP', 10))
+
+REPORT_VERSION = 1
+
+
+def run_id():
+    """Id of this run: ETL_RUN_ID if set (shared by all stages of a pipeline run), else time + pid."""
+    value = os.getenv('ETL_RUN_ID')
+    if not value:
+        value = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        os.environ['ETL_RUN_ID'] = value
+    return value
+
+
+@lru_cache(maxsize=4096)
+def normalize_sql(sql):
+    """Statement text with literals, placeholders and whitespace normalized."""
+    sql = re.sub(r'--[^\n]*', ' ', sql)
+    sql = re.sub(r"'(?:[^'\\]|\\.|'')*'", '?', sql)
+    sql = re.sub(r'%s|\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'\s+', ' ', sql).strip()
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)+\s*\)', '(?, ...)', sql)
+    sql = re.sub(r'(\(\?, \.\.\.\))(?:\s*,\s*\(\?, \.\.\.\))+', r'\1', sql)
+    return sql
+
+
+def statement_id(normalized):
+    """Short stable id of a normalized statement (comparable between runs)."""
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
+
+class StatementStats:
+    __slots__ = ('count', 'seconds', 'rows', 'latencies')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.latencies = array('d')
+
+
+class QueryRecorder:
+    """Thread-safe per-statement and per-stage accumulator of one run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.statements = {}
+        self.stages = []
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows = 0
+
+    def record(self, sql, seconds, rows):
+        key = normalize_sql(sql)
+        with self._lock:
+            stats = self.statements.get(key)
+            if stats is None:
+                stats = self.statements[key] = StatementStats()
+            stats.count += 1
+            stats.seconds += seconds
+            stats.rows += rows
+            stats.latencies.append(seconds)
+            self.calls += 1
+            self.seconds += seconds
+            self.rows += rows
+
+    def totals(self):
+        with self._lock:
+            return self.calls, self.seconds, self.rows
+
+
+class InstrumentedCursor:
+    """
+    Cursor proxy that times execute/executemany plus the fetches of their
+    results. A SELECT is reported once its result is fetched completely, the
+    next statement starts or the cursor closes.
+    """
+
+    def __init__(self, cursor, recorder):
+        self._cursor = cursor
+        self._recorder = recorder
+        self._pending = None  # [sql, seconds, rows]
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def _flush(self):
+        if self._pending is not None:
+            sql, seconds, rows = self._pending
+            self._pending = None
+            self._recorder.record(sql, seconds, rows)
+
+    def _run(self, method, sql, params):
+        self._flush()
+        started = time.perf_counter()
+        try:
+            result = method(sql, params) if params is not None else method(sql)
+        finally:
+            elapsed = time.perf_counter() - started
+            if self._cursor.description is None:
+                # No result set: complete now
+                self._recorder.record(sql, elapsed, max(self._cursor.rowcount or 0, 0))
+            else:
+                self._pending = [sql, elapsed, 0]
+        return result
+
+    def execute(self, sql, params=None, *args, **kwargs):
+        if args or kwargs:
+            self._flush()
+            return self._cursor.execute(sql, params, *args, **kwargs)
+        return self._run(self._cursor.execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self._run(self._cursor.executemany, sql, seq_of_params)
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        result = method(*args)
+        if self._pending is not None:
+            self._pending[1] += time.perf_counter() - started
+            if result is not None:
+                self._pending[2] += len(result) if isinstance(result, list) else 1
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._fetch(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        result = self._fetch(self._cursor.fetchall)
+        self._flush()
+        return result
+
+    def close(self):
+        self._flush()
+        return self._cursor.close()
+
+
+# Recorder of the current run (None = not instrumented)
+_recorder = None
+_stage_stack = []
+_stage_lock = threading.Lock()
+
+
+def current_stage():
+    """Path of the innermost running stage ('' outside any stage)."""
+    with _stage_lock:
+        return '/'.join(_stage_stack)
+
+
+def enable():
+    """Start recording queries of every cursor handed out by ETL.db."""
+    global _recorder
+    _recorder = QueryRecorder()
+    db.set_cursor_wrapper(lambda cursor: InstrumentedCursor(cursor, _recorder))
+    return _recorder
+
+
+def disable():
+    global _recorder
+    _recorder = None
+    db.set_cursor_wrapper(None)
+
+
+@contextmanager
+def stage(name):
+    """
+    Time a pipeline stage (nested stages are recorded as parent/child). With
+    instrumentation on, the stage also gets its query count and time.
+    """
+    recorder = _recorder
+    with _stage_lock:
+        _stage_stack.append(name)
+        path = '/'.join(_stage_stack)
+    calls, seconds, rows = recorder.totals() if recorder else (0, 0.0, 0)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        with _stage_lock:
+            if _stage_stack and _stage_stack[-1] == name:
+                _stage_stack.pop()
+        if recorder is not None:
+            end_calls, end_seconds, end_rows = recorder.totals()
+            recorder.stages.append({
+                'name': path,
+                'seconds': round(elapsed, 6),
+                'queries': end_calls - calls,
+                'query_seconds': round(end_seconds - seconds, 6),
+                'rows': end_rows - rows,
+            })
+
+
+def _ms(seconds):
+    return round(seconds * 1000.0, 3)
+
+
+def build_report(recorder, script, started_at, wall_seconds, status):
+    """Run report as a JSON-serializable dict (statements sorted by total time)."""
+    statements = []
+    for sql, stats in recorder.statements.items():
+        latencies = np.frombuffer(stats.latencies, dtype=np.float64)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0.0, 0.0, 0.0)
+        statements.append({
+            'id': statement_id(sql),
+            'sql': sql,
+            'count': stats.count,
+            'total_seconds': round(stats.seconds, 6),
+            'mean_ms': _ms(stats.seconds / stats.count),
+            'p50_ms': _ms(p50),
+            'p95_ms': _ms(p95),
+            'p99_ms': _ms(p99),
+            'max_ms': _ms(latencies.max()) if len(latencies) else 0.0,
+            'rows': stats.rows,
+        })
+    statements.sort(key=lambda s: s['total_seconds'], reverse=True)
+    return {
+        'version': REPORT_VERSION,
+        'run_id': run_id(),
+        'script': script,
+        'backend': db.DB_BACKEND,
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'status': status,
+        'wall_seconds': round(wall_seconds, 6),
+        'queries': {
+            'count': recorder.calls,
+            'total_seconds': round(recorder.seconds, 6),
+            'rows': recorder.rows,
+            'distinct_statements': len(statements),
+        },
+        'stages': recorder.stages,
+        'statements': statements,
+    }
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def to_prometheus(report):
+    """Render a run report in Prometheus text exposition format (textfile collector)."""
+    base = f'script="{_label(report["script"])}",run_id="{_label(report["run_id"])}"'
+    lines = [
+        '# HELP etl_run_seconds Wall time of the ETL run.',
+        '# TYPE etl_run_seconds gauge',
+        f'etl_run_seconds{{{base},status="{report["status"]}"}} {report["wall_seconds"]}',
+        '# HELP etl_run_queries Statements executed by the ETL run.',
+        '# TYPE etl_run_queries gauge',
+        f'etl_run_queries{{{base}}} {report["queries"]["count"]}',
+        '# HELP etl_stage_seconds Wall time per pipeline stage.',
+        '# TYPE etl_stage_seconds gauge',
+    ]
+    for stage_report in report['stages']:
+        lines.append(f'etl_stage_seconds{{{base},stage="{_label(stage_report["name"])}"}} {stage_report["seconds"]}')
+    lines += [
+        '# HELP etl_statement_calls Executions per normalized statement.',
+        '# TYPE etl_statement_calls gauge',
+    ]
+    for s in report['statements']:
+        lines.append(f'etl_statement_calls{{{base},statement="{s["id"]}"}} {s["count"]}')
+    lines += [
+        '# HELP etl_statement_seconds Latency per normalized statement.',
+        '# TYPE etl_statement_seconds summary',
+    ]
+    for s in report['statements']:
+        labels = f'{base},statement="{s["id"]}"'
+        for quantile, key in (('0.5', 'p50_ms'), ('0.95', 'p95_ms'), ('0.99', 'p99_ms')):
+            lines.append(f'etl_statement_seconds{{{labels},quantile="{quantile}"}} {round(s[key] / 1000.0, 9)}')
+        lines.append(f'etl_statement_seconds_sum{{{labels}}} {s["total_seconds"]}')
+        lines.append(f'etl_statement_seconds_count{{{labels}}} {s["count"]}')
+    lines += [
+        '# HELP etl_statement_rows Rows fetched or affected per normalized statement.',
+        '# TYPE etl_statement_rows gauge',
+    ]
+    for s in report['statements']:
+        lines.append(f'etl_statement_rows{{{base},statement="{s["id"]}"}} {s["rows"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_report(report, directory=None, output_format=None):
+    """Write the report to <directory>/<script>_<run_id>.json / .prom. Returns the paths."""
+    directory = directory or ETL_METRICS_DIR
+    output_format = output_format or ETL_METRICS_FORMAT
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, f"{report['script']}_{report['run_id']}")
+    paths = []
+    if output_format in ('json', 'both'):
+        with open(stem + '.json', 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        paths.append(stem + '.json')
+    if output_format in ('prometheus', 'both'):
+        with open(stem + '.prom', 'w', encoding='utf-8') as f:
+            f.write(to_prometheus(report))
+        paths.append(stem + '.prom')
+    return paths
+
+
+def print_summary(report, top=ETL_METRICS_TOP):
+    queries = report['queries']
+    print(f"\nQuery metrics: {queries['count']} executions of {queries['distinct_statements']} statements, "
+          f"{queries['total_seconds']:.2f}s in the database of {report['wall_seconds']:.2f}s wall time")
+    for s in report['statements'][:top]:
+        print(f"  {s['total_seconds']:>9.3f}s {s['count']:>8}x p95 {s['p95_ms']:>8.2f}ms "
+              f"{s['rows']:>9} rows  {s['sql'][:90]}")
+    for stage_report in report['stages']:
+        print(f"  stage {stage_report['name']}: {stage_report['seconds']:.2f}s, "
+              f"{stage_report['queries']} queries ({stage_report['query_seconds']:.2f}s)")
+
+
+@contextmanager
+def metrics_run(script, directory=None):
+    """
+    Instrument the enclosed run if ETL_METRICS_DIR (or `directory`) is set and
+    write its report on exit, also when the run fails or calls sys.exit().
+    """
+    directory = directory or ETL_METRICS_DIR
+    if not directory:
+        yield None
+        return
+    recorder = enable()
+    started_at = datetime.now()
+    started = time.perf_counter()
+    status = 'error'
+    try:
+        yield recorder
+        status = 'ok'
+    except SystemExit as e:
+        status = 'ok' if not e.code else 'error'
+        raise
+    finally:
+        disable()
+        report = build_report(recorder, script, started_at, time.perf_counter() - started, status)
+        print_summary(report)
+        for path in write_report(report, directory):
+            print(f"Run report written to {path}")
+
+
+def instrumented_main(script):
+    """
+    Decorator for ETL main() functions: run them inside metrics_run(script)
+    and, with --profile [KINDS] or ETL_PROFILE, under profiling.profile_run
+    (the option is removed from argv / sys.argv before main() parses it).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            argv = args[0] if args else kwargs.get('argv')
+            source = sys.argv[1:] if argv is None else list(argv)
+            kinds = None
+            if os.getenv('ETL_PROFILE') or any(a == '--profile' or a.startswith('--profile=') for a in source):
+                from ETL.profiling import extract_profile_option, profile_run
+                kinds, remaining = extract_profile_option(source)
+                if argv is None:
+                    sys.argv[1:] = remaining
+                elif args:
+                    args = (remaining,) + args[1:]
+                else:
+                    kwargs['argv'] = remaining
+            with metrics_run(script):
+                if not kinds:
+                    return func(*args, **kwargs)
+                with profile_run(script, kinds):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def compare_reports(old, new, threshold=0.2, min_seconds=0.01):
+    """
+    Differences between two run reports of the same script. Returns a list of
+    (kind, name, old_value, new_value, ratio) for stages, statements and the
+    whole run whose time grew by more than `threshold` (ignoring items below
+    `min_seconds`), plus statements that are new.
+    """
+    regressions = []
+
+    def check(kind, name, old_value, new_value):
+        if new_value < min_seconds:
+            return
+        if old_value is None:
+            regressions.append((kind, name, None, new_value, None))
+        elif old_value > 0 and new_value / old_value - 1.0 > threshold:
+            regressions.append((kind, name, old_value, new_value, new_value / old_value))
+
+    check('run', old['script'], old['wall_seconds'], new['wall_seconds'])
+    old_stages = {s['name']: s['seconds'] for s in old['stages']}
+    for s in new['stages']:
+        check('stage', s['name'], old_stages.get(s['name']), s['seconds'])
+    old_statements = {s['id']: s for s in old['statements']}
+    for s in new['statements']:
+        previous = old_statements.get(s['id'])
+        check('statement', s['sql'], previous['total_seconds'] if previous else None, s['total_seconds'])
+    return regressions
+
+
+def main(argv=None):
+    """Show or compare run reports."""
+    parser = argparse.ArgumentParser(description='Show or compare ETL run reports.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    show = subparsers.add_parser('show', help='Print the summary of a run report')
+    show.add_argument('report')
+    show.add_argument('--top', type=int, default=ETL_METRICS_TOP)
+    compare = subparsers.add_parser('compare', help='Flag regressions between two run reports')
+    compare.add_argument('old')
+    compare.add_argument('new')
+    compare.add_argument('--threshold', type=float, default=0.2, help='Relative slowdown flagged (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'show':
+        with open(args.report, encoding='utf-8') as f:
+            print_summary(json.load(f), args.top)
+        return
+
+    with open(args.old, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+    print(f"{old['script']}: {old['run_id']} ({old['wall_seconds']:.2f}s, {old['queries']['count']} queries) -> "
+          f"{new['run_id']} ({new['wall_seconds']:.2f}s, {new['queries']['count']} queries)")
+    regressions = compare_reports(old, new, args.threshold)
+    for kind, name, old_value, new_value, ratio in regressions:
+        if old_value is None:
+            print(f"  NEW   {kind:<9} {new_value:>9.3f}s  {name[:90]}")
+        else:
+            print(f"  SLOWER {kind:<9} {old_value:>9.3f}s -> {new_value:>9.3f}s ({ratio:.2f}x)  {name[:90]}")
+    if any(old_value is not None for _, _, old_value, _, _ in regressions):
+        sys.exit(1)
+    print("No regressions above the threshold")
+
+
+if __name__ == "__main__":
+    main()
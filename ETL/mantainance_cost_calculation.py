@@ -8,26 +8,21 @@ This script calculates maintenance costs for each asset based on:
 - Average monthly/yearly costs
 
 Output: Updates the mantainace_cost table in MySQL
+
+Set ETL_ASYNC=1 to calculate the assets concurrently (ETL/async_exec.py).
 """
 
-import mysql.connector
-from mysql.connector import Error
 from datetime import datetime, timedelta
 import os
-from dotenv import load_dotenv
 import sys
 
-# Load environment variables
-load_dotenv()
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/mantainance_cost_calculation.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Database configuration
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'database': os.getenv('DB_NAME', 'palantir_maintenance'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', ''),
-    'port': int(os.getenv('DB_PORT', 3306))
-}
+from ETL.async_exec import ETL_ASYNC, AsyncRunner
+from ETL.db import Error, get_connection, get_read_connection, read_backend
+from ETL.instrumentation import instrumented_main, stage
 
 
 def calculate_maintenance_costs(asset_id, connection):
@@ -217,6 +212,7 @@ def calculate_maintenance_costs(asset_id, connection):
 def update_maintenance_cost_table(connection):
     """Update the mantainace_cost table with calculated values for all assets."""
     cursor = connection.cursor()
+    read_connection = None
     
     try:
         # Get all assets
@@ -225,9 +221,17 @@ def update_maintenance_cost_table(connection):
         
         updated_count = 0
         
-        for (asset_id,) in assets:
-            result = calculate_maintenance_costs(asset_id, connection)
-            
+        asset_ids = [asset_id for (asset_id,) in assets]
+        if ETL_ASYNC:
+            # Per-asset queries of many assets in flight at once; writes stay sequential and in order
+            with AsyncRunner(backend=read_backend()) as runner:
+                results = runner.map(calculate_maintenance_costs, asset_ids)
+        else:
+            # The per-asset scans go to the read replica while it is fresh
+            read_connection = get_read_connection()
+            results = (calculate_maintenance_costs(asset_id, read_connection) for asset_id in asset_ids)
+        
+        for asset_id, result in zip(asset_ids, results):
             if result:
                 # Insert or update the maintenance cost record
                 cursor.execute("""
@@ -303,21 +307,25 @@ def update_maintenance_cost_table(connection):
         raise
     finally:
         cursor.close()
+        if read_connection is not None:
+            read_connection.close()
 
 
+@instrumented_main('mantainance_cost_calculation')
 def main():
     """Main ETL execution function."""
     connection = None
     
     try:
-        print("Connecting to MySQL database...")
-        connection = mysql.connector.connect(**DB_CONFIG)
+        print("Connecting to database...")
+        connection = get_connection()
         
         if connection.is_connected():
-            print(f"Connected to MySQL database: {DB_CONFIG['database']}")
+            print(f"Connected to database: {connection.database}")
             print("Starting maintenance cost calculation ETL...")
             
-            update_maintenance_cost_table(connection)
+            with stage('update_maintenance_cost'):
+                update_maintenance_cost_table(connection)
             
             print("\nETL process completed successfully!")
             
@@ -330,7 +338,7 @@ def main():
     finally:
         if connection and connection.is_connected():
             connection.close()
-            print("MySQL connection closed")
+            print("Database connection closed")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,105 @@
+"""
+Model Registry for the Predictive Maintenance System
+
+Stores trained artifacts (models, scalers, reference statistics) as versioned
+joblib files under a single directory, with a JSON manifest describing every
+version. The LightGBM training script registers its models here, and the
+feature drift monitor stores the training reference histograms next to them.
+
+Layout:
+    <MODEL_REGISTRY_DIR>/registry.json
+    <MODEL_REGISTRY_DIR>/<artifact_name>/<version>.pkl
+"""
+
+import json
+import os
+from datetime import datetime
+
+import joblib
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Sampling/dev mode (ETL_SAMPLE=1, ETL/sampling.py) keeps its models out of the production registry
+REGISTRY_DIR = os.getenv(
+    'MODEL_REGISTRY_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                 'model_registry_sample' if os.getenv('ETL_SAMPLE', '0') == '1' else 'model_registry')
+)
+MANIFEST_FILE = 'registry.json'
+
+
+def _manifest_path(registry_dir=None):
+    return os.path.join(registry_dir or REGISTRY_DIR, MANIFEST_FILE)
+
+
+def load_manifest(registry_dir=None):
+    """Return the registry manifest as a dict ({} if the registry is empty)."""
+    path = _manifest_path(registry_dir)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_manifest(manifest, registry_dir=None):
+    path = _manifest_path(registry_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, default=str)
+    # Atomic replace so readers never see a half-written manifest
+    os.replace(tmp_path, path)
+
+
+def save_artifact(name, obj, metadata=None, version=None, registry_dir=None):
+    """
+    Save an artifact under a new version and mark it as the latest one.
+
+    Returns the version string.
+    """
+    registry_dir = registry_dir or REGISTRY_DIR
+    version = version or datetime.now().strftime('%Y%m%d%H%M%S%f')
+
+    artifact_dir = os.path.join(registry_dir, name)
+    os.makedirs(artifact_dir, exist_ok=True)
+    file_name = f"{version}.pkl"
+    joblib.dump(obj, os.path.join(artifact_dir, file_name))
+
+    manifest = load_manifest(registry_dir)
+    entry = manifest.setdefault(name, {'latest': None, 'versions': {}})
+    entry['versions'][version] = {
+        'file': os.path.join(name, file_name),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'metadata': metadata or {},
+    }
+    entry['latest'] = version
+    _write_manifest(manifest, registry_dir)
+    return version
+
+
+def get_artifact_metadata(name, version=None, registry_dir=None):
+    """
+    Return the manifest entry of an artifact version (latest by default),
+    including its 'version' key, or None if it is not registered.
+    """
+    entry = load_manifest(registry_dir).get(name)
+    if not entry:
+        return None
+    version = version or entry['latest']
+    info = entry['versions'].get(version)
+    if info is None:
+        return None
+    return dict(info, version=version)
+
+
+def load_artifact(name, version=None, registry_dir=None):
+    """Load an artifact version (latest by default). Returns None if missing."""
+    info = get_artifact_metadata(name, version, registry_dir)
+    if info is None:
+        return None
+    path = os.path.join(registry_dir or REGISTRY_DIR, info['file'])
+    if not os.path.exists(path):
+        return None
+    return joblib.load(path)
@@ -0,0 +1,366 @@
+"""
+Pipeline Orchestrator for the ETL Scripts
+
+Runs the nightly pipeline as a DAG of stages instead of by hand in README
+order:
+
+    rollups    sensor_downsampling        --+
+    anomalies  sensor_anomaly_detection   --+--> features  faliure_probability_dataframe
+    quality    sensor_data_quality        --+      ---> lightgbm  faliure_probability_lightgbm_prediction
+    risk       faliure_probability_calculation
+    cost       mantainance_cost_calculation
+
+A stage starts as soon as its dependencies are done. Each stage runs in its
+own process (python -m ETL.<module>), up to --max-workers at a time. The run
+therefore takes as long as its critical path (sensor stages + features +
+lightgbm), not the sum of all stages.
+
+Before a stage starts, its inputs are fingerprinted from:
+- version queries of the tables it reads (COUNT / MAX of ids and timestamps)
+- a hash of its script and of every ETL module it imports, transitively
+- the environment variables that change its output
+- the contents (file count, size, newest mtime) of the directories it reads,
+  e.g. the columnar sensor store
+- the date, for stages computed relative to today
+A stage whose fingerprint matches its last successful run is skipped, unless
+--force is given or one of its dependencies ran in this run.
+
+Every stage execution is recorded with its timing in etl_stage_runs. All
+stages share ETL_RUN_ID, so their metrics reports and profiles belong to the
+same run. Stage output goes to ETL_PIPELINE_LOG_DIR/<run_id>/<stage>.log.
+
+Usage:
+    python -m ETL run
+    python -m ETL run --force --max-workers 2
+    python -m ETL run --stages risk cost
+    python -m ETL status
+"""
+
+from datetime import date, datetime
+import argparse
+import ast
+import hashlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import time
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/pipeline.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import Error, get_connection
+from ETL.instrumentation import instrumented_main, run_id
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ETL_PIPELINE_LOG_DIR = os.getenv('ETL_PIPELINE_LOG_DIR', 'pipeline_logs')
+POLL_SECONDS = 0.2
+
+# Version query per input table: cheap aggregates that change whenever rows are
+# added, removed or (where the table tracks it) updated
+TABLE_VERSIONS = {
+    'assets': "COUNT(*), MAX(asset_id), MAX(updated_at)",
+    'assets_faliures': "COUNT(*), MAX(failure_id), SUM(resolved), MAX(resolution_date)",
+    'asset_costs': "COUNT(*), MAX(cost_id), SUM(amount)",
+    'mantainance_orders': "COUNT(*), MAX(order_id), MAX(updated_at)",
+    'plc_sensor_readings': "COUNT(*), MIN(reading_timestamp), MAX(reading_timestamp)",
+    'plc_sensor_readings_hourly': "COUNT(*), MAX(bucket_start)",
+    'plc_sensor_readings_daily': "COUNT(*), MAX(bucket_date)",
+    'sensor_anomaly_daily': "COUNT(*), MAX(reading_date), SUM(alarm_count)",
+    'sensor_data_quality': "COUNT(*), MAX(checked_at)",
+    'faliure_probability_base': "COUNT(*), MAX(base_id), MAX(extraction_date)",
+}
+
+
+class Stage:
+    """One pipeline step: an ETL module run as `python -m <module>`."""
+
+    def __init__(self, name, module, inputs, depends_on=(), env=(), directories=(), daily=False):
+        self.name = name
+        self.module = module
+        self.inputs = inputs
+        self.depends_on = depends_on
+        # Environment variables that change the stage's output
+        self.env = env
+        # Environment variables naming directories whose contents the stage reads
+        self.directories = directories
+        # Output depends on today's date (NOW() / CURDATE() windows)
+        self.daily = daily
+
+
+PIPELINE = [
+    Stage('rollups', 'ETL.sensor_downsampling', inputs=('plc_sensor_readings',)),
+    Stage('anomalies', 'ETL.sensor_anomaly_detection', inputs=('assets', 'plc_sensor_readings'),
+          env=('ANOMALY_EWMA_ALPHA', 'ANOMALY_CUSUM_K', 'ANOMALY_CUSUM_H', 'ANOMALY_WARMUP')),
+    Stage('quality', 'ETL.sensor_data_quality', inputs=('assets', 'plc_sensor_readings'),
+          env=('SENSOR_EXPECTED_INTERVAL_MINUTES', 'DQ_GAP_FACTOR', 'DQ_FLATLINE_MIN_READINGS')),
+    Stage('features', 'ETL.faliure_probability_dataframe',
+          inputs=('assets', 'plc_sensor_readings', 'plc_sensor_readings_hourly', 'plc_sensor_readings_daily',
+                  'assets_faliures', 'mantainance_orders', 'sensor_anomaly_daily', 'sensor_data_quality'),
+          depends_on=('rollups', 'anomalies', 'quality'),
+          env=('FEATURE_ENGINE', 'SENSOR_STORE_DIR', 'SENSOR_ROLLUPS'), directories=('SENSOR_STORE_DIR',)),
+    Stage('risk', 'ETL.faliure_probability_calculation',
+          inputs=('assets', 'assets_faliures', 'plc_sensor_readings', 'mantainance_orders'), daily=True),
+    Stage('cost', 'ETL.mantainance_cost_calculation', inputs=('assets', 'asset_costs'), daily=True),
+    Stage('lightgbm', 'ETL.faliure_probability_lightgbm_prediction',
+          inputs=('faliure_probability_base',), depends_on=('features',), env=('RETRAIN_POLICY',)),
+]
+
+
+def _module_path(module):
+    return importlib.util.find_spec(module).origin
+
+
+def _etl_imports(path):
+    """ETL modules imported anywhere in a file, including imports inside functions."""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [f"ETL.{alias.name}" for alias in node.names] if node.module == 'ETL' else [node.module]
+        elif isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        else:
+            continue
+        modules.update(name for name in names if name.startswith('ETL.') and importlib.util.find_spec(name))
+    return modules
+
+
+def code_hash(module):
+    """sha1 over a module and every ETL module it imports, transitively."""
+    seen, todo = set(), [module]
+    while todo:
+        name = todo.pop()
+        if name not in seen:
+            seen.add(name)
+            todo.extend(_etl_imports(_module_path(name)))
+    digest = hashlib.sha1()
+    for name in sorted(seen):
+        with open(_module_path(name), 'rb') as f:
+            digest.update(name.encode('utf-8') + b'\0' + f.read())
+    return digest.hexdigest()
+
+
+def directory_version(path):
+    """File count, total size and newest mtime under `path` (None when unset or missing)."""
+    if not path or not os.path.isdir(path):
+        return None
+    count = size = newest = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            stat = os.stat(os.path.join(root, name))
+            count += 1
+            size += stat.st_size
+            newest = max(newest, stat.st_mtime_ns)
+    return [count, size, newest]
+
+
+def table_version(cursor, table):
+    try:
+        cursor.execute(f"SELECT {TABLE_VERSIONS[table]} FROM {table}")
+        return [str(value) for value in cursor.fetchone()]
+    except Error:
+        return 'missing'
+
+
+def input_fingerprint(connection, stage):
+    """sha1 over the stage's input table versions, code, environment, directories and (daily stages) date."""
+    # End the previous transaction so the versions reflect stages finished since
+    connection.commit()
+    cursor = connection.cursor()
+    try:
+        state = {
+            'tables': {table: table_version(cursor, table) for table in stage.inputs},
+            'code': code_hash(stage.module),
+            'env': {name: os.getenv(name) for name in stage.env},
+            'directories': {name: directory_version(os.getenv(name)) for name in stage.directories},
+            'date': date.today().isoformat() if stage.daily else None,
+        }
+    finally:
+        cursor.close()
+    return hashlib.sha1(json.dumps(state, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def last_fingerprint(connection, stage_name):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT input_fingerprint FROM etl_stage_runs
+            WHERE stage_name = %s AND status = 'ok'
+            ORDER BY stage_run_id DESC LIMIT 1
+        """, (stage_name,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    finally:
+        cursor.close()
+
+
+def record_stage_run(connection, run, stage_name, status, fingerprint, started_at, seconds, message=None):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO etl_stage_runs
+            (run_id, stage_name, status, input_fingerprint, started_at, finished_at, duration_seconds, message)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, (run, stage_name, status, fingerprint, started_at, datetime.now(), round(seconds, 3),
+              message[:500] if message else None))
+        connection.commit()
+    finally:
+        cursor.close()
+
+
+def _log_tail(path, lines=10):
+    with open(path, encoding='utf-8', errors='replace') as f:
+        return ''.join(f.readlines()[-lines:])
+
+
+def run_pipeline(connection, stages, force=False, max_workers=None, log_dir=ETL_PIPELINE_LOG_DIR):
+    """
+    Run `stages` respecting their dependencies (dependencies outside
+    `stages` count as done). Returns {stage: (status, seconds)} with status
+    'ok', 'skipped', 'error' or 'blocked' (a dependency failed).
+    """
+    run = run_id()
+    log_dir = os.path.join(log_dir, run)
+    os.makedirs(log_dir, exist_ok=True)
+    max_workers = max_workers or len(stages)
+    selected = {stage.name for stage in stages}
+    pending = {stage.name: stage for stage in stages}
+    running = {}
+    results = {}
+
+    def deps_done(stage):
+        return all(dep not in selected or results.get(dep, ('',))[0] in ('ok', 'skipped')
+                   for dep in stage.depends_on)
+
+    while pending or running:
+        for name, stage in list(pending.items()):
+            if any(results.get(dep, ('',))[0] in ('error', 'blocked') for dep in stage.depends_on):
+                del pending[name]
+                results[name] = ('blocked', 0.0)
+                record_stage_run(connection, run, name, 'blocked', None, datetime.now(), 0.0,
+                                 'a dependency failed')
+                print(f"[{name}] blocked: a dependency failed")
+
+        for name, stage in list(pending.items()):
+            if len(running) >= max_workers or not deps_done(stage):
+                continue
+            del pending[name]
+            fingerprint = input_fingerprint(connection, stage)
+            deps_ran = any(results.get(dep, ('',))[0] == 'ok' for dep in stage.depends_on)
+            if not force and not deps_ran and last_fingerprint(connection, name) == fingerprint:
+                results[name] = ('skipped', 0.0)
+                record_stage_run(connection, run, name, 'skipped', fingerprint, datetime.now(), 0.0,
+                                 'inputs unchanged since the last successful run')
+                print(f"[{name}] skipped: inputs unchanged since the last successful run")
+                continue
+            log_path = os.path.join(log_dir, f"{name}.log")
+            log = open(log_path, 'w', encoding='utf-8')
+            process = subprocess.Popen([sys.executable, '-m', stage.module], cwd=ROOT,
+                                       stdout=log, stderr=subprocess.STDOUT)
+            running[name] = (process, log, log_path, fingerprint, datetime.now(), time.perf_counter())
+            print(f"[{name}] started (log: {log_path})")
+
+        finished = False
+        for name, (process, log, log_path, fingerprint, started_at, started) in list(running.items()):
+            code = process.poll()
+            if code is None:
+                continue
+            finished = True
+            del running[name]
+            log.close()
+            seconds = time.perf_counter() - started
+            status = 'ok' if code == 0 else 'error'
+            results[name] = (status, seconds)
+            record_stage_run(connection, run, name, status, fingerprint, started_at, seconds,
+                             None if code == 0 else f"exit code {code}")
+            print(f"[{name}] {'finished' if code == 0 else f'FAILED (exit code {code})'} in {seconds:.1f}s")
+            if code != 0:
+                print(_log_tail(log_path))
+
+        if running and not finished:
+            time.sleep(POLL_SECONDS)
+    return results
+
+
+def print_status(connection):
+    """Latest execution of every stage."""
+    cursor = connection.cursor(dictionary=True)
+    try:
+        print(f"{'stage':<10} {'status':<8} {'finished':<20} {'seconds':>9}  run")
+        for stage in PIPELINE:
+            cursor.execute("""
+                SELECT run_id, status, finished_at, duration_seconds FROM etl_stage_runs
+                WHERE stage_name = %s ORDER BY stage_run_id DESC LIMIT 1
+            """, (stage.name,))
+            row = cursor.fetchone()
+            if row is None:
+                print(f"{stage.name:<10} {'never':<8}")
+                continue
+            print(f"{stage.name:<10} {row['status']:<8} {str(row['finished_at'])[:19]:<20} "
+                  f"{float(row['duration_seconds']):>9.1f}  {row['run_id']}")
+    finally:
+        cursor.close()
+
+
+@instrumented_main('pipeline')
+def main(argv=None):
+    """Run the pipeline DAG or show the last run of each stage."""
+    stage_names = [stage.name for stage in PIPELINE]
+    parser = argparse.ArgumentParser(prog='python -m ETL', description='Run the ETL pipeline as a DAG of stages.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='Run the pipeline')
+    run_parser.add_argument('--stages', nargs='+', choices=stage_names, default=stage_names,
+                            help='Run only these stages (dependencies outside the selection count as done)')
+    run_parser.add_argument('--force', action='store_true', help='Run stages even when their inputs are unchanged')
+    run_parser.add_argument('--max-workers', type=int, default=None, help='Concurrent stage processes')
+    run_parser.add_argument('--log-dir', default=ETL_PIPELINE_LOG_DIR)
+    subparsers.add_parser('status', help='Show the last run of each stage')
+    args = parser.parse_args(argv)
+    connection = None
+    failed = False
+
+    try:
+        print("Connecting to database...")
+        connection = get_connection()
+
+        if connection.is_connected():
+            print(f"Connected to database: {connection.database}")
+            if args.command == 'status':
+                print_status(connection)
+                return
+
+            stages = [stage for stage in PIPELINE if stage.name in args.stages]
+            print(f"Pipeline run {run_id()}: {', '.join(stage.name for stage in stages)}\n")
+            started = time.perf_counter()
+            results = run_pipeline(connection, stages, args.force, args.max_workers, args.log_dir)
+            wall_seconds = time.perf_counter() - started
+
+            print(f"\n{'stage':<10} {'status':<8} {'seconds':>9}")
+            for stage in stages:
+                status, seconds = results[stage.name]
+                print(f"{stage.name:<10} {status:<8} {seconds:>9.1f}")
+            print(f"\nWall time {wall_seconds:.1f}s for {sum(seconds for _, seconds in results.values()):.1f}s of stages")
+            failed = any(status in ('error', 'blocked') for status, _ in results.values())
+
+    except Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+            print("Database connection closed")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
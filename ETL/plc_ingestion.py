@@ -0,0 +1,428 @@
+"""
+PLC Sensor Reading Ingestion Service
+
+Asyncio pipeline that moves readings from a pluggable source into
+plc_sensor_readings with batched inserts:
+- A producer task reads from the source into a bounded queue; when the queue
+  is full the producer waits (backpressure) instead of buffering without limit.
+- A consumer task buffers readings per asset and flushes all buffers in one
+  large multi-row INSERT when the batch size or the flush interval is reached.
+- Delivery is at-least-once: the source is only acknowledged (checkpointed)
+  after the batch is committed, and failed flushes are retried with the same
+  rows. A restart replays anything that was not acknowledged.
+
+Sources:
+- SimulatedPLCSource: synthetic fleet with the same sensor set and base values
+  as deployment/02_insert_sample_data.sql
+- FileReplaySource: replays a CSV export (with resumable checkpoint)
+
+Reading status is assigned by the threshold alarm engine
+(ETL/sensor_alarm_engine.py) just before each batch is written; --no-alarms
+keeps the status delivered by the source.
+
+Sinks: plc_sensor_readings (wide) or the normalized sensors / sensor_readings
+schema of deployment/03_sensor_fact_schema.sql (narrow). Without --sink, narrow
+is used once ETL/sensor_fact_migration.py has swapped plc_sensor_readings for
+its read-only compatibility view, wide otherwise.
+
+Usage:
+    python ETL/plc_ingestion.py --source simulated --assets 8 --days 1
+    python ETL/plc_ingestion.py --source file --path readings.csv
+"""
+
+from datetime import datetime, timedelta
+import argparse
+import asyncio
+import csv
+import os
+import random
+import sys
+import time
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/plc_ingestion.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import Error, get_connection
+from ETL.instrumentation import instrumented_main
+from ETL.sensor_alarm_engine import AlarmEngine, load_asset_types
+from ETL.sensor_fact_migration import readings_layout
+
+# Column order of every reading tuple handled by the pipeline
+READING_COLUMNS = (
+    'asset_id', 'sensor_name', 'sensor_type', 'reading_value', 'unit',
+    'reading_timestamp', 'status'
+)
+
+INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', 50000))
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 5000))
+INGEST_FLUSH_INTERVAL = float(os.getenv('INGEST_FLUSH_INTERVAL', 1.0))
+INGEST_MAX_RETRIES = int(os.getenv('INGEST_MAX_RETRIES', 5))
+
+# Sensors of the sample fleet: (sensor_name, sensor_type, unit)
+PLC_SENSORS = [
+    ('Vibration Sensor', 'vibration', 'mm/s'),
+    ('RPM Sensor', 'rpm', 'rpm'),
+    ('Power Sensor', 'power', 'kW'),
+    ('Current Sensor', 'current', 'A'),
+    ('Pressure Sensor', 'pressure', 'bar'),
+    ('Flow Sensor', 'flow', 'L/min'),
+]
+
+
+# ---------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------
+
+class SimulatedPLCSource:
+    """
+    Simulated PLC feed: every `interval_hours` each asset publishes one reading
+    per sensor. Assets cycle through the 8 sample profiles (profiles 1-4 are
+    pumps, 5-8 motors with pressure and flow at 0), mirroring the sample data
+    generator.
+    """
+
+    def __init__(self, n_assets=8, start=datetime(2022, 1, 1), days=1,
+                 interval_hours=6, seed=42, first_asset_id=1):
+        self.n_assets = n_assets
+        self.start = start
+        self.days = days
+        self.interval_hours = interval_hours
+        self.first_asset_id = first_asset_id
+        self.rng = random.Random(seed)
+
+    def _sample(self, profile, is_pump, sensor_type):
+        rnd = self.rng.random
+        if sensor_type == 'vibration':
+            return 1.5 + profile * 0.2 + (rnd() * 1.5 - 0.75)
+        if sensor_type == 'rpm':
+            return 1450.0 + profile * 50 + (rnd() * 100 - 50)
+        if sensor_type == 'power':
+            base = 15.0 + profile * 2 if is_pump else 11.0 + (profile - 4) * 1.5
+            return base + (rnd() * 4 - 2)
+        if sensor_type == 'current':
+            return 22.0 + profile * 1.5 + (rnd() * 6 - 3)
+        if sensor_type == 'pressure':
+            return 4.0 + profile * 0.3 + (rnd() * 1.0 - 0.5) if is_pump else 0.0
+        if sensor_type == 'flow':
+            return 80.0 + profile * 15 + (rnd() * 20 - 10) if is_pump else 0.0
+        return 0.0
+
+    async def readings(self):
+        """Yield (sequence, reading) tuples."""
+        steps = int(self.days * 24 / self.interval_hours)
+        seq = 0
+        for step in range(steps):
+            timestamp = self.start + timedelta(hours=step * self.interval_hours)
+            for offset in range(self.n_assets):
+                asset_id = self.first_asset_id + offset
+                profile = (asset_id - 1) % 8 + 1
+                is_pump = profile <= 4
+                for sensor_name, sensor_type, unit in PLC_SENSORS:
+                    value = round(self._sample(profile, is_pump, sensor_type), 4)
+                    seq += 1
+                    yield seq, (asset_id, sensor_name, sensor_type, value, unit, timestamp, 'normal')
+            # Let the consumer run between PLC scan cycles
+            await asyncio.sleep(0)
+
+    def acknowledge(self, sequence):
+        """Simulated readings cannot be replayed; nothing to checkpoint."""
+
+
+class FileReplaySource:
+    """
+    Replays readings from a CSV file with a header containing READING_COLUMNS
+    (status is optional). The last acknowledged line is stored in
+    `<path>.checkpoint`, so a restarted replay resumes after it.
+    """
+
+    def __init__(self, path, checkpoint_path=None):
+        self.path = path
+        self.checkpoint_path = checkpoint_path or f"{path}.checkpoint"
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+        return int(content) if content else 0
+
+    async def readings(self):
+        """Yield (line_number, reading) tuples after the last checkpoint."""
+        skip = self._load_checkpoint()
+        with open(self.path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            for line_number, row in enumerate(reader, start=1):
+                if line_number <= skip:
+                    continue
+                yield line_number, (
+                    int(row['asset_id']),
+                    row['sensor_name'],
+                    row['sensor_type'],
+                    float(row['reading_value']),
+                    row['unit'],
+                    datetime.fromisoformat(row['reading_timestamp']),
+                    row.get('status') or 'normal',
+                )
+                if line_number % 1000 == 0:
+                    await asyncio.sleep(0)
+
+    def acknowledge(self, sequence):
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(str(sequence))
+        os.replace(tmp_path, self.checkpoint_path)
+
+
+# ---------------------------------------------------------------------------
+# Sinks
+# ---------------------------------------------------------------------------
+
+class MySQLReadingSink:
+    """Writes batches to plc_sensor_readings with one multi-row INSERT per batch."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def write_batch(self, rows):
+        cursor = self.connection.cursor()
+        try:
+            # mysql.connector rewrites executemany INSERTs into a multi-row INSERT
+            cursor.executemany(f"""
+                INSERT INTO plc_sensor_readings
+                ({', '.join(READING_COLUMNS)})
+                VALUES ({', '.join(['%s'] * len(READING_COLUMNS))})
+            """, rows)
+            self.connection.commit()
+        except Error:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+class NarrowReadingSink:
+    """
+    Writes batches to the normalized sensor_readings fact table
+    (deployment/03_sensor_fact_schema.sql). Re-delivered readings overwrite the
+    same (sensor_id, ts) row, so at-least-once delivery stays idempotent.
+    """
+
+    STATUS_CODES = {'normal': 0, 'warning': 1, 'critical': 2}
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.sensor_ids = {}
+
+    def _resolve_sensors(self, cursor, rows):
+        missing = {(r[0], r[2], r[1]): r[4] for r in rows if (r[0], r[2], r[1]) not in self.sensor_ids}
+        if not missing:
+            return
+        cursor.executemany("""
+            INSERT IGNORE INTO sensors (asset_id, sensor_type, sensor_name, unit)
+            VALUES (%s, %s, %s, %s)
+        """, [key + (unit,) for key, unit in missing.items()])
+        cursor.execute("SELECT asset_id, sensor_type, sensor_name, sensor_id FROM sensors")
+        self.sensor_ids = {(a, t, n): sensor_id for a, t, n, sensor_id in cursor.fetchall()}
+
+    def write_batch(self, rows):
+        cursor = self.connection.cursor()
+        try:
+            self._resolve_sensors(cursor, rows)
+            cursor.executemany("""
+                INSERT INTO sensor_readings (sensor_id, ts, value, status)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE value = VALUES(value), status = VALUES(status)
+            """, [
+                (self.sensor_ids[(r[0], r[2], r[1])], r[5], r[3], self.STATUS_CODES.get(r[6], 0))
+                for r in rows
+            ])
+            self.connection.commit()
+        except Error:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+class NullSink:
+    """Discards batches; used to benchmark the pipeline without a database."""
+
+    def __init__(self):
+        self.rows_written = 0
+
+    def write_batch(self, rows):
+        self.rows_written += len(rows)
+
+
+# ---------------------------------------------------------------------------
+# Service
+# ---------------------------------------------------------------------------
+
+class IngestionService:
+    """Bounded-queue producer/consumer moving readings from a source to a sink."""
+
+    def __init__(self, source, sink, queue_size=INGEST_QUEUE_SIZE,
+                 batch_size=INGEST_BATCH_SIZE, flush_interval=INGEST_FLUSH_INTERVAL,
+                 max_retries=INGEST_MAX_RETRIES, alarm_engine=None):
+        self.source = source
+        self.sink = sink
+        self.alarm_engine = alarm_engine
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.buffers = {}
+        self.buffered = 0
+        self.last_sequence = 0
+        self.stats = {'readings': 0, 'batches': 0, 'retries': 0, 'producer_waits': 0}
+
+    async def _produce(self, queue):
+        async for item in self.source.readings():
+            if queue.full():
+                self.stats['producer_waits'] += 1
+            await queue.put(item)
+        await queue.put(None)
+
+    async def _flush(self):
+        if not self.buffered:
+            return
+        # Group rows by asset so each batch appends contiguous (asset, time) ranges
+        rows = [row for asset_id in sorted(self.buffers) for row in self.buffers[asset_id]]
+        if self.alarm_engine is not None:
+            rows = self.alarm_engine.classify(rows)
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            try:
+                await loop.run_in_executor(None, self.sink.write_batch, rows)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                self.stats['retries'] += 1
+                print(f"Flush failed ({e}); retrying batch of {len(rows)} readings...")
+                await asyncio.sleep(min(0.1 * 2 ** attempt, 5.0))
+        # Acknowledge only after the batch is durable (at-least-once)
+        self.source.acknowledge(self.last_sequence)
+        self.stats['readings'] += len(rows)
+        self.stats['batches'] += 1
+        self.buffers = {}
+        self.buffered = 0
+
+    async def _consume(self, queue):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                # Only arm a timer when there is nothing to drain
+                try:
+                    timeout = max(self.flush_interval - (time.monotonic() - last_flush), 0.001)
+                    item = await asyncio.wait_for(queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    item = False
+
+            if item is None:
+                await self._flush()
+                return
+            if item:
+                sequence, reading = item
+                self.buffers.setdefault(reading[0], []).append(reading)
+                self.buffered += 1
+                self.last_sequence = sequence
+
+            if (self.buffered >= self.batch_size
+                    or time.monotonic() - last_flush >= self.flush_interval):
+                await self._flush()
+                last_flush = time.monotonic()
+
+    async def run(self):
+        """Run until the source is exhausted. Returns the statistics dict."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        started = time.perf_counter()
+        producer = asyncio.create_task(self._produce(queue))
+        try:
+            await self._consume(queue)
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+        elapsed = time.perf_counter() - started
+        self.stats['elapsed_seconds'] = round(elapsed, 3)
+        self.stats['readings_per_second'] = round(self.stats['readings'] / elapsed, 1) if elapsed else 0.0
+        return self.stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Ingest PLC sensor readings into plc_sensor_readings.')
+    parser.add_argument('--source', choices=['simulated', 'file'], default='simulated')
+    parser.add_argument('--path', help='CSV file to replay (--source file)')
+    parser.add_argument('--sink', choices=['wide', 'narrow'],
+                        help='plc_sensor_readings (wide) or sensors/sensor_readings (narrow); '
+                             'default: narrow once plc_sensor_readings is the migration view')
+    parser.add_argument('--assets', type=int, default=8, help='Simulated fleet size')
+    parser.add_argument('--days', type=float, default=1, help='Simulated days of readings')
+    parser.add_argument('--start', default='2022-01-01', help='Simulated start date (YYYY-MM-DD)')
+    parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument('--queue-size', type=int, default=INGEST_QUEUE_SIZE)
+    parser.add_argument('--no-alarms', action='store_true',
+                        help='Keep the source status instead of classifying readings')
+    return parser.parse_args(argv)
+
+
+@instrumented_main('plc_ingestion')
+def main(argv=None):
+    """Main ingestion execution function."""
+    args = parse_args(argv)
+    connection = None
+
+    if args.source == 'file':
+        if not args.path:
+            print("--path is required with --source file")
+            sys.exit(2)
+        source = FileReplaySource(args.path)
+    else:
+        source = SimulatedPLCSource(n_assets=args.assets, days=args.days,
+                                    start=datetime.fromisoformat(args.start))
+
+    try:
+        print("Connecting to database...")
+        connection = get_connection()
+
+        if connection.is_connected():
+            print(f"Connected to database: {connection.database}")
+            print("Starting PLC reading ingestion...")
+
+            layout = readings_layout(connection)
+            if args.sink == 'wide' and layout == 'narrow':
+                print("plc_sensor_readings is the read-only compatibility view of "
+                      "sensor_readings (sensor_fact_migration.py swap); use --sink narrow")
+                sys.exit(2)
+            sink_name = args.sink or layout
+            print(f"Sink: {sink_name}")
+
+            sink = NarrowReadingSink(connection) if sink_name == 'narrow' else MySQLReadingSink(connection)
+            alarm_engine = None if args.no_alarms else AlarmEngine(load_asset_types(connection))
+            service = IngestionService(source, sink, queue_size=args.queue_size,
+                                       batch_size=args.batch_size, alarm_engine=alarm_engine)
+            stats = asyncio.run(service.run())
+
+            print(f"\nIngested {stats['readings']} readings in {stats['batches']} batches "
+                  f"({stats['readings_per_second']:.0f} readings/s, {stats['retries']} retries)")
+
+    except Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+            print("Database connection closed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Profiling Hooks for the ETL Entry Points
+
+Every ETL main() (decorated with instrumentation.instrumented_main) accepts
+`--profile [KINDS]` or the ETL_PROFILE environment variable, where KINDS is a
+comma-separated subset of:
+- cpu:    cProfile of the whole run -> <name>.pstats plus <name>.cpu.txt
+          (top functions by cumulative time)
+- memory: tracemalloc peak / current size and the top allocation sites
+          -> <name>.memory.json
+- flame:  wall-clock stack sampling (ETL_PROFILE_INTERVAL_MS) in collapsed
+          stack format -> <name>.folded, with the pipeline stage
+          (instrumentation.stage) as the root frame, so each stage gets its own
+          tower in flamegraph.pl / speedscope and time blocked on the database
+          shows up as well
+`--profile` without KINDS means cpu,memory. Files go to ETL_PROFILE_DIR as
+<script>_<run_id>.*, with the same run id as the query metrics report.
+Frames are keyed by function (file:first line), so files of different runs
+can be compared with `python ETL/profiling.py compare`.
+
+Without the option nothing is imported or started.
+
+Usage:
+    python ETL/faliure_probability_dataframe.py --profile
+    python ETL/sensor_data_quality.py --profile cpu,memory,flame --start 2022-06-01
+    ETL_PROFILE=flame python ETL/mantainance_cost_calculation.py
+    python ETL/profiling.py compare profiles/<old>.pstats profiles/<new>.pstats
+"""
+
+from contextlib import contextmanager
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/profiling.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.instrumentation import current_stage, run_id
+
+PROFILE_KINDS = ('cpu', 'memory', 'flame')
+DEFAULT_PROFILE_KINDS = ('cpu', 'memory')
+ETL_PROFILE_DIR = os.getenv('ETL_PROFILE_DIR', 'profiles')
+ETL_PROFILE_INTERVAL_MS = float(os.getenv('ETL_PROFILE_INTERVAL_MS', 5))
+ETL_PROFILE_TOP = int(os.getenv('ETL_PROFILE_TOP', 25))
+# Stack depth recorded per allocation (1 = allocation line only, cheapest)
+ETL_PROFILE_MEMORY_FRAMES = int(os.getenv('ETL_PROFILE_MEMORY_FRAMES', 1))
+
+
+def parse_kinds(value):
+    """'cpu,flame' -> ('cpu', 'flame'); empty -> the default kinds."""
+    kinds = tuple(k.strip() for k in (value or '').split(',') if k.strip()) or DEFAULT_PROFILE_KINDS
+    unknown = set(kinds) - set(PROFILE_KINDS)
+    if unknown:
+        raise ValueError(f"Unknown profile kinds {sorted(unknown)} (expected {', '.join(PROFILE_KINDS)})")
+    return kinds
+
+
+def extract_profile_option(argv):
+    """
+    Remove --profile [KINDS] / --profile=KINDS from argv. Returns
+    (kinds or None, remaining argv); ETL_PROFILE applies when the option is absent.
+    """
+    remaining, kinds, i = [], None, 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == '--profile':
+            following = argv[i + 1] if i + 1 < len(argv) else ''
+            if following and not following.startswith('-') and set(following.split(',')) <= set(PROFILE_KINDS):
+                kinds = parse_kinds(following)
+                i += 1
+            else:
+                kinds = DEFAULT_PROFILE_KINDS
+        elif arg.startswith('--profile='):
+            kinds = parse_kinds(arg.split('=', 1)[1])
+        else:
+            remaining.append(arg)
+        i += 1
+    if kinds is None and os.getenv('ETL_PROFILE'):
+        kinds = parse_kinds(os.getenv('ETL_PROFILE'))
+    return kinds, remaining
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread every `interval_ms` from a daemon thread
+    and counts collapsed stacks: 'root;stage;outer (file:line);...;inner'.
+    """
+
+    def __init__(self, root, thread_id=None, interval_ms=ETL_PROFILE_INTERVAL_MS):
+        self.root = root
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval_ms / 1000.0
+        self.counts = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='etl-stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None or self.thread_id == own:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            labels.reverse()
+            stage = current_stage()
+            key = ';'.join([self.root] + (stage.split('/') if stage else ['(no stage)']) + labels)
+            self.counts[key] = self.counts.get(key, 0) + 1
+            self.samples += 1
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+
+def _write_cpu(profiler, stem):
+    profiler.dump_stats(stem + '.pstats')
+    text = io.StringIO()
+    stats = pstats.Stats(profiler, stream=text)
+    stats.sort_stats('cumulative').print_stats(ETL_PROFILE_TOP)
+    stats.sort_stats('tottime').print_stats(ETL_PROFILE_TOP)
+    with open(stem + '.cpu.txt', 'w', encoding='utf-8') as f:
+        f.write(text.getvalue())
+    return [stem + '.pstats', stem + '.cpu.txt']
+
+
+def _write_memory(snapshot, current, peak, stem):
+    top = []
+    for stat in snapshot.statistics('lineno')[:ETL_PROFILE_TOP]:
+        frame = stat.traceback[0]
+        top.append({'location': f"{frame.filename}:{frame.lineno}", 'size_bytes': stat.size, 'count': stat.count})
+    with open(stem + '.memory.json', 'w', encoding='utf-8') as f:
+        json.dump({'peak_bytes': peak, 'current_bytes': current, 'top_allocations': top}, f, indent=2)
+    return [stem + '.memory.json']
+
+
+@contextmanager
+def profile_run(script, kinds, directory=None):
+    """Profile the enclosed run with the given kinds and write the outputs on exit."""
+    directory = directory or ETL_PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, f"{script}_{run_id()}")
+
+    profiler = sampler = None
+    if 'memory' in kinds:
+        tracemalloc.start(ETL_PROFILE_MEMORY_FRAMES)
+    if 'flame' in kinds:
+        sampler = StackSampler(script)
+        sampler.start()
+    if 'cpu' in kinds:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if profiler is not None:
+            profiler.disable()
+        if sampler is not None:
+            sampler.stop()
+        paths = []
+        if profiler is not None:
+            paths += _write_cpu(profiler, stem)
+        if sampler is not None:
+            sampler.write(stem + '.folded')
+            paths.append(stem + '.folded')
+        if 'memory' in kinds:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            paths += _write_memory(snapshot, current, peak, stem)
+            print(f"\nPeak traced memory: {peak / 1e6:.1f} MB")
+        print(f"Profiled {script} ({', '.join(kinds)}) for {elapsed:.2f}s")
+        for path in paths:
+            print(f"Profile written to {path}")
+
+
+def _function_times(path):
+    stats = pstats.Stats(path)
+    return {
+        f"{func[2]} ({os.path.basename(func[0])}:{func[1]})": (tottime, cumtime)
+        for func, (_, _, tottime, cumtime, _) in stats.stats.items()
+    }
+
+
+def main(argv=None):
+    """Compare two profiles of the same script."""
+    parser = argparse.ArgumentParser(description='Compare ETL profiles of two runs.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compare = subparsers.add_parser('compare', help='Functions (.pstats) or peak memory (.memory.json) that changed most')
+    compare.add_argument('old')
+    compare.add_argument('new')
+    compare.add_argument('--top', type=int, default=ETL_PROFILE_TOP)
+    args = parser.parse_args(argv)
+
+    if args.old.endswith('.json'):
+        with open(args.old, encoding='utf-8') as f:
+            old = json.load(f)
+        with open(args.new, encoding='utf-8') as f:
+            new = json.load(f)
+        print(f"Peak memory: {old['peak_bytes'] / 1e6:.1f} MB -> {new['peak_bytes'] / 1e6:.1f} MB")
+        old_sites = {a['location']: a['size_bytes'] for a in old['top_allocations']}
+        for allocation in new['top_allocations'][:args.top]:
+            before = old_sites.get(allocation['location'], 0)
+            print(f"  {before / 1e6:>9.2f} MB -> {allocation['size_bytes'] / 1e6:>9.2f} MB  {allocation['location']}")
+        return
+
+    old, new = _function_times(args.old), _function_times(args.new)
+    changes = sorted(
+        ((new.get(name, (0.0, 0.0))[0] - old.get(name, (0.0, 0.0))[0], name) for name in set(old) | set(new)),
+        key=lambda item: abs(item[0]), reverse=True,
+    )
+    print(f"{'delta tottime':>14} {'old':>9} {'new':>9}  function")
+    for delta, name in changes[:args.top]:
+        print(f"{delta:>+13.3f}s {old.get(name, (0.0,))[0]:>8.3f}s {new.get(name, (0.0,))[0]:>8.3f}s  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Sampling / Dev Mode for Fast ETL Iteration
+
+Builds a scratch sample database (DB_SAMPLE_NAME on the MySQL server, or
+SQLITE_SAMPLE_PATH with DB_BACKEND=sqlite) from production:
+- a subset of assets, stratified by asset_type and failure history (assets
+  with and without failures), drawn deterministically from --seed
+- their sensor data only for the date window (plus the 30-day feature
+  lookback before it and the 7-day failure label horizon after it); their
+  assets, failures, costs, orders and reference tables in full
+- every output table (features, predictions, costs, stage runs, ...) empty
+
+With ETL_SAMPLE=1 every ETL stage and the trainer then run unchanged on the
+sample: ETL/db.py points all connections at the scratch database, the
+feature extraction covers just the sample window, and models go to
+model_registry_sample/. Production tables and models are never written.
+
+Note that the risk and cost scripts look back from today, so they only see
+sensor readings if the window reaches today.
+
+Usage:
+    python ETL/sampling.py build --assets 20 --start 2022-06-01 --end 2022-08-31 --seed 7
+    python ETL/sampling.py show
+    ETL_SAMPLE=1 python ETL/faliure_probability_dataframe.py
+    ETL_SAMPLE=1 python -m ETL run --force
+"""
+
+from datetime import date, timedelta
+import argparse
+import os
+import sys
+
+import numpy as np
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/sampling.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL import db
+from ETL.db import DB_CONFIG, DB_SAMPLE_NAME, Error, get_connection, get_read_connection
+from ETL.instrumentation import instrumented_main
+
+# Days of sensor data copied before the window (30-day feature averages) and after it (7-day label)
+SAMPLE_LOOKBACK_DAYS = 30
+SAMPLE_HORIZON_DAYS = 7
+SAMPLE_COPY_BATCH = 5000
+
+# Input tables copied into the sample, in foreign key order: (table, WHERE on the
+# sampled assets or None for the whole table, column limited to the window or None)
+SAMPLE_TABLES = [
+    ('mantainance_employees', None, None),
+    ('mantainance_employees_education', None, None),
+    ('assets', "asset_id IN ({assets})", None),
+    ('asset_value', "asset_id IN ({assets})", None),
+    ('asset_costs', "asset_id IN ({assets})", None),
+    ('assets_faliures', "asset_id IN ({assets})", None),
+    ('mantainance_orders', "asset_id IN ({assets})", None),
+    ('mantainance_tasks', "order_id IN (SELECT order_id FROM mantainance_orders WHERE asset_id IN ({assets}))", None),
+    ('plc_sensor_readings', "asset_id IN ({assets})", 'reading_timestamp'),
+    ('plc_sensor_readings_hourly', "asset_id IN ({assets})", 'bucket_start'),
+    ('plc_sensor_readings_daily', "asset_id IN ({assets})", 'bucket_date'),
+    ('sensors', "asset_id IN ({assets})", None),
+    ('sensor_readings', "sensor_id IN (SELECT sensor_id FROM sensors WHERE asset_id IN ({assets}))", 'ts'),
+    ('sensor_anomaly_state', "asset_id IN ({assets})", None),
+    ('sensor_anomaly_daily', "asset_id IN ({assets})", 'reading_date'),
+    ('sensor_data_quality', "asset_id IN ({assets})", 'reading_date'),
+    ('etl_watermarks', None, None),
+]
+
+# etl_watermarks rows describing the sample (read back in sample mode)
+SAMPLE_WATERMARKS = ('sampling.start', 'sampling.end', 'sampling.seed', 'sampling.assets')
+
+
+def stratified_sample(assets, size, seed):
+    """
+    Pick `size` asset ids from (asset_id, asset_type, has_failures) tuples,
+    allocated to the asset_type x failure-history strata in proportion to their
+    size (every stratum gets one while size allows). Same seed, same sample.
+    """
+    if size >= len(assets):
+        return sorted(asset_id for asset_id, _, _ in assets)
+    strata = {}
+    for asset_id, asset_type, has_failures in sorted(assets):
+        strata.setdefault((asset_type or '', bool(has_failures)), []).append(asset_id)
+    keys = sorted(strata)
+    quotas = {key: size * len(strata[key]) / len(assets) for key in keys}
+    counts = {key: int(quotas[key]) for key in keys}
+    if size >= len(keys):
+        counts = {key: max(count, 1) for key, count in counts.items()}
+    # Largest remainder: hand out the missing picks, take back the extra ones
+    while sum(counts.values()) < size:
+        key = max((key for key in keys if counts[key] < len(strata[key])), key=lambda k: quotas[k] - counts[k])
+        counts[key] += 1
+    while sum(counts.values()) > size:
+        key = max((key for key in keys if counts[key] > 1), key=lambda k: counts[k] - quotas[k])
+        counts[key] -= 1
+
+    rng = np.random.default_rng(seed)
+    chosen = []
+    for key in keys:
+        chosen.extend(int(asset_id) for asset_id in rng.choice(strata[key], counts[key], replace=False))
+    return sorted(chosen)
+
+
+def load_strata(connection):
+    """(asset_id, asset_type, has_failures) of every asset."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT a.asset_id, a.asset_type, COUNT(f.failure_id) > 0 as has_failures
+            FROM assets a
+            LEFT JOIN assets_faliures f ON f.asset_id = a.asset_id
+            GROUP BY a.asset_id, a.asset_type
+        """)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def _source_tables(cursor):
+    cursor.execute("""
+        SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE'
+    """, (DB_CONFIG['database'],))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def create_mysql_sample_schema(connection, tables):
+    """CREATE DATABASE DB_SAMPLE_NAME with an empty copy of every production table."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{DB_SAMPLE_NAME}`")
+        for table in tables:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS `{DB_SAMPLE_NAME}`.`{table}` "
+                           f"LIKE `{DB_CONFIG['database']}`.`{table}`")
+        connection.commit()
+    finally:
+        cursor.close()
+
+
+def copy_table(source, scratch, table, where, params):
+    """Stream the matching rows of `table` from production into the sample; returns the row count."""
+    source_cursor = source.cursor()
+    scratch_cursor = scratch.cursor()
+    try:
+        source_cursor.execute(f"SELECT * FROM {table}" + (f" WHERE {where}" if where else ""), params)
+        columns = list(source_cursor.column_names)
+        insert = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                  f"VALUES ({', '.join(['%s'] * len(columns))})")
+        rows = 0
+        while True:
+            chunk = source_cursor.fetchmany(SAMPLE_COPY_BATCH)
+            if not chunk:
+                break
+            scratch_cursor.executemany(insert, chunk)
+            rows += len(chunk)
+        scratch.commit()
+        return rows
+    finally:
+        source_cursor.close()
+        scratch_cursor.close()
+
+
+def build_sample(source, scratch, asset_ids, start_date, end_date, seed, sqlite=False):
+    """Empty every table of the sample and copy the sampled production rows into it."""
+    source_cursor = source.cursor()
+    scratch_cursor = scratch.cursor()
+    try:
+        tables = _source_tables(source_cursor)
+        # Rows arrive table by table; the sample is consistent once all are copied
+        scratch_cursor.execute("PRAGMA foreign_keys = OFF" if sqlite else "SET FOREIGN_KEY_CHECKS = 0")
+        for table in tables:
+            scratch_cursor.execute(f"TRUNCATE TABLE {table}")
+        scratch.commit()
+
+        assets = ', '.join(str(int(asset_id)) for asset_id in asset_ids)
+        window = (start_date - timedelta(days=SAMPLE_LOOKBACK_DAYS),
+                  end_date + timedelta(days=SAMPLE_HORIZON_DAYS + 1))
+        copied = {}
+        for table, where, time_column in SAMPLE_TABLES:
+            if table not in tables:
+                continue
+            conditions = [where.format(assets=assets)] if where else []
+            params = ()
+            if time_column:
+                conditions.append(f"{time_column} >= %s AND {time_column} < %s")
+                params = window
+            copied[table] = copy_table(source, scratch, table, ' AND '.join(conditions), params)
+            print(f"  {table}: {copied[table]} rows")
+
+        scratch_cursor.executemany("""
+            INSERT INTO etl_watermarks (watermark_name, watermark_value) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE watermark_value = VALUES(watermark_value)
+        """, list(zip(SAMPLE_WATERMARKS, (start_date.isoformat(), end_date.isoformat(),
+                                          str(seed), str(len(asset_ids))))))
+        scratch_cursor.execute("PRAGMA foreign_keys = ON" if sqlite else "SET FOREIGN_KEY_CHECKS = 1")
+        scratch.commit()
+        return copied
+    finally:
+        source_cursor.close()
+        scratch_cursor.close()
+
+
+def sample_info(connection):
+    """{name: value} of the SAMPLE_WATERMARKS of a sample database ({} if it is not one)."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT watermark_name, watermark_value FROM etl_watermarks
+            WHERE watermark_name IN ({', '.join(['%s'] * len(SAMPLE_WATERMARKS))})
+        """, SAMPLE_WATERMARKS)
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def sample_window(connection):
+    """(start_date, end_date) the sample database was built for, or None."""
+    info = sample_info(connection)
+    if 'sampling.start' not in info:
+        return None
+    # The SQLite stand-in already returns ISO date strings as dates
+    return tuple(value if isinstance(value, date) else date.fromisoformat(value)
+                 for value in (info['sampling.start'], info['sampling.end']))
+
+
+@instrumented_main('sampling')
+def main(argv=None):
+    """Build the scratch sample database or describe it."""
+    from ETL.faliure_probability_dataframe import get_date_range
+
+    parser = argparse.ArgumentParser(description='Build a small, stratified sample database for fast ETL runs.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='(Re)build the sample database from production')
+    build_parser.add_argument('--assets', type=int, default=20, help='Number of assets to sample')
+    build_parser.add_argument('--start', type=date.fromisoformat, help='First day (default: the feature date range)')
+    build_parser.add_argument('--end', type=date.fromisoformat, help='Last day (default: start + 30 days)')
+    build_parser.add_argument('--seed', type=int, default=42)
+    subparsers.add_parser('show', help='Describe the sample database')
+    args = parser.parse_args(argv)
+    if db.ETL_SAMPLE:
+        print("Unset ETL_SAMPLE to build or show the sample: it is read from production")
+        sys.exit(1)
+    sample_backend = f"{db.DB_BACKEND}_sample"
+    source = None
+    scratch = None
+
+    try:
+        print("Connecting to database...")
+        # Reads production through the replica when it is fresh
+        source = get_read_connection()
+
+        if source.is_connected():
+            print(f"Connected to database: {source.database}")
+            if args.command == 'build':
+                if db.DB_BACKEND == 'mysql':
+                    primary = get_connection()
+                    cursor = primary.cursor()
+                    try:
+                        create_mysql_sample_schema(primary, _source_tables(cursor))
+                    finally:
+                        cursor.close()
+                        primary.close()
+                scratch = get_connection(backend=sample_backend)
+                min_date, _ = get_date_range(source)
+                start_date = args.start or min_date
+                end_date = args.end or start_date + timedelta(days=30)
+                asset_ids = stratified_sample(load_strata(source), args.assets, args.seed)
+                print(f"Sampled {len(asset_ids)} assets (seed {args.seed}): {asset_ids}")
+                print(f"Window {start_date} to {end_date}; copying into {scratch.database}...")
+                copied = build_sample(source, scratch, asset_ids, start_date, end_date, args.seed,
+                                      sqlite=db.DB_BACKEND == 'sqlite')
+                print(f"\nSample ready: {sum(copied.values())} rows. Run the ETL on it with ETL_SAMPLE=1")
+            else:
+                scratch = get_connection(backend=sample_backend)
+                info = sample_info(scratch)
+                if not info:
+                    print(f"No sample in {scratch.database}; build one first")
+                    return
+                print(f"Sample {scratch.database}: {info['sampling.assets']} assets, "
+                      f"{info['sampling.start']} to {info['sampling.end']}, seed {info['sampling.seed']}")
+
+    except Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        for connection in (scratch, source):
+            if connection and connection.is_connected():
+                connection.close()
+        print("Database connection closed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""
+ETL Script for Sensor Alarm Classification (normal / warning / critical)
+
+Replaces the hard-coded status rules of the sample data generator with a
+threshold configuration per asset type and sensor type:
+- warning_low / warning_high / critical_low / critical_high limits
+- a hysteresis deadband: once raised, an alarm level only clears when the
+  value is back inside its limit by more than the deadband, so a value
+  oscillating around a limit does not toggle the status on every reading
+
+Classification is vectorized with NumPy over whole arrays of readings (one
+pass per alarm level, no Python loop per reading). It is used:
+- at ingestion (ETL/plc_ingestion.py), where AlarmEngine keeps the alarm
+  level of every asset x sensor between batches
+- for bulk re-classification of plc_sensor_readings after a threshold change,
+  where only rows whose status changes are written back (to sensor_readings
+  once ETL/sensor_fact_migration.py has turned plc_sensor_readings into a view,
+  and the thresholds are then copied into sensors as well)
+
+Thresholds default to ALARM_THRESHOLDS and can be overridden with a JSON file
+(ALARM_CONFIG_PATH or --config) of the same shape:
+    {"Hydraulic Pump": {"vibration": {"warning_high": 4.5, "deadband": 0.2}}}
+
+Usage:
+    python ETL/sensor_alarm_engine.py                          # re-classify all history
+    python ETL/sensor_alarm_engine.py --start 2022-06-01 --dry-run
+"""
+
+from datetime import datetime
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+import numpy as np
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/sensor_alarm_engine.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import Error, get_connection
+from ETL.instrumentation import instrumented_main
+
+ALARM_CONFIG_PATH = os.getenv('ALARM_CONFIG_PATH')
+RECLASSIFY_UPDATE_BATCH = int(os.getenv('RECLASSIFY_UPDATE_BATCH', 5000))
+
+STATUS_NAMES = ('normal', 'warning', 'critical')
+STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+
+# Statements of reclassify_history per readings layout (see
+# sensor_fact_migration.readings_layout). Rows are (key..., sensor_type, value,
+# status); the key identifies the row in the UPDATE.
+READING_SQL = {
+    'wide': {
+        'timestamp': 'reading_timestamp',
+        'select': """
+            SELECT reading_id, sensor_type, reading_value, status
+            FROM plc_sensor_readings
+            WHERE asset_id = %s{range_filter}
+            ORDER BY sensor_type, reading_timestamp, reading_id
+        """,
+        'last_status': """
+            SELECT status
+            FROM plc_sensor_readings
+            WHERE asset_id = %s AND sensor_type = %s AND reading_timestamp < %s
+            ORDER BY reading_timestamp DESC, reading_id DESC
+            LIMIT 1
+        """,
+        'update': "UPDATE plc_sensor_readings SET status = %s WHERE reading_id = %s",
+    },
+    'narrow': {
+        'timestamp': 'r.ts',
+        'select': """
+            SELECT r.sensor_id, r.ts, s.sensor_type, r.value, r.status
+            FROM sensor_readings r
+            JOIN sensors s ON s.sensor_id = r.sensor_id
+            WHERE s.asset_id = %s{range_filter}
+            ORDER BY s.sensor_type, r.ts, r.sensor_id
+        """,
+        'last_status': """
+            SELECT r.status
+            FROM sensor_readings r
+            JOIN sensors s ON s.sensor_id = r.sensor_id
+            WHERE s.asset_id = %s AND s.sensor_type = %s AND r.ts < %s
+            ORDER BY r.ts DESC, r.sensor_id DESC
+            LIMIT 1
+        """,
+        'update': "UPDATE sensor_readings SET status = %s WHERE sensor_id = %s AND ts = %s",
+    },
+}
+
+LIMIT_KEYS = ('warning_low', 'warning_high', 'critical_low', 'critical_high', 'deadband')
+
+# asset_type -> sensor_type -> limits. '*' applies to asset types without an
+# entry of their own; a sensor without limits is always 'normal'.
+ALARM_THRESHOLDS = {
+    '*': {
+        'vibration': {'warning_high': 4.0, 'critical_high': 6.0, 'deadband': 0.2},
+        'rpm': {'warning_low': 1200.0, 'warning_high': 1800.0, 'deadband': 20.0},
+        'current': {'warning_high': 30.0, 'critical_high': 35.0, 'deadband': 0.5},
+    },
+    'Hydraulic Pump': {
+        'power': {'warning_high': 28.0, 'critical_high': 32.0, 'deadband': 0.5},
+        'pressure': {'warning_low': 2.5, 'warning_high': 6.0, 'critical_low': 1.5,
+                     'critical_high': 7.5, 'deadband': 0.1},
+        'flow': {'warning_low': 50.0, 'warning_high': 150.0, 'critical_low': 30.0,
+                 'deadband': 2.0},
+    },
+    'Electric Motor': {
+        'power': {'warning_high': 21.0, 'critical_high': 25.0, 'deadband': 0.5},
+    },
+}
+
+
+def load_threshold_config(path=None):
+    """
+    Default thresholds merged with the JSON overrides in `path` (or
+    ALARM_CONFIG_PATH). Overrides replace individual limits of a sensor.
+    """
+    config = copy.deepcopy(ALARM_THRESHOLDS)
+    path = path or ALARM_CONFIG_PATH
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+        for asset_type, sensors in overrides.items():
+            for sensor_type, limits in sensors.items():
+                unknown = set(limits) - set(LIMIT_KEYS)
+                if unknown:
+                    raise ValueError(f"Unknown alarm limits for {asset_type}/{sensor_type}: {sorted(unknown)}")
+                config.setdefault(asset_type, {}).setdefault(sensor_type, {}).update(limits)
+    return config
+
+
+def resolve_limits(config, asset_type, sensor_type):
+    """Limits of one asset type x sensor as a float array in LIMIT_KEYS order (NaN = no limit)."""
+    limits = config.get(asset_type, {}).get(sensor_type)
+    if limits is None:
+        limits = config.get('*', {}).get(sensor_type, {})
+    values = [limits.get(key) for key in LIMIT_KEYS]
+    values[-1] = values[-1] or 0.0
+    return np.array([np.nan if v is None else float(v) for v in values])
+
+
+def _hysteresis(outside, inside, group_start, initial):
+    """
+    Latch an alarm state: set where `outside`, cleared where `inside`, held
+    otherwise. `group_start` marks the first reading of each series, whose held
+    state is `initial` (the level carried over from the previous batch).
+    """
+    event = outside | inside | group_start
+    state_at_event = outside | (~inside & initial)
+    last_event = np.maximum.accumulate(np.where(event, np.arange(len(event)), 0))
+    return state_at_event[last_event]
+
+
+def classify_values(values, limits, series_start=None, initial_levels=None):
+    """
+    Alarm level (0 normal, 1 warning, 2 critical) for every reading.
+
+    values: reading values, grouped by series (asset x sensor) and ordered by
+        time inside each series
+    limits: (n, 5) array of per-reading limits in LIMIT_KEYS order
+    series_start: bool array marking the first reading of each series
+        (default: the whole array is one series)
+    initial_levels: per-reading level held before each series starts (only
+        read at series starts; default 0)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return np.zeros(0, dtype=np.int8)
+    if series_start is None:
+        series_start = np.zeros(n, dtype=bool)
+        series_start[0] = True
+    if initial_levels is None:
+        initial_levels = np.zeros(n, dtype=np.int8)
+
+    deadband = limits[:, 4]
+    levels = np.zeros(n, dtype=np.int8)
+    for level, low_col, high_col in ((1, 0, 1), (2, 2, 3)):
+        low, high = limits[:, low_col], limits[:, high_col]
+        # NaN limits compare False: never outside, always inside
+        outside = (values < low) | (values > high)
+        inside = ~((values < low + deadband) | (values > high - deadband))
+        active = _hysteresis(outside, inside, series_start, initial_levels >= level)
+        levels[active] = level
+    return levels
+
+
+class AlarmEngine:
+    """
+    Streaming classifier for batches of READING_COLUMNS tuples. Keeps the last
+    alarm level of every (asset_id, sensor_type) so hysteresis spans batches.
+    """
+
+    def __init__(self, asset_types, config=None):
+        self.asset_types = asset_types
+        self.config = config or load_threshold_config()
+        self.levels = {}
+        self._limits = {}
+
+    def _limits_for(self, asset_id, sensor_type):
+        key = (asset_id, sensor_type)
+        limits = self._limits.get(key)
+        if limits is None:
+            limits = resolve_limits(self.config, self.asset_types.get(asset_id), sensor_type)
+            self._limits[key] = limits
+        return limits
+
+    def classify(self, rows):
+        """Return the rows with their status column replaced by the engine's classification."""
+        if not rows:
+            return rows
+        keys = [(row[0], row[2]) for row in rows]
+        timestamps = [row[5] for row in rows]
+        order = sorted(range(len(rows)), key=lambda i: (keys[i], timestamps[i]))
+
+        sorted_keys = [keys[i] for i in order]
+        values = np.array([float(rows[i][3]) for i in order])
+        limits = np.array([self._limits_for(*key) for key in sorted_keys])
+        series_start = np.ones(len(order), dtype=bool)
+        series_start[1:] = [a != b for a, b in zip(sorted_keys[1:], sorted_keys[:-1])]
+        initial = np.array([self.levels.get(key, 0) for key in sorted_keys], dtype=np.int8)
+
+        levels = classify_values(values, limits, series_start, initial)
+
+        status = [None] * len(rows)
+        for position, i in enumerate(order):
+            status[i] = STATUS_NAMES[levels[position]]
+            self.levels[sorted_keys[position]] = int(levels[position])
+        return [row[:6] + (status[i],) + row[7:] for i, row in enumerate(rows)]
+
+
+def sync_sensor_thresholds(connection, config=None):
+    """
+    Write the configured limits into the sensors dimension table of
+    deployment/03_sensor_fact_schema.sql, so it holds the same thresholds the
+    engine classifies with (the deadband has no column there). Returns the
+    number of sensors updated.
+    """
+    config = config or load_threshold_config()
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT s.sensor_id, a.asset_type, s.sensor_type
+            FROM sensors s
+            JOIN assets a ON a.asset_id = s.asset_id
+        """)
+        updates = []
+        for sensor_id, asset_type, sensor_type in cursor.fetchall():
+            limits = resolve_limits(config, asset_type, sensor_type)[:4]
+            updates.append(tuple(None if np.isnan(v) else float(v) for v in limits) + (sensor_id,))
+        cursor.executemany("""
+            UPDATE sensors
+            SET warning_low = %s, warning_high = %s, critical_low = %s, critical_high = %s
+            WHERE sensor_id = %s
+        """, updates)
+        connection.commit()
+        return len(updates)
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def load_asset_types(connection):
+    """asset_id -> asset_type for every asset."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT asset_id, asset_type FROM assets")
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def _status_code(status):
+    """Alarm level of a stored status: a name in plc_sensor_readings, a code in sensor_readings."""
+    return STATUS_CODES.get(status, 0) if isinstance(status, str) else int(status)
+
+
+def load_levels_before(cursor, asset_id, sensor_types, start, layout='wide'):
+    """
+    sensor_type -> alarm level of the asset's last reading before `start`, so
+    the hysteresis of a re-classified range continues from the stored state.
+    """
+    levels = {}
+    for sensor_type in sensor_types:
+        cursor.execute(READING_SQL[layout]['last_status'], (asset_id, sensor_type, start))
+        row = cursor.fetchone()
+        levels[sensor_type] = _status_code(row[0]) if row else 0
+    return levels
+
+
+def reclassify_history(connection, config=None, start=None, end=None, dry_run=False, layout=None):
+    """
+    Re-evaluate the status of the sensor readings in [start, end) with the
+    current thresholds, one asset at a time, and write back only the rows whose
+    status changed. With a `start`, each series is seeded with the status of its
+    last reading before `start`. `layout` ('wide' = plc_sensor_readings,
+    'narrow' = sensor_readings) defaults to the migration state of the
+    database. Returns a dict of reading and change counts.
+    """
+    if layout is None:
+        # Imported here: sensor_fact_migration imports this module
+        from ETL.sensor_fact_migration import readings_layout
+        layout = readings_layout(connection)
+    sql = READING_SQL[layout]
+    config = config or load_threshold_config()
+    asset_types = load_asset_types(connection)
+    cursor = connection.cursor()
+    totals = {'readings': 0, 'changed': 0, 'warning': 0, 'critical': 0}
+
+    conditions, params = [], []
+    if start:
+        conditions.append(f"{sql['timestamp']} >= %s")
+        params.append(start)
+    if end:
+        conditions.append(f"{sql['timestamp']} < %s")
+        params.append(end)
+    range_filter = ''.join(f" AND {condition}" for condition in conditions)
+
+    try:
+        for asset_id in sorted(asset_types):
+            cursor.execute(sql['select'].format(range_filter=range_filter), [asset_id] + params)
+            rows = cursor.fetchall()
+            if not rows:
+                continue
+
+            keys = [tuple(row[:-3]) for row in rows]
+            sensor_types = np.array([row[-3] for row in rows])
+            values = np.array([float(row[-2]) for row in rows])
+            current = np.array([_status_code(row[-1]) for row in rows], dtype=np.int8)
+
+            series_start = np.ones(len(rows), dtype=bool)
+            series_start[1:] = sensor_types[1:] != sensor_types[:-1]
+            limits = np.empty((len(rows), len(LIMIT_KEYS)))
+            for sensor_type in np.unique(sensor_types):
+                limits[sensor_types == sensor_type] = resolve_limits(
+                    config, asset_types[asset_id], str(sensor_type)
+                )
+
+            initial = None
+            if start:
+                seeds = load_levels_before(cursor, asset_id, [str(t) for t in np.unique(sensor_types)], start, layout)
+                initial = np.array([seeds[str(t)] for t in sensor_types], dtype=np.int8)
+
+            levels = classify_values(values, limits, series_start, initial)
+            changed = np.flatnonzero(levels != current)
+            totals['readings'] += len(rows)
+            totals['changed'] += len(changed)
+            totals['warning'] += int((levels == 1).sum())
+            totals['critical'] += int((levels == 2).sum())
+            print(f"  asset_id {asset_id}: {len(rows)} readings, {len(changed)} status changes")
+
+            if dry_run or len(changed) == 0:
+                continue
+            updates = [(STATUS_NAMES[levels[i]] if layout == 'wide' else int(levels[i]),) + keys[i]
+                       for i in changed]
+            for offset in range(0, len(updates), RECLASSIFY_UPDATE_BATCH):
+                cursor.executemany(sql['update'], updates[offset:offset + RECLASSIFY_UPDATE_BATCH])
+            connection.commit()
+
+        return totals
+    except Error as e:
+        print(f"Error re-classifying sensor readings: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+@instrumented_main('sensor_alarm_engine')
+def main(argv=None):
+    """Re-classify plc_sensor_readings with the configured thresholds."""
+    # Imported here: sensor_fact_migration imports this module
+    from ETL.sensor_fact_migration import readings_layout
+
+    parser = argparse.ArgumentParser(description='Re-classify sensor reading alarm status.')
+    parser.add_argument('--config', help='JSON threshold overrides (default: ALARM_CONFIG_PATH)')
+    parser.add_argument('--start', help='First reading date (YYYY-MM-DD)')
+    parser.add_argument('--end', help='End reading date, exclusive (YYYY-MM-DD)')
+    parser.add_argument('--dry-run', action='store_true', help='Count changes without writing them')
+    args = parser.parse_args(argv)
+    connection = None
+
+    try:
+        config = load_threshold_config(args.config)
+        start = datetime.fromisoformat(args.start) if args.start else None
+        end = datetime.fromisoformat(args.end) if args.end else None
+
+        print("Connecting to database...")
+        connection = get_connection()
+
+        if connection.is_connected():
+            print(f"Connected to database: {connection.database}")
+            print("Re-classifying sensor readings...")
+            started = time.perf_counter()
+            totals = reclassify_history(connection, config, start, end, dry_run=args.dry_run)
+            elapsed = time.perf_counter() - started
+            action = "would change" if args.dry_run else "changed"
+            print(f"\n{totals['readings']} readings in {elapsed:.2f}s: {action} {totals['changed']} "
+                  f"({totals['warning']} warning, {totals['critical']} critical)")
+
+            if not args.dry_run and readings_layout(connection) == 'narrow':
+                print(f"Set alarm thresholds of {sync_sensor_thresholds(connection, config)} sensors")
+
+    except Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+            print("Database connection closed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+ETL Script for Streaming Sensor Anomaly Detection
+
+Keeps constant-size state per asset x sensor and updates it reading by reading:
+- EWMA mean and variance of the reading value
+- z-score of each reading against the EWMA before it is absorbed
+- two-sided CUSUM of the z-scores, which accumulates small persistent shifts
+  (the noise and spikes of the days before a failure) that a 30-day average
+  smooths away; an alarm is counted and the CUSUM reset when it exceeds
+  ANOMALY_CUSUM_H
+
+Scores are aggregated per asset x day x sensor into sensor_anomaly_daily (one
+compact row: reading count, max |z|, max CUSUM, alarm count), which the
+feature ETL exposes as the sensor_anomaly_score / sensor_anomaly_alarms
+columns of faliure_probability_base. Detector state is persisted in
+sensor_anomaly_state, so each run only processes readings newer than the
+state of their series.
+
+Usage:
+    python ETL/sensor_anomaly_detection.py
+    python ETL/sensor_anomaly_detection.py --reset     # rebuild from the first reading
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/sensor_anomaly_detection.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import Error, get_connection
+from ETL.instrumentation import instrumented_main
+
+# EWMA smoothing factor (0.02 ~ a 50-reading memory, ~12 days at 4 readings/day)
+ANOMALY_EWMA_ALPHA = float(os.getenv('ANOMALY_EWMA_ALPHA', 0.02))
+# CUSUM slack (in standard deviations) and alarm threshold
+ANOMALY_CUSUM_K = float(os.getenv('ANOMALY_CUSUM_K', 0.5))
+ANOMALY_CUSUM_H = float(os.getenv('ANOMALY_CUSUM_H', 5.0))
+# Readings used to seed the EWMA before a series is scored
+ANOMALY_WARMUP = int(os.getenv('ANOMALY_WARMUP', 20))
+
+# Per-series state layout (a plain list keeps updates cheap)
+MEAN, VAR, CUSUM_POS, CUSUM_NEG, COUNT, LAST_TS = range(6)
+
+# Per-day aggregate layout
+READINGS, MAX_ABS_Z, MAX_CUSUM, ALARMS = range(4)
+
+
+class AnomalyDetector:
+    """
+    EWMA + CUSUM detector over any number of asset x sensor series. Memory is
+    constant per series plus one aggregate per series and day until flushed.
+    """
+
+    def __init__(self, alpha=ANOMALY_EWMA_ALPHA, k=ANOMALY_CUSUM_K, h=ANOMALY_CUSUM_H,
+                 warmup=ANOMALY_WARMUP):
+        self.alpha = alpha
+        self.k = k
+        self.h = h
+        self.warmup = warmup
+        # (asset_id, sensor_type) -> [mean, var, cusum_pos, cusum_neg, count, last_ts]
+        self.state = {}
+        # (asset_id, reading_date, sensor_type) -> [readings, max_abs_z, max_cusum, alarms]
+        self.daily = {}
+
+    def update(self, asset_id, sensor_type, timestamp, value):
+        """
+        Absorb one reading (series must be fed in time order). Returns the
+        reading's z-score, or None if it was skipped or in warm-up.
+        """
+        key = (asset_id, sensor_type)
+        state = self.state.get(key)
+        if state is None:
+            state = self.state[key] = [value, 0.0, 0.0, 0.0, 0, None]
+        elif state[LAST_TS] is not None and timestamp <= state[LAST_TS]:
+            return None
+
+        alpha = self.alpha
+        diff = value - state[MEAN]
+        z = None
+        alarm = 0
+        if state[COUNT] >= self.warmup:
+            z = diff / math.sqrt(state[VAR]) if state[VAR] > 1e-12 else 0.0
+            pos = state[CUSUM_POS] + z - self.k
+            neg = state[CUSUM_NEG] - z - self.k
+            state[CUSUM_POS] = pos if pos > 0.0 else 0.0
+            state[CUSUM_NEG] = neg if neg > 0.0 else 0.0
+            cusum = max(state[CUSUM_POS], state[CUSUM_NEG])
+            if cusum > self.h:
+                alarm = 1
+                state[CUSUM_POS] = state[CUSUM_NEG] = 0.0
+        else:
+            cusum = 0.0
+        # During warm-up use the running average so the seed is not just the first reading
+        weight = alpha if state[COUNT] >= self.warmup else 1.0 / (state[COUNT] + 1)
+        state[MEAN] += weight * diff
+        state[VAR] = (1.0 - weight) * (state[VAR] + weight * diff * diff)
+        state[COUNT] += 1
+        state[LAST_TS] = timestamp
+
+        day_key = (asset_id, timestamp.date(), sensor_type)
+        day = self.daily.get(day_key)
+        if day is None:
+            day = self.daily[day_key] = [0, 0.0, 0.0, 0]
+        day[READINGS] += 1
+        if z is not None:
+            abs_z = abs(z)
+            if abs_z > day[MAX_ABS_Z]:
+                day[MAX_ABS_Z] = abs_z
+            if cusum > day[MAX_CUSUM]:
+                day[MAX_CUSUM] = cusum
+            day[ALARMS] += alarm
+        return z
+
+    def pop_daily(self):
+        """Return and clear the per-day aggregates collected since the last call."""
+        daily, self.daily = self.daily, {}
+        return daily
+
+
+def load_state(connection, detector):
+    """Load persisted series state into the detector."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT asset_id, sensor_type, ewma_mean, ewma_var, cusum_pos, cusum_neg,
+                   reading_count, last_reading_at
+            FROM sensor_anomaly_state
+        """)
+        for asset_id, sensor_type, mean, var, pos, neg, count, last_ts in cursor.fetchall():
+            detector.state[(asset_id, sensor_type)] = [mean, var, pos, neg, count, last_ts]
+    finally:
+        cursor.close()
+
+
+def save_results(connection, detector, asset_id=None):
+    """
+    Upsert the daily aggregates (merging with partial days) and the series
+    state (of `asset_id` only, if given).
+    """
+    cursor = connection.cursor()
+    try:
+        daily = detector.pop_daily()
+        if daily:
+            cursor.executemany("""
+                INSERT INTO sensor_anomaly_daily
+                (asset_id, reading_date, sensor_type, reading_count, max_abs_z, max_cusum, alarm_count)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    reading_count = reading_count + VALUES(reading_count),
+                    max_abs_z = GREATEST(max_abs_z, VALUES(max_abs_z)),
+                    max_cusum = GREATEST(max_cusum, VALUES(max_cusum)),
+                    alarm_count = alarm_count + VALUES(alarm_count)
+            """, [key + tuple(round(v, 4) if isinstance(v, float) else v for v in values)
+                  for key, values in daily.items()])
+        cursor.executemany("""
+            INSERT INTO sensor_anomaly_state
+            (asset_id, sensor_type, ewma_mean, ewma_var, cusum_pos, cusum_neg, reading_count, last_reading_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                ewma_mean = VALUES(ewma_mean),
+                ewma_var = VALUES(ewma_var),
+                cusum_pos = VALUES(cusum_pos),
+                cusum_neg = VALUES(cusum_neg),
+                reading_count = VALUES(reading_count),
+                last_reading_at = VALUES(last_reading_at)
+        """, [key + tuple(state) for key, state in detector.state.items()
+              if asset_id is None or key[0] == asset_id])
+        connection.commit()
+        return len(daily)
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def run_detection(connection, detector=None, reset=False):
+    """
+    Feed new plc_sensor_readings through the detector, one asset at a time in
+    time order, persisting aggregates and state after each asset.
+    Returns (readings processed, seconds spent in the detector).
+    """
+    detector = detector or AnomalyDetector()
+    cursor = connection.cursor()
+    processed = 0
+    detect_seconds = 0.0
+    try:
+        if reset:
+            cursor.execute("DELETE FROM sensor_anomaly_daily")
+            cursor.execute("DELETE FROM sensor_anomaly_state")
+            connection.commit()
+        else:
+            load_state(connection, detector)
+
+        cursor.execute("SELECT asset_id FROM assets ORDER BY asset_id")
+        asset_ids = [row[0] for row in cursor.fetchall()]
+        for asset_id in asset_ids:
+            # Re-read from the oldest series state of the asset; update() skips
+            # readings a series has already absorbed. A series without state
+            # that has readings up to that point (a sensor added to the asset)
+            # needs its full history, so the asset is re-read from the start.
+            series = {t: s[LAST_TS] for (a, t), s in detector.state.items() if a == asset_id}
+            since = min(series.values()) if series else None
+            if since:
+                placeholders = ', '.join(['%s'] * len(series))
+                cursor.execute(f"""
+                    SELECT 1 FROM plc_sensor_readings
+                    WHERE asset_id = %s AND reading_timestamp <= %s
+                    AND sensor_type NOT IN ({placeholders})
+                    LIMIT 1
+                """, (asset_id, since, *series))
+                if cursor.fetchone():
+                    since = None
+            cursor.execute(f"""
+                SELECT sensor_type, reading_timestamp, reading_value
+                FROM plc_sensor_readings
+                WHERE asset_id = %s{' AND reading_timestamp > %s' if since else ''}
+                ORDER BY reading_timestamp
+            """, (asset_id, since) if since else (asset_id,))
+            rows = cursor.fetchall()
+            if not rows:
+                continue
+
+            started = time.perf_counter()
+            update = detector.update
+            for sensor_type, timestamp, value in rows:
+                update(asset_id, sensor_type, timestamp, float(value))
+            detect_seconds += time.perf_counter() - started
+            processed += len(rows)
+            days = save_results(connection, detector, asset_id)
+            print(f"  asset_id {asset_id}: {len(rows)} readings, {days} asset-day-sensor rows")
+        return processed, detect_seconds
+    except Error as e:
+        print(f"Error running anomaly detection: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+@instrumented_main('sensor_anomaly_detection')
+def main(argv=None):
+    """Main anomaly detection execution function."""
+    parser = argparse.ArgumentParser(description='Streaming EWMA/CUSUM anomaly detection on sensor readings.')
+    parser.add_argument('--reset', action='store_true', help='Discard stored state and rebuild from the first reading')
+    args = parser.parse_args(argv)
+    connection = None
+
+    try:
+        print("Connecting to database...")
+        connection = get_connection()
+
+        if connection.is_connected():
+            print(f"Connected to database: {connection.database}")
+            print("Starting sensor anomaly detection...")
+            processed, seconds = run_detection(connection, reset=args.reset)
+            rate = processed / seconds if seconds else 0.0
+            print(f"\nProcessed {processed} readings ({rate:.0f} readings/s in the detector)")
+
+    except Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+            print("Database connection closed")
+
+
+if __name__ == "__main__":
+    main()
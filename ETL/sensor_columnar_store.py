@@ -0,0 +1,243 @@
+"""
+Columnar Time-Series Store for Sensor History
+
+Alternative storage backend for plc_sensor_readings history. Each
+asset x sensor x month is one chunk of two memory-mappable NumPy files:
+- <YYYY-MM>.ts.npy: uint32 seconds since the start of the month
+  (frame-of-reference encoding: 4 bytes per timestamp instead of a DATETIME,
+  and still sorted, so time ranges are found with a binary search)
+- <YYYY-MM>.val.npy: float32 reading values
+
+Layout:
+    <SENSOR_STORE_DIR>/asset_<asset_id>/<sensor_type>/<YYYY-MM>.{ts,val}.npy
+
+Reads inside one chunk return views into the memory-mapped file (zero-copy);
+ranges spanning several months are concatenated. The feature ETL reads its
+30-day sensor windows from here when SENSOR_STORE_DIR is set.
+
+Usage (export plc_sensor_readings into the store):
+    python ETL/sensor_columnar_store.py --store-dir sensor_store
+"""
+
+import argparse
+import os
+import sys
+import numpy as np
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/sensor_columnar_store.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import Error, get_connection
+from ETL.instrumentation import instrumented_main
+
+SENSOR_STORE_DIR = os.getenv('SENSOR_STORE_DIR')
+
+# sensor_type in plc_sensor_readings -> feature column in faliure_probability_base
+SENSOR_FEATURES = {
+    'vibration': 'mechanical_vibration',
+    'rpm': 'rpm',
+    'power': 'power',
+    'current': 'electrical_current',
+    'pressure': 'pressure',
+    'flow': 'flow',
+}
+
+
+def _month_start(value):
+    return np.datetime64(value, 'M').astype('datetime64[s]')
+
+
+class SensorColumnarStore:
+    """Chunked, memory-mapped storage of sensor series."""
+
+    def __init__(self, root, max_open_chunks=4096):
+        self.root = root
+        self.max_open_chunks = max_open_chunks
+        # (asset_id, sensor_type, month) -> (offsets, values) memory maps
+        self._open_chunks = {}
+
+    def _series_dir(self, asset_id, sensor_type):
+        return os.path.join(self.root, f"asset_{int(asset_id)}", sensor_type)
+
+    def _chunk_paths(self, asset_id, sensor_type, month):
+        base = os.path.join(self._series_dir(asset_id, sensor_type), str(np.datetime64(month, 'M')))
+        return base + '.ts.npy', base + '.val.npy'
+
+    def _load_chunk(self, asset_id, sensor_type, month):
+        key = (int(asset_id), sensor_type, np.datetime64(month, 'M'))
+        chunk = self._open_chunks.get(key)
+        if chunk is None:
+            ts_path, val_path = self._chunk_paths(asset_id, sensor_type, month)
+            if not os.path.exists(ts_path):
+                return None, None
+            if len(self._open_chunks) >= self.max_open_chunks:
+                self._open_chunks.clear()
+            chunk = (np.load(ts_path, mmap_mode='r'), np.load(val_path, mmap_mode='r'))
+            self._open_chunks[key] = chunk
+        return chunk
+
+    def write(self, asset_id, sensor_type, timestamps, values):
+        """
+        Append a series to the store, merging with existing chunks. Duplicate
+        timestamps keep the newest value. On Windows a chunk cannot be replaced
+        while it is memory-mapped, so views returned by read() for the months
+        being written must be released first.
+        """
+        timestamps = np.asarray(timestamps, dtype='datetime64[s]')
+        values = np.asarray(values, dtype=np.float32)
+        if len(timestamps) == 0:
+            return
+        months = timestamps.astype('datetime64[M]')
+        os.makedirs(self._series_dir(asset_id, sensor_type), exist_ok=True)
+
+        for month in np.unique(months):
+            mask = months == month
+            offsets = (timestamps[mask] - _month_start(month)).astype(np.uint32)
+            chunk_values = values[mask]
+
+            old_ts, old_val = self._load_chunk(asset_id, sensor_type, month)
+            if old_ts is not None:
+                offsets = np.concatenate([np.array(old_ts), offsets])
+                chunk_values = np.concatenate([np.array(old_val), chunk_values])
+                self._open_chunks.pop((int(asset_id), sensor_type, month), None)
+            # Unmap the old chunk before os.replace (fails on Windows otherwise)
+            del old_ts, old_val
+
+            # Stable sort, then keep the last occurrence of each timestamp
+            order = np.argsort(offsets, kind='stable')
+            offsets, chunk_values = offsets[order], chunk_values[order]
+            keep = np.ones(len(offsets), dtype=bool)
+            keep[:-1] = offsets[1:] != offsets[:-1]
+
+            ts_path, val_path = self._chunk_paths(asset_id, sensor_type, month)
+            for path, data in ((ts_path, offsets[keep]), (val_path, chunk_values[keep])):
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, data)
+                os.replace(tmp_path, path)
+
+    def read(self, asset_id, sensor_type, start, end):
+        """
+        Return (timestamps datetime64[s], values float32) with start <= t < end.
+        Values from a single chunk are views of the memory-mapped file.
+        """
+        return self._read(asset_id, sensor_type, start, end, with_timestamps=True)
+
+    def read_values(self, asset_id, sensor_type, start, end):
+        """Like read() but only returns the values (no timestamp decoding)."""
+        return self._read(asset_id, sensor_type, start, end, with_timestamps=False)[1]
+
+    def _read(self, asset_id, sensor_type, start, end, with_timestamps):
+        start = np.datetime64(start, 's')
+        end = np.datetime64(end, 's')
+        ts_parts, val_parts = [], []
+        month = start.astype('datetime64[M]')
+        last_month = (end - np.timedelta64(1, 's')).astype('datetime64[M]')
+        while month <= last_month:
+            offsets, values = self._load_chunk(asset_id, sensor_type, month)
+            if offsets is not None:
+                base = _month_start(month)
+                lo = np.searchsorted(offsets, max(0, int((start - base).astype(np.int64))), side='left')
+                hi = np.searchsorted(offsets, max(0, int((end - base).astype(np.int64))), side='left')
+                if hi > lo:
+                    if with_timestamps:
+                        ts_parts.append(base + offsets[lo:hi].astype('timedelta64[s]'))
+                    val_parts.append(values[lo:hi])
+            month += 1
+
+        if not val_parts:
+            return np.empty(0, dtype='datetime64[s]'), np.empty(0, dtype=np.float32)
+        timestamps = None
+        if with_timestamps:
+            timestamps = ts_parts[0] if len(ts_parts) == 1 else np.concatenate(ts_parts)
+        values = val_parts[0] if len(val_parts) == 1 else np.concatenate(val_parts)
+        return timestamps, values
+
+    def nbytes(self):
+        """Total bytes of all chunk files in the store."""
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith('.npy'):
+                    total += os.path.getsize(os.path.join(dirpath, name))
+        return total
+
+
+def sensor_window_averages(store, asset_id, start, end):
+    """
+    Average of every sensor in [start, end) as faliure_probability_base
+    feature columns (None when the window has no readings).
+    """
+    features = {}
+    for sensor_type, feature in SENSOR_FEATURES.items():
+        values = store.read_values(asset_id, sensor_type, start, end)
+        features[feature] = float(values.mean(dtype=np.float64)) if len(values) else None
+    return features
+
+
+def export_from_mysql(connection, store):
+    """Copy plc_sensor_readings into the store, one asset at a time."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT asset_id FROM assets ORDER BY asset_id")
+        asset_ids = [row[0] for row in cursor.fetchall()]
+
+        total = 0
+        for asset_id in asset_ids:
+            cursor.execute("""
+                SELECT sensor_type, reading_timestamp, reading_value
+                FROM plc_sensor_readings
+                WHERE asset_id = %s
+                ORDER BY sensor_type, reading_timestamp
+            """, (asset_id,))
+            rows = cursor.fetchall()
+            if not rows:
+                continue
+            sensor_types = np.array([row[0] for row in rows])
+            timestamps = np.array([row[1] for row in rows], dtype='datetime64[s]')
+            values = np.array([float(row[2]) for row in rows], dtype=np.float32)
+            for sensor_type in np.unique(sensor_types):
+                mask = sensor_types == sensor_type
+                store.write(asset_id, str(sensor_type), timestamps[mask], values[mask])
+            total += len(rows)
+            print(f"Exported asset_id {asset_id}: {len(rows)} readings")
+        return total
+    finally:
+        cursor.close()
+
+
+@instrumented_main('sensor_columnar_store')
+def main(argv=None):
+    """Export plc_sensor_readings into the columnar store."""
+    parser = argparse.ArgumentParser(description='Export plc_sensor_readings into the columnar store.')
+    parser.add_argument('--store-dir', default=SENSOR_STORE_DIR or 'sensor_store')
+    args = parser.parse_args(argv)
+    connection = None
+
+    try:
+        print("Connecting to database...")
+        connection = get_connection()
+
+        if connection.is_connected():
+            print(f"Connected to database: {connection.database}")
+            store = SensorColumnarStore(args.store_dir)
+            total = export_from_mysql(connection, store)
+            print(f"\nExported {total} readings to {args.store_dir} ({store.nbytes()} bytes)")
+
+    except Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+            print("Database connection closed")
+
+
+if __name__ == "__main__":
+    main()
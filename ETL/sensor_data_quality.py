@@ -0,0 +1,254 @@
+"""
+ETL Script for Sensor Data Quality and Gap Detection
+
+Scans plc_sensor_readings per asset in one vectorized pass over all of its
+sensor series and reports, per asset x day x sensor:
+- reading count against the expected count (SENSOR_EXPECTED_INTERVAL_MINUTES)
+  and the resulting coverage ratio
+- gaps: minutes missing between consecutive readings spaced more than
+  DQ_GAP_FACTOR expected intervals apart, and the longest gap
+- flatlines: readings inside runs of at least DQ_FLATLINE_MIN_READINGS
+  identical values (a stuck sensor)
+- out-of-range values outside the physical plausibility range of the sensor
+- duplicate timestamps
+
+Series that are constantly 0 (pressure and flow on motors) are not
+applicable and skipped. Results go to sensor_data_quality; the feature ETL
+turns them into the sensor_coverage_1d / sensor_coverage_30d features of
+faliure_probability_base, so gaps no longer disappear inside a 30-day AVG.
+
+Usage:
+    python ETL/sensor_data_quality.py
+    python ETL/sensor_data_quality.py --start 2022-06-01 --end 2022-07-01
+"""
+
+from datetime import datetime
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/sensor_data_quality.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import Error, get_connection
+from ETL.instrumentation import instrumented_main
+
+# The sample fleet reports every 6 hours
+SENSOR_EXPECTED_INTERVAL_MINUTES = int(os.getenv('SENSOR_EXPECTED_INTERVAL_MINUTES', 360))
+DQ_GAP_FACTOR = float(os.getenv('DQ_GAP_FACTOR', 1.5))
+DQ_FLATLINE_MIN_READINGS = int(os.getenv('DQ_FLATLINE_MIN_READINGS', 8))
+
+# Physical plausibility range per sensor_type (values outside are sensor faults)
+SENSOR_VALID_RANGES = {
+    'vibration': (0.0, 50.0),
+    'rpm': (0.0, 4000.0),
+    'power': (0.0, 500.0),
+    'current': (0.0, 500.0),
+    'pressure': (0.0, 50.0),
+    'flow': (0.0, 1000.0),
+}
+
+QUALITY_COLUMNS = (
+    'expected_count', 'reading_count', 'duplicate_count', 'out_of_range_count',
+    'flatline_count', 'gap_minutes', 'longest_gap_minutes', 'coverage_ratio'
+)
+
+
+def scan_series(sensor_codes, timestamps, values, sensor_types, day0, n_days,
+                expected_interval=SENSOR_EXPECTED_INTERVAL_MINUTES):
+    """
+    Quality metrics per sensor x day for one asset.
+
+    sensor_codes: int index into sensor_types for every reading
+    timestamps: int64 seconds; values: float
+    day0: int64 seconds of the first day's midnight; n_days: days reported
+    Returns {column: (n_sensors, n_days) array} for QUALITY_COLUMNS plus an
+    'applicable' bool array per sensor.
+    """
+    n_sensors = len(sensor_types)
+    order = np.lexsort((timestamps, sensor_codes))
+    codes, ts, vals = sensor_codes[order], timestamps[order], values[order]
+
+    same_series = np.zeros(len(codes), dtype=bool)
+    same_series[1:] = codes[1:] == codes[:-1]
+    dt = np.zeros(len(ts), dtype=np.int64)
+    dt[1:] = ts[1:] - ts[:-1]
+
+    # Constant-zero series are sensors the asset does not have
+    nonzero = np.bincount(codes, weights=(vals != 0), minlength=n_sensors)
+    applicable = nonzero > 0
+
+    duplicate = same_series & (dt == 0)
+    low = np.array([SENSOR_VALID_RANGES.get(s, (-np.inf, np.inf))[0] for s in sensor_types])
+    high = np.array([SENSOR_VALID_RANGES.get(s, (-np.inf, np.inf))[1] for s in sensor_types])
+    out_of_range = ~np.isfinite(vals) | (vals < low[codes]) | (vals > high[codes])
+
+    # Flatlines: runs of identical consecutive values within a series
+    new_run = ~same_series
+    new_run[1:] |= vals[1:] != vals[:-1]
+    run_id = np.cumsum(new_run) - 1
+    run_length = np.bincount(run_id)
+    flatline = run_length[run_id] >= DQ_FLATLINE_MIN_READINGS
+
+    # Gaps are attributed to the day of the reading that ends them
+    expected_seconds = expected_interval * 60
+    is_gap = same_series & (dt > DQ_GAP_FACTOR * expected_seconds)
+    gap_minutes = np.where(is_gap, (dt - expected_seconds) / 60.0, 0.0)
+
+    day = (ts - day0) // 86400
+    in_range = (day >= 0) & (day < n_days)
+    cell = codes[in_range] * n_days + day[in_range]
+    size = n_sensors * n_days
+
+    def per_cell(weights):
+        return np.bincount(cell, weights=weights[in_range], minlength=size).reshape(n_sensors, n_days)
+
+    metrics = {
+        'reading_count': np.bincount(cell, minlength=size).reshape(n_sensors, n_days),
+        'duplicate_count': per_cell(duplicate.astype(float)),
+        'out_of_range_count': per_cell(out_of_range.astype(float)),
+        'flatline_count': per_cell(flatline.astype(float)),
+        'gap_minutes': per_cell(gap_minutes),
+    }
+    longest = np.zeros(size)
+    np.maximum.at(longest, cell, gap_minutes[in_range])
+    metrics['longest_gap_minutes'] = longest.reshape(n_sensors, n_days)
+
+    expected = np.full((n_sensors, n_days), 1440 // expected_interval)
+    valid = metrics['reading_count'] - metrics['duplicate_count'] - metrics['out_of_range_count']
+    metrics['expected_count'] = expected
+    metrics['coverage_ratio'] = np.minimum(valid / expected, 1.0)
+    metrics['applicable'] = applicable
+    return metrics
+
+
+def check_asset(cursor, asset_id, start=None, end=None):
+    """
+    Run the quality scan for one asset. Returns the sensor_data_quality rows
+    (asset_id, reading_date, sensor_type, *QUALITY_COLUMNS).
+    """
+    conditions, params = ["asset_id = %s"], [asset_id]
+    if start:
+        conditions.append("reading_timestamp >= %s")
+        params.append(start)
+    if end:
+        conditions.append("reading_timestamp < %s")
+        params.append(end)
+    cursor.execute(f"""
+        SELECT sensor_type, reading_timestamp, reading_value
+        FROM plc_sensor_readings
+        WHERE {' AND '.join(conditions)}
+    """, params)
+    rows = cursor.fetchall()
+    if not rows:
+        return []
+
+    sensor_types, sensor_codes = np.unique(np.array([row[0] for row in rows]), return_inverse=True)
+    timestamps = np.array([row[1] for row in rows], dtype='datetime64[s]')
+    values = np.array([float(row[2]) for row in rows])
+
+    # Report every day of the range, including days without any reading
+    first_day = np.datetime64(start, 'D') if start else timestamps.min().astype('datetime64[D]')
+    last_day = (np.datetime64(end, 's') - 1).astype('datetime64[D]') if end else timestamps.max().astype('datetime64[D]')
+    n_days = int((last_day - first_day) / np.timedelta64(1, 'D')) + 1
+    day0 = first_day.astype('datetime64[s]').astype(np.int64)
+
+    metrics = scan_series(sensor_codes, timestamps.astype(np.int64), values,
+                          [str(s) for s in sensor_types], day0, n_days)
+    dates = (first_day + np.arange(n_days)).astype(datetime)
+    result = []
+    for s, sensor_type in enumerate(sensor_types):
+        if not metrics['applicable'][s]:
+            continue
+        columns = [metrics[name][s] for name in QUALITY_COLUMNS]
+        for d, reading_date in enumerate(dates):
+            result.append((asset_id, reading_date, str(sensor_type), *(
+                round(float(column[d]), 4) if name == 'coverage_ratio' else int(column[d])
+                for name, column in zip(QUALITY_COLUMNS, columns)
+            )))
+    return result
+
+
+def run_quality_checks(connection, start=None, end=None):
+    """Scan every asset and upsert sensor_data_quality. Returns a summary dict."""
+    cursor = connection.cursor()
+    summary = {name: 0 for name in ('rows', 'readings', 'gap_days', 'duplicates', 'out_of_range', 'flatlines')}
+    try:
+        cursor.execute("SELECT asset_id FROM assets ORDER BY asset_id")
+        asset_ids = [row[0] for row in cursor.fetchall()]
+        insert_sql = f"""
+            INSERT INTO sensor_data_quality
+            (asset_id, reading_date, sensor_type, {', '.join(QUALITY_COLUMNS)})
+            VALUES ({', '.join(['%s'] * (len(QUALITY_COLUMNS) + 3))})
+            ON DUPLICATE KEY UPDATE
+                {', '.join(f'{c} = VALUES({c})' for c in QUALITY_COLUMNS)}
+        """
+        for asset_id in asset_ids:
+            rows = check_asset(cursor, asset_id, start, end)
+            if not rows:
+                continue
+            cursor.executemany(insert_sql, rows)
+            connection.commit()
+
+            index = {name: 3 + i for i, name in enumerate(QUALITY_COLUMNS)}
+            gap_days = sum(1 for r in rows if r[index['gap_minutes']] > 0 or r[index['reading_count']] == 0)
+            summary['rows'] += len(rows)
+            summary['readings'] += sum(r[index['reading_count']] for r in rows)
+            summary['gap_days'] += gap_days
+            summary['duplicates'] += sum(r[index['duplicate_count']] for r in rows)
+            summary['out_of_range'] += sum(r[index['out_of_range_count']] for r in rows)
+            summary['flatlines'] += sum(r[index['flatline_count']] for r in rows)
+            print(f"  asset_id {asset_id}: {len(rows)} sensor-days, {gap_days} with gaps")
+        return summary
+    except Error as e:
+        print(f"Error running sensor data quality checks: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+@instrumented_main('sensor_data_quality')
+def main(argv=None):
+    """Main data quality execution function."""
+    parser = argparse.ArgumentParser(description='Scan sensor readings for gaps, flatlines, out-of-range values and duplicates.')
+    parser.add_argument('--start', help='First reading date (YYYY-MM-DD)')
+    parser.add_argument('--end', help='End reading date, exclusive (YYYY-MM-DD)')
+    args = parser.parse_args(argv)
+    connection = None
+
+    try:
+        start = datetime.fromisoformat(args.start) if args.start else None
+        end = datetime.fromisoformat(args.end) if args.end else None
+
+        print("Connecting to database...")
+        connection = get_connection()
+
+        if connection.is_connected():
+            print(f"Connected to database: {connection.database}")
+            print("Starting sensor data quality checks...")
+            started = time.perf_counter()
+            summary = run_quality_checks(connection, start, end)
+            print(f"\nChecked {summary['readings']} readings in {time.perf_counter() - started:.2f}s: "
+                  f"{summary['gap_days']} sensor-days with gaps, {summary['flatlines']} flatlined, "
+                  f"{summary['out_of_range']} out of range, {summary['duplicates']} duplicate timestamps")
+
+    except Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+            print("Database connection closed")
+
+
+if __name__ == "__main__":
+    main()
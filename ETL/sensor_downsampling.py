@@ -0,0 +1,386 @@
+"""
+ETL Script for Tiered Downsampling of Sensor History (raw -> hourly -> daily)
+
+Builds rollup tiers of plc_sensor_readings:
+- plc_sensor_readings_hourly: per asset x sensor_type x hour
+- plc_sensor_readings_daily:  per asset x sensor_type x day (built from the hourly tier)
+Each bucket stores count, mean, min, max, population std and warning/critical counts.
+
+Progress is tracked in etl_watermarks, so every run only recomputes the new
+buckets plus a short late-arrival lookback. With --apply-retention, raw readings
+are kept only for the hot window (SENSOR_RAW_HOT_DAYS) and never before they
+have been rolled up. Retention is opt-in: only window_averages (SENSOR_ROLLUPS=1)
+reads the rollups, every other reader of plc_sensor_readings still needs the raw
+history.
+
+Queries are routed to the coarsest tier that can answer them exactly
+(choose_tier / fetch_sensor_series / window_averages): a 30-day feature window
+reads ~30 daily rows per sensor instead of ~120 raw readings, and a yearly
+trend chart reads 365 daily rows instead of 1,460+.
+
+Usage:
+    python ETL/sensor_downsampling.py                    # build tiers only
+    python ETL/sensor_downsampling.py --apply-retention  # also delete raw readings past the hot window
+"""
+
+from datetime import datetime, timedelta
+import argparse
+import math
+import os
+import sys
+import time
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/sensor_downsampling.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import Error, get_connection
+from ETL.instrumentation import instrumented_main
+from ETL.sensor_columnar_store import SENSOR_FEATURES
+
+SENSOR_RAW_HOT_DAYS = int(os.getenv('SENSOR_RAW_HOT_DAYS', 90))
+# Buckets recomputed on every run to absorb late readings
+SENSOR_LATE_ARRIVAL_HOURS = int(os.getenv('SENSOR_LATE_ARRIVAL_HOURS', 48))
+# Raw range aggregated per statement (keeps transactions short)
+DOWNSAMPLING_CHUNK_DAYS = int(os.getenv('DOWNSAMPLING_CHUNK_DAYS', 7))
+RETENTION_DELETE_BATCH = int(os.getenv('RETENTION_DELETE_BATCH', 10000))
+# Seconds the query router trusts its cached tier watermarks
+SENSOR_TIER_CACHE_SECONDS = int(os.getenv('SENSOR_TIER_CACHE_SECONDS', 60))
+
+HOURLY_WATERMARK = 'sensor_downsampling.hourly'
+DAILY_WATERMARK = 'sensor_downsampling.daily'
+
+# Rollup tiers, coarsest first: (name, bucket seconds, table, bucket column, watermark)
+TIERS = [
+    ('daily', 86400, 'plc_sensor_readings_daily', 'bucket_date', DAILY_WATERMARK),
+    ('hourly', 3600, 'plc_sensor_readings_hourly', 'bucket_start', HOURLY_WATERMARK),
+]
+
+# Tier watermarks cached for SENSOR_TIER_CACHE_SECONDS (see refresh_tier_watermarks)
+_TIER_WATERMARKS = None
+_TIER_WATERMARKS_LOADED_AT = 0.0
+
+
+def _floor_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime(value.year, value.month, value.day)
+
+
+def get_watermark(cursor, name):
+    cursor.execute("SELECT watermark_value FROM etl_watermarks WHERE watermark_name = %s", (name,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    # The SQLite stand-in (ETL.db) already returns ISO strings as datetime
+    return row[0] if isinstance(row[0], datetime) else datetime.fromisoformat(row[0])
+
+
+def set_watermark(cursor, name, value):
+    cursor.execute("""
+        INSERT INTO etl_watermarks (watermark_name, watermark_value)
+        VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE watermark_value = VALUES(watermark_value)
+    """, (name, value.isoformat(sep=' ')))
+
+
+def build_hourly_tier(connection, until=None):
+    """
+    Aggregate raw readings into hourly buckets up to `until` (default: the
+    current hour, exclusive). Returns the number of buckets written.
+    """
+    cursor = connection.cursor()
+    written = 0
+    try:
+        until = _floor_hour(until or datetime.now())
+        watermark = get_watermark(cursor, HOURLY_WATERMARK)
+        if watermark is None:
+            cursor.execute("SELECT MIN(reading_timestamp) FROM plc_sensor_readings")
+            oldest = cursor.fetchone()[0]
+            if oldest is None:
+                print("No raw readings to downsample")
+                return 0
+            start = _floor_hour(oldest)
+        else:
+            start = watermark - timedelta(hours=SENSOR_LATE_ARRIVAL_HOURS)
+
+        chunk_start = start
+        while chunk_start < until:
+            chunk_end = min(chunk_start + timedelta(days=DOWNSAMPLING_CHUNK_DAYS), until)
+            cursor.execute("""
+                INSERT INTO plc_sensor_readings_hourly
+                (asset_id, sensor_type, bucket_start, reading_count, mean_value,
+                 min_value, max_value, std_value, warning_count, critical_count)
+                SELECT
+                    asset_id,
+                    sensor_type,
+                    TIMESTAMP(DATE(reading_timestamp), MAKETIME(HOUR(reading_timestamp), 0, 0)) AS bucket_start,
+                    COUNT(*),
+                    AVG(reading_value),
+                    MIN(reading_value),
+                    MAX(reading_value),
+                    STDDEV_POP(reading_value),
+                    SUM(CASE WHEN status = 'warning' THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN status = 'critical' THEN 1 ELSE 0 END)
+                FROM plc_sensor_readings
+                WHERE reading_timestamp >= %s AND reading_timestamp < %s
+                GROUP BY asset_id, sensor_type, bucket_start
+                ON DUPLICATE KEY UPDATE
+                    reading_count = VALUES(reading_count),
+                    mean_value = VALUES(mean_value),
+                    min_value = VALUES(min_value),
+                    max_value = VALUES(max_value),
+                    std_value = VALUES(std_value),
+                    warning_count = VALUES(warning_count),
+                    critical_count = VALUES(critical_count)
+            """, (chunk_start, chunk_end))
+            written += cursor.rowcount
+            set_watermark(cursor, HOURLY_WATERMARK, chunk_end)
+            connection.commit()
+            print(f"  Hourly tier built up to {chunk_end}")
+            chunk_start = chunk_end
+        return written
+    except Error as e:
+        print(f"Error building hourly tier: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def build_daily_tier(connection):
+    """
+    Roll complete days of the hourly tier up into daily buckets. Means and
+    standard deviations are combined exactly from the hourly count/mean/std.
+    Returns the number of buckets written.
+    """
+    cursor = connection.cursor()
+    try:
+        hourly_watermark = get_watermark(cursor, HOURLY_WATERMARK)
+        if hourly_watermark is None:
+            return 0
+        until = datetime.combine(hourly_watermark.date(), datetime.min.time())
+        watermark = get_watermark(cursor, DAILY_WATERMARK)
+        if watermark is None:
+            cursor.execute("SELECT MIN(bucket_start) FROM plc_sensor_readings_hourly")
+            oldest = cursor.fetchone()[0]
+            start = datetime.combine(oldest.date(), datetime.min.time())
+        else:
+            start = watermark - timedelta(days=math.ceil(SENSOR_LATE_ARRIVAL_HOURS / 24))
+        if start >= until:
+            return 0
+
+        cursor.execute("""
+            INSERT INTO plc_sensor_readings_daily
+            (asset_id, sensor_type, bucket_date, reading_count, mean_value,
+             min_value, max_value, std_value, warning_count, critical_count)
+            SELECT asset_id, sensor_type, bucket_date, n, mean_value, min_value, max_value,
+                   SQRT(GREATEST(sum_sq / n - mean_value * mean_value, 0)),
+                   warning_count, critical_count
+            FROM (
+                SELECT
+                    asset_id,
+                    sensor_type,
+                    DATE(bucket_start) AS bucket_date,
+                    SUM(reading_count) AS n,
+                    SUM(mean_value * reading_count) / SUM(reading_count) AS mean_value,
+                    MIN(min_value) AS min_value,
+                    MAX(max_value) AS max_value,
+                    SUM(reading_count * (std_value * std_value + mean_value * mean_value)) AS sum_sq,
+                    SUM(warning_count) AS warning_count,
+                    SUM(critical_count) AS critical_count
+                FROM plc_sensor_readings_hourly
+                WHERE bucket_start >= %s AND bucket_start < %s
+                GROUP BY asset_id, sensor_type, DATE(bucket_start)
+            ) AS day_totals
+            ON DUPLICATE KEY UPDATE
+                reading_count = VALUES(reading_count),
+                mean_value = VALUES(mean_value),
+                min_value = VALUES(min_value),
+                max_value = VALUES(max_value),
+                std_value = VALUES(std_value),
+                warning_count = VALUES(warning_count),
+                critical_count = VALUES(critical_count)
+        """, (start, until))
+        written = cursor.rowcount
+        set_watermark(cursor, DAILY_WATERMARK, until)
+        connection.commit()
+        print(f"  Daily tier built up to {until.date()}")
+        return written
+    except Error as e:
+        print(f"Error building daily tier: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def enforce_raw_retention(connection, hot_days=SENSOR_RAW_HOT_DAYS):
+    """
+    Delete raw readings older than the hot window, in small batches and never
+    past the hourly watermark (data must be rolled up before it is removed).
+    For partitioned tables prefer sensor_partition_manager.py, which drops whole
+    partitions instead. Returns the number of rows deleted.
+    """
+    cursor = connection.cursor()
+    deleted = 0
+    try:
+        hourly_watermark = get_watermark(cursor, HOURLY_WATERMARK)
+        if hourly_watermark is None:
+            return 0
+        cutoff = min(datetime.now() - timedelta(days=hot_days), hourly_watermark)
+        while True:
+            cursor.execute("""
+                DELETE FROM plc_sensor_readings
+                WHERE reading_timestamp < %s
+                LIMIT %s
+            """, (cutoff, RETENTION_DELETE_BATCH))
+            connection.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < RETENTION_DELETE_BATCH:
+                break
+        print(f"Deleted {deleted} raw readings older than {cutoff}")
+        return deleted
+    finally:
+        cursor.close()
+
+
+def refresh_tier_watermarks(connection):
+    """Reload the tier watermarks used by the query router."""
+    global _TIER_WATERMARKS, _TIER_WATERMARKS_LOADED_AT
+    cursor = connection.cursor()
+    try:
+        _TIER_WATERMARKS = {name: get_watermark(cursor, watermark) for name, _, _, _, watermark in TIERS}
+        _TIER_WATERMARKS_LOADED_AT = time.monotonic()
+    finally:
+        cursor.close()
+    return _TIER_WATERMARKS
+
+
+def tier_watermarks(connection):
+    """Cached tier watermarks, reloaded once they are older than SENSOR_TIER_CACHE_SECONDS."""
+    if _TIER_WATERMARKS is None or time.monotonic() - _TIER_WATERMARKS_LOADED_AT >= SENSOR_TIER_CACHE_SECONDS:
+        return refresh_tier_watermarks(connection)
+    return _TIER_WATERMARKS
+
+
+def choose_tier(connection, start, end, resolution_seconds=86400):
+    """
+    Coarsest tier that answers [start, end) at the requested resolution:
+    the bucket size must not exceed the resolution, both bounds must be bucket
+    aligned and the tier must be built up to `end`. Returns 'daily', 'hourly'
+    or 'raw'.
+    """
+    watermarks = tier_watermarks(connection)
+    start, end = _as_datetime(start), _as_datetime(end)
+    for name, seconds, _, _, _ in TIERS:
+        watermark = watermarks.get(name)
+        aligned = all((t - datetime(t.year, t.month, t.day)).total_seconds() % seconds == 0
+                      for t in (start, end))
+        if resolution_seconds >= seconds and aligned and watermark is not None and end <= watermark:
+            return name
+    return 'raw'
+
+
+def fetch_sensor_series(connection, asset_id, sensor_type, start, end, resolution_seconds=86400):
+    """
+    Return [(bucket, mean, min, max, count)] for one sensor from the coarsest
+    tier able to answer (raw readings come back as single-reading buckets).
+    """
+    tier = choose_tier(connection, start, end, resolution_seconds)
+    cursor = connection.cursor()
+    try:
+        if tier == 'raw':
+            cursor.execute("""
+                SELECT reading_timestamp, reading_value, reading_value, reading_value, 1
+                FROM plc_sensor_readings
+                WHERE asset_id = %s AND sensor_type = %s
+                AND reading_timestamp >= %s AND reading_timestamp < %s
+                ORDER BY reading_timestamp
+            """, (asset_id, sensor_type, start, end))
+        else:
+            _, _, table, bucket_column, _ = next(t for t in TIERS if t[0] == tier)
+            cursor.execute(f"""
+                SELECT {bucket_column}, mean_value, min_value, max_value, reading_count
+                FROM {table}
+                WHERE asset_id = %s AND sensor_type = %s
+                AND {bucket_column} >= %s AND {bucket_column} < %s
+                ORDER BY {bucket_column}
+            """, (asset_id, sensor_type, start, end))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def window_averages(connection, asset_id, start, end):
+    """
+    Exact average of every sensor in [start, end) as faliure_probability_base
+    feature columns, computed from the coarsest tier that covers the window.
+    Returns None when the window can only be answered from raw readings.
+    """
+    tier = choose_tier(connection, start, end)
+    if tier == 'raw':
+        return None
+    _, _, table, bucket_column, _ = next(t for t in TIERS if t[0] == tier)
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT sensor_type, SUM(mean_value * reading_count) / SUM(reading_count)
+            FROM {table}
+            WHERE asset_id = %s
+            AND {bucket_column} >= %s AND {bucket_column} < %s
+            GROUP BY sensor_type
+        """, (asset_id, start, end))
+        averages = {sensor_type: value for sensor_type, value in cursor.fetchall()}
+    finally:
+        cursor.close()
+    return {feature: averages.get(sensor_type) for sensor_type, feature in SENSOR_FEATURES.items()}
+
+
+@instrumented_main('sensor_downsampling')
+def main(argv=None):
+    """Main ETL execution function."""
+    parser = argparse.ArgumentParser(description='Build hourly/daily sensor rollups and optionally apply raw retention.')
+    parser.add_argument('--apply-retention', action='store_true',
+                        help='Delete raw readings older than the hot window once they are rolled up')
+    parser.add_argument('--hot-days', type=int, default=SENSOR_RAW_HOT_DAYS)
+    args = parser.parse_args(argv)
+    connection = None
+
+    try:
+        print("Connecting to database...")
+        connection = get_connection()
+
+        if connection.is_connected():
+            print(f"Connected to database: {connection.database}")
+            print("Starting sensor downsampling ETL...")
+
+            hourly = build_hourly_tier(connection)
+            daily = build_daily_tier(connection)
+            print(f"\nWrote {hourly} hourly and {daily} daily bucket rows")
+            refresh_tier_watermarks(connection)
+            if args.apply_retention:
+                enforce_raw_retention(connection, args.hot_days)
+
+            print("\nETL process completed successfully!")
+
+    except Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+            print("Database connection closed")
+
+
+if __name__ == "__main__":
+    main()
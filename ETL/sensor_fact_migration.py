@@ -0,0 +1,341 @@
+"""
+Migration Tool: plc_sensor_readings -> sensors + sensor_readings
+
+Moves sensor history to the normalized schema of
+deployment/03_sensor_fact_schema.sql:
+- sensors: dimension table (asset, name, type, unit, thresholds)
+- sensor_readings: narrow fact table (sensor_id SMALLINT, ts, value FLOAT,
+  status TINYINT) clustered by (sensor_id, ts)
+
+Steps (each can be re-run safely):
+    create  Create the new tables and register the sensors
+    copy    Copy history in reading_id batches while the old table stays online;
+            progress is kept in etl_watermarks, so a later run only copies new rows
+    swap    Rename plc_sensor_readings to plc_sensor_readings_legacy, create the
+            plc_sensor_readings compatibility view and copy the remaining rows
+    report  Compare table sizes and query latency before/after
+
+Usage:
+    python ETL/sensor_fact_migration.py create
+    python ETL/sensor_fact_migration.py copy --batch-size 50000
+    python ETL/sensor_fact_migration.py report
+    python ETL/sensor_fact_migration.py swap
+"""
+
+from datetime import timedelta
+import argparse
+import os
+import statistics
+import sys
+import time
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/sensor_fact_migration.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import DB_CONFIG, Error, get_connection
+from ETL.instrumentation import instrumented_main
+from ETL.sensor_alarm_engine import sync_sensor_thresholds
+
+SCHEMA_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'deployment', '03_sensor_fact_schema.sql'
+)
+
+LEGACY_TABLE = 'plc_sensor_readings_legacy'
+WATERMARK_NAME = 'sensor_fact_migration.reading_id'
+
+# Status codes of sensor_readings.status
+STATUS_CODES = {'normal': 0, 'warning': 1, 'critical': 2}
+
+# plc_sensor_readings-compatible projection of the narrow schema
+COMPAT_VIEW_SQL = """
+    CREATE OR REPLACE VIEW plc_sensor_readings AS
+    SELECT
+        s.asset_id,
+        s.sensor_name,
+        s.sensor_type,
+        CAST(r.value AS DECIMAL(10, 4)) AS reading_value,
+        s.unit,
+        r.ts AS reading_timestamp,
+        ELT(r.status + 1, 'normal', 'warning', 'critical') AS status,
+        r.ts AS created_at
+    FROM sensor_readings r
+    JOIN sensors s ON s.sensor_id = r.sensor_id
+"""
+
+
+def _table_exists(cursor, table_name):
+    cursor.execute("""
+        SELECT TABLE_TYPE FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s
+    """, (DB_CONFIG['database'], table_name))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def readings_layout(connection):
+    """
+    'narrow' once `swap` has replaced plc_sensor_readings with the read-only
+    compatibility view (writers must then target sensor_readings), else 'wide'.
+    """
+    cursor = connection.cursor()
+    try:
+        return 'narrow' if _table_exists(cursor, 'plc_sensor_readings') == 'VIEW' else 'wide'
+    finally:
+        cursor.close()
+
+
+def _source_table(cursor):
+    """Table holding the wide-format history (legacy name after the swap)."""
+    if _table_exists(cursor, LEGACY_TABLE) == 'BASE TABLE':
+        return LEGACY_TABLE
+    return 'plc_sensor_readings'
+
+
+def _get_watermark(cursor):
+    cursor.execute("SELECT watermark_value FROM etl_watermarks WHERE watermark_name = %s",
+                   (WATERMARK_NAME,))
+    row = cursor.fetchone()
+    return int(row[0]) if row else 0
+
+
+def _set_watermark(cursor, value):
+    cursor.execute("""
+        INSERT INTO etl_watermarks (watermark_name, watermark_value)
+        VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE watermark_value = VALUES(watermark_value)
+    """, (WATERMARK_NAME, str(value)))
+
+
+def create_schema(connection):
+    """
+    Create sensors / sensor_readings, register every sensor of the old table
+    and copy the alarm engine's thresholds (ETL/sensor_alarm_engine.py, the
+    single source of truth) into sensors.
+    """
+    cursor = connection.cursor()
+    try:
+        with open(SCHEMA_FILE, 'r', encoding='utf-8') as f:
+            script = f.read()
+        for statement in script.split(';'):
+            lines = [line for line in statement.splitlines() if not line.strip().startswith('--')]
+            statement = '\n'.join(lines).strip()
+            if statement and not statement.upper().startswith('USE '):
+                cursor.execute(statement)
+
+        source = _source_table(cursor)
+        cursor.execute(f"""
+            INSERT IGNORE INTO sensors (asset_id, sensor_name, sensor_type, unit)
+            SELECT DISTINCT asset_id, sensor_name, sensor_type, unit
+            FROM {source}
+        """)
+        print(f"Registered {cursor.rowcount} new sensors")
+        connection.commit()
+        print(f"Set alarm thresholds of {sync_sensor_thresholds(connection)} sensors")
+    except Error as e:
+        print(f"Error creating normalized sensor schema: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def copy_history(connection, batch_size=50000, pause_seconds=0.0):
+    """
+    Copy rows newer than the watermark in reading_id batches. Each batch is its
+    own short transaction, so the source table stays available for writers.
+    Returns the number of rows copied.
+    """
+    cursor = connection.cursor()
+    copied = 0
+    try:
+        source = _source_table(cursor)
+        # Sensors that appeared since `create`
+        cursor.execute(f"""
+            INSERT IGNORE INTO sensors (asset_id, sensor_name, sensor_type, unit)
+            SELECT DISTINCT asset_id, sensor_name, sensor_type, unit
+            FROM {source}
+            WHERE reading_id > %s
+        """, (_get_watermark(cursor),))
+        connection.commit()
+
+        cursor.execute(f"SELECT MAX(reading_id) FROM {source}")
+        max_id = cursor.fetchone()[0] or 0
+        last_id = _get_watermark(cursor)
+        started = time.perf_counter()
+
+        while last_id < max_id:
+            upper = min(last_id + batch_size, max_id)
+            cursor.execute(f"""
+                INSERT IGNORE INTO sensor_readings (sensor_id, ts, value, status)
+                SELECT s.sensor_id, r.reading_timestamp, r.reading_value,
+                       CASE r.status WHEN 'critical' THEN 2 WHEN 'warning' THEN 1 ELSE 0 END
+                FROM {source} r
+                JOIN sensors s
+                  ON s.asset_id = r.asset_id
+                 AND s.sensor_type = r.sensor_type
+                 AND s.sensor_name = r.sensor_name
+                WHERE r.reading_id > %s AND r.reading_id <= %s
+            """, (last_id, upper))
+            copied += cursor.rowcount
+            _set_watermark(cursor, upper)
+            connection.commit()
+            last_id = upper
+
+            elapsed = time.perf_counter() - started
+            print(f"  Copied up to reading_id {last_id} / {max_id} "
+                  f"({copied} rows, {copied / elapsed if elapsed else 0:.0f} rows/s)")
+            if pause_seconds:
+                time.sleep(pause_seconds)
+
+        print(f"\nCopied {copied} rows into sensor_readings")
+        return copied
+    except Error as e:
+        print(f"Error copying sensor history: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def swap_tables(connection, batch_size=50000):
+    """
+    Rename the wide table to plc_sensor_readings_legacy, replace it with the
+    compatibility view, then copy the rows written since the last `copy`.
+    Writers must target sensor_readings after the swap: plc_ingestion.py and
+    sensor_alarm_engine.py switch to it automatically (see readings_layout).
+    """
+    cursor = connection.cursor()
+    try:
+        if _table_exists(cursor, 'plc_sensor_readings') == 'BASE TABLE':
+            cursor.execute(f"RENAME TABLE plc_sensor_readings TO {LEGACY_TABLE}")
+            print(f"Renamed plc_sensor_readings to {LEGACY_TABLE}")
+        cursor.execute(COMPAT_VIEW_SQL)
+        print("Created compatibility view plc_sensor_readings")
+    finally:
+        cursor.close()
+    copy_history(connection, batch_size=batch_size)
+
+
+def _table_bytes(cursor, table_names):
+    placeholders = ', '.join(['%s'] * len(table_names))
+    cursor.execute(f"""
+        SELECT COALESCE(SUM(DATA_LENGTH), 0), COALESCE(SUM(INDEX_LENGTH), 0), COALESCE(SUM(TABLE_ROWS), 0)
+        FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME IN ({placeholders})
+    """, (DB_CONFIG['database'], *table_names))
+    data_length, index_length, rows = cursor.fetchone()
+    return int(data_length), int(index_length), int(rows)
+
+
+def _median_latency_ms(cursor, query, params, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def report(connection, repeats=5):
+    """Print storage and query-latency comparison of the old and new layouts."""
+    cursor = connection.cursor()
+    try:
+        source = _source_table(cursor)
+        cursor.execute(f"ANALYZE TABLE {source}, sensors, sensor_readings")
+        cursor.fetchall()
+
+        old = _table_bytes(cursor, [source])
+        new = _table_bytes(cursor, ['sensors', 'sensor_readings'])
+        print("\nStorage (INFORMATION_SCHEMA estimates):")
+        for label, (data_length, index_length, rows) in ((source, old), ('sensors + sensor_readings', new)):
+            total = data_length + index_length
+            print(f"  {label:<28} data {data_length / 1e6:9.2f} MB  indexes {index_length / 1e6:9.2f} MB  "
+                  f"total {total / 1e6:9.2f} MB  ({total / max(rows, 1):.1f} bytes/row)")
+
+        cursor.execute(f"SELECT asset_id, MAX(reading_timestamp) FROM {source} GROUP BY asset_id LIMIT 1")
+        row = cursor.fetchone()
+        if not row:
+            print("No readings to benchmark.")
+            return
+        asset_id, last_ts = row
+        window = (asset_id, last_ts - timedelta(days=30), last_ts)
+
+        queries = {
+            '30-day sensor averages (feature ETL)': (
+                f"""SELECT sensor_type, AVG(reading_value) FROM {source}
+                    WHERE asset_id = %s AND reading_timestamp BETWEEN %s AND %s
+                    GROUP BY sensor_type""",
+                """SELECT s.sensor_type, AVG(r.value) FROM sensors s
+                    JOIN sensor_readings r ON r.sensor_id = s.sensor_id
+                    AND r.ts BETWEEN %s AND %s
+                    WHERE s.asset_id = %s
+                    GROUP BY s.sensor_type""",
+                window, (window[1], window[2], asset_id),
+            ),
+            '30-day warning/critical counts (risk ETL)': (
+                f"""SELECT COUNT(*), SUM(CASE WHEN status = 'critical' THEN 1 ELSE 0 END) FROM {source}
+                    WHERE asset_id = %s AND reading_timestamp BETWEEN %s AND %s
+                    AND status IN ('warning', 'critical')""",
+                """SELECT COUNT(*), SUM(CASE WHEN r.status = 2 THEN 1 ELSE 0 END) FROM sensors s
+                    JOIN sensor_readings r ON r.sensor_id = s.sensor_id
+                    AND r.ts BETWEEN %s AND %s
+                    WHERE s.asset_id = %s AND r.status > 0""",
+                window, (window[1], window[2], asset_id),
+            ),
+        }
+        print(f"\nQuery latency (median of {repeats}, asset_id {asset_id}):")
+        for label, (old_sql, new_sql, old_params, new_params) in queries.items():
+            old_ms = _median_latency_ms(cursor, old_sql, old_params, repeats)
+            new_ms = _median_latency_ms(cursor, new_sql, new_params, repeats)
+            print(f"  {label:<42} before {old_ms:8.2f} ms  after {new_ms:8.2f} ms")
+    finally:
+        cursor.close()
+
+
+@instrumented_main('sensor_fact_migration')
+def main(argv=None):
+    """Main migration execution function."""
+    parser = argparse.ArgumentParser(description='Migrate plc_sensor_readings to the normalized sensor schema.')
+    parser.add_argument('step', choices=['create', 'copy', 'swap', 'report'])
+    parser.add_argument('--batch-size', type=int, default=50000)
+    parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between copy batches')
+    args = parser.parse_args(argv)
+    connection = None
+
+    try:
+        print("Connecting to database...")
+        connection = get_connection(backend='mysql')
+
+        if connection.is_connected():
+            print(f"Connected to database: {connection.database}")
+
+            if args.step == 'create':
+                create_schema(connection)
+            elif args.step == 'copy':
+                copy_history(connection, batch_size=args.batch_size, pause_seconds=args.pause)
+            elif args.step == 'swap':
+                swap_tables(connection, batch_size=args.batch_size)
+            else:
+                report(connection)
+
+            print("\nMigration step completed successfully!")
+
+    except Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+            print("Database connection closed")
+
+
+if __name__ == "__main__":
+    main()
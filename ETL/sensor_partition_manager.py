@@ -0,0 +1,324 @@
+"""
+Partition and Retention Manager for Sensor Readings
+
+Keeps the sensor reading table in monthly RANGE partitions
+(PARTITION BY RANGE (TO_DAYS(<timestamp>)), one partition pYYYYMM per month
+plus a p_future catch-all):
+- convert   Partition the existing table. For plc_sensor_readings this drops the
+            foreign key to assets and extends the primary key to
+            (reading_id, reading_timestamp), as required by InnoDB partitioning.
+- maintain  Pre-create the partitions of the next months (split from p_future)
+            and enforce the retention policy: partitions older than the retention
+            window are archived to compressed CSV files first, then dropped or
+            exchanged into a standalone archive table.
+- verify    Run EXPLAIN on the feature ETL 30-day window query and check that the
+            optimizer prunes to the partitions covering the window.
+
+Usage:
+    python ETL/sensor_partition_manager.py convert
+    python ETL/sensor_partition_manager.py maintain --retention-months 24 --mode drop
+    python ETL/sensor_partition_manager.py verify
+"""
+
+from datetime import date, datetime, timedelta
+import argparse
+import csv
+import gzip
+import os
+import sys
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/sensor_partition_manager.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import DB_CONFIG, Error, get_connection
+from ETL.instrumentation import instrumented_main
+
+# Partitionable tables and their time column
+PARTITION_TABLES = {
+    'plc_sensor_readings': 'reading_timestamp',
+    'sensor_readings': 'ts',
+}
+
+SENSOR_RETENTION_MONTHS = int(os.getenv('SENSOR_RETENTION_MONTHS', 24))
+PARTITION_FUTURE_MONTHS = int(os.getenv('PARTITION_FUTURE_MONTHS', 3))
+PARTITION_ARCHIVE_DIR = os.getenv('PARTITION_ARCHIVE_DIR', 'archive')
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month):
+    return f"p{month.year:04d}{month.month:02d}"
+
+
+def _partition_month(name):
+    """Month stored in partition pYYYYMM (None for p_future)."""
+    if len(name) != 7 or not name[1:].isdigit():
+        return None
+    return date(int(name[1:5]), int(name[5:7]), 1)
+
+
+def _partition_clause(month):
+    upper = _add_months(month, 1)
+    return f"PARTITION {_partition_name(month)} VALUES LESS THAN (TO_DAYS('{upper.isoformat()}'))"
+
+
+def get_partitions(cursor, table):
+    """Return [(partition_name, table_rows)] ordered by position ([] if not partitioned)."""
+    cursor.execute("""
+        SELECT PARTITION_NAME, TABLE_ROWS
+        FROM INFORMATION_SCHEMA.PARTITIONS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (DB_CONFIG['database'], table))
+    return [(row[0], row[1]) for row in cursor.fetchall()]
+
+
+def convert_table(connection, table, future_months=PARTITION_FUTURE_MONTHS):
+    """Partition `table` by month, from its oldest reading to future_months ahead."""
+    time_column = PARTITION_TABLES[table]
+    cursor = connection.cursor()
+    try:
+        if get_partitions(cursor, table):
+            print(f"{table} is already partitioned")
+            return
+
+        cursor.execute(f"SELECT MIN({time_column}) FROM {table}")
+        oldest = cursor.fetchone()[0] or datetime.now()
+        first_month = _month_start(oldest)
+        last_month = _add_months(_month_start(date.today()), future_months)
+
+        # InnoDB partitioned tables cannot have foreign keys
+        cursor.execute("""
+            SELECT CONSTRAINT_NAME FROM INFORMATION_SCHEMA.REFERENTIAL_CONSTRAINTS
+            WHERE CONSTRAINT_SCHEMA = %s AND TABLE_NAME = %s
+        """, (DB_CONFIG['database'], table))
+        for (constraint_name,) in cursor.fetchall():
+            print(f"Dropping foreign key {constraint_name}")
+            cursor.execute(f"ALTER TABLE {table} DROP FOREIGN KEY {constraint_name}")
+
+        # Every unique key must contain the partitioning column
+        cursor.execute("""
+            SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND CONSTRAINT_NAME = 'PRIMARY'
+            ORDER BY ORDINAL_POSITION
+        """, (DB_CONFIG['database'], table))
+        pk_columns = [row[0] for row in cursor.fetchall()]
+        if time_column not in pk_columns:
+            new_pk = ', '.join(pk_columns + [time_column])
+            print(f"Extending primary key to ({new_pk})")
+            cursor.execute(f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY ({new_pk})")
+
+        clauses = []
+        month = first_month
+        while month <= last_month:
+            clauses.append(_partition_clause(month))
+            month = _add_months(month, 1)
+        clauses.append("PARTITION p_future VALUES LESS THAN MAXVALUE")
+
+        print(f"Partitioning {table} into {len(clauses)} partitions "
+              f"({_partition_name(first_month)} .. {_partition_name(last_month)}, p_future)...")
+        cursor.execute(f"""
+            ALTER TABLE {table}
+            PARTITION BY RANGE (TO_DAYS({time_column})) (
+                {', '.join(clauses)}
+            )
+        """)
+        print(f"{table} partitioned by month")
+    finally:
+        cursor.close()
+
+
+def create_future_partitions(connection, table, future_months=PARTITION_FUTURE_MONTHS):
+    """Split p_future so that monthly partitions exist up to future_months ahead."""
+    cursor = connection.cursor()
+    try:
+        months = [m for m in (_partition_month(name) for name, _ in get_partitions(cursor, table)) if m]
+        if not months:
+            print(f"{table} is not partitioned; run 'convert' first")
+            return 0
+        target = _add_months(_month_start(date.today()), future_months)
+        new_months = []
+        month = _add_months(max(months), 1)
+        while month <= target:
+            new_months.append(month)
+            month = _add_months(month, 1)
+        if not new_months:
+            return 0
+
+        clauses = [_partition_clause(m) for m in new_months]
+        clauses.append("PARTITION p_future VALUES LESS THAN MAXVALUE")
+        cursor.execute(f"""
+            ALTER TABLE {table}
+            REORGANIZE PARTITION p_future INTO (
+                {', '.join(clauses)}
+            )
+        """)
+        print(f"Created partitions {', '.join(_partition_name(m) for m in new_months)}")
+        return len(new_months)
+    finally:
+        cursor.close()
+
+
+def archive_partition(connection, table, partition_name, archive_dir=PARTITION_ARCHIVE_DIR):
+    """
+    Write every row of one partition to <archive_dir>/<table>_<partition>.csv.gz
+    and verify the row count. Returns (path, rows).
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{table}_{partition_name}.csv.gz")
+    tmp_path = path + '.tmp'
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM {table} PARTITION ({partition_name})")
+        expected = cursor.fetchone()[0]
+
+        cursor.execute(f"SELECT * FROM {table} PARTITION ({partition_name})")
+        columns = [desc[0] for desc in cursor.description]
+        written = 0
+        with gzip.open(tmp_path, 'wt', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            while True:
+                rows = cursor.fetchmany(10000)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                written += len(rows)
+    finally:
+        cursor.close()
+
+    if written != expected:
+        os.remove(tmp_path)
+        raise RuntimeError(f"Archive of {table}.{partition_name} incomplete: {written} of {expected} rows")
+    os.replace(tmp_path, path)
+    return path, written
+
+
+def enforce_retention(connection, table, retention_months=SENSOR_RETENTION_MONTHS,
+                      mode='drop', archive_dir=PARTITION_ARCHIVE_DIR):
+    """
+    Archive and remove every monthly partition that ends before the retention
+    window. mode='drop' drops the partition; mode='exchange' moves its rows into
+    a standalone table <table>_<partition> (instant metadata swap) before
+    dropping the then-empty partition.
+    """
+    cutoff = _add_months(_month_start(date.today()), -retention_months)
+    cursor = connection.cursor()
+    removed = 0
+    try:
+        for name, _ in get_partitions(cursor, table):
+            month = _partition_month(name)
+            if month is None or _add_months(month, 1) > cutoff:
+                continue
+
+            path, rows = archive_partition(connection, table, name, archive_dir)
+            print(f"Archived {table}.{name}: {rows} rows -> {path}")
+
+            if mode == 'exchange':
+                archive_table = f"{table}_{name}"
+                cursor.execute(f"CREATE TABLE {archive_table} LIKE {table}")
+                cursor.execute(f"ALTER TABLE {archive_table} REMOVE PARTITIONING")
+                cursor.execute(f"ALTER TABLE {table} EXCHANGE PARTITION {name} WITH TABLE {archive_table}")
+                print(f"Exchanged {table}.{name} into {archive_table}")
+
+            cursor.execute(f"ALTER TABLE {table} DROP PARTITION {name}")
+            removed += 1
+        print(f"Retention ({retention_months} months): removed {removed} partition(s) of {table}")
+        return removed
+    finally:
+        cursor.close()
+
+
+def verify_pruning(connection, table, window_days=30):
+    """
+    EXPLAIN the feature ETL window query for the most recent window and check
+    that it only touches the partitions overlapping it. Returns the partitions.
+    """
+    time_column = PARTITION_TABLES[table]
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(f"SELECT MAX({time_column}) AS last_ts FROM {table}")
+        last_ts = cursor.fetchone()['last_ts'] or datetime.now()
+        window_end = datetime.combine(last_ts.date() + timedelta(days=1), datetime.min.time())
+        window_start = window_end - timedelta(days=window_days + 1)
+
+        filter_column = 'asset_id' if table == 'plc_sensor_readings' else 'sensor_id'
+        cursor.execute(f"""
+            EXPLAIN SELECT AVG({'reading_value' if table == 'plc_sensor_readings' else 'value'})
+            FROM {table}
+            WHERE {filter_column} = 1
+            AND {time_column} >= %s AND {time_column} < %s
+        """, (window_start, window_end))
+        plan = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    partitions = (plan[0].get('partitions') or '').split(',') if plan else []
+    expected = set()
+    month = _month_start(window_start)
+    while month < window_end.date():
+        expected.add(_partition_name(month))
+        month = _add_months(month, 1)
+
+    print(f"Window {window_start:%Y-%m-%d} .. {window_end:%Y-%m-%d} reads partitions: {', '.join(partitions)}")
+    if not partitions or not set(partitions) <= expected | {'p_future'}:
+        raise RuntimeError(f"Partition pruning not effective on {table}: expected {sorted(expected)}")
+    print("Partition pruning verified")
+    return partitions
+
+
+@instrumented_main('sensor_partition_manager')
+def main(argv=None):
+    """Main partition manager execution function."""
+    parser = argparse.ArgumentParser(description='Monthly partitioning and retention for sensor readings.')
+    parser.add_argument('step', choices=['convert', 'maintain', 'verify'])
+    parser.add_argument('--table', choices=sorted(PARTITION_TABLES), default='plc_sensor_readings')
+    parser.add_argument('--future-months', type=int, default=PARTITION_FUTURE_MONTHS)
+    parser.add_argument('--retention-months', type=int, default=SENSOR_RETENTION_MONTHS)
+    parser.add_argument('--mode', choices=['drop', 'exchange'], default='drop')
+    parser.add_argument('--archive-dir', default=PARTITION_ARCHIVE_DIR)
+    args = parser.parse_args(argv)
+    connection = None
+
+    try:
+        print("Connecting to database...")
+        connection = get_connection(backend='mysql')
+
+        if connection.is_connected():
+            print(f"Connected to database: {connection.database}")
+
+            if args.step == 'convert':
+                convert_table(connection, args.table, args.future_months)
+            elif args.step == 'maintain':
+                create_future_partitions(connection, args.table, args.future_months)
+                enforce_retention(connection, args.table, args.retention_months,
+                                  args.mode, args.archive_dir)
+            else:
+                verify_pruning(connection, args.table)
+
+            print("\nPartition maintenance completed successfully!")
+
+    except Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+            print("Database connection closed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+ETL Script for Regular-Grid Resampling of Sensor Series
+
+Projects plc_sensor_readings onto a regular per-asset time grid and returns
+dense NumPy arrays shaped (asset, time, sensor), so windowed feature code can
+work on whole arrays instead of looping over rows.
+
+All series of a block of assets are resampled in one vectorized operation:
+each series is shifted onto its own stretch of a single time axis
+(series_index * span + offset), so one searchsorted / bincount call covers the
+whole block. Fill methods:
+- 'nan':    mean of the readings in each grid bucket, NaN where there are none
+- 'ffill':  last reading at or before the grid point
+- 'linear': linear interpolation between the readings around the grid point
+'ffill' and 'linear' never bridge gaps longer than RESAMPLE_MAX_GAP_MINUTES;
+those grid points stay NaN.
+
+Memory is bounded by processing RESAMPLE_BLOCK_ASSETS assets at a time
+(iter_resampled_blocks): a block holds assets x grid points x sensors
+float32 values plus that block's readings.
+
+Usage:
+    python ETL/sensor_resampling.py --start 2022-01-01 --end 2023-01-01 --interval-minutes 60
+    python ETL/sensor_resampling.py --method linear --output-dir resampled
+"""
+
+from datetime import datetime
+import argparse
+import os
+import sys
+import numpy as np
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/sensor_resampling.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import Error, get_connection
+from ETL.instrumentation import instrumented_main
+from ETL.sensor_columnar_store import SENSOR_FEATURES
+
+RESAMPLE_METHODS = ('nan', 'ffill', 'linear')
+RESAMPLE_MAX_GAP_MINUTES = int(os.getenv('RESAMPLE_MAX_GAP_MINUTES', 720))
+RESAMPLE_BLOCK_ASSETS = int(os.getenv('RESAMPLE_BLOCK_ASSETS', 64))
+
+# Sensor axis of the resampled arrays
+SENSOR_AXIS = tuple(SENSOR_FEATURES)
+
+
+def make_grid(start, end, interval_minutes):
+    """Grid points start, start + interval, ... < end as datetime64[s]."""
+    return np.arange(np.datetime64(start, 's'), np.datetime64(end, 's'),
+                     np.timedelta64(interval_minutes * 60, 's'))
+
+
+def resample(series_index, timestamps, values, n_series, grid, method='nan',
+             max_gap_minutes=RESAMPLE_MAX_GAP_MINUTES):
+    """
+    Resample many series onto the same grid at once.
+
+    series_index: int series number of every reading (0..n_series-1)
+    timestamps: datetime64[s]; values: float
+    Returns a float32 array (n_series, len(grid)).
+    """
+    if method not in RESAMPLE_METHODS:
+        raise ValueError(f"Unknown resampling method: {method} (expected one of {RESAMPLE_METHODS})")
+    n_grid = len(grid)
+    result = np.full((n_series, n_grid), np.nan, dtype=np.float32)
+    if len(values) == 0 or n_grid == 0:
+        return result
+
+    step = int((grid[1] - grid[0]) / np.timedelta64(1, 's')) if n_grid > 1 else 1
+    origin = grid[0]
+    # Every series gets its own stretch of one axis, wider than any lookback
+    span = n_grid * step + 2 * max_gap_minutes * 60 + 2 * step
+    offsets = (timestamps - origin).astype(np.int64)
+    keep = (offsets >= -max_gap_minutes * 60) & (offsets < n_grid * step + max_gap_minutes * 60)
+    series_index, offsets, values = series_index[keep], offsets[keep], np.asarray(values, dtype=np.float64)[keep]
+    if len(values) == 0:
+        return result
+    position = series_index.astype(np.int64) * span + offsets
+    order = np.argsort(position, kind='stable')
+    position, values, series_index = position[order], values[order], series_index[order]
+
+    if method == 'nan':
+        inside = (offsets[order] >= 0) & (offsets[order] < n_grid * step)
+        cell = series_index[inside].astype(np.int64) * n_grid + offsets[order][inside] // step
+        sums = np.bincount(cell, weights=values[inside], minlength=n_series * n_grid)
+        counts = np.bincount(cell, minlength=n_series * n_grid)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result[:] = np.where(counts > 0, sums / counts, np.nan).reshape(n_series, n_grid)
+        return result
+
+    grid_series = np.repeat(np.arange(n_series, dtype=np.int64), n_grid)
+    grid_position = grid_series * span + np.tile(np.arange(n_grid, dtype=np.int64) * step, n_series)
+    max_gap = max_gap_minutes * 60
+    prev = np.searchsorted(position, grid_position, side='right') - 1
+    prev_ok = prev >= 0
+    prev_ok[prev_ok] = series_index[prev[prev_ok]] == grid_series[prev_ok]
+    prev_clipped = np.maximum(prev, 0)
+    age = grid_position - position[prev_clipped]
+
+    if method == 'ffill':
+        filled = np.where(prev_ok & (age <= max_gap), values[prev_clipped], np.nan)
+    else:
+        nxt = np.minimum(prev + 1, len(position) - 1)
+        next_ok = (prev + 1 < len(position)) & (series_index[nxt] == grid_series)
+        exact = prev_ok & (age == 0)
+        width = position[nxt] - position[prev_clipped]
+        bridge = prev_ok & next_ok & (width <= max_gap) & (width > 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fraction = np.where(bridge, age / np.where(width > 0, width, 1), 0.0)
+        interpolated = values[prev_clipped] + fraction * (values[nxt] - values[prev_clipped])
+        filled = np.where(exact, values[prev_clipped], np.where(bridge, interpolated, np.nan))
+    result[:] = filled.reshape(n_series, n_grid)
+    return result
+
+
+def resample_block(cursor, asset_ids, grid, method='nan', max_gap_minutes=RESAMPLE_MAX_GAP_MINUTES):
+    """
+    Load the readings of a block of assets (plus the lookback needed for
+    filling) and resample them. Returns float32 (len(asset_ids), len(grid), len(SENSOR_AXIS)).
+    """
+    lookback = np.timedelta64(max_gap_minutes * 60, 's')
+    step = grid[1] - grid[0] if len(grid) > 1 else np.timedelta64(1, 's')
+    placeholders = ', '.join(['%s'] * len(asset_ids))
+    cursor.execute(f"""
+        SELECT asset_id, sensor_type, reading_timestamp, reading_value
+        FROM plc_sensor_readings
+        WHERE asset_id IN ({placeholders})
+        AND reading_timestamp >= %s AND reading_timestamp < %s
+    """, list(asset_ids) + [(grid[0] - lookback).astype(datetime), (grid[-1] + step + lookback).astype(datetime)])
+    rows = cursor.fetchall()
+
+    asset_position = {asset_id: i for i, asset_id in enumerate(asset_ids)}
+    sensor_position = {sensor_type: j for j, sensor_type in enumerate(SENSOR_AXIS)}
+    rows = [row for row in rows if row[1] in sensor_position]
+    n_sensors = len(SENSOR_AXIS)
+    # Series number = asset position * sensors + sensor position -> reshapes to (asset, sensor, time)
+    series_index = np.array([asset_position[r[0]] * n_sensors + sensor_position[r[1]] for r in rows], dtype=np.int64)
+    timestamps = np.array([r[2] for r in rows], dtype='datetime64[s]')
+    values = np.array([float(r[3]) for r in rows])
+
+    resampled = resample(series_index, timestamps, values, len(asset_ids) * n_sensors, grid,
+                         method, max_gap_minutes)
+    return resampled.reshape(len(asset_ids), n_sensors, len(grid)).transpose(0, 2, 1)
+
+
+def iter_resampled_blocks(connection, start, end, interval_minutes, method='nan',
+                          block_assets=RESAMPLE_BLOCK_ASSETS, asset_ids=None):
+    """
+    Yield (asset_ids, grid, array) per block of assets; array is
+    float32 (assets, time, sensor) with the sensor axis in SENSOR_AXIS order.
+    """
+    cursor = connection.cursor()
+    try:
+        if asset_ids is None:
+            cursor.execute("SELECT asset_id FROM assets ORDER BY asset_id")
+            asset_ids = [row[0] for row in cursor.fetchall()]
+        grid = make_grid(start, end, interval_minutes)
+        for offset in range(0, len(asset_ids), block_assets):
+            block = asset_ids[offset:offset + block_assets]
+            yield block, grid, resample_block(cursor, block, grid, method)
+    finally:
+        cursor.close()
+
+
+def rolling_nanmean(array, window):
+    """
+    Mean over the last `window` grid points along axis 1, ignoring NaN
+    (NaN where the whole window is empty). Cumulative sums, no Python loops.
+    """
+    valid = ~np.isnan(array)
+    sums = np.cumsum(np.where(valid, array, 0.0), axis=1, dtype=np.float64)
+    counts = np.cumsum(valid, axis=1)
+    lagged_sums = np.zeros_like(sums)
+    lagged_counts = np.zeros_like(counts)
+    lagged_sums[:, window:] = sums[:, :-window]
+    lagged_counts[:, window:] = counts[:, :-window]
+    window_counts = counts - lagged_counts
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(window_counts > 0, (sums - lagged_sums) / window_counts, np.nan)
+
+
+@instrumented_main('sensor_resampling')
+def main(argv=None):
+    """Resample sensor history onto a regular grid, block by block."""
+    parser = argparse.ArgumentParser(description='Resample plc_sensor_readings onto a regular time grid.')
+    parser.add_argument('--start', default='2022-01-01', help='First grid point (YYYY-MM-DD)')
+    parser.add_argument('--end', default='2023-01-01', help='End of the grid, exclusive (YYYY-MM-DD)')
+    parser.add_argument('--interval-minutes', type=int, default=60)
+    parser.add_argument('--method', choices=RESAMPLE_METHODS, default='nan')
+    parser.add_argument('--block-assets', type=int, default=RESAMPLE_BLOCK_ASSETS)
+    parser.add_argument('--output-dir', help='Write each block to <output-dir>/block_<n>.npz')
+    args = parser.parse_args(argv)
+    connection = None
+
+    try:
+        print("Connecting to database...")
+        connection = get_connection()
+
+        if connection.is_connected():
+            print(f"Connected to database: {connection.database}")
+            print(f"Resampling sensor readings ({args.interval_minutes}-minute grid, method '{args.method}')...")
+            if args.output_dir:
+                os.makedirs(args.output_dir, exist_ok=True)
+
+            blocks = iter_resampled_blocks(connection, datetime.fromisoformat(args.start),
+                                           datetime.fromisoformat(args.end), args.interval_minutes,
+                                           args.method, args.block_assets)
+            for n, (asset_ids, grid, array) in enumerate(blocks):
+                filled = float(np.mean(~np.isnan(array))) if array.size else 0.0
+                print(f"  Block {n}: assets {asset_ids[0]}-{asset_ids[-1]}, shape {array.shape}, "
+                      f"{100 * filled:.1f}% filled, {array.nbytes / 1e6:.1f} MB")
+                if args.output_dir:
+                    np.savez(os.path.join(args.output_dir, f"block_{n}.npz"), asset_ids=np.array(asset_ids),
+                             grid=grid, sensors=np.array(SENSOR_AXIS), values=array)
+
+    except Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+            print("Database connection closed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,690 @@
+"""
+Synthetic Fleet Data Generator for Benchmarks
+
+Scalable replacement for the stored procedures of
+deployment/02_insert_sample_data.sql. It generates employees, assets, PLC
+sensor readings, failures, visual-inspection orders with their tasks, and
+asset costs for any number of assets and years. It keeps the sample data's
+structure:
+- The same sensor value ranges and status thresholds per asset profile.
+  Profiles 1-4 are hydraulic pumps; 5-8 are electric motors, whose pressure
+  and flow are 0.
+- The same failure precursor: noise and spikes ramp up over the 3 days before
+  each failure, peak on the failure day, and the day after has no data.
+- The same order / task / cost structure.
+
+Each asset is generated with NumPy from its own random stream, seeded by
+(--seed, asset_id). The output is therefore identical for a given seed no
+matter how assets are batched. Ids are assigned explicitly, so all outputs
+agree with each other.
+
+Outputs (any combination):
+- --csv-dir DIR: one CSV per table, plus load_data.sql. That file holds the
+  LOAD DATA LOCAL INFILE statements, in foreign key order. This is the
+  fastest way to load a large fleet into MySQL.
+- --db: insert into the configured database through ETL.db. Inserts use
+  executemany, with one transaction per block of assets. With
+  DB_BACKEND=sqlite this builds a local benchmark database; the readings
+  indexes are dropped for the load and rebuilt at the end.
+- --store-dir DIR: sensor readings into the columnar store
+  (sensor_columnar_store.py). Add --store-only-readings to keep the readings
+  out of the CSV files and the database. The feature ETL then reads them from
+  SENSOR_STORE_DIR.
+
+Usage:
+    DB_BACKEND=sqlite SQLITE_PATH=bench.sqlite python ETL/synthetic_fleet.py --assets 100 --years 1 --db --reset
+    python ETL/synthetic_fleet.py --assets 1000 --years 5 --csv-dir fleet_csv
+    mysql --local-infile=1 palantir_maintenance < fleet_csv/load_data.sql
+    python ETL/synthetic_fleet.py --assets 1000 --years 5 --db --store-dir sensor_store --store-only-readings
+"""
+
+import argparse
+import csv
+import math
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+import numpy as np
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/synthetic_fleet.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import DB_BACKEND, Error, get_connection
+from ETL.instrumentation import instrumented_main, stage
+from ETL.plc_ingestion import PLC_SENSORS
+from ETL.sensor_columnar_store import SensorColumnarStore
+
+# Generated tables in foreign key order, with the columns written for each.
+# Readings, failures and costs leave their id to AUTO_INCREMENT.
+TABLE_COLUMNS = {
+    'mantainance_employees': (
+        'employee_id', 'first_name', 'last_name', 'email', 'phone', 'hire_date',
+        'department', 'position', 'salary',
+    ),
+    'assets': (
+        'asset_id', 'asset_name', 'asset_type', 'location', 'installation_date',
+        'manufacturer', 'model_number', 'status',
+    ),
+    'assets_faliures': (
+        'asset_id', 'failure_date', 'failure_type', 'severity', 'description',
+        'root_cause', 'downtime_hours', 'resolved', 'resolution_date',
+    ),
+    'asset_costs': (
+        'asset_id', 'cost_type', 'amount', 'cost_date', 'description', 'vendor', 'invoice_number',
+    ),
+    'plc_sensor_readings': (
+        'asset_id', 'sensor_name', 'sensor_type', 'reading_value', 'unit', 'reading_timestamp', 'status',
+    ),
+    'mantainance_orders': (
+        'order_id', 'asset_id', 'assigned_employee_id', 'order_type', 'priority', 'description',
+        'scheduled_date', 'start_date', 'completion_date', 'status', 'estimated_cost', 'actual_cost',
+    ),
+    'mantainance_tasks': (
+        'order_id', 'task_name', 'task_description', 'assigned_employee_id', 'status',
+        'estimated_hours', 'actual_hours', 'start_time', 'end_time', 'notes',
+    ),
+}
+
+FIRST_NAMES = ['John', 'Maria', 'David', 'Sarah', 'Michael', 'Emily', 'Robert', 'Lisa']
+LAST_NAMES = ['Smith', 'Garcia', 'Johnson', 'Williams', 'Brown', 'Davis', 'Miller', 'Wilson']
+DEPARTMENTS = [
+    ('Mechanical', 'Technician', 55000.0), ('Electrical', 'Technician', 58000.0),
+    ('Mechanical', 'Senior Technician', 65000.0), ('HVAC', 'Lead Technician', 72000.0),
+    ('Electrical', 'Junior Technician', 48000.0), ('Power Systems', 'Senior Engineer', 85000.0),
+]
+
+ASSET_MODELS = {
+    'Hydraulic Pump': [('Grundfos', 'CR-32'), ('Parker', 'P1-45'), ('Bosch Rexroth', 'A10VSO'), ('Eaton', 'Vickers')],
+    'Electric Motor': [('ABB', 'M2BA-132'), ('Siemens', '1LE0'), ('WEG', 'W22'), ('Baldor', 'EM3767T')],
+}
+ASSET_AREAS = {
+    'Hydraulic Pump': ['Floor 2', 'Basement', 'Production', 'Fluid Room'],
+    'Electric Motor': ['Assembly Line', 'Conveyor', 'Machine Shop', 'Packaging'],
+}
+
+# failure_type -> [(description, root_cause)] taken from the sample failures
+FAILURE_TYPES = {
+    'Hydraulic Pump': ['Ball Bearing Failure', 'Cavitation'],
+    'Electric Motor': ['Ball Bearing Failure', 'Motor Overload'],
+}
+FAILURE_DETAILS = {
+    'Ball Bearing Failure': [
+        ('Pump ball bearing wear detected', 'Normal wear from continuous operation'),
+        ('Bearing cage failure', 'Contamination'),
+        ('Ball bearing seizure', 'Lack of lubrication'),
+        ('Inner race spalling', 'Fatigue'),
+        ('Bearing outer race damage', 'Vibration'),
+        ('Bearing grease degradation', 'High ambient temperature'),
+    ],
+    'Cavitation': [
+        ('Cavitation damage to impeller', 'Low inlet pressure and NPSH'),
+        ('Cavitation pitting on casing', 'Air ingress in suction line'),
+        ('Cavitation erosion', 'High fluid temperature'),
+        ('Severe cavitation damage', 'Blocked suction filter'),
+    ],
+    'Motor Overload': [
+        ('Winding burnout from overload', 'Sustained overload'),
+        ('Stator burnout', 'Electrical overload'),
+        ('Thermal overload trip', 'Blocked cooling'),
+        ('Rotor bar damage from overload', 'Starting overload'),
+    ],
+}
+REPAIR_DESCRIPTIONS = {
+    'Ball Bearing Failure': 'Ball bearing replacement',
+    'Cavitation': 'Cavitation damage repair',
+    'Motor Overload': 'Winding burnout from overload',
+}
+SEVERITIES = ['low', 'medium', 'high', 'critical']
+SEVERITY_WEIGHTS = [0.3, 0.45, 0.18, 0.07]
+# severity -> (downtime hours range, repair cost range)
+SEVERITY_IMPACT = {
+    'low': ((1.0, 3.0), (1000.0, 1600.0)),
+    'medium': ((3.0, 6.0), (1500.0, 2400.0)),
+    'high': ((6.0, 24.0), (2200.0, 3200.0)),
+    'critical': ((12.0, 24.0), (3000.0, 4500.0)),
+}
+
+# Intensity of the failure precursor on the 3 days before and on the failure day
+PRECURSOR_INTENSITY = (0.25, 0.75, 1.25, 1.75)
+# Failures are at least this many days apart so precursor windows never overlap
+MIN_FAILURE_SPACING_DAYS = 6
+STATUS_NAMES = np.array(['normal', 'warning', 'critical'])
+
+
+def profile_of(asset_id):
+    """Sample-data profile 1-8 of an asset (1-4 pumps, 5-8 motors)."""
+    return (asset_id - 1) % 8 + 1
+
+
+def _status(sensor_type, values, power_base=None):
+    """Status codes (0 normal, 1 warning, 2 critical) of the sample data rules."""
+    codes = np.zeros(len(values), dtype=np.int8)
+    if sensor_type == 'vibration':
+        codes[values > 4.0] = 1
+        codes[values > 6.0] = 2
+    elif sensor_type == 'current':
+        codes[values > 30] = 1
+        codes[values > 35] = 2
+    elif sensor_type == 'rpm':
+        codes[(values < 1200) | (values > 1800)] = 1
+    elif sensor_type == 'power':
+        codes[values > power_base * 1.2] = 1
+    elif sensor_type == 'pressure':
+        codes[(values != 0) & ((values < 2.5) | (values > 6.0))] = 1
+    elif sensor_type == 'flow':
+        codes[(values != 0) & ((values < 50) | (values > 150))] = 1
+    return codes
+
+
+class FleetGenerator:
+    """Generates the sample data structure for `n_assets` over `years` from `start`."""
+
+    def __init__(self, n_assets, years=1.0, start=date(2022, 1, 1), samples_per_day=4,
+                 failure_rate=3.0, orders_per_year=40.0, n_employees=None, seed=42):
+        self.n_assets = n_assets
+        self.start = start
+        self.days = max(1, int(round(years * 365)))
+        self.samples_per_day = samples_per_day
+        self.failure_rate = failure_rate
+        self.orders_per_asset = int(round(orders_per_year * self.days / 365))
+        self.n_employees = n_employees or max(8, n_assets // 10)
+        self.seed = seed
+        if failure_rate * MIN_FAILURE_SPACING_DAYS > 365:
+            raise ValueError(f"failure_rate {failure_rate} is too high: failures must be "
+                             f"{MIN_FAILURE_SPACING_DAYS} days apart")
+
+        # Reading grid shared by all assets: sample index -> day, timestamp and its text
+        step = np.timedelta64(int(round(86400 / samples_per_day)), 's')
+        start_ts = np.datetime64(start, 's')
+        self.timestamps = start_ts + step * np.arange(self.days * samples_per_day)
+        self.sample_days = ((self.timestamps - start_ts) // np.timedelta64(1, 'D')).astype(np.int64)
+        self.timestamp_text = np.array([
+            text.replace('T', ' ') for text in np.datetime_as_string(self.timestamps, unit='s')
+        ])
+
+    def rng(self, asset_id):
+        return np.random.default_rng([self.seed, asset_id])
+
+    def readings_per_asset(self):
+        return len(self.timestamps) * len(PLC_SENSORS)
+
+    def employees(self):
+        rng = np.random.default_rng([self.seed, 0])
+        rows = []
+        for employee_id in range(1, self.n_employees + 1):
+            first = FIRST_NAMES[(employee_id - 1) % len(FIRST_NAMES)]
+            last = LAST_NAMES[(employee_id - 1) // len(FIRST_NAMES) % len(LAST_NAMES)]
+            department, position, salary = DEPARTMENTS[int(rng.integers(len(DEPARTMENTS)))]
+            hire_date = self.start - timedelta(days=int(rng.integers(180, 3650)))
+            rows.append((
+                employee_id, first, last, f"{first.lower()}.{last.lower()}.{employee_id}@company.com",
+                f"555-{employee_id:04d}", hire_date, department, position,
+                round(salary * (0.9 + rng.random() * 0.2), 2),
+            ))
+        return rows
+
+    def asset(self, asset_id):
+        """
+        All rows of one asset: {table: [row tuples]}, with the sensor readings
+        under 'readings' as [(sensor_name, sensor_type, unit, sample index, values, statuses)].
+        """
+        rng = self.rng(asset_id)
+        profile = profile_of(asset_id)
+        is_pump = profile <= 4
+        asset_type = 'Hydraulic Pump' if is_pump else 'Electric Motor'
+        manufacturer, model_number = ASSET_MODELS[asset_type][int(rng.integers(4))]
+        prefix = 'P' if is_pump else 'M'
+        asset_row = (
+            asset_id, f"{asset_type} {prefix}-{asset_id:05d}", asset_type,
+            f"Building {int(rng.integers(1, 21))} - {ASSET_AREAS[asset_type][int(rng.integers(4))]}",
+            self.start - timedelta(days=int(rng.integers(180, 2190))), manufacturer, model_number,
+            'maintenance' if rng.random() < 0.05 else 'operational',
+        )
+
+        failure_days = self._failure_days(rng)
+        failures, costs = self._failures_and_costs(rng, asset_id, asset_type, manufacturer, failure_days)
+        orders, tasks = self._orders_and_tasks(rng, asset_id)
+        return {
+            'assets': [asset_row],
+            'assets_faliures': failures,
+            'asset_costs': costs,
+            'mantainance_orders': orders,
+            'mantainance_tasks': tasks,
+            'readings': self._readings(rng, profile, is_pump, failure_days),
+        }
+
+    def _failure_days(self, rng):
+        """Day offsets of the failures, one per equal segment of the period."""
+        expected = self.failure_rate * self.days / 365
+        count = int(expected) + int(rng.random() < expected - int(expected))
+        if count == 0:
+            return []
+        segment = self.days / count
+        margin = len(PRECURSOR_INTENSITY)
+        days = []
+        for i in range(count):
+            low = int(i * segment) + margin
+            high = max(low + 1, int((i + 1) * segment) - 2)
+            days.append(min(self.days - 1, int(rng.integers(low, high))))
+        return days
+
+    def _failures_and_costs(self, rng, asset_id, asset_type, manufacturer, failure_days):
+        failures, costs = [], []
+        for n, day in enumerate(failure_days):
+            failure_type = FAILURE_TYPES[asset_type][int(rng.integers(2))]
+            description, root_cause = FAILURE_DETAILS[failure_type][int(rng.integers(len(FAILURE_DETAILS[failure_type])))]
+            severity = SEVERITIES[int(rng.choice(4, p=SEVERITY_WEIGHTS))]
+            (low_hours, high_hours), (low_cost, high_cost) = SEVERITY_IMPACT[severity]
+            failure_date = datetime.combine(self.start + timedelta(days=day), datetime.min.time()) + timedelta(
+                hours=int(rng.integers(6, 17)), minutes=15 * int(rng.integers(4)))
+            downtime = round(low_hours + rng.random() * (high_hours - low_hours), 1)
+            resolution_date = failure_date + timedelta(hours=downtime)
+            failures.append((
+                asset_id, failure_date, failure_type, severity, description, root_cause,
+                downtime, 1, resolution_date,
+            ))
+            costs.append((
+                asset_id, 'repair', round(low_cost + rng.random() * (high_cost - low_cost), 2),
+                resolution_date.date(), REPAIR_DESCRIPTIONS[failure_type], 'Industrial Parts Co',
+                f"INV-{resolution_date.year}-{asset_id}-R{n + 1:03d}",
+            ))
+
+        # One paid visual inspection per year
+        for year in range(int(math.ceil(self.days / 365))):
+            day = min(self.days - 1, year * 365 + int(rng.integers(365)))
+            cost_date = self.start + timedelta(days=day)
+            costs.append((
+                asset_id, 'maintenance', round(500 + rng.random() * 300, 2), cost_date,
+                'Visual inspection', f"{manufacturer} Service", f"INV-{cost_date.year}-{asset_id}-M{year + 1:03d}",
+            ))
+        return failures, costs
+
+    def _orders_and_tasks(self, rng, asset_id):
+        """Visual inspection orders (generate_maintenance_orders) and their tasks (generate_maintenance_tasks)."""
+        orders, tasks = [], []
+        last_day = datetime.combine(self.start + timedelta(days=self.days - 1), datetime.min.time()) + timedelta(hours=8)
+        first_order_id = (asset_id - 1) * self.orders_per_asset + 1
+        for idx in range(self.orders_per_asset):
+            order_id = first_order_id + idx
+            scheduled = last_day - timedelta(days=int(rng.integers(self.days))) + timedelta(hours=int(rng.integers(10)))
+            employee_id = 1 + int(rng.integers(self.n_employees))
+            priority = 'high' if rng.random() < 0.2 else ('medium' if rng.random() < 0.6 else 'low')
+            if rng.random() < 0.65:
+                status = 'completed'
+            elif rng.random() < 0.80:
+                status = 'in_progress'
+            else:
+                status = 'pending'
+            estimated_cost = 200.0 + rng.random() * 400.0
+            start_date = completion_date = actual_cost = None
+            if status == 'completed':
+                start_date = scheduled
+                completion_date = start_date + timedelta(hours=1 + int(rng.integers(3)))
+                actual_cost = round(estimated_cost * (0.9 + rng.random() * 0.2), 2)
+            elif status == 'in_progress':
+                start_date = scheduled
+            orders.append((
+                order_id, asset_id, employee_id, 'preventive', priority,
+                f"Visual inspection of asset {asset_id} - inspection {idx + 1}",
+                scheduled, start_date, completion_date, status, round(estimated_cost, 2), actual_cost,
+            ))
+
+            for task_idx in range(1 + int(rng.integers(5))):
+                task_employee_id = 1 + int(rng.integers(self.n_employees))
+                if status == 'completed':
+                    task_status = 'completed' if rng.random() < 0.9 else 'pending'
+                elif status == 'in_progress':
+                    task_status = 'completed' if rng.random() < 0.4 else ('in_progress' if rng.random() < 0.7 else 'pending')
+                else:
+                    task_status = 'pending'
+                estimated_hours = 0.5 + rng.random() * 7.5
+                actual_hours = start_time = end_time = notes = None
+                if task_status == 'completed':
+                    actual_hours = round(estimated_hours * (0.8 + rng.random() * 0.4), 2)
+                    start_time = (start_date or scheduled) + timedelta(hours=int(rng.integers(8)))
+                    end_time = start_time + timedelta(minutes=int(actual_hours * 60))
+                    if rng.random() < 0.5:
+                        notes = 'Task completed successfully'
+                elif task_status == 'in_progress':
+                    start_time = start_date + timedelta(hours=int(rng.integers(4))) if start_date else scheduled
+                    notes = 'Work in progress'
+                tasks.append((
+                    order_id, 'Visual Inspection', f"Visual inspection for order {order_id} - task {task_idx + 1}",
+                    task_employee_id, task_status, round(estimated_hours, 2), actual_hours, start_time, end_time, notes,
+                ))
+        return orders, tasks
+
+    def _readings(self, rng, profile, is_pump, failure_days):
+        """generate_sensor_readings plus apply_failure_pattern_sensor_readings, vectorized."""
+        n = len(self.timestamps)
+        intensity_by_day = np.zeros(self.days)
+        dropped_by_day = np.zeros(self.days, dtype=bool)
+        for day in failure_days:
+            for offset, intensity in enumerate(PRECURSOR_INTENSITY):
+                if day - 3 + offset >= 0:
+                    intensity_by_day[day - 3 + offset] = intensity
+            if day + 1 < self.days:
+                dropped_by_day[day + 1] = True
+        intensity = intensity_by_day[self.sample_days]
+        keep = np.flatnonzero(~dropped_by_day[self.sample_days])
+        ramp = intensity > 0
+
+        readings = []
+        for sensor_name, sensor_type, unit in PLC_SENSORS:
+            power_base = None
+            if sensor_type == 'vibration':
+                values = 1.5 + profile * 0.2 + (rng.random(n) * 1.5 - 0.75)
+            elif sensor_type == 'rpm':
+                values = 1450.0 + profile * 50 + (rng.random(n) * 100 - 50)
+            elif sensor_type == 'power':
+                power_base = 15.0 + profile * 2 if is_pump else 11.0 + (profile - 4) * 1.5
+                values = power_base + (rng.random(n) * 4 - 2)
+            elif sensor_type == 'current':
+                values = 22.0 + profile * 1.5 + (rng.random(n) * 6 - 3)
+            elif sensor_type == 'pressure':
+                values = 4.0 + profile * 0.3 + (rng.random(n) * 1.0 - 0.5) if is_pump else np.zeros(n)
+            else:
+                values = 80.0 + profile * 15 + (rng.random(n) * 20 - 10) if is_pump else np.zeros(n)
+            values = np.round(values, 4)
+            status = _status(sensor_type, values, power_base)
+
+            if ramp.any():
+                k = intensity[ramp]
+                old = values[ramp]
+                r1, r2 = rng.random(len(k)), rng.random(len(k))
+                if sensor_type == 'vibration':
+                    new = old * (1 + k * (0.35 + r1 * 0.5)) + r2 * 0.8 * k
+                    first_pass = _status(sensor_type, old * (1 + k * 0.6))
+                elif sensor_type == 'rpm':
+                    new = old * (1 + k * (r1 * 0.25 - 0.08)) + (r2 * 20 - 10) * k
+                    first_pass = np.zeros(len(k), dtype=np.int8)
+                elif sensor_type == 'power':
+                    new = old * (1 + k * (0.25 + r1 * 0.35)) + r2 * 1.5 * k
+                    first_pass = None
+                elif sensor_type == 'current':
+                    new = old * (1 + k * (0.3 + r1 * 0.4)) + r2 * 2 * k
+                    first_pass = _status(sensor_type, old * (1 + k * 0.5))
+                elif sensor_type == 'pressure':
+                    new = np.where(old == 0, 0, np.maximum(0.1, old * (1 - k * (0.05 + r1 * 0.15)) + (r2 * 0.5 - 0.25) * k))
+                    first_pass = None
+                else:
+                    new = np.where(old == 0, 0, np.maximum(1, old * (1 - k * (0.05 + r1 * 0.2)) + (r2 * 10 - 5) * k))
+                    first_pass = None
+                values[ramp] = np.round(new, 4)
+                if first_pass is not None:
+                    # The sample data sets status from the scaled old value, then re-applies the
+                    # thresholds to the new value; each pass keeps the previous status when normal
+                    ramp_status = np.where(first_pass > 0, first_pass, status[ramp])
+                    second_pass = _status(sensor_type, values[ramp])
+                    status[ramp] = np.where(second_pass > 0, second_pass, ramp_status)
+
+            readings.append((sensor_name, sensor_type, unit, keep, values[keep], status[keep]))
+        return readings
+
+
+class CsvFleetWriter:
+    """One CSV per table (\\N for NULL) plus load_data.sql for MySQL."""
+
+    def __init__(self, directory, include_readings=True):
+        self.directory = directory
+        self.include_readings = include_readings
+        os.makedirs(directory, exist_ok=True)
+        self._files = {}
+        self._writers = {}
+
+    def _writer(self, table):
+        writer = self._writers.get(table)
+        if writer is None:
+            f = open(os.path.join(self.directory, f"{table}.csv"), 'w', newline='', encoding='utf-8')
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(TABLE_COLUMNS[table])
+            self._files[table] = f
+            self._writers[table] = writer
+        return writer
+
+    def write(self, table, rows):
+        self._writer(table).writerows(
+            tuple('\\N' if value is None else value for value in row) for row in rows
+        )
+
+    def write_readings(self, generator, asset_id, readings):
+        if not self.include_readings:
+            return
+        writer = self._writer('plc_sensor_readings')
+        for sensor_name, sensor_type, unit, keep, values, status in readings:
+            writer.writerows(zip(
+                [asset_id] * len(keep), [sensor_name] * len(keep), [sensor_type] * len(keep),
+                values.tolist(), [unit] * len(keep),
+                generator.timestamp_text[keep].tolist(), STATUS_NAMES[status].tolist(),
+            ))
+
+    def commit(self):
+        for f in self._files.values():
+            f.flush()
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        path = os.path.join(self.directory, 'load_data.sql')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("-- Generated by ETL/synthetic_fleet.py\n")
+            f.write("-- mysql --local-infile=1 palantir_maintenance < load_data.sql\n")
+            f.write("SET foreign_key_checks = 0;\nSET unique_checks = 0;\n\n")
+            for table, columns in TABLE_COLUMNS.items():
+                if table not in self._files:
+                    continue
+                csv_path = os.path.abspath(os.path.join(self.directory, f"{table}.csv")).replace('\\', '/')
+                f.write(
+                    f"LOAD DATA LOCAL INFILE '{csv_path}' INTO TABLE {table}\n"
+                    f"    FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"'\n"
+                    f"    LINES TERMINATED BY '\\n' IGNORE 1 LINES\n"
+                    f"    ({', '.join(columns)});\n\n"
+                )
+            f.write("SET unique_checks = 1;\nSET foreign_key_checks = 1;\n")
+        print(f"CSV files and load script written to {self.directory}")
+
+
+class DbFleetWriter:
+    """Batched executemany inserts through ETL.db, one transaction per commit()."""
+
+    def __init__(self, connection, include_readings=True, batch_size=5000):
+        self.connection = connection
+        self.include_readings = include_readings
+        self.batch_size = batch_size
+        self.cursor = connection.cursor()
+        self._deferred_indexes = []
+        self._sql = {
+            table: f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+            for table, columns in TABLE_COLUMNS.items()
+        }
+
+    def reset(self):
+        """Delete previously generated rows (children first)."""
+        for table in reversed(list(TABLE_COLUMNS)):
+            self.cursor.execute(f"DELETE FROM {table}")
+        self.connection.commit()
+
+    def defer_indexes(self, table='plc_sensor_readings'):
+        """
+        SQLite only: drop the secondary indexes of `table` for the load;
+        restore_indexes() rebuilds each of them in one pass, which is about
+        twice as fast as maintaining them row by row.
+        """
+        self.cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL",
+            (table,)
+        )
+        indexes = self.cursor.fetchall()
+        for name, _ in indexes:
+            self.cursor.execute(f"DROP INDEX {name}")
+        self.connection.commit()
+        self._deferred_indexes.extend(sql for _, sql in indexes)
+
+    def restore_indexes(self):
+        if not self._deferred_indexes:
+            return
+        print(f"Building {len(self._deferred_indexes)} deferred indexes...")
+        while self._deferred_indexes:
+            self.cursor.execute(self._deferred_indexes.pop(0))
+        self.connection.commit()
+
+    def write(self, table, rows):
+        for i in range(0, len(rows), self.batch_size):
+            self.cursor.executemany(self._sql[table], rows[i:i + self.batch_size])
+
+    def write_readings(self, generator, asset_id, readings):
+        if not self.include_readings:
+            return
+        rows = []
+        for sensor_name, sensor_type, unit, keep, values, status in readings:
+            rows.extend(zip(
+                [asset_id] * len(keep), [sensor_name] * len(keep), [sensor_type] * len(keep),
+                values.tolist(), [unit] * len(keep),
+                generator.timestamp_text[keep].tolist(), STATUS_NAMES[status].tolist(),
+            ))
+        self.write('plc_sensor_readings', rows)
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.restore_indexes()
+        self.cursor.close()
+
+
+class StoreFleetWriter:
+    """Sensor readings into the columnar store; other tables are ignored."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def write(self, table, rows):
+        pass
+
+    def write_readings(self, generator, asset_id, readings):
+        for _, sensor_type, _, keep, values, _ in readings:
+            self.store.write(asset_id, sensor_type, generator.timestamps[keep], values)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        print(f"Columnar store at {self.store.root}: {self.store.nbytes()} bytes")
+
+
+def generate_fleet(generator, writers, block_assets=50):
+    """Generate every asset and hand it to all writers, committing per block."""
+    totals = dict.fromkeys(TABLE_COLUMNS, 0)
+    started = time.perf_counter()
+
+    employees = generator.employees()
+    for writer in writers:
+        writer.write('mantainance_employees', employees)
+    totals['mantainance_employees'] = len(employees)
+
+    for block_start in range(1, generator.n_assets + 1, block_assets):
+        block_end = min(generator.n_assets, block_start + block_assets - 1)
+        for asset_id in range(block_start, block_end + 1):
+            data = generator.asset(asset_id)
+            readings = data.pop('readings')
+            for writer in writers:
+                for table in ('assets', 'assets_faliures', 'asset_costs', 'mantainance_orders', 'mantainance_tasks'):
+                    writer.write(table, data[table])
+                writer.write_readings(generator, asset_id, readings)
+            for table, rows in data.items():
+                totals[table] += len(rows)
+            totals['plc_sensor_readings'] += sum(len(r[3]) for r in readings)
+        for writer in writers:
+            writer.commit()
+        elapsed = time.perf_counter() - started
+        print(f"Assets {block_end}/{generator.n_assets}: {totals['plc_sensor_readings']} readings "
+              f"({totals['plc_sensor_readings'] / elapsed:.0f} readings/s)")
+    return totals
+
+
+@instrumented_main('synthetic_fleet')
+def main(argv=None):
+    """Generate a synthetic fleet into CSV files, the database and/or the columnar store."""
+    parser = argparse.ArgumentParser(description='Generate a synthetic fleet for benchmarks.')
+    parser.add_argument('--assets', type=int, default=8)
+    parser.add_argument('--years', type=float, default=1.0)
+    parser.add_argument('--start', type=date.fromisoformat, default=date(2022, 1, 1))
+    parser.add_argument('--samples-per-day', type=int, default=4)
+    parser.add_argument('--failure-rate', type=float, default=3.0, help='Failures per asset per year')
+    parser.add_argument('--orders-per-year', type=float, default=40.0, help='Visual inspections per asset per year')
+    parser.add_argument('--employees', type=int, default=None, help='Default: max(8, assets / 10)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--csv-dir', help='Write CSV files and load_data.sql here')
+    parser.add_argument('--db', action='store_true', help='Insert into the configured database')
+    parser.add_argument('--reset', action='store_true', help='With --db, delete existing rows of the generated tables first')
+    parser.add_argument('--store-dir', help='Write sensor readings into this columnar store')
+    parser.add_argument('--store-only-readings', action='store_true',
+                        help='With --store-dir, keep sensor readings out of --csv-dir / --db')
+    parser.add_argument('--block-assets', type=int, default=50, help='Assets per transaction / progress line')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Rows per executemany')
+    args = parser.parse_args(argv)
+    if not (args.csv_dir or args.db or args.store_dir):
+        parser.error('choose at least one output: --csv-dir, --db or --store-dir')
+
+    generator = FleetGenerator(
+        args.assets, years=args.years, start=args.start, samples_per_day=args.samples_per_day,
+        failure_rate=args.failure_rate, orders_per_year=args.orders_per_year,
+        n_employees=args.employees, seed=args.seed,
+    )
+    include_readings = not (args.store_dir and args.store_only_readings)
+    print(f"Fleet: {args.assets} assets x {generator.days} days at {args.samples_per_day} samples/day "
+          f"= {args.assets * generator.readings_per_asset()} readings (before failure gaps)")
+
+    connection = None
+    db_writer = None
+    writers = []
+    try:
+        if args.csv_dir:
+            writers.append(CsvFleetWriter(args.csv_dir, include_readings))
+        if args.store_dir:
+            writers.append(StoreFleetWriter(SensorColumnarStore(args.store_dir)))
+        if args.db:
+            print("Connecting to database...")
+            connection = get_connection()
+            print(f"Connected to database: {connection.database}")
+            db_writer = DbFleetWriter(connection, include_readings, args.batch_size)
+            if DB_BACKEND == 'sqlite' and include_readings:
+                db_writer.defer_indexes()
+            if args.reset:
+                print("Deleting existing rows...")
+                db_writer.reset()
+            writers.append(db_writer)
+
+        started = time.perf_counter()
+        with stage('generate_fleet'):
+            totals = generate_fleet(generator, writers, args.block_assets)
+        for writer in writers:
+            writer.close()
+
+        print(f"\nGenerated in {time.perf_counter() - started:.1f}s:")
+        for table, count in totals.items():
+            print(f"  {table}: {count}")
+
+    except Error as e:
+        print(f"Database error: {e}")
+        if connection:
+            connection.rollback()
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if connection and connection.is_connected():
+            if db_writer is not None:
+                # A failed load still gets its indexes back
+                db_writer.restore_indexes()
+            connection.close()
+            print("Database connection closed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""
+Distributed Work Queue for faliure_probability_base Backfills
+
+A multi-year backfill of faliure_probability_base for thousands of assets is
+too much for one machine overnight. The coordinator splits it into
+asset x date-range work units stored in etl_work_units. Any number of worker
+processes, on one or many hosts, then work through the units:
+
+- claim: SELECT ... FOR UPDATE SKIP LOCKED picks the next pending unit that
+  no other worker is claiming, and one guarded UPDATE marks it running with
+  the worker id and a lease
+- heartbeat: a background thread refreshes heartbeat_at every
+  ETL_QUEUE_HEARTBEAT_SECONDS while the unit is processed
+- commit: the unit's rows replace its asset and date range in
+  faliure_probability_base in the same transaction that marks it done, and
+  only if the worker still holds the lease. A unit is therefore written
+  exactly once, even if a worker is presumed dead and its unit re-run.
+- retry: a failed unit goes back to pending until it has been tried
+  max_attempts times, then it is marked failed. A running unit without a
+  heartbeat for ETL_QUEUE_LEASE_SECONDS (worker crashed or lost its host) is
+  re-queued by the next worker that looks for work.
+
+The features are those of ETL/faliure_probability_dataframe.py
+(extract_features_for_asset_date). A backfill writes rows in place, so do
+not run it at the same time as the nightly features stage, which replaces
+the whole table.
+
+Usage:
+    python ETL/work_queue.py submit --job backfill-2022 --start 2022-01-01 --end 2022-12-31 --unit-days 30
+    python ETL/work_queue.py worker --job backfill-2022          # on every host, as many as wanted
+    python ETL/work_queue.py local --job backfill-2022 --workers 4
+    python ETL/work_queue.py status --job backfill-2022
+    python ETL/work_queue.py retry --job backfill-2022           # re-queue the failed units
+"""
+
+from datetime import date, timedelta
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+if __package__ in (None, ''):
+    # Allow running as a plain script: python ETL/work_queue.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import Error, get_connection, get_read_connection, transaction, with_retries
+from ETL.faliure_probability_dataframe import (FeatureColumns, extract_features_for_asset_date,
+                                               get_date_range, get_failure_dates)
+from ETL.feature_store import FEATURE_NAMES
+from ETL.instrumentation import instrumented_main, stage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# A running unit without a heartbeat for this long is presumed abandoned
+ETL_QUEUE_LEASE_SECONDS = int(os.getenv('ETL_QUEUE_LEASE_SECONDS', 120))
+ETL_QUEUE_HEARTBEAT_SECONDS = float(os.getenv('ETL_QUEUE_HEARTBEAT_SECONDS', 15))
+# Wait between looks for work while other workers still hold units
+ETL_QUEUE_POLL_SECONDS = float(os.getenv('ETL_QUEUE_POLL_SECONDS', 5))
+
+COLUMNS = ['asset_id', 'reading_date', 'faliure'] + FEATURE_NAMES
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def submit_job(connection, job_id, asset_ids, start_date, end_date, unit_days=30, max_attempts=3):
+    """
+    Split assets x [start_date, end_date] into units of unit_days days.
+    Units that already exist for the job are left as they are, so a job can be
+    re-submitted (e.g. with more assets). Returns the number of new units.
+    """
+    units = []
+    for asset_id in asset_ids:
+        unit_start = start_date
+        while unit_start <= end_date:
+            unit_end = min(unit_start + timedelta(days=unit_days - 1), end_date)
+            units.append((job_id, asset_id, unit_start, unit_end, max_attempts))
+            unit_start = unit_end + timedelta(days=1)
+
+    with transaction(connection) as cursor:
+        cursor.execute("SELECT COUNT(*) FROM etl_work_units WHERE job_id = %s", (job_id,))
+        before = cursor.fetchone()[0]
+        cursor.executemany("""
+            INSERT IGNORE INTO etl_work_units (job_id, asset_id, start_date, end_date, max_attempts)
+            VALUES (%s, %s, %s, %s, %s)
+        """, units)
+        cursor.execute("SELECT COUNT(*) FROM etl_work_units WHERE job_id = %s", (job_id,))
+        return cursor.fetchone()[0] - before
+
+
+def requeue_expired(connection, job_id):
+    """Give the units of workers that stopped heartbeating back to the queue (or fail them)."""
+    def requeue():
+        with transaction(connection) as cursor:
+            cursor.execute("""
+                UPDATE etl_work_units
+                SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+                    last_error = 'lease expired (no heartbeat)', worker_id = NULL
+                WHERE job_id = %s AND status = 'running'
+                AND heartbeat_at < DATE_SUB(NOW(), INTERVAL %s SECOND)
+            """, (job_id, ETL_QUEUE_LEASE_SECONDS))
+            return cursor.rowcount
+    return with_retries(requeue)
+
+
+def claim_unit(connection, job_id, worker_id):
+    """Lease the next pending unit of the job to worker_id; None if there is none."""
+    def claim():
+        with transaction(connection, dictionary=True) as cursor:
+            while True:
+                cursor.execute("""
+                    SELECT unit_id FROM etl_work_units
+                    WHERE job_id = %s AND status = 'pending'
+                    ORDER BY unit_id LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                """, (job_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    return None
+                # Guarded, so two workers can never both win a unit (backends without row locks)
+                cursor.execute("""
+                    UPDATE etl_work_units
+                    SET status = 'running', worker_id = %s, attempts = attempts + 1,
+                        claimed_at = NOW(), heartbeat_at = NOW()
+                    WHERE unit_id = %s AND status = 'pending'
+                """, (worker_id, row['unit_id']))
+                if cursor.rowcount == 1:
+                    cursor.execute("""
+                        SELECT unit_id, asset_id, start_date, end_date, attempts, max_attempts
+                        FROM etl_work_units WHERE unit_id = %s
+                    """, (row['unit_id'],))
+                    return cursor.fetchone()
+    return with_retries(claim)
+
+
+def unfinished_units(connection, job_id):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT COUNT(*) FROM etl_work_units
+            WHERE job_id = %s AND status IN ('pending', 'running')
+        """, (job_id,))
+        count = cursor.fetchone()[0]
+        connection.commit()
+        return count
+    finally:
+        cursor.close()
+
+
+class Heartbeat:
+    """Refreshes a claimed unit's heartbeat_at on its own connection until stopped."""
+
+    def __init__(self, unit_id, worker_id, interval=None):
+        self.unit_id = unit_id
+        self.worker_id = worker_id
+        self.interval = interval or ETL_QUEUE_HEARTBEAT_SECONDS
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'heartbeat-{unit_id}', daemon=True)
+
+    def _beat(self, connection):
+        with transaction(connection) as cursor:
+            cursor.execute("""
+                UPDATE etl_work_units SET heartbeat_at = NOW()
+                WHERE unit_id = %s AND worker_id = %s AND status = 'running'
+            """, (self.unit_id, self.worker_id))
+            return cursor.rowcount == 1
+
+    def _run(self):
+        connection = get_connection()
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    if not with_retries(self._beat, connection):
+                        # Re-queued by another worker: give up the unit
+                        self.lost.set()
+                        return
+                except Error as e:
+                    print(f"Heartbeat of unit {self.unit_id} failed: {e}")
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def extract_unit(connection, unit, failure_dict):
+    """Feature rows of the unit's asset for every day of its date range."""
+    n_days = (unit['end_date'] - unit['start_date']).days + 1
+    features = FeatureColumns(n_days)
+    for day in range(n_days):
+        row = extract_features_for_asset_date(unit['asset_id'], unit['start_date'] + timedelta(days=day),
+                                              connection, failure_dict)
+        if row:
+            features.append(row)
+    return features
+
+
+def commit_unit(connection, unit, worker_id, features):
+    """
+    Replace the unit's asset and date range in faliure_probability_base and
+    mark it done, in one transaction. Returns False (and writes nothing) if the
+    worker no longer holds the unit.
+    """
+    def write():
+        with transaction(connection) as cursor:
+            cursor.execute("""
+                UPDATE etl_work_units
+                SET status = 'done', finished_at = NOW(), rows_written = %s, last_error = NULL
+                WHERE unit_id = %s AND worker_id = %s AND status = 'running'
+            """, (features.size, unit['unit_id'], worker_id))
+            if cursor.rowcount != 1:
+                connection.rollback()
+                return False
+            cursor.execute("""
+                DELETE FROM faliure_probability_base
+                WHERE asset_id = %s AND reading_date >= %s AND reading_date <= %s
+            """, (unit['asset_id'], unit['start_date'], unit['end_date']))
+            cursor.executemany(f"""
+                INSERT INTO faliure_probability_base ({', '.join(COLUMNS)})
+                VALUES ({', '.join(['%s'] * len(COLUMNS))})
+            """, list(features.db_rows(COLUMNS)))
+            return True
+    return with_retries(write)
+
+
+def fail_unit(connection, unit, worker_id, message):
+    """Back to pending for another attempt, or failed once max_attempts is used up."""
+    def fail():
+        with transaction(connection) as cursor:
+            cursor.execute("""
+                UPDATE etl_work_units
+                SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+                    worker_id = NULL, last_error = %s
+                WHERE unit_id = %s AND worker_id = %s AND status = 'running'
+            """, (message[:500], unit['unit_id'], worker_id))
+    with_retries(fail)
+
+
+def run_worker(connection, job_id, worker_id=None, max_units=None):
+    """
+    Claim and process units of the job until none is left (or max_units are
+    done). Returns (done, failed) counts of this worker.
+    """
+    worker_id = worker_id or worker_name()
+    failure_dict = get_failure_dates(connection)
+    done = failed = 0
+
+    while max_units is None or done + failed < max_units:
+        requeue_expired(connection, job_id)
+        unit = claim_unit(connection, job_id, worker_id)
+        if unit is None:
+            if not unfinished_units(connection, job_id):
+                break
+            # Units held by other workers may still come back to the queue
+            time.sleep(ETL_QUEUE_POLL_SECONDS)
+            continue
+
+        label = f"unit {unit['unit_id']} (asset {unit['asset_id']}, {unit['start_date']}..{unit['end_date']})"
+        started = time.perf_counter()
+        try:
+            with Heartbeat(unit['unit_id'], worker_id) as heartbeat:
+                # Extraction reads from the replica while it is fresh; the commit goes to the primary
+                with stage('extract_unit'), get_read_connection() as read_connection:
+                    features = extract_unit(read_connection, unit, failure_dict)
+                if heartbeat.lost.is_set():
+                    print(f"[{worker_id}] lost the lease of {label}, dropping it")
+                    continue
+                with stage('commit_unit'):
+                    committed = commit_unit(connection, unit, worker_id, features)
+            if committed:
+                done += 1
+                print(f"[{worker_id}] {label}: {features.size} rows in {time.perf_counter() - started:.1f}s")
+            else:
+                print(f"[{worker_id}] lost the lease of {label}, dropping it")
+        except Exception as e:
+            connection.rollback()
+            failed += 1
+            print(f"[{worker_id}] {label} failed (attempt {unit['attempts']}/{unit['max_attempts']}): {e}")
+            traceback.print_exc()
+            fail_unit(connection, unit, worker_id, f"{type(e).__name__}: {e}")
+    return done, failed
+
+
+def retry_failed(connection, job_id):
+    """Re-queue the failed units of the job with a fresh set of attempts."""
+    with transaction(connection) as cursor:
+        cursor.execute("""
+            UPDATE etl_work_units SET status = 'pending', attempts = 0, worker_id = NULL
+            WHERE job_id = %s AND status = 'failed'
+        """, (job_id,))
+        return cursor.rowcount
+
+
+def run_local_workers(job_id, workers):
+    """Run `workers` worker processes on this host and wait for them; returns their exit codes."""
+    processes = [subprocess.Popen([sys.executable, '-m', 'ETL.work_queue', 'worker', '--job', job_id], cwd=ROOT)
+                 for _ in range(workers)]
+    return [process.wait() for process in processes]
+
+
+def print_status(connection, job_id):
+    """Units per status of the job and the errors of failed units; returns the failed count."""
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT status, COUNT(*) as units, SUM(rows_written) as rows_written, MAX(attempts) as max_attempts
+            FROM etl_work_units WHERE job_id = %s
+            GROUP BY status ORDER BY status
+        """, (job_id,))
+        rows = cursor.fetchall()
+        if not rows:
+            print(f"No units for job {job_id}")
+            return 0
+        print(f"{'status':<8} {'units':>7} {'rows':>10} {'attempts':>9}")
+        for row in rows:
+            print(f"{row['status']:<8} {row['units']:>7} {int(row['rows_written'] or 0):>10} {row['max_attempts']:>9}")
+        cursor.execute("""
+            SELECT unit_id, asset_id, start_date, end_date, attempts, last_error
+            FROM etl_work_units WHERE job_id = %s AND status = 'failed'
+            ORDER BY unit_id LIMIT 20
+        """, (job_id,))
+        for row in cursor.fetchall():
+            print(f"  failed unit {row['unit_id']} (asset {row['asset_id']}, {row['start_date']}..{row['end_date']}, "
+                  f"{row['attempts']} attempts): {row['last_error']}")
+        return sum(row['units'] for row in rows if row['status'] == 'failed')
+    finally:
+        cursor.close()
+
+
+@instrumented_main('work_queue')
+def main(argv=None):
+    """Submit a backfill job, run workers on it or show its progress."""
+    parser = argparse.ArgumentParser(description='Distributed faliure_probability_base backfill work queue.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    submit_parser = subparsers.add_parser('submit', help='Split a backfill into work units')
+    submit_parser.add_argument('--job', required=True)
+    submit_parser.add_argument('--start', type=date.fromisoformat, help='Default: the feature date range')
+    submit_parser.add_argument('--end', type=date.fromisoformat, help='Default: the feature date range')
+    submit_parser.add_argument('--assets', type=int, nargs='+', help='Default: all assets')
+    submit_parser.add_argument('--unit-days', type=int, default=30)
+    submit_parser.add_argument('--max-attempts', type=int, default=3)
+    worker_parser = subparsers.add_parser('worker', help='Process units until the job is finished')
+    worker_parser.add_argument('--job', required=True)
+    worker_parser.add_argument('--max-units', type=int, default=None)
+    local_parser = subparsers.add_parser('local', help='Run several worker processes on this host')
+    local_parser.add_argument('--job', required=True)
+    local_parser.add_argument('--workers', type=int, default=os.cpu_count())
+    for name, help_text in (('status', 'Show the progress of a job'), ('retry', 'Re-queue the failed units')):
+        subparsers.add_parser(name, help=help_text).add_argument('--job', required=True)
+    args = parser.parse_args(argv)
+    connection = None
+    failed = False
+
+    try:
+        print("Connecting to database...")
+        connection = get_connection()
+
+        if connection.is_connected():
+            print(f"Connected to database: {connection.database}")
+            if args.command == 'submit':
+                min_date, max_date = get_date_range(connection)
+                start_date, end_date = args.start or min_date, args.end or max_date
+                asset_ids = args.assets
+                if not asset_ids:
+                    cursor = connection.cursor()
+                    cursor.execute("SELECT asset_id FROM assets ORDER BY asset_id")
+                    asset_ids = [asset_id for (asset_id,) in cursor.fetchall()]
+                    cursor.close()
+                created = submit_job(connection, args.job, asset_ids, start_date, end_date,
+                                     args.unit_days, args.max_attempts)
+                print(f"Job {args.job}: {created} new units ({len(asset_ids)} assets, "
+                      f"{start_date} to {end_date}, {args.unit_days} days per unit)")
+            elif args.command == 'worker':
+                worker_id = worker_name()
+                print(f"Worker {worker_id} on job {args.job}")
+                done, unit_failures = run_worker(connection, args.job, worker_id, args.max_units)
+                print(f"Worker {worker_id}: {done} units done, {unit_failures} failed attempts")
+            elif args.command == 'local':
+                print(f"Starting {args.workers} workers on job {args.job}\n")
+                started = time.perf_counter()
+                codes = run_local_workers(args.job, args.workers)
+                print(f"\nWorkers finished in {time.perf_counter() - started:.1f}s (exit codes {codes})")
+                failed = any(codes)
+            elif args.command == 'retry':
+                print(f"Re-queued {retry_failed(connection, args.job)} failed units of job {args.job}")
+            if args.command in ('local', 'status'):
+                failed_units = print_status(connection, args.job)
+                failed = args.command == 'local' and (failed or failed_units > 0)
+
+    except Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+            print("Database connection closed")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
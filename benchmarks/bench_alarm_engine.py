@@ -0,0 +1,105 @@
+"""
+Benchmark: alarm engine classification speed
+
+Measures the two access patterns of ETL/sensor_alarm_engine.py on a
+synthetic fleet with the sample data value ranges:
+- bulk: classify_values over a year of history per asset (the re-classification
+  path after a threshold change, without the database round trips)
+- streaming: AlarmEngine.classify on ingestion-sized batches
+
+Usage:
+    python benchmarks/bench_alarm_engine.py --assets 100 --days 365
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.sensor_alarm_engine import AlarmEngine, LIMIT_KEYS, classify_values, load_threshold_config, resolve_limits
+
+# sensor_type -> (mean, std) roughly matching the sample fleet
+SENSOR_RANGES = {
+    'vibration': (2.5, 0.8),
+    'rpm': (1650.0, 60.0),
+    'power': (18.0, 3.0),
+    'current': (28.0, 3.0),
+    'pressure': (5.0, 0.8),
+    'flow': (120.0, 20.0),
+}
+
+
+def asset_type(asset_id):
+    return 'Hydraulic Pump' if (asset_id - 1) % 8 < 4 else 'Electric Motor'
+
+
+def bench_bulk(config, n_assets, days, samples_per_day, rng):
+    per_series = days * samples_per_day
+    elapsed = 0.0
+    rows = alarms = 0
+    for asset_id in range(1, n_assets + 1):
+        values = np.concatenate([rng.normal(mean, std, per_series) for mean, std in SENSOR_RANGES.values()])
+        limits = np.repeat(
+            np.array([resolve_limits(config, asset_type(asset_id), s) for s in SENSOR_RANGES]),
+            per_series, axis=0
+        )
+        series_start = np.zeros(len(values), dtype=bool)
+        series_start[::per_series] = True
+        started = time.perf_counter()
+        levels = classify_values(values, limits, series_start)
+        elapsed += time.perf_counter() - started
+        rows += len(values)
+        alarms += int((levels > 0).sum())
+    return rows, alarms, elapsed
+
+
+def bench_streaming(config, n_assets, batch_size, n_batches, rng):
+    engine = AlarmEngine({asset_id: asset_type(asset_id) for asset_id in range(1, n_assets + 1)}, config)
+    sensors = list(SENSOR_RANGES)
+    start = datetime(2022, 1, 1)
+    elapsed = 0.0
+    for batch in range(n_batches):
+        rows = []
+        for i in range(batch_size):
+            reading = batch * batch_size + i
+            sensor_type = sensors[reading % len(sensors)]
+            asset_id = reading // len(sensors) % n_assets + 1
+            mean, std = SENSOR_RANGES[sensor_type]
+            rows.append((asset_id, sensor_type, sensor_type, float(rng.normal(mean, std)), '',
+                         start + timedelta(seconds=reading), 'normal'))
+        started = time.perf_counter()
+        engine.classify(rows)
+        elapsed += time.perf_counter() - started
+    return batch_size * n_batches, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the sensor alarm engine.')
+    parser.add_argument('--assets', type=int, default=100)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--samples-per-day', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--batches', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    config = load_threshold_config()
+    print(f"Limits per sensor: {', '.join(LIMIT_KEYS)}")
+
+    rows, alarms, elapsed = bench_bulk(config, args.assets, args.days, args.samples_per_day, rng)
+    print(f"Bulk: {rows} readings ({alarms} in alarm) in {elapsed:.3f}s "
+          f"({rows / elapsed / 1e6:.1f}M readings/s)")
+
+    rows, elapsed = bench_streaming(config, args.assets, args.batch_size, args.batches, rng)
+    print(f"Streaming: {rows} readings in {args.batches} batches in {elapsed:.3f}s "
+          f"({rows / elapsed:.0f} readings/s)")
+
+
+if __name__ == "__main__":
+    main()
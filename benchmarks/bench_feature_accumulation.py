@@ -0,0 +1,125 @@
+"""
+Benchmark: accumulation of faliure_probability_base rows
+
+Feeds synthetic extract_features_for_asset_date() results for assets x days
+through both accumulation strategies of create_feature_dataframe, up to the
+row tuples handed to the database:
+- dicts:  list of per-row dicts -> DataFrame -> replace({np.nan: None})
+          (object dtype) -> itertuples (the previous implementation)
+- arrays: FeatureColumns preallocated float64 columns -> db_rows (NULLs
+          converted per insert batch only)
+and reports the wall time (net of generating the synthetic rows) and the
+peak traced memory (tracemalloc) of each.
+
+Usage:
+    python benchmarks/bench_feature_accumulation.py --assets 200 --days 396
+    python benchmarks/bench_feature_accumulation.py --assets 1000 --days 365 --strategies arrays
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.faliure_probability_dataframe import INTEGER_FEATURES, FeatureColumns
+from ETL.feature_store import FEATURE_NAMES
+
+COLUMNS = ['asset_id', 'reading_date', 'faliure'] + FEATURE_NAMES
+
+
+def synthetic_rows(n_assets, n_days, seed):
+    """extract_features_for_asset_date()-shaped dicts, ~10% of the optional features None."""
+    rng = np.random.default_rng(seed)
+    first_day = date(2022, 1, 1)
+    for day in range(n_days):
+        reading_date = first_day + timedelta(days=day)
+        values = rng.normal(50.0, 10.0, (n_assets, len(FEATURE_NAMES)))
+        missing = rng.random((n_assets, len(FEATURE_NAMES))) < 0.1
+        for asset in range(n_assets):
+            row = {'asset_id': asset + 1, 'reading_date': reading_date, 'faliure': bool(values[asset, 0] > 70)}
+            for j, name in enumerate(FEATURE_NAMES):
+                if missing[asset, j] and name not in ('asset_service_days', 'asset_service_hours'):
+                    row[name] = None
+                elif name in INTEGER_FEATURES:
+                    row[name] = int(values[asset, j])
+                else:
+                    row[name] = float(values[asset, j])
+            yield row
+
+
+def accumulate_dicts(rows):
+    all_features = list(rows)
+    df = pd.DataFrame(all_features)
+    df = df.replace({np.nan: None})
+    count = 0
+    for _ in df[COLUMNS].itertuples(index=False, name=None):
+        count += 1
+    return count
+
+
+def accumulate_arrays(rows, capacity):
+    features = FeatureColumns(capacity)
+    for row in rows:
+        features.append(row)
+    count = 0
+    for _ in features.db_rows(COLUMNS):
+        count += 1
+    return count
+
+
+def run(strategy, args, traced):
+    rows = synthetic_rows(args.assets, args.days, args.seed)
+    gc.collect()
+    if traced:
+        tracemalloc.start()
+    started = time.perf_counter()
+    if strategy == 'generate':
+        count = sum(1 for _ in rows)
+    elif strategy == 'dicts':
+        count = accumulate_dicts(rows)
+    else:
+        count = accumulate_arrays(rows, args.assets * args.days)
+    elapsed = time.perf_counter() - started
+    peak = 0
+    if traced:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark feature row accumulation strategies.')
+    parser.add_argument('--assets', type=int, default=200)
+    parser.add_argument('--days', type=int, default=396)
+    parser.add_argument('--strategies', nargs='+', choices=['dicts', 'arrays'], default=['dicts', 'arrays'])
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{args.assets} assets x {args.days} days = {args.assets * args.days} rows, "
+          f"{len(FEATURE_NAMES)} features")
+    _, generate_time, _ = run('generate', args, traced=False)
+    print(f"Generating the rows alone: {generate_time:.2f}s (subtracted below)")
+    results = {}
+    for strategy in args.strategies:
+        # Time without tracemalloc (it slows allocation-heavy code), then measure memory
+        count, elapsed, _ = run(strategy, args, traced=False)
+        _, _, peak = run(strategy, args, traced=True)
+        elapsed = max(elapsed - generate_time, 1e-9)
+        results[strategy] = (elapsed, peak)
+        print(f"{strategy:>7}: {count} rows in {elapsed:6.2f}s, peak {peak / 1e6:8.1f} MB")
+
+    if len(results) == 2:
+        (dict_time, dict_peak), (array_time, array_peak) = results['dicts'], results['arrays']
+        print(f"\narrays vs dicts: {dict_time / array_time:.1f}x faster, {dict_peak / array_peak:.1f}x less peak memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark: faliure_probability_base on MySQL vs. DuckDB
+
+With --mysql, runs both execution modes on the live database (DB_* env
+settings) and compares them on the same data:
+- MySQL path: create_feature_dataframe (per asset-day queries)
+- DuckDB path: export to Parquet, one set-based query, load back
+Both write faliure_probability_base; after each run the table is read back
+and the two results are compared column by column.
+
+Without --mysql, a synthetic fleet is written straight to Parquet and only
+the DuckDB compute stage is timed (scaling with fleet size).
+
+Usage:
+    python benchmarks/bench_feature_engines.py --mysql
+    python benchmarks/bench_feature_engines.py --assets 100 500 1000
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import get_connection
+from ETL.faliure_probability_duckdb import compute_features, create_feature_dataframe_duckdb, duckdb
+from ETL.sensor_columnar_store import SENSOR_FEATURES
+
+
+def write_synthetic(export_dir, n_assets, days, seed):
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2021-12-01T00:00:00', 's')
+    timestamps = start + np.arange((days + 31) * 4) * np.timedelta64(6, 'h')
+    sensors = list(SENSOR_FEATURES)
+    n = len(timestamps)
+    readings = pd.DataFrame({
+        'asset_id': np.repeat(np.arange(1, n_assets + 1), n * len(sensors)).astype(np.int32),
+        'sensor_type': np.tile(np.repeat(sensors, n), n_assets),
+        'reading_timestamp': np.tile(timestamps, n_assets * len(sensors)).astype('datetime64[us]'),
+        'reading_value': rng.normal(10.0, 1.0, n_assets * n * len(sensors)),
+    })
+    assets = pd.DataFrame({'asset_id': np.arange(1, n_assets + 1, dtype=np.int32),
+                           'installation_date': pd.to_datetime('2020-01-01').date()})
+    failures = pd.DataFrame({
+        'asset_id': np.repeat(np.arange(1, n_assets + 1, dtype=np.int32), 3),
+        'failure_date': start + rng.integers(31, days, n_assets * 3).astype('timedelta64[D]'),
+    })
+    orders = pd.DataFrame({
+        'asset_id': np.repeat(np.arange(1, n_assets + 1, dtype=np.int32), 6),
+        'order_type': 'preventive', 'status': 'completed',
+        'completion_date': start + rng.integers(0, days, n_assets * 6).astype('timedelta64[D]'),
+    })
+    local = duckdb.connect()
+    for table, frame in (('plc_sensor_readings', readings), ('assets', assets),
+                         ('assets_faliures', failures), ('mantainance_orders', orders)):
+        local.register('frame', frame)
+        local.execute(f"COPY (SELECT * FROM frame) TO '{os.path.join(export_dir, table + '.parquet')}' (FORMAT PARQUET)")
+        local.unregister('frame')
+    local.close()
+    return len(readings)
+
+
+def read_base(connection):
+    frame = pd.read_sql("SELECT * FROM faliure_probability_base ORDER BY asset_id, reading_date", connection)
+    return frame.drop(columns=['base_id', 'extraction_date', 'created_at', 'updated_at'], errors='ignore')
+
+
+def compare(mysql_frame, duckdb_frame):
+    if len(mysql_frame) != len(duckdb_frame):
+        print(f"Row count differs: MySQL {len(mysql_frame)}, DuckDB {len(duckdb_frame)}")
+        return
+    for column in mysql_frame.columns:
+        if column in ('asset_id', 'reading_date'):
+            continue
+        left = pd.to_numeric(mysql_frame[column], errors='coerce').to_numpy(dtype=float)
+        right = pd.to_numeric(duckdb_frame[column], errors='coerce').to_numpy(dtype=float)
+        same_missing = np.array_equal(np.isnan(left), np.isnan(right))
+        diff = np.nanmax(np.abs(left - right)) if np.any(~np.isnan(left)) else 0.0
+        print(f"  {column:<28} max abs diff {diff:.6f}{'' if same_missing else '  (NULLs differ)'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the MySQL and DuckDB feature ETL modes.')
+    parser.add_argument('--mysql', action='store_true', help='Run both modes on the live database')
+    parser.add_argument('--assets', type=int, nargs='+', default=[100, 500])
+    parser.add_argument('--days', type=int, default=396)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if duckdb is None:
+        print("duckdb is not installed: pip install duckdb")
+        sys.exit(1)
+
+    export_dir = tempfile.mkdtemp(prefix='duckdb_export_')
+    try:
+        if args.mysql:
+            from ETL.faliure_probability_dataframe import create_feature_dataframe
+            connection = get_connection()
+            try:
+                started = time.perf_counter()
+                create_feature_dataframe(connection)
+                mysql_seconds = time.perf_counter() - started
+                mysql_frame = read_base(connection)
+
+                started = time.perf_counter()
+                timings = create_feature_dataframe_duckdb(connection, export_dir)
+                duckdb_seconds = time.perf_counter() - started
+                duckdb_frame = read_base(connection)
+            finally:
+                connection.close()
+            print(f"\nMySQL path:  {mysql_seconds:.2f}s for {len(mysql_frame)} rows")
+            print(f"DuckDB path: {duckdb_seconds:.2f}s ("
+                  + ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+                  + f"), speedup {mysql_seconds / duckdb_seconds:.1f}x")
+            compare(mysql_frame, duckdb_frame)
+        else:
+            for n_assets in args.assets:
+                readings = write_synthetic(export_dir, n_assets, args.days, args.seed)
+                started = time.perf_counter()
+                _, rows = compute_features(date(2022, 1, 1), date(2023, 1, 31), export_dir)
+                elapsed = time.perf_counter() - started
+                print(f"{n_assets:>6} assets: {readings} readings -> {len(rows)} rows in {elapsed:.2f}s")
+    finally:
+        shutil.rmtree(export_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark: interval feature builder scaling
+
+Builds faliure_probability_base_hourly-style features for a synthetic fleet
+(4 readings per day per sensor, 3 failures and 6 inspections per asset per
+year) at several bucket sizes with build_asset_features, and reports the
+time per output row. With the grid/cumulative-sum design the run time grows
+linearly with readings + rows; the per-row query design of
+faliure_probability_dataframe.py issues 4 queries per row, which is also
+printed for comparison (--query-ms per query).
+
+Usage:
+    python benchmarks/bench_interval_features.py --assets 50 --days 365
+    python benchmarks/bench_interval_features.py --intervals 1440 480 60 15
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.faliure_probability_interval import FEATURE_WINDOW_DAYS, bucket_grid, build_asset_features
+from ETL.sensor_columnar_store import SENSOR_FEATURES
+
+QUERIES_PER_ROW = 4
+
+
+def synthetic_asset(rng, first_day, days, samples_per_day):
+    start = np.datetime64(first_day, 's') - np.timedelta64(FEATURE_WINDOW_DAYS, 'D')
+    n = (days + FEATURE_WINDOW_DAYS) * samples_per_day
+    timestamps = start + np.arange(n) * np.timedelta64(86400 // samples_per_day, 's')
+    sensor_series = {s: (timestamps, rng.normal(10.0, 1.0, n)) for s in SENSOR_FEATURES}
+    span = days * 86400
+    failures = np.sort(np.datetime64(first_day, 's') + rng.integers(0, span, 3).astype('timedelta64[s]'))
+    inspections = np.sort(np.datetime64(first_day, 's') + rng.integers(0, span, 6).astype('timedelta64[s]'))
+    return sensor_series, failures, inspections, n * len(SENSOR_FEATURES)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the interval feature builder.')
+    parser.add_argument('--assets', type=int, default=50)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--samples-per-day', type=int, default=4)
+    parser.add_argument('--intervals', type=int, nargs='+', default=[1440, 480, 60, 15])
+    parser.add_argument('--query-ms', type=float, default=0.5, help='Assumed latency per query of the per-row design')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    first_day = date(2022, 1, 1)
+    last_day = date.fromordinal(first_day.toordinal() + args.days - 1)
+    fleet = [synthetic_asset(rng, first_day, args.days, args.samples_per_day) for _ in range(args.assets)]
+    readings = sum(asset[3] for asset in fleet)
+    print(f"Fleet: {args.assets} assets, {readings} readings")
+
+    for interval in args.intervals:
+        buckets = bucket_grid(first_day, last_day, interval)
+        started = time.perf_counter()
+        for sensor_series, failures, inspections, _ in fleet:
+            build_asset_features(buckets, interval, sensor_series, date(2020, 1, 1), failures, inspections)
+        elapsed = time.perf_counter() - started
+        rows = len(buckets) * args.assets
+        per_row_design = rows * QUERIES_PER_ROW * args.query_ms / 1000.0
+        print(f"{interval:>5} min: {rows:>9} rows in {elapsed:7.3f}s "
+              f"({elapsed / rows * 1e6:6.2f} us/row); per-row queries: ~{per_row_design:,.0f}s")
+
+
+if __name__ == "__main__":
+    main()
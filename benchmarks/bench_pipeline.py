@@ -0,0 +1,376 @@
+"""
+Benchmark: end-to-end ETL and ML pipeline at several data scales
+
+For every scale (--assets x --years), a synthetic fleet is generated once
+by ETL/synthetic_fleet.py into a SQLite stand-in database under --work-dir,
+together with its columnar sensor store, rollup tiers, sensor_anomaly_daily
+and sensor_data_quality. Later runs reuse it. The pipeline stages then run in order, each in its own process against
+that database (DB_BACKEND=sqlite):
+- features: faliure_probability_dataframe.py -> faliure_probability_base
+- risk:     faliure_probability_calculation.py -> faliure_probability
+- cost:     mantainance_cost_calculation.py -> mantainace_cost
+- lightgbm: faliure_probability_lightgbm_prediction.py -> faliure_prediction
+
+Recorded per stage:
+- wall time
+- query count and query time, from the stage's instrumentation report
+- peak RSS of the stage process
+- output rows and rows/s
+
+Every result is appended to a JSON lines history file (--history).
+
+Golden-output checks: the optimized feature paths (DuckDB engine, columnar
+sensor store, rollup tiers) run after the legacy per asset-day path. Each
+must reproduce the legacy faliure_probability_base row for row, within
+--tolerance. A compared column that is NULL on every row fails the check.
+
+A result is flagged as a regression when it exceeds the median of its last
+--baseline-runs history entries by more than --threshold. This is checked
+for wall time, query count and peak RSS, for the same stage, variant and
+scale. The exit code is 1 on regressions, golden mismatches or failed
+stages. Stages whose optional dependencies (duckdb, lightgbm / scikit-learn)
+are not installed are skipped.
+
+Usage:
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --assets 8 64 256 --threshold 0.15
+    python benchmarks/bench_pipeline.py --assets 32 --stages features --variants duckdb store
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# stage -> (script, output table, modules it needs)
+STAGES = {
+    'features': ('ETL/faliure_probability_dataframe.py', 'faliure_probability_base', ()),
+    'risk': ('ETL/faliure_probability_calculation.py', 'faliure_probability', ()),
+    'cost': ('ETL/mantainance_cost_calculation.py', 'mantainace_cost', ()),
+    'lightgbm': ('ETL/faliure_probability_lightgbm_prediction.py', 'faliure_prediction', ('lightgbm', 'sklearn')),
+}
+
+# Optimized feature paths checked against the legacy output: variant -> (extra env, modules it needs)
+FEATURE_VARIANTS = {
+    'duckdb': ({'FEATURE_ENGINE': 'duckdb', 'DUCKDB_EXPORT_DIR': '{scale_dir}/duckdb_export'}, ('duckdb',)),
+    'store': ({'SENSOR_STORE_DIR': '{scale_dir}/sensor_store'}, ()),
+    'rollups': ({'SENSOR_ROLLUPS': '1'}, ()),
+}
+
+# Columns of faliure_probability_base that legitimately differ between runs
+VOLATILE_COLUMNS = ['base_id', 'extraction_date', 'created_at', 'updated_at']
+REGRESSION_METRICS = ('wall_seconds', 'queries', 'peak_rss_mb')
+
+
+def missing_modules(modules):
+    return [module for module in modules if importlib.util.find_spec(module) is None]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def stage_env(database, extra=None):
+    env = dict(os.environ, DB_BACKEND='sqlite', SQLITE_PATH=database)
+    # The caller's profiling and feature-path settings would skew the measurements
+    for name in ('ETL_PROFILE', 'SENSOR_STORE_DIR', 'SENSOR_ROLLUPS', 'FEATURE_ENGINE'):
+        env.pop(name, None)
+    env.update(extra or {})
+    return env
+
+
+def run_process(args, env, log_path):
+    """Run a script to completion; returns (exit code, wall seconds, peak RSS in MB or None)."""
+    started = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        process = subprocess.Popen([sys.executable] + args, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+        peak_rss_mb = None
+        if hasattr(os, 'wait4'):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+            peak_rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+        else:
+            process.wait()
+    return process.returncode, time.perf_counter() - started, peak_rss_mb
+
+
+def prepare_fleet(args, n_assets):
+    """
+    Generate (or reuse) the fleet database of one scale with its sensor store,
+    rollup tiers, anomaly and data quality tables. The .ready file lists the
+    setup steps already done; a fleet from an older setup only runs the new ones.
+    """
+    scale_dir = os.path.join(args.work_dir, f"fleet_{n_assets}a_{args.years:g}y_s{args.seed}")
+    database = os.path.join(scale_dir, 'fleet.sqlite')
+    ready = os.path.join(scale_dir, '.ready')
+    steps = [
+        ('generate', ['ETL/synthetic_fleet.py', '--assets', str(n_assets), '--years', str(args.years),
+                      '--seed', str(args.seed), '--db', '--store-dir', os.path.join(scale_dir, 'sensor_store')]),
+        ('rollups', ['ETL/sensor_downsampling.py']),
+        ('anomalies', ['ETL/sensor_anomaly_detection.py']),
+        ('quality', ['ETL/sensor_data_quality.py']),
+    ]
+    done = set()
+    if os.path.exists(ready):
+        with open(ready, encoding='utf-8') as f:
+            done = set(f.read().split())
+    if all(name in done for name, _ in steps):
+        return scale_dir, database
+
+    os.makedirs(scale_dir, exist_ok=True)
+    if 'generate' not in done:
+        done = set()
+        for name in os.listdir(scale_dir):
+            if name.startswith('fleet.sqlite'):
+                os.remove(os.path.join(scale_dir, name))
+        print(f"Generating fleet of {n_assets} assets x {args.years:g} years in {scale_dir}...")
+    else:
+        print(f"Completing fleet setup in {scale_dir}...")
+    env = stage_env(database)
+    for name, step in steps:
+        if name in done:
+            continue
+        code, seconds, _ = run_process(step, env, os.path.join(scale_dir, f"setup_{name}.log"))
+        if code != 0:
+            raise RuntimeError(f"Fleet setup step '{name}' failed, see {scale_dir}/setup_{name}.log")
+        print(f"  {name}: {seconds:.1f}s")
+        done.add(name)
+        with open(ready, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(name for name, _ in steps if name in done) + '\n')
+    return scale_dir, database
+
+
+def count_rows(database, table):
+    connection = sqlite3.connect(database)
+    try:
+        return connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def read_features(database):
+    connection = sqlite3.connect(database)
+    try:
+        frame = pd.read_sql("SELECT * FROM faliure_probability_base ORDER BY asset_id, reading_date", connection)
+    finally:
+        connection.close()
+    return frame.drop(columns=VOLATILE_COLUMNS, errors='ignore').reset_index(drop=True)
+
+
+def compare_outputs(expected, actual, tolerance):
+    """
+    Differences between two feature tables as a list of messages (empty =
+    identical). A column that is NULL on every row is reported too: it would
+    match trivially and prove nothing.
+    """
+    if len(expected) != len(actual):
+        return [f"row count {len(actual)} != {len(expected)}"]
+    keys = ['asset_id', 'reading_date']
+    if not expected[keys].astype(str).equals(actual[keys].astype(str)):
+        return ["(asset_id, reading_date) keys differ"]
+    problems = []
+    for column in expected.columns:
+        if column in keys:
+            continue
+        if column not in actual.columns:
+            problems.append(f"{column}: missing")
+            continue
+        left = pd.to_numeric(expected[column], errors='coerce').to_numpy(dtype=float)
+        right = pd.to_numeric(actual[column], errors='coerce').to_numpy(dtype=float)
+        if len(left) and np.isnan(left).all() and np.isnan(right).all():
+            problems.append(f"{column}: NULL on every row of both outputs")
+            continue
+        same = np.isclose(left, right, rtol=tolerance, atol=tolerance, equal_nan=True)
+        if not same.all():
+            first = int(np.argmin(same))
+            problems.append(
+                f"{column}: {int((~same).sum())} rows differ, e.g. asset {expected['asset_id'].iloc[first]} "
+                f"on {expected['reading_date'].iloc[first]}: {left[first]} != {right[first]}"
+            )
+    return problems
+
+
+def run_stage(args, bench_run_id, scale_dir, database, stage, variant='legacy', extra_env=None):
+    script, table, _ = STAGES[stage]
+    metrics_dir = os.path.join(args.work_dir, 'metrics')
+    os.makedirs(metrics_dir, exist_ok=True)
+    run_id = f"{bench_run_id}-{os.path.basename(scale_dir)}-{stage}-{variant}"
+    env = stage_env(database, dict(extra_env or {}, ETL_METRICS_DIR=metrics_dir, ETL_RUN_ID=run_id))
+    log_path = os.path.join(scale_dir, f"{stage}_{variant}.log")
+
+    code, wall_seconds, peak_rss_mb = run_process([script], env, log_path)
+    report_path = os.path.join(metrics_dir, f"{os.path.splitext(os.path.basename(script))[0]}_{run_id}.json")
+    queries = query_seconds = None
+    if os.path.exists(report_path):
+        with open(report_path, encoding='utf-8') as f:
+            report = json.load(f)
+        queries, query_seconds = report['queries']['count'], report['queries']['total_seconds']
+    output_rows = count_rows(database, table) if code == 0 else None
+    return {
+        'stage': stage,
+        'variant': variant,
+        'status': 'ok' if code == 0 else 'error',
+        'wall_seconds': round(wall_seconds, 4),
+        'queries': queries,
+        'query_seconds': query_seconds,
+        'peak_rss_mb': round(peak_rss_mb, 1) if peak_rss_mb is not None else None,
+        'output_rows': output_rows,
+        'rows_per_second': round(output_rows / wall_seconds, 1) if output_rows else None,
+        'log': log_path,
+    }
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _key(entry):
+    return (entry['stage'], entry['variant'], entry['assets'], entry['years'], entry['seed'], entry['backend'])
+
+
+def find_regressions(results, history, threshold, min_seconds, baseline_runs):
+    """[(result, metric, baseline, value)] for results beyond threshold of their baseline."""
+    regressions = []
+    for result in results:
+        if result['status'] != 'ok':
+            continue
+        previous = [entry for entry in history if entry['status'] == 'ok' and _key(entry) == _key(result)]
+        previous = previous[-baseline_runs:]
+        for metric in REGRESSION_METRICS:
+            values = [entry[metric] for entry in previous if entry.get(metric) is not None]
+            if not values or result.get(metric) is None:
+                continue
+            baseline = statistics.median(values)
+            value = result[metric]
+            if value > baseline * (1 + threshold) and (metric != 'wall_seconds' or value - baseline >= min_seconds):
+                regressions.append((result, metric, baseline, value))
+    return regressions
+
+
+def print_result(result):
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else '-'
+    print(f"{result['assets']:>7} {result['stage']:<9} {result['variant']:<8} {result['status']:<8} "
+          f"{fmt(result['wall_seconds'], '>9.2f')} {fmt(result['queries'], '>9')} "
+          f"{fmt(result['peak_rss_mb'], '>9.1f')} {fmt(result['output_rows'], '>9')} "
+          f"{fmt(result['rows_per_second'], '>10.0f')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ETL and ML pipeline stages at several scales.')
+    parser.add_argument('--assets', type=int, nargs='+', default=[8, 32, 128])
+    parser.add_argument('--years', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--variants', nargs='*', choices=list(FEATURE_VARIANTS), default=list(FEATURE_VARIANTS),
+                        help='Optimized feature paths to check against the legacy output (none: skip golden checks)')
+    parser.add_argument('--work-dir', default=os.path.join(ROOT, 'bench_data'))
+    parser.add_argument('--history', help='JSON lines history file (default: <work-dir>/pipeline_history.jsonl)')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Relative increase flagged as a regression')
+    parser.add_argument('--min-seconds', type=float, default=0.5, help='Ignore wall time increases below this')
+    parser.add_argument('--baseline-runs', type=int, default=5, help='History entries the baseline median uses')
+    parser.add_argument('--tolerance', type=float, default=1e-3, help='Golden check tolerance (absolute and relative)')
+    parser.add_argument('--no-record', action='store_true', help='Do not append this run to the history')
+    args = parser.parse_args()
+    args.work_dir = os.path.abspath(args.work_dir)
+    history_path = args.history or os.path.join(args.work_dir, 'pipeline_history.jsonl')
+    os.makedirs(args.work_dir, exist_ok=True)
+
+    bench_run_id = datetime.now().strftime('%Y%m%dT%H%M%S')
+    context = {
+        'run_id': bench_run_id,
+        'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'backend': 'sqlite',
+        'years': args.years,
+        'seed': args.seed,
+    }
+    history = load_history(history_path)
+    results, mismatches, skipped = [], [], []
+
+    print(f"{'assets':>7} {'stage':<9} {'variant':<8} {'status':<8} {'seconds':>9} {'queries':>9} "
+          f"{'rss MB':>9} {'rows':>9} {'rows/s':>10}")
+    for n_assets in args.assets:
+        scale_dir, database = prepare_fleet(args, n_assets)
+        legacy_features = None
+        for stage in args.stages:
+            missing = missing_modules(STAGES[stage][2])
+            if missing:
+                skipped.append(f"{stage} ({', '.join(missing)} not installed)")
+                continue
+            result = dict(context, assets=n_assets, **run_stage(args, bench_run_id, scale_dir, database, stage))
+            results.append(result)
+            print_result(result)
+            if stage == 'features' and result['status'] == 'ok':
+                legacy_features = read_features(database)
+
+        if legacy_features is None:
+            continue
+        for variant in args.variants:
+            extra_env, modules = FEATURE_VARIANTS[variant]
+            missing = missing_modules(modules)
+            if missing:
+                skipped.append(f"features/{variant} ({', '.join(missing)} not installed)")
+                continue
+            extra_env = {name: value.format(scale_dir=scale_dir) for name, value in extra_env.items()}
+            result = dict(context, assets=n_assets,
+                          **run_stage(args, bench_run_id, scale_dir, database, 'features', variant, extra_env))
+            if result['status'] == 'ok':
+                problems = compare_outputs(legacy_features, read_features(database), args.tolerance)
+                result['golden'] = 'match' if not problems else 'mismatch'
+                mismatches += [(n_assets, variant, problem) for problem in problems]
+            results.append(result)
+            print_result(result)
+
+    failed = [result for result in results if result['status'] != 'ok']
+    regressions = find_regressions(results, history, args.threshold, args.min_seconds, args.baseline_runs)
+
+    if skipped:
+        print(f"\nSkipped: {', '.join(dict.fromkeys(skipped))}")
+    for result in failed:
+        print(f"\nFAILED {result['stage']}/{result['variant']} at {result['assets']} assets, see {result['log']}")
+    if mismatches:
+        print("\nGolden-output mismatches (optimized path vs legacy):")
+        for n_assets, variant, problem in mismatches:
+            print(f"  {n_assets} assets, {variant}: {problem}")
+    elif any('golden' in result for result in results):
+        print("\nGolden-output checks: all optimized feature paths match the legacy output")
+    if regressions:
+        print(f"\nRegressions (> {args.threshold:.0%} over the median of the last {args.baseline_runs} runs):")
+        for result, metric, baseline, value in regressions:
+            print(f"  {result['assets']} assets {result['stage']}/{result['variant']}: {metric} {baseline:g} -> {value:g}")
+
+    if not args.no_record:
+        with open(history_path, 'a', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps({k: v for k, v in result.items() if k != 'log'}) + '\n')
+        print(f"\n{len(results)} results appended to {history_path}")
+
+    if failed or mismatches or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
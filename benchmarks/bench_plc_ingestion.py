@@ -0,0 +1,85 @@
+"""
+Benchmark: PLC reading ingestion throughput at fleet scale
+
+Pushes a simulated fleet through IngestionService and reports sustained
+readings/s. By default the sink only counts rows, which measures the pipeline
+itself; --latency-ms adds a fixed per-batch round trip to model a database,
+and --mysql writes to the real plc_sensor_readings table (DB_* env settings).
+
+Usage:
+    python benchmarks/bench_plc_ingestion.py --assets 1000 --days 2
+    python benchmarks/bench_plc_ingestion.py --assets 1000 --days 1 --latency-ms 5 --batch-sizes 1 100 5000
+    python benchmarks/bench_plc_ingestion.py --assets 200 --days 1 --mysql
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import get_connection
+from ETL.plc_ingestion import (
+    IngestionService, MySQLReadingSink, NullSink, SimulatedPLCSource, PLC_SENSORS
+)
+
+
+class LatencySink(NullSink):
+    """NullSink that sleeps a fixed round trip per batch (models a remote DB)."""
+
+    def __init__(self, latency_ms):
+        super().__init__()
+        self.latency = latency_ms / 1000.0
+
+    def write_batch(self, rows):
+        time.sleep(self.latency)
+        super().write_batch(rows)
+
+
+def run_case(args, batch_size, sink):
+    source = SimulatedPLCSource(n_assets=args.assets, days=args.days, start=datetime(2022, 1, 1))
+    service = IngestionService(source, sink, queue_size=args.queue_size, batch_size=batch_size)
+    return asyncio.run(service.run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark PLC reading ingestion.')
+    parser.add_argument('--assets', type=int, default=1000)
+    parser.add_argument('--days', type=float, default=1)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[500, 5000, 20000])
+    parser.add_argument('--queue-size', type=int, default=50000)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--mysql', action='store_true', help='Write to MySQL instead of a null sink')
+    args = parser.parse_args()
+
+    expected = int(args.days * 4) * args.assets * len(PLC_SENSORS)
+    print(f"Fleet: {args.assets} assets x {len(PLC_SENSORS)} sensors, {args.days} day(s) "
+          f"at 4 samples/day = {expected} readings")
+    print(f"{'batch':>8} {'readings':>10} {'batches':>8} {'seconds':>9} {'readings/s':>12} {'waits':>7}")
+
+    connection = None
+    if args.mysql:
+        connection = get_connection()
+
+    try:
+        for batch_size in args.batch_sizes:
+            if connection is not None:
+                sink = MySQLReadingSink(connection)
+            elif args.latency_ms:
+                sink = LatencySink(args.latency_ms)
+            else:
+                sink = NullSink()
+            stats = run_case(args, batch_size, sink)
+            print(f"{batch_size:>8} {stats['readings']:>10} {stats['batches']:>8} "
+                  f"{stats['elapsed_seconds']:>9.3f} {stats['readings_per_second']:>12.0f} "
+                  f"{stats['producer_waits']:>7}")
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark: columnar sensor store vs. MySQL plc_sensor_readings
+
+Measures storage bytes and the scan speed of the feature ETL access pattern
+(30-day window averages of the 6 sensors for every asset-day).
+
+Without --mysql a synthetic fleet is written to a temporary store. With
+--mysql, plc_sensor_readings is exported into the store and compared with
+the table size from INFORMATION_SCHEMA and the same window queries in SQL
+(DB_* env settings).
+
+Usage:
+    python benchmarks/bench_sensor_store.py --assets 100 --days 365
+    python benchmarks/bench_sensor_store.py --mysql --sample-days 30
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ETL.db import DB_CONFIG, get_connection
+from ETL.sensor_columnar_store import (
+    SENSOR_FEATURES, SensorColumnarStore, export_from_mysql, sensor_window_averages
+)
+
+
+def write_synthetic(store, n_assets, days, samples_per_day, seed):
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2022-01-01T00:00:00', 's')
+    step = np.timedelta64(86400 // samples_per_day, 's')
+    timestamps = start + np.arange(days * samples_per_day) * step
+    rows = 0
+    for asset_id in range(1, n_assets + 1):
+        for sensor_type in SENSOR_FEATURES:
+            values = rng.normal(10.0, 1.0, len(timestamps)).astype(np.float32)
+            store.write(asset_id, sensor_type, timestamps, values)
+            rows += len(values)
+    return rows
+
+
+def scan_store(store, asset_ids, first_day, n_days):
+    started = time.perf_counter()
+    for asset_id in asset_ids:
+        for offset in range(n_days):
+            day = first_day + timedelta(days=offset)
+            sensor_window_averages(store, asset_id, day - timedelta(days=30), day + timedelta(days=1))
+    return time.perf_counter() - started
+
+
+def scan_mysql(connection, asset_ids, first_day, n_days):
+    cursor = connection.cursor()
+    started = time.perf_counter()
+    for asset_id in asset_ids:
+        for offset in range(n_days):
+            day = first_day + timedelta(days=offset)
+            cursor.execute("""
+                SELECT sensor_type, AVG(reading_value)
+                FROM plc_sensor_readings
+                WHERE asset_id = %s
+                AND reading_timestamp >= %s AND reading_timestamp < %s
+                GROUP BY sensor_type
+            """, (asset_id, day - timedelta(days=30), day + timedelta(days=1)))
+            cursor.fetchall()
+    elapsed = time.perf_counter() - started
+    cursor.close()
+    return elapsed
+
+
+def mysql_table_bytes(connection):
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT DATA_LENGTH, INDEX_LENGTH, TABLE_ROWS
+        FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'plc_sensor_readings'
+    """, (DB_CONFIG['database'],))
+    data_length, index_length, table_rows = cursor.fetchone()
+    cursor.close()
+    return int(data_length), int(index_length), int(table_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the columnar sensor store.')
+    parser.add_argument('--assets', type=int, default=100)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--samples-per-day', type=int, default=4)
+    parser.add_argument('--sample-days', type=int, default=60, help='Asset-days scanned per asset')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--mysql', action='store_true')
+    args = parser.parse_args()
+
+    store_dir = tempfile.mkdtemp(prefix='sensor_store_')
+    store = SensorColumnarStore(store_dir)
+    connection = None
+    try:
+        started = time.perf_counter()
+        if args.mysql:
+            connection = get_connection()
+            rows = export_from_mysql(connection, store)
+            cursor = connection.cursor()
+            cursor.execute("SELECT asset_id FROM assets ORDER BY asset_id")
+            asset_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute("SELECT DATE(MIN(reading_timestamp)) FROM plc_sensor_readings")
+            first_day = cursor.fetchone()[0] + timedelta(days=30)
+            cursor.close()
+        else:
+            rows = write_synthetic(store, args.assets, args.days, args.samples_per_day, args.seed)
+            asset_ids = list(range(1, args.assets + 1))
+            first_day = date(2022, 1, 31)
+        write_seconds = time.perf_counter() - started
+
+        store_bytes = store.nbytes()
+        print(f"Readings: {rows}")
+        print(f"Columnar store: {store_bytes / 1e6:.2f} MB "
+              f"({store_bytes / max(rows, 1):.2f} bytes/reading, written in {write_seconds:.2f}s)")
+
+        windows = len(asset_ids) * args.sample_days
+        store_seconds = scan_store(store, asset_ids, first_day, args.sample_days)
+        print(f"Store scan: {windows} asset-day windows in {store_seconds:.3f}s "
+              f"({windows / store_seconds:.0f} windows/s)")
+
+        if connection is not None:
+            data_length, index_length, table_rows = mysql_table_bytes(connection)
+            mysql_bytes = data_length + index_length
+            print(f"MySQL plc_sensor_readings: {mysql_bytes / 1e6:.2f} MB "
+                  f"(data {data_length / 1e6:.2f} MB + indexes {index_length / 1e6:.2f} MB, "
+                  f"{mysql_bytes / max(table_rows, 1):.1f} bytes/row)")
+            mysql_seconds = scan_mysql(connection, asset_ids, first_day, args.sample_days)
+            print(f"MySQL scan: {windows} asset-day windows in {mysql_seconds:.3f}s "
+                  f"({windows / mysql_seconds:.0f} windows/s)")
+            print(f"Storage ratio: {mysql_bytes / store_bytes:.1f}x smaller, "
+                  f"scan speedup: {mysql_seconds / store_seconds:.1f}x")
+    finally:
+        if connection is not None:
+            connection.close()
+        shutil.rmtree(store_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -231,7 +231,7 @@ CREATE TABLE IF NOT EXISTS palantir_maintenance.mantainace_cost (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- Table: faliure_probability_base (features: mechanical vibrations, RPM, power, current, pressure, flow, service time, days since failure/inspection)
-CREATE TABLE palantir_maintenance.faliure_probability_base (
+CREATE TABLE IF NOT EXISTS palantir_maintenance.faliure_probability_base (
   `base_id` int NOT NULL AUTO_INCREMENT,
   `asset_id` int NOT NULL,
   `reading_date` date DEFAULT NULL,
@@ -247,6 +247,10 @@ CREATE TABLE palantir_maintenance.faliure_probability_base (
   `asset_service_hours` decimal(12,2) DEFAULT NULL COMMENT 'Estimated operating hours',
   `days_since_last_failure` int DEFAULT NULL COMMENT 'Days since last failure',
   `days_since_last_inspection` int DEFAULT NULL COMMENT 'Days since last visual inspection',
+  `sensor_anomaly_score` decimal(10,4) DEFAULT NULL COMMENT 'Max |z| of any sensor reading that day (EWMA detector)',
+  `sensor_anomaly_alarms` int DEFAULT NULL COMMENT 'CUSUM alarms across all sensors that day',
+  `sensor_coverage_1d` decimal(5,4) DEFAULT NULL COMMENT 'Valid readings / expected readings that day',
+  `sensor_coverage_30d` decimal(5,4) DEFAULT NULL COMMENT 'Valid readings / expected readings in the 30-day window',
   `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
   `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (`base_id`),
@@ -257,6 +261,28 @@ CREATE TABLE palantir_maintenance.faliure_probability_base (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 
+-- Table: faliure_probability_base_hourly (faliure_probability_base features without the daily anomaly/coverage ones, per asset per time bucket; interval_minutes = bucket length)
+CREATE TABLE IF NOT EXISTS palantir_maintenance.faliure_probability_base_hourly (
+  `asset_id` int NOT NULL,
+  `interval_minutes` smallint NOT NULL DEFAULT 60,
+  `bucket_start` datetime NOT NULL,
+  `faliure` tinyint(1) DEFAULT '0' COMMENT 'Failure in the 7 days after the bucket',
+  `mechanical_vibration` decimal(12,4) DEFAULT NULL,
+  `rpm` decimal(10,2) DEFAULT NULL,
+  `power` decimal(12,4) DEFAULT NULL,
+  `electrical_current` decimal(12,4) DEFAULT NULL,
+  `pressure` decimal(12,4) DEFAULT NULL,
+  `flow` decimal(12,4) DEFAULT NULL,
+  `asset_service_days` int DEFAULT NULL,
+  `asset_service_hours` decimal(12,2) DEFAULT NULL,
+  `days_since_last_failure` int DEFAULT NULL,
+  `days_since_last_inspection` int DEFAULT NULL,
+  `extraction_date` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP(),
+  PRIMARY KEY (`interval_minutes`, `asset_id`, `bucket_start`),
+  KEY `idx_bucket_start` (`bucket_start`),
+  CONSTRAINT `faliure_probability_base_hourly_ibfk_1` FOREIGN KEY (`asset_id`) REFERENCES `assets` (`asset_id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 -- Table: faliure_prediction
 CREATE TABLE IF NOT EXISTS palantir_maintenance.faliure_prediction (
     prediction_id INT AUTO_INCREMENT PRIMARY KEY,
@@ -276,3 +302,141 @@ CREATE TABLE IF NOT EXISTS palantir_maintenance.faliure_prediction (
     INDEX idx_probability_score (probability_score),
     INDEX idx_predicted_failure (predicted_failure)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Table: feature_drift (daily PSI/KS drift scores of faliure_probability_base sensor features vs. the training reference)
+CREATE TABLE IF NOT EXISTS palantir_maintenance.feature_drift (
+    drift_id INT AUTO_INCREMENT PRIMARY KEY,
+    reading_date DATE NOT NULL,
+    feature_name VARCHAR(100) NOT NULL,
+    psi DECIMAL(12, 6) NOT NULL,
+    ks_statistic DECIMAL(8, 6) NOT NULL,
+    window_count INT DEFAULT 0,
+    drift_status VARCHAR(50) NOT NULL,
+    reference_version VARCHAR(50) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY unique_drift_date_feature (reference_version, reading_date, feature_name),
+    INDEX idx_reading_date (reading_date),
+    INDEX idx_drift_status (drift_status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Table: etl_watermarks (progress markers of incremental ETL jobs, e.g. last copied reading_id)
+CREATE TABLE IF NOT EXISTS palantir_maintenance.etl_watermarks (
+    watermark_name VARCHAR(100) PRIMARY KEY,
+    watermark_value VARCHAR(100) NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Table: etl_stage_runs (one row per stage execution of the pipeline orchestrator, ETL/pipeline.py)
+CREATE TABLE IF NOT EXISTS palantir_maintenance.etl_stage_runs (
+    stage_run_id INT AUTO_INCREMENT PRIMARY KEY,
+    run_id VARCHAR(64) NOT NULL,
+    stage_name VARCHAR(100) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    input_fingerprint CHAR(40),
+    started_at DATETIME NOT NULL,
+    finished_at DATETIME,
+    duration_seconds DECIMAL(12,3),
+    message VARCHAR(500),
+    INDEX idx_stage_status (stage_name, status),
+    INDEX idx_run_id (run_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Table: etl_work_units (asset x date-range units of distributed backfill jobs, ETL/work_queue.py)
+CREATE TABLE IF NOT EXISTS palantir_maintenance.etl_work_units (
+    unit_id INT AUTO_INCREMENT PRIMARY KEY,
+    job_id VARCHAR(64) NOT NULL,
+    asset_id INT NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 3,
+    worker_id VARCHAR(100),
+    claimed_at DATETIME,
+    heartbeat_at DATETIME,
+    finished_at DATETIME,
+    rows_written INT,
+    last_error VARCHAR(500),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY unique_job_unit (job_id, asset_id, start_date),
+    INDEX idx_job_status (job_id, status, unit_id),
+    INDEX idx_status_heartbeat (status, heartbeat_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Table: plc_sensor_readings_hourly (hourly rollup of plc_sensor_readings, built by ETL/sensor_downsampling.py)
+CREATE TABLE IF NOT EXISTS palantir_maintenance.plc_sensor_readings_hourly (
+    asset_id INT NOT NULL,
+    sensor_type VARCHAR(100) NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    reading_count INT NOT NULL,
+    mean_value DOUBLE NOT NULL,
+    min_value DOUBLE NOT NULL,
+    max_value DOUBLE NOT NULL,
+    std_value DOUBLE NOT NULL,
+    warning_count INT DEFAULT 0,
+    critical_count INT DEFAULT 0,
+    PRIMARY KEY (asset_id, sensor_type, bucket_start),
+    INDEX idx_bucket_start (bucket_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Table: plc_sensor_readings_daily (daily rollup, built from the hourly tier)
+CREATE TABLE IF NOT EXISTS palantir_maintenance.plc_sensor_readings_daily (
+    asset_id INT NOT NULL,
+    sensor_type VARCHAR(100) NOT NULL,
+    bucket_date DATE NOT NULL,
+    reading_count INT NOT NULL,
+    mean_value DOUBLE NOT NULL,
+    min_value DOUBLE NOT NULL,
+    max_value DOUBLE NOT NULL,
+    std_value DOUBLE NOT NULL,
+    warning_count INT DEFAULT 0,
+    critical_count INT DEFAULT 0,
+    PRIMARY KEY (asset_id, sensor_type, bucket_date),
+    INDEX idx_bucket_date (bucket_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Table: sensor_anomaly_state (EWMA/CUSUM detector state per asset x sensor)
+CREATE TABLE IF NOT EXISTS palantir_maintenance.sensor_anomaly_state (
+    asset_id INT NOT NULL,
+    sensor_type VARCHAR(100) NOT NULL,
+    ewma_mean DOUBLE NOT NULL,
+    ewma_var DOUBLE NOT NULL,
+    cusum_pos DOUBLE NOT NULL,
+    cusum_neg DOUBLE NOT NULL,
+    reading_count INT NOT NULL,
+    last_reading_at DATETIME,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (asset_id, sensor_type)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Table: sensor_anomaly_daily (anomaly scores per asset x day x sensor)
+CREATE TABLE IF NOT EXISTS palantir_maintenance.sensor_anomaly_daily (
+    asset_id INT NOT NULL,
+    reading_date DATE NOT NULL,
+    sensor_type VARCHAR(100) NOT NULL,
+    reading_count INT NOT NULL,
+    max_abs_z DECIMAL(10, 4) NOT NULL,
+    max_cusum DECIMAL(10, 4) NOT NULL,
+    alarm_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (asset_id, reading_date, sensor_type),
+    INDEX idx_reading_date (reading_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Table: sensor_data_quality (per asset x day x sensor: coverage, gaps, flatlines, out-of-range values, duplicates)
+CREATE TABLE IF NOT EXISTS palantir_maintenance.sensor_data_quality (
+    asset_id INT NOT NULL,
+    reading_date DATE NOT NULL,
+    sensor_type VARCHAR(100) NOT NULL,
+    expected_count INT NOT NULL,
+    reading_count INT NOT NULL,
+    duplicate_count INT NOT NULL DEFAULT 0,
+    out_of_range_count INT NOT NULL DEFAULT 0,
+    flatline_count INT NOT NULL DEFAULT 0,
+    gap_minutes INT NOT NULL DEFAULT 0,
+    longest_gap_minutes INT NOT NULL DEFAULT 0,
+    coverage_ratio DECIMAL(5, 4) NOT NULL,
+    checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (asset_id, reading_date, sensor_type),
+    INDEX idx_reading_date (reading_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -134,7 +134,7 @@ BEGIN
                 -- Vibration (mechanical vibration, mm/s)
                 SET base_val = 1.5 + (asset_id_var * 0.2);
                 SET reading_val = base_val + (RAND() * 1.5 - 0.75);
-                SET status_val = IF(reading_val > 4.0, 'warning', IF(reading_val > 6.0, 'critical', 'normal'));
+                SET status_val = IF(reading_val > 6.0, 'critical', IF(reading_val > 4.0, 'warning', 'normal'));
                 INSERT INTO plc_sensor_readings (asset_id, sensor_name, sensor_type, reading_value, unit, reading_timestamp, status)
                 VALUES (asset_id_var, 'Vibration Sensor', 'vibration', reading_val, 'mm/s', timestamp_val, status_val);
                 
@@ -155,7 +155,7 @@ BEGIN
                 -- Electrical current (A) - drive motor for pumps, main for motors
                 SET base_val = 22.0 + asset_id_var * 1.5 + (RAND() * 6 - 3);
                 SET reading_val = base_val;
-                SET status_val = IF(reading_val > 30, 'warning', IF(reading_val > 35, 'critical', 'normal'));
+                SET status_val = IF(reading_val > 35, 'critical', IF(reading_val > 30, 'warning', 'normal'));
                 INSERT INTO plc_sensor_readings (asset_id, sensor_name, sensor_type, reading_value, unit, reading_timestamp, status)
                 VALUES (asset_id_var, 'Current Sensor', 'current', reading_val, 'A', timestamp_val, status_val);
                 
@@ -0,0 +1,40 @@
+-- SQL Script to create the normalized sensor schema for Predictive Maintenance System
+-- Database: palantir_maintenance
+--
+-- Replaces the wide plc_sensor_readings rows (VARCHAR name/type/unit/status next to
+-- one DECIMAL value, INT AUTO_INCREMENT id and five secondary indexes) with:
+--   sensors          dimension table: one row per physical sensor, with its thresholds
+--   sensor_readings  narrow fact table clustered by (sensor_id, ts), no secondary indexes
+--
+-- History is copied online and the compatibility view is created by
+-- ETL/sensor_fact_migration.py (see ETL/README.md). After the swap, the legacy table
+-- is kept as plc_sensor_readings_legacy and plc_sensor_readings becomes a view.
+
+USE palantir_maintenance;
+
+-- Table: sensors (dimension)
+CREATE TABLE IF NOT EXISTS palantir_maintenance.sensors (
+    sensor_id SMALLINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    asset_id INT NOT NULL,
+    sensor_name VARCHAR(255) NOT NULL,
+    sensor_type VARCHAR(100) NOT NULL,
+    unit VARCHAR(50) NOT NULL,
+    warning_low DECIMAL(10, 4),
+    warning_high DECIMAL(10, 4),
+    critical_low DECIMAL(10, 4),
+    critical_high DECIMAL(10, 4),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (asset_id) REFERENCES assets(asset_id) ON DELETE CASCADE,
+    UNIQUE KEY unique_asset_sensor (asset_id, sensor_type, sensor_name),
+    INDEX idx_sensor_type (sensor_type)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Table: sensor_readings (narrow fact table; status: 0 = normal, 1 = warning, 2 = critical)
+CREATE TABLE IF NOT EXISTS palantir_maintenance.sensor_readings (
+    sensor_id SMALLINT UNSIGNED NOT NULL,
+    ts DATETIME NOT NULL,
+    value FLOAT NOT NULL,
+    status TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    PRIMARY KEY (sensor_id, ts)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
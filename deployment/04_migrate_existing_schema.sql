@@ -0,0 +1,49 @@
+-- SQL Script to upgrade an existing palantir_maintenance database to the current schema
+-- Database: palantir_maintenance
+--
+-- 01_create_tables.sql only creates what is missing: it does not change tables
+-- that already exist. This script adds the columns that were added to existing
+-- tables afterwards. It is idempotent: columns that are already there are skipped.
+--
+-- Upgrade order on an existing database:
+--   mysql -u root -p < deployment/01_create_tables.sql              # new tables
+--   mysql -u root -p < deployment/04_migrate_existing_schema.sql    # new columns
+
+USE palantir_maintenance;
+
+DELIMITER $$
+
+CREATE PROCEDURE IF NOT EXISTS add_column_if_missing(
+    IN table_name_var VARCHAR(64),
+    IN column_name_var VARCHAR(64),
+    IN definition_var VARCHAR(1000)
+)
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME = table_name_var
+        AND COLUMN_NAME = column_name_var
+    ) THEN
+        SET @ddl = CONCAT('ALTER TABLE `', table_name_var, '` ADD COLUMN `', column_name_var, '` ', definition_var);
+        PREPARE stmt FROM @ddl;
+        EXECUTE stmt;
+        DEALLOCATE PREPARE stmt;
+    END IF;
+END$$
+
+DELIMITER ;
+
+-- faliure_probability_base: daily anomaly features (ETL/sensor_anomaly_detection.py)
+CALL add_column_if_missing('faliure_probability_base', 'sensor_anomaly_score',
+    "decimal(10,4) DEFAULT NULL COMMENT 'Max |z| of any sensor reading that day (EWMA detector)' AFTER `days_since_last_inspection`");
+CALL add_column_if_missing('faliure_probability_base', 'sensor_anomaly_alarms',
+    "int DEFAULT NULL COMMENT 'CUSUM alarms across all sensors that day' AFTER `sensor_anomaly_score`");
+
+-- faliure_probability_base: sensor data coverage features (ETL/sensor_data_quality.py)
+CALL add_column_if_missing('faliure_probability_base', 'sensor_coverage_1d',
+    "decimal(5,4) DEFAULT NULL COMMENT 'Valid readings / expected readings that day' AFTER `sensor_anomaly_alarms`");
+CALL add_column_if_missing('faliure_probability_base', 'sensor_coverage_30d',
+    "decimal(5,4) DEFAULT NULL COMMENT 'Valid readings / expected readings in the 30-day window' AFTER `sensor_coverage_1d`");
+
+DROP PROCEDURE IF EXISTS add_column_if_missing;
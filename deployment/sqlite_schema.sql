@@ -0,0 +1,468 @@
+-- SQLite schema of palantir_maintenance
+-- Local stand-in for MySQL used by ETL.db when DB_BACKEND=sqlite (tests,
+-- benchmarks, quick iteration). Mirrors 01_create_tables.sql and
+-- 03_sensor_fact_schema.sql minus MySQL-only options (engines, comments,
+-- partitioning, ON UPDATE clauses). Keep both files in sync when adding columns.
+
+-- Table: assets
+CREATE TABLE IF NOT EXISTS assets (
+    asset_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    asset_name VARCHAR(255) NOT NULL,
+    asset_type VARCHAR(100) NOT NULL,
+    location VARCHAR(255) NOT NULL,
+    installation_date DATE NOT NULL,
+    manufacturer VARCHAR(255),
+    model_number VARCHAR(100),
+    status VARCHAR(50) DEFAULT 'operational',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Table: mantainance_employees
+CREATE TABLE IF NOT EXISTS mantainance_employees (
+    employee_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    first_name VARCHAR(100) NOT NULL,
+    last_name VARCHAR(100) NOT NULL,
+    email VARCHAR(255) NOT NULL UNIQUE,
+    phone VARCHAR(20),
+    hire_date DATE NOT NULL,
+    department VARCHAR(100) NOT NULL,
+    position VARCHAR(100) NOT NULL,
+    salary DECIMAL(10, 2),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Table: mantainance_employees_education
+CREATE TABLE IF NOT EXISTS mantainance_employees_education (
+    education_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    employee_id INT NOT NULL,
+    degree VARCHAR(255) NOT NULL,
+    institution VARCHAR(255) NOT NULL,
+    graduation_year INT,
+    field_of_study VARCHAR(255),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (employee_id) REFERENCES mantainance_employees(employee_id) ON DELETE CASCADE
+);
+
+-- Table: asset_value
+CREATE TABLE IF NOT EXISTS asset_value (
+    value_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    asset_id INT NOT NULL,
+    value_date DATE NOT NULL,
+    purchase_value DECIMAL(12, 2) NOT NULL,
+    current_value DECIMAL(12, 2) NOT NULL,
+    depreciation_rate DECIMAL(5, 2),
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (asset_id) REFERENCES assets(asset_id) ON DELETE CASCADE
+);
+
+-- Table: asset_costs
+CREATE TABLE IF NOT EXISTS asset_costs (
+    cost_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    asset_id INT NOT NULL,
+    cost_type VARCHAR(100) NOT NULL,
+    amount DECIMAL(12, 2) NOT NULL CHECK (amount >= 0),
+    cost_date DATE NOT NULL,
+    description TEXT,
+    vendor VARCHAR(255),
+    invoice_number VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (asset_id) REFERENCES assets(asset_id) ON DELETE CASCADE
+);
+
+-- Table: assets_faliures
+CREATE TABLE IF NOT EXISTS assets_faliures (
+    failure_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    asset_id INT NOT NULL,
+    failure_date DATETIME NOT NULL,
+    failure_type VARCHAR(100) NOT NULL,
+    severity VARCHAR(50) NOT NULL,
+    description TEXT NOT NULL,
+    root_cause TEXT,
+    downtime_hours DECIMAL(10, 2),
+    resolved BOOLEAN DEFAULT FALSE,
+    resolution_date DATETIME,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (asset_id) REFERENCES assets(asset_id) ON DELETE CASCADE
+);
+
+-- Table: plc_sensor_readings
+CREATE TABLE IF NOT EXISTS plc_sensor_readings (
+    reading_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    asset_id INT NOT NULL,
+    sensor_name VARCHAR(255) NOT NULL,
+    sensor_type VARCHAR(100) NOT NULL,
+    reading_value DECIMAL(10, 4) NOT NULL,
+    unit VARCHAR(50) NOT NULL,
+    reading_timestamp DATETIME NOT NULL,
+    status VARCHAR(50) DEFAULT 'normal',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (asset_id) REFERENCES assets(asset_id) ON DELETE CASCADE
+);
+
+-- Table: mantainance_orders
+CREATE TABLE IF NOT EXISTS mantainance_orders (
+    order_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    asset_id INT NOT NULL,
+    assigned_employee_id INT,
+    order_type VARCHAR(100) NOT NULL,
+    priority VARCHAR(50) NOT NULL,
+    description TEXT NOT NULL,
+    scheduled_date DATETIME,
+    start_date DATETIME,
+    completion_date DATETIME,
+    status VARCHAR(50) DEFAULT 'pending',
+    estimated_cost DECIMAL(12, 2),
+    actual_cost DECIMAL(12, 2),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (asset_id) REFERENCES assets(asset_id) ON DELETE CASCADE,
+    FOREIGN KEY (assigned_employee_id) REFERENCES mantainance_employees(employee_id) ON DELETE SET NULL
+);
+
+-- Table: mantainance_tasks
+CREATE TABLE IF NOT EXISTS mantainance_tasks (
+    task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INT NOT NULL,
+    task_name VARCHAR(255) NOT NULL,
+    task_description TEXT,
+    assigned_employee_id INT,
+    status VARCHAR(50) DEFAULT 'pending',
+    estimated_hours DECIMAL(6, 2),
+    actual_hours DECIMAL(6, 2),
+    start_time DATETIME,
+    end_time DATETIME,
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (order_id) REFERENCES mantainance_orders(order_id) ON DELETE CASCADE,
+    FOREIGN KEY (assigned_employee_id) REFERENCES mantainance_employees(employee_id) ON DELETE SET NULL
+);
+
+-- Table: faliure_probability
+CREATE TABLE IF NOT EXISTS faliure_probability (
+    probability_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    asset_id INT NOT NULL,
+    probability_score DECIMAL(5, 4) NOT NULL CHECK (probability_score >= 0 AND probability_score <= 1),
+    risk_level VARCHAR(50) NOT NULL,
+    calculation_date DATETIME NOT NULL,
+    failure_count INT DEFAULT 0,
+    warning_count INT DEFAULT 0,
+    critical_sensor_count INT DEFAULT 0,
+    days_since_maintenance INT,
+    unresolved_failures INT DEFAULT 0,
+    asset_age_days INT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (asset_id) REFERENCES assets(asset_id) ON DELETE CASCADE,
+    UNIQUE (asset_id)
+);
+
+-- Table: mantainace_cost
+CREATE TABLE IF NOT EXISTS mantainace_cost (
+    cost_calculation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    asset_id INT NOT NULL,
+    calculation_date DATETIME NOT NULL,
+    total_cost DECIMAL(12, 2) DEFAULT 0.00,
+    total_transactions INT DEFAULT 0,
+    avg_cost_per_transaction DECIMAL(12, 2) DEFAULT 0.00,
+    maintenance_cost DECIMAL(12, 2) DEFAULT 0.00,
+    repair_cost DECIMAL(12, 2) DEFAULT 0.00,
+    upgrade_cost DECIMAL(12, 2) DEFAULT 0.00,
+    other_cost DECIMAL(12, 2) DEFAULT 0.00,
+    cost_last_12m DECIMAL(12, 2) DEFAULT 0.00,
+    cost_last_6m DECIMAL(12, 2) DEFAULT 0.00,
+    cost_last_3m DECIMAL(12, 2) DEFAULT 0.00,
+    transactions_12m INT DEFAULT 0,
+    transactions_6m INT DEFAULT 0,
+    transactions_3m INT DEFAULT 0,
+    avg_monthly_cost DECIMAL(12, 2) DEFAULT 0.00,
+    avg_yearly_cost DECIMAL(12, 2) DEFAULT 0.00,
+    cost_per_day DECIMAL(10, 4) DEFAULT 0.0000,
+    cost_trend VARCHAR(50) DEFAULT 'stable',
+    last_cost_date DATE,
+    days_since_last_cost INT,
+    asset_age_days INT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (asset_id) REFERENCES assets(asset_id) ON DELETE CASCADE,
+    UNIQUE (asset_id)
+);
+
+-- Table: faliure_probability_base (features: mechanical vibrations, RPM, power, current, pressure, flow, service time, days since failure/inspection)
+CREATE TABLE IF NOT EXISTS faliure_probability_base (
+    base_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    asset_id int NOT NULL,
+    reading_date date DEFAULT NULL,
+    faliure tinyint(1) DEFAULT '0',
+    extraction_date datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    mechanical_vibration decimal(12,4) DEFAULT NULL,
+    rpm decimal(10,2) DEFAULT NULL,
+    power decimal(12,4) DEFAULT NULL,
+    electrical_current decimal(12,4) DEFAULT NULL,
+    pressure decimal(12,4) DEFAULT NULL,
+    flow decimal(12,4) DEFAULT NULL,
+    asset_service_days int DEFAULT NULL,
+    asset_service_hours decimal(12,2) DEFAULT NULL,
+    days_since_last_failure int DEFAULT NULL,
+    days_since_last_inspection int DEFAULT NULL,
+    sensor_anomaly_score decimal(10,4) DEFAULT NULL,
+    sensor_anomaly_alarms int DEFAULT NULL,
+    sensor_coverage_1d decimal(5,4) DEFAULT NULL,
+    sensor_coverage_30d decimal(5,4) DEFAULT NULL,
+    created_at timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (asset_id,extraction_date,reading_date),
+    FOREIGN KEY (asset_id) REFERENCES assets (asset_id) ON DELETE CASCADE
+);
+
+-- Table: faliure_probability_base_hourly (faliure_probability_base features without the daily anomaly/coverage ones, per asset per time bucket; interval_minutes = bucket length)
+CREATE TABLE IF NOT EXISTS faliure_probability_base_hourly (
+    asset_id int NOT NULL,
+    interval_minutes smallint NOT NULL DEFAULT 60,
+    bucket_start datetime NOT NULL,
+    faliure tinyint(1) DEFAULT '0',
+    mechanical_vibration decimal(12,4) DEFAULT NULL,
+    rpm decimal(10,2) DEFAULT NULL,
+    power decimal(12,4) DEFAULT NULL,
+    electrical_current decimal(12,4) DEFAULT NULL,
+    pressure decimal(12,4) DEFAULT NULL,
+    flow decimal(12,4) DEFAULT NULL,
+    asset_service_days int DEFAULT NULL,
+    asset_service_hours decimal(12,2) DEFAULT NULL,
+    days_since_last_failure int DEFAULT NULL,
+    days_since_last_inspection int DEFAULT NULL,
+    extraction_date datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (interval_minutes, asset_id, bucket_start),
+    FOREIGN KEY (asset_id) REFERENCES assets (asset_id) ON DELETE CASCADE
+);
+
+-- Table: faliure_prediction
+CREATE TABLE IF NOT EXISTS faliure_prediction (
+    prediction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    asset_id INT NOT NULL,
+    prediction_date DATETIME NOT NULL,
+    probability_score DECIMAL(5, 4) NOT NULL CHECK (probability_score >= 0 AND probability_score <= 1),
+    predicted_failure BOOLEAN DEFAULT FALSE,
+    risk_level VARCHAR(50) NOT NULL,
+    model_version VARCHAR(50) DEFAULT 'LSTM_v1.0',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (asset_id) REFERENCES assets(asset_id) ON DELETE CASCADE,
+    UNIQUE (asset_id, prediction_date)
+);
+
+-- Table: feature_drift (daily PSI/KS drift scores of faliure_probability_base sensor features vs. the training reference)
+CREATE TABLE IF NOT EXISTS feature_drift (
+    drift_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    reading_date DATE NOT NULL,
+    feature_name VARCHAR(100) NOT NULL,
+    psi DECIMAL(12, 6) NOT NULL,
+    ks_statistic DECIMAL(8, 6) NOT NULL,
+    window_count INT DEFAULT 0,
+    drift_status VARCHAR(50) NOT NULL,
+    reference_version VARCHAR(50) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (reference_version, reading_date, feature_name)
+);
+
+-- Table: etl_watermarks (progress markers of incremental ETL jobs, e.g. last copied reading_id)
+CREATE TABLE IF NOT EXISTS etl_watermarks (
+    watermark_name VARCHAR(100) PRIMARY KEY,
+    watermark_value VARCHAR(100) NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Table: etl_stage_runs (one row per stage execution of the pipeline orchestrator, ETL/pipeline.py)
+CREATE TABLE IF NOT EXISTS etl_stage_runs (
+    stage_run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id VARCHAR(64) NOT NULL,
+    stage_name VARCHAR(100) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    input_fingerprint CHAR(40),
+    started_at DATETIME NOT NULL,
+    finished_at DATETIME,
+    duration_seconds DECIMAL(12,3),
+    message VARCHAR(500)
+);
+
+-- Table: etl_work_units (asset x date-range units of distributed backfill jobs, ETL/work_queue.py)
+CREATE TABLE IF NOT EXISTS etl_work_units (
+    unit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id VARCHAR(64) NOT NULL,
+    asset_id INT NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 3,
+    worker_id VARCHAR(100),
+    claimed_at DATETIME,
+    heartbeat_at DATETIME,
+    finished_at DATETIME,
+    rows_written INT,
+    last_error VARCHAR(500),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (job_id, asset_id, start_date)
+);
+
+-- Table: plc_sensor_readings_hourly (hourly rollup of plc_sensor_readings, built by ETL/sensor_downsampling.py)
+CREATE TABLE IF NOT EXISTS plc_sensor_readings_hourly (
+    asset_id INT NOT NULL,
+    sensor_type VARCHAR(100) NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    reading_count INT NOT NULL,
+    mean_value DOUBLE NOT NULL,
+    min_value DOUBLE NOT NULL,
+    max_value DOUBLE NOT NULL,
+    std_value DOUBLE NOT NULL,
+    warning_count INT DEFAULT 0,
+    critical_count INT DEFAULT 0,
+    PRIMARY KEY (asset_id, sensor_type, bucket_start)
+);
+
+-- Table: plc_sensor_readings_daily (daily rollup, built from the hourly tier)
+CREATE TABLE IF NOT EXISTS plc_sensor_readings_daily (
+    asset_id INT NOT NULL,
+    sensor_type VARCHAR(100) NOT NULL,
+    bucket_date DATE NOT NULL,
+    reading_count INT NOT NULL,
+    mean_value DOUBLE NOT NULL,
+    min_value DOUBLE NOT NULL,
+    max_value DOUBLE NOT NULL,
+    std_value DOUBLE NOT NULL,
+    warning_count INT DEFAULT 0,
+    critical_count INT DEFAULT 0,
+    PRIMARY KEY (asset_id, sensor_type, bucket_date)
+);
+
+-- Table: sensor_anomaly_state (EWMA/CUSUM detector state per asset x sensor)
+CREATE TABLE IF NOT EXISTS sensor_anomaly_state (
+    asset_id INT NOT NULL,
+    sensor_type VARCHAR(100) NOT NULL,
+    ewma_mean DOUBLE NOT NULL,
+    ewma_var DOUBLE NOT NULL,
+    cusum_pos DOUBLE NOT NULL,
+    cusum_neg DOUBLE NOT NULL,
+    reading_count INT NOT NULL,
+    last_reading_at DATETIME,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (asset_id, sensor_type)
+);
+
+-- Table: sensor_anomaly_daily (anomaly scores per asset x day x sensor)
+CREATE TABLE IF NOT EXISTS sensor_anomaly_daily (
+    asset_id INT NOT NULL,
+    reading_date DATE NOT NULL,
+    sensor_type VARCHAR(100) NOT NULL,
+    reading_count INT NOT NULL,
+    max_abs_z DECIMAL(10, 4) NOT NULL,
+    max_cusum DECIMAL(10, 4) NOT NULL,
+    alarm_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (asset_id, reading_date, sensor_type)
+);
+
+-- Table: sensor_data_quality (per asset x day x sensor: coverage, gaps, flatlines, out-of-range values, duplicates)
+CREATE TABLE IF NOT EXISTS sensor_data_quality (
+    asset_id INT NOT NULL,
+    reading_date DATE NOT NULL,
+    sensor_type VARCHAR(100) NOT NULL,
+    expected_count INT NOT NULL,
+    reading_count INT NOT NULL,
+    duplicate_count INT NOT NULL DEFAULT 0,
+    out_of_range_count INT NOT NULL DEFAULT 0,
+    flatline_count INT NOT NULL DEFAULT 0,
+    gap_minutes INT NOT NULL DEFAULT 0,
+    longest_gap_minutes INT NOT NULL DEFAULT 0,
+    coverage_ratio DECIMAL(5, 4) NOT NULL,
+    checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (asset_id, reading_date, sensor_type)
+);
+
+-- Table: sensors (dimension)
+CREATE TABLE IF NOT EXISTS sensors (
+    sensor_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    asset_id INT NOT NULL,
+    sensor_name VARCHAR(255) NOT NULL,
+    sensor_type VARCHAR(100) NOT NULL,
+    unit VARCHAR(50) NOT NULL,
+    warning_low DECIMAL(10, 4),
+    warning_high DECIMAL(10, 4),
+    critical_low DECIMAL(10, 4),
+    critical_high DECIMAL(10, 4),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (asset_id) REFERENCES assets(asset_id) ON DELETE CASCADE,
+    UNIQUE (asset_id, sensor_type, sensor_name)
+);
+
+-- Table: sensor_readings (narrow fact table; status: 0 = normal, 1 = warning, 2 = critical)
+CREATE TABLE IF NOT EXISTS sensor_readings (
+    sensor_id SMALLINT NOT NULL,
+    ts DATETIME NOT NULL,
+    value FLOAT NOT NULL,
+    status TINYINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (sensor_id, ts)
+);
+
+-- Indexes
+CREATE INDEX IF NOT EXISTS assets_idx_asset_type ON assets (asset_type);
+CREATE INDEX IF NOT EXISTS assets_idx_status ON assets (status);
+CREATE INDEX IF NOT EXISTS assets_idx_location ON assets (location);
+CREATE INDEX IF NOT EXISTS mantainance_employees_idx_department ON mantainance_employees (department);
+CREATE INDEX IF NOT EXISTS mantainance_employees_idx_position ON mantainance_employees (position);
+CREATE INDEX IF NOT EXISTS mantainance_employees_education_idx_employee_id ON mantainance_employees_education (employee_id);
+CREATE INDEX IF NOT EXISTS mantainance_employees_education_idx_graduation_year ON mantainance_employees_education (graduation_year);
+CREATE INDEX IF NOT EXISTS asset_value_idx_asset_id ON asset_value (asset_id);
+CREATE INDEX IF NOT EXISTS asset_value_idx_value_date ON asset_value (value_date);
+CREATE INDEX IF NOT EXISTS asset_costs_idx_asset_id ON asset_costs (asset_id);
+CREATE INDEX IF NOT EXISTS asset_costs_idx_cost_type ON asset_costs (cost_type);
+CREATE INDEX IF NOT EXISTS asset_costs_idx_cost_date ON asset_costs (cost_date);
+CREATE INDEX IF NOT EXISTS assets_faliures_idx_asset_id ON assets_faliures (asset_id);
+CREATE INDEX IF NOT EXISTS assets_faliures_idx_failure_date ON assets_faliures (failure_date);
+CREATE INDEX IF NOT EXISTS assets_faliures_idx_failure_type ON assets_faliures (failure_type);
+CREATE INDEX IF NOT EXISTS assets_faliures_idx_severity ON assets_faliures (severity);
+CREATE INDEX IF NOT EXISTS assets_faliures_idx_resolved ON assets_faliures (resolved);
+CREATE INDEX IF NOT EXISTS plc_sensor_readings_idx_asset_id ON plc_sensor_readings (asset_id);
+CREATE INDEX IF NOT EXISTS plc_sensor_readings_idx_reading_timestamp ON plc_sensor_readings (reading_timestamp);
+CREATE INDEX IF NOT EXISTS plc_sensor_readings_idx_sensor_type ON plc_sensor_readings (sensor_type);
+CREATE INDEX IF NOT EXISTS plc_sensor_readings_idx_status ON plc_sensor_readings (status);
+CREATE INDEX IF NOT EXISTS plc_sensor_readings_idx_asset_timestamp ON plc_sensor_readings (asset_id, reading_timestamp);
+CREATE INDEX IF NOT EXISTS mantainance_orders_idx_asset_id ON mantainance_orders (asset_id);
+CREATE INDEX IF NOT EXISTS mantainance_orders_idx_assigned_employee_id ON mantainance_orders (assigned_employee_id);
+CREATE INDEX IF NOT EXISTS mantainance_orders_idx_order_type ON mantainance_orders (order_type);
+CREATE INDEX IF NOT EXISTS mantainance_orders_idx_priority ON mantainance_orders (priority);
+CREATE INDEX IF NOT EXISTS mantainance_orders_idx_status ON mantainance_orders (status);
+CREATE INDEX IF NOT EXISTS mantainance_orders_idx_scheduled_date ON mantainance_orders (scheduled_date);
+CREATE INDEX IF NOT EXISTS mantainance_tasks_idx_order_id ON mantainance_tasks (order_id);
+CREATE INDEX IF NOT EXISTS mantainance_tasks_idx_assigned_employee_id ON mantainance_tasks (assigned_employee_id);
+CREATE INDEX IF NOT EXISTS mantainance_tasks_idx_status ON mantainance_tasks (status);
+CREATE INDEX IF NOT EXISTS faliure_probability_idx_asset_id ON faliure_probability (asset_id);
+CREATE INDEX IF NOT EXISTS faliure_probability_idx_risk_level ON faliure_probability (risk_level);
+CREATE INDEX IF NOT EXISTS faliure_probability_idx_probability_score ON faliure_probability (probability_score);
+CREATE INDEX IF NOT EXISTS faliure_probability_idx_calculation_date ON faliure_probability (calculation_date);
+CREATE INDEX IF NOT EXISTS mantainace_cost_idx_asset_id ON mantainace_cost (asset_id);
+CREATE INDEX IF NOT EXISTS mantainace_cost_idx_calculation_date ON mantainace_cost (calculation_date);
+CREATE INDEX IF NOT EXISTS mantainace_cost_idx_cost_trend ON mantainace_cost (cost_trend);
+CREATE INDEX IF NOT EXISTS mantainace_cost_idx_total_cost ON mantainace_cost (total_cost);
+CREATE INDEX IF NOT EXISTS faliure_probability_base_idx_asset_id ON faliure_probability_base (asset_id);
+CREATE INDEX IF NOT EXISTS faliure_probability_base_idx_extraction_date ON faliure_probability_base (extraction_date);
+CREATE INDEX IF NOT EXISTS faliure_probability_base_hourly_idx_bucket_start ON faliure_probability_base_hourly (bucket_start);
+CREATE INDEX IF NOT EXISTS faliure_prediction_idx_asset_id ON faliure_prediction (asset_id);
+CREATE INDEX IF NOT EXISTS faliure_prediction_idx_prediction_date ON faliure_prediction (prediction_date);
+CREATE INDEX IF NOT EXISTS faliure_prediction_idx_risk_level ON faliure_prediction (risk_level);
+CREATE INDEX IF NOT EXISTS faliure_prediction_idx_probability_score ON faliure_prediction (probability_score);
+CREATE INDEX IF NOT EXISTS faliure_prediction_idx_predicted_failure ON faliure_prediction (predicted_failure);
+CREATE INDEX IF NOT EXISTS feature_drift_idx_reading_date ON feature_drift (reading_date);
+CREATE INDEX IF NOT EXISTS feature_drift_idx_drift_status ON feature_drift (drift_status);
+CREATE INDEX IF NOT EXISTS plc_sensor_readings_hourly_idx_bucket_start ON plc_sensor_readings_hourly (bucket_start);
+CREATE INDEX IF NOT EXISTS plc_sensor_readings_daily_idx_bucket_date ON plc_sensor_readings_daily (bucket_date);
+CREATE INDEX IF NOT EXISTS sensor_anomaly_daily_idx_reading_date ON sensor_anomaly_daily (reading_date);
+CREATE INDEX IF NOT EXISTS sensor_data_quality_idx_reading_date ON sensor_data_quality (reading_date);
+CREATE INDEX IF NOT EXISTS sensors_idx_sensor_type ON sensors (sensor_type);
+CREATE INDEX IF NOT EXISTS etl_stage_runs_idx_stage_status ON etl_stage_runs (stage_name, status);
+CREATE INDEX IF NOT EXISTS etl_stage_runs_idx_run_id ON etl_stage_runs (run_id);
+CREATE INDEX IF NOT EXISTS etl_work_units_idx_job_status ON etl_work_units (job_id, status, unit_id);
+CREATE INDEX IF NOT EXISTS etl_work_units_idx_status_heartbeat ON etl_work_units (status, heartbeat_at);